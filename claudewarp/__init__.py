@@ -9,10 +9,26 @@ __version__ = "0.0.35"
 __author__ = "claudewarp"
 __email__ = "claudewarp@example.com"
 
-from claudewarp.core.exceptions import ClaudeWarpError
+# 导出主要组件（按需导入，避免 `import claudewarp` 时加载 pydantic 等重量级依赖）
+_LAZY_EXPORTS = {
+    "ProxyManager": "claudewarp.core.manager",
+    "ProxyServer": "claudewarp.core.models",
+    "ExportFormat": "claudewarp.core.models",
+    "ClaudeWarpError": "claudewarp.core.exceptions",
+}
+
+
+def __getattr__(name: str):
+    """延迟导入导出的组件"""
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
 
-# 导出主要组件
-from claudewarp.core.manager import ProxyManager
-from claudewarp.core.models import ExportFormat, ProxyServer
 
 __all__ = ["ProxyManager", "ProxyServer", "ExportFormat", "ClaudeWarpError"]
@@ -6,29 +6,27 @@ CLI命令处理模块
 
 import logging
 import sys
-from typing import Optional
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Optional
 
 import typer
-from rich.console import Console
-from rich.prompt import Confirm, Prompt
-
-from claudewarp.cli.formatters import (
-    format_export_output,
-    format_proxy_info,
-    format_proxy_table,
-    format_success,
-)
+
 from claudewarp.core.exceptions import (
     ClaudeWarpError,
     DuplicateProxyError,
     ProxyNotFoundError,
     ValidationError,
 )
-from claudewarp.core.manager import ProxyManager
-from claudewarp.core.models import ExportFormat
+from claudewarp.core.exceptions import ImportError as ProxyImportError
+
+if TYPE_CHECKING:
+    from rich.console import Console
 
-# 创建控制台对象
-console = Console()
+    from claudewarp.core.manager import ProxyManager
+
+# 注意: rich、pydantic 以及核心管理器都在命令内部按需导入，
+# 保证 `cw current` / `cw use` 等高频命令只加载实际用到的模块
 
 # 创建日志器
 logger = logging.getLogger(__name__)
@@ -43,8 +41,25 @@ app = typer.Typer(
 )
 
 
-def get_proxy_manager() -> ProxyManager:
+@lru_cache(maxsize=None)
+def get_console() -> "Console":
+    """获取控制台对象（首次调用时创建）"""
+    from rich.console import Console
+
+    return Console()
+
+
+# 批处理模式下所有命令共享的代理管理器
+_batch_manager: Optional["ProxyManager"] = None
+
+
+def get_proxy_manager() -> "ProxyManager":
     """获取代理管理器实例"""
+    if _batch_manager is not None:
+        return _batch_manager
+
+    from claudewarp.core.manager import ProxyManager
+
     try:
         logger.debug("初始化代理管理器")
         return ProxyManager()
@@ -54,7 +69,7 @@ def get_proxy_manager() -> ProxyManager:
 
 
 def _update_proxy_with_rename(
-    manager: ProxyManager, old_name: str, new_name: str, update_kwargs: dict
+    manager: "ProxyManager", old_name: str, new_name: str, update_kwargs: dict
 ) -> None:
     """处理代理重命名的更新逻辑
 
@@ -81,26 +96,30 @@ def _update_proxy_with_rename(
         "is_active": update_kwargs.get("is_active", old_proxy.is_active),
         "bigmodel": update_kwargs.get("bigmodel", old_proxy.bigmodel),
         "smallmodel": update_kwargs.get("smallmodel", old_proxy.smallmodel),
+        "auth_token": update_kwargs.get("auth_token", old_proxy.auth_token),
     }
 
-    # 删除旧代理
-    manager.remove_proxy(old_name)
-
-    # 添加新代理
-    manager.add_proxy(
-        name=proxy_data["name"],
-        base_url=proxy_data["base_url"],
-        api_key=proxy_data["api_key"],
-        description=proxy_data["description"],
-        tags=proxy_data["tags"],
-        is_active=proxy_data["is_active"],
-        bigmodel=proxy_data["bigmodel"],
-        smallmodel=proxy_data["smallmodel"],
-    )
+    # 删除、添加和切换在同一事务中完成，只写入一次配置
+    with manager.transaction():
+        # 删除旧代理
+        manager.remove_proxy(old_name)
 
-    # 如果原代理是当前代理，切换到新名称
-    if was_current:
-        manager.switch_proxy(new_name)
+        # 添加新代理
+        manager.add_proxy(
+            name=proxy_data["name"],
+            base_url=proxy_data["base_url"],
+            api_key=proxy_data["api_key"],
+            description=proxy_data["description"],
+            tags=proxy_data["tags"],
+            is_active=proxy_data["is_active"],
+            bigmodel=proxy_data["bigmodel"],
+            smallmodel=proxy_data["smallmodel"],
+            auth_token=proxy_data["auth_token"],
+        )
+
+        # 如果原代理是当前代理，切换到新名称
+        if was_current:
+            manager.switch_proxy(new_name)
 
 
 @app.command()
@@ -115,9 +134,14 @@ def add(
     tags: Optional[str] = typer.Option(None, "--tags", "-t", help="标签列表，用逗号分隔"),
     bigmodel: Optional[str] = typer.Option(None, "--bigmodel", help="大模型名称"),
     smallmodel: Optional[str] = typer.Option(None, "--smallmodel", help="小模型名称"),
-    interactive: bool = typer.Option(True, "--interactive", "-i", help="交互式输入"),
+    interactive: bool = typer.Option(
+        True, "--interactive/--no-interactive", "-i", help="交互式输入"
+    ),
 ):
     """添加新的代理服务器"""
+    from claudewarp.cli.formatters import format_proxy_info
+
+    console = get_console()
 
     try:
         manager = get_proxy_manager()
@@ -252,8 +276,14 @@ def add(
 def list(
     format: str = typer.Option("table", "--format", "-f", help="输出格式: table, json, simple"),
     search: Optional[str] = typer.Option(None, "--search", "-s", help="搜索关键词"),
+    sort: str = typer.Option(
+        "name", "--sort", help="排序方式: name, latency（按历史延迟中位数，无记录的排在最后）"
+    ),
 ):
     """列出所有代理服务器"""
+    from claudewarp.cli.formatters import format_proxy_table
+
+    console = get_console()
 
     try:
         manager = get_proxy_manager()
@@ -271,13 +301,31 @@ def list(
             logger.warning("暂无代理服务器配置")
             return
 
+        # 按历史延迟排序
+        latency = None
+        if sort == "latency":
+            latency = manager.get_latency_summaries(proxies.keys())
+            proxies = dict(
+                sorted(
+                    proxies.items(),
+                    key=lambda item: (
+                        latency[item[0]]["p50"] is None,
+                        latency[item[0]]["p50"] or 0.0,
+                        item[0],
+                    ),
+                )
+            )
+        elif sort != "name":
+            logger.error(f"不支持的排序方式: {sort}")
+            raise typer.Exit(1)
+
         # 获取当前代理
         current_proxy = manager.get_current_proxy()
         current_name = current_proxy.name if current_proxy else None
 
         # 格式化输出
         if format == "table":
-            table = format_proxy_table(proxies, current_name)
+            table = format_proxy_table(proxies, current_name, latency)
             console.print(table)
         elif format == "json":
             import json
@@ -286,6 +334,8 @@ def list(
                 "current_proxy": current_name,
                 "proxies": {name: proxy.dict() for name, proxy in proxies.items()},
             }
+            if latency is not None:
+                data["latency"] = latency
             console.print(json.dumps(data, indent=2, ensure_ascii=False))
         elif format == "simple":
             for name, proxy in proxies.items():
@@ -299,6 +349,81 @@ def list(
     except ClaudeWarpError as e:
         logger.error(f"操作失败: {e}")
         raise typer.Exit(1) from None
+    except typer.Exit:
+        raise
+    except Exception as e:
+        logger.error(f"未知错误: {e}")
+        raise typer.Exit(1) from None
+
+
+@app.command()
+def dump(
+    output: Optional[str] = typer.Option(None, "--output", "-o", help="输出到文件(默认标准输出)"),
+    fields: Optional[str] = typer.Option(
+        None, "--fields", help="只输出指定字段，逗号分隔，如 name,base_url"
+    ),
+    mask: bool = typer.Option(False, "--mask", "-m", help="遮蔽API密钥和Auth令牌"),
+    active_only: bool = typer.Option(False, "--active-only", "-a", help="只输出启用的代理"),
+):
+    """以NDJSON格式（每行一个JSON对象）流式导出全部代理"""
+    import json
+    import os
+    import tempfile
+
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+    try:
+        manager = get_proxy_manager()
+        records = manager.iter_proxies(
+            active_only=active_only, fields=field_list, mask_credentials=mask
+        )
+
+        if output:
+            # 先写入同目录下的临时文件再替换，读取方不会看到写了一半的文件；
+            # 临时文件名唯一且权限为0600（内容可能包含未遮蔽的密钥），任何失败都会删除
+            try:
+                fd, temp_path = tempfile.mkstemp(
+                    dir=os.path.dirname(os.path.abspath(output)),
+                    prefix=f".{os.path.basename(output)}.",
+                    suffix=".tmp",
+                )
+            except OSError as e:
+                logger.error(f"写入文件失败: {e}")
+                raise typer.Exit(1) from None
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+                        f.write("\n")
+                os.replace(temp_path, output)
+            except BaseException as e:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+                if not isinstance(e, OSError):
+                    raise
+                logger.error(f"写入文件失败: {e}")
+                raise typer.Exit(1) from None
+        else:
+            write = sys.stdout.write
+            for record in records:
+                write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+                write("\n")
+            sys.stdout.flush()
+
+    except BrokenPipeError:
+        # 下游提前关闭管道（如 | head），静默退出
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+    except ValidationError as e:
+        logger.error(str(e))
+        raise typer.Exit(1) from None
+    except ClaudeWarpError as e:
+        logger.error(f"操作失败: {e}")
+        raise typer.Exit(1) from None
+    except typer.Exit:
+        raise
     except Exception as e:
         logger.error(f"未知错误: {e}")
         raise typer.Exit(1) from None
@@ -306,49 +431,720 @@ def list(
 
 @app.command()
 def use(
-    name: str = typer.Argument(..., help="代理名称"),
+    name: Optional[str] = typer.Argument(None, help="代理名称(使用 --fastest 时省略)"),
     force: bool = typer.Option(False, "--force", "-f", help="强制切换(即使代理未启用)"),
+    targets: bool = typer.Option(
+        False, "--targets", "-T", help="同时同步到登记的 Claude Code 配置目标"
+    ),
+    fastest: bool = typer.Option(
+        False, "--fastest", help="检查所有启用的代理，切换到错误率最低、延迟最小的代理"
+    ),
+    tag: Optional[str] = typer.Option(None, "--tag", "-t", help="--fastest 只在包含该标签的代理中选择"),
+    attempts: int = typer.Option(3, "--attempts", help="--fastest 时每个代理的检查次数"),
+    max_age: Optional[float] = typer.Option(
+        None, "--max-age", help="--fastest 时复用最近 N 秒内的检查记录，不再重新检查这些代理"
+    ),
 ):
     """切换到指定的代理服务器"""
+    from rich.prompt import Confirm
+
+    from claudewarp.cli.formatters import format_proxy_info, format_ranking_table
+
+    console = get_console()
+
+    if fastest == (name is not None):
+        logger.error("请指定代理名称或使用 --fastest（二者只能选一）")
+        raise typer.Exit(1)
 
     try:
         manager = get_proxy_manager()
 
-        # 检查代理是否存在
-        proxy = manager.get_proxy(name)
-
-        # 检查代理状态
-        if not proxy.is_active and not force:
-            logger.warning(f"代理 '{name}' 未启用")
-            console.print("使用 --force 强制切换，或先启用该代理")
-            if not Confirm.ask("是否强制切换?", default=False):
-                logger.info("用户取消操作")
-                return
+        if fastest:
+            with console.status("正在检查候选代理..."):
+                selection = manager.switch_to_best(tag=tag, attempts=attempts, max_age=max_age)
+            proxy = selection["proxy"]
+            name = proxy.name
+            console.print(format_ranking_table(selection["ranking"], selected=name))
+            logger.info(f"成功切换到代理: {name}")
+        else:
+            # 检查代理是否存在
+            proxy = manager.get_proxy(name)
+
+            # 检查代理状态
+            if not proxy.is_active and not force:
+                logger.warning(f"代理 '{name}' 未启用")
+                console.print("使用 --force 强制切换，或先启用该代理")
+                if not Confirm.ask("是否强制切换?", default=False):
+                    logger.info("用户取消操作")
+                    return
 
-        # 切换代理
-        logger.info(f"切换到代理: {name}")
-        manager.switch_proxy(name)
+            # 切换代理
+            logger.info(f"切换到代理: {name}")
+            manager.switch_proxy(name)
 
-        logger.info(f"成功切换到代理: {name}")
+            logger.info(f"成功切换到代理: {name}")
 
         # 显示代理信息
         console.print()
         console.print(format_proxy_info(proxy))
 
+        if targets:
+            _sync_targets(manager, name)
+
+    except ProxyNotFoundError as e:
+        logger.error(str(e))
+        raise typer.Exit(1) from None
+    except ClaudeWarpError as e:
+        logger.error(f"操作失败: {e}")
+        raise typer.Exit(1) from None
+    except typer.Exit:
+        raise
+    except Exception as e:
+        logger.error(f"未知错误: {e}")
+        raise typer.Exit(1) from None
+
+
+def _sync_targets(
+    manager: "ProxyManager", proxy_name: Optional[str] = None, workers: int = 16
+) -> None:
+    """同步到登记的 Claude Code 配置目标并显示结果，有目标失败时以状态码1退出"""
+    from claudewarp.cli.formatters import format_target_results, format_warning
+
+    console = get_console()
+    if _batch_manager is not None:
+        # 批处理中的修改尚未提交，同步推迟到提交之后，结果记录在日志中
+        manager.sync_claude_code_targets(proxy_name, max_workers=workers)
+        console.print("将在批处理提交后同步 Claude Code 配置目标")
+        return
+
+    started = time.perf_counter()
+    results = manager.sync_claude_code_targets(proxy_name, max_workers=workers)
+    elapsed = time.perf_counter() - started
+    if not results:
+        console.print(format_warning("没有登记的 Claude Code 配置目标，使用 'cw targets add' 添加"))
+        return
+
+    console.print(format_target_results(results))
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    total = sum(result["elapsed"] for result in results)
+    console.print(
+        f"更新 {counts.get('updated', 0)}，无变化 {counts.get('unchanged', 0)}，"
+        f"已最新 {counts.get('skipped', 0)}，失败 {counts.get('failed', 0)}"
+        f"，耗时 {elapsed * 1000:.1f}ms（各目标合计 {total * 1000:.1f}ms）"
+    )
+    if counts.get("failed"):
+        raise typer.Exit(1)
+
+
+@app.command("sync-targets")
+def sync_targets(
+    proxy: Optional[str] = typer.Option(
+        None, "--proxy", "-p", help="要同步的代理名称(默认当前代理，no 表示清空)"
+    ),
+    workers: int = typer.Option(16, "--workers", "-w", help="并发写入的线程数"),
+):
+    """将代理配置同步到所有登记的 Claude Code 配置目标"""
+    try:
+        manager = get_proxy_manager()
+        _sync_targets(manager, proxy, workers)
+
+    except ProxyNotFoundError as e:
+        logger.error(str(e))
+        raise typer.Exit(1) from None
+    except ClaudeWarpError as e:
+        logger.error(f"操作失败: {e}")
+        raise typer.Exit(1) from None
+    except typer.Exit:
+        raise
+    except Exception as e:
+        logger.error(f"未知错误: {e}")
+        raise typer.Exit(1) from None
+
+
+# Claude Code 配置同步目标管理
+targets_app = typer.Typer(help="管理 Claude Code 配置同步目标", no_args_is_help=True)
+app.add_typer(targets_app, name="targets")
+
+
+@targets_app.command("add")
+def targets_add(
+    paths: List[str] = typer.Argument(
+        ..., help="配置文件路径(如 项目/.claude/settings.local.json)或 Claude Code 配置目录"
+    ),
+):
+    """登记同步目标"""
+    from claudewarp.cli.formatters import format_success
+
+    try:
+        added = get_proxy_manager().add_claude_code_targets(paths)
+        for path in added:
+            get_console().print(format_success(f"已添加: {path}"))
+        if not added:
+            logger.info("目标均已登记")
+
+    except ClaudeWarpError as e:
+        logger.error(f"操作失败: {e}")
+        raise typer.Exit(1) from None
+
+
+@targets_app.command("remove")
+def targets_remove(
+    paths: List[str] = typer.Argument(..., help="配置文件路径或 Claude Code 配置目录"),
+):
+    """取消登记同步目标（不修改目标文件）"""
+    from claudewarp.cli.formatters import format_success
+
+    try:
+        removed = get_proxy_manager().remove_claude_code_targets(paths)
+        for path in removed:
+            get_console().print(format_success(f"已移除: {path}"))
+        if not removed:
+            logger.warning("没有匹配的已登记目标")
+
+    except ClaudeWarpError as e:
+        logger.error(f"操作失败: {e}")
+        raise typer.Exit(1) from None
+
+
+@targets_app.command("list")
+def targets_list():
+    """列出已登记的同步目标"""
+    from rich.markup import escape
+
+    console = get_console()
+    targets = get_proxy_manager().get_claude_code_targets()
+    if not targets:
+        console.print("没有登记的 Claude Code 配置目标")
+        return
+    for path in targets:
+        status = "" if path.parent.is_dir() else " [red](目录不存在)[/red]"
+        console.print(f"{escape(str(path))}{status}")
+
+
+# 本地转发的模型路由规则管理
+routes_app = typer.Typer(help="管理本地转发的模型路由规则", no_args_is_help=True)
+app.add_typer(routes_app, name="routes")
+
+
+@routes_app.command("set")
+def routes_set(
+    rule: str = typer.Argument(..., help="模型名称、通配符(如 claude-opus-*)或模型类别 small/big"),
+    proxy: str = typer.Argument(..., help="目标代理名称"),
+):
+    """添加或修改模型路由规则"""
+    from claudewarp.cli.formatters import format_success
+
+    try:
+        get_proxy_manager().set_model_route(rule, proxy)
+        get_console().print(format_success(f"已设置模型路由: {rule} -> {proxy}"))
+
+    except ProxyNotFoundError as e:
+        logger.error(str(e))
+        raise typer.Exit(1) from None
+    except ClaudeWarpError as e:
+        logger.error(f"操作失败: {e}")
+        raise typer.Exit(1) from None
+
+
+@routes_app.command("remove")
+def routes_remove(
+    rules: List[str] = typer.Argument(..., help="要删除的规则"),
+):
+    """删除模型路由规则"""
+    from claudewarp.cli.formatters import format_success
+
+    try:
+        removed = get_proxy_manager().remove_model_routes(rules)
+        for rule in removed:
+            get_console().print(format_success(f"已删除: {rule}"))
+        if not removed:
+            logger.warning("没有匹配的模型路由规则")
+
+    except ClaudeWarpError as e:
+        logger.error(f"操作失败: {e}")
+        raise typer.Exit(1) from None
+
+
+@routes_app.command("list")
+def routes_list():
+    """列出模型路由规则（按匹配顺序）"""
+    from rich.markup import escape
+
+    from claudewarp.core.router import MODEL_CLASSES
+
+    console = get_console()
+    manager = get_proxy_manager()
+    routes = manager.get_model_routes()
+    if not routes:
+        console.print("没有配置模型路由规则，本地转发代理将所有请求转发到当前代理")
+        return
+    proxies = manager.list_proxies()
+    ordered = [rule for rule in routes if rule not in MODEL_CLASSES] + [
+        rule for rule in MODEL_CLASSES if rule in routes
+    ]
+    for rule in ordered:
+        target = proxies.get(routes[rule])
+        if target is None:
+            status = " [red](代理不存在)[/red]"
+        elif not target.is_active:
+            status = " [yellow](已禁用)[/yellow]"
+        else:
+            status = ""
+        console.print(f"{escape(rule)} -> {escape(routes[rule])}{status}")
+
+
+# 本地转发的备用代理管理
+fallbacks_app = typer.Typer(help="管理本地转发故障转移的备用代理", no_args_is_help=True)
+app.add_typer(fallbacks_app, name="fallbacks")
+
+
+@fallbacks_app.command("set")
+def fallbacks_set(
+    name: str = typer.Argument(..., help="代理名称"),
+    fallbacks: List[str] = typer.Argument(..., help="备用代理名称(按尝试顺序)"),
+):
+    """设置代理的备用代理列表"""
+    from claudewarp.cli.formatters import format_success
+
+    try:
+        result = get_proxy_manager().set_fallbacks(name, fallbacks)
+        get_console().print(format_success(f"已设置 {name} 的备用代理: {' -> '.join(result)}"))
+
+    except ProxyNotFoundError as e:
+        logger.error(str(e))
+        raise typer.Exit(1) from None
+    except ClaudeWarpError as e:
+        logger.error(f"操作失败: {e}")
+        raise typer.Exit(1) from None
+
+
+@fallbacks_app.command("clear")
+def fallbacks_clear(
+    name: str = typer.Argument(..., help="代理名称"),
+):
+    """清除代理的备用代理列表"""
+    from claudewarp.cli.formatters import format_success
+
+    try:
+        manager = get_proxy_manager()
+        if not manager.get_fallbacks(name):
+            logger.warning(f"代理 {name} 没有设置备用代理")
+            return
+        manager.set_fallbacks(name, [])
+        get_console().print(format_success(f"已清除 {name} 的备用代理"))
+
+    except ProxyNotFoundError as e:
+        logger.error(str(e))
+        raise typer.Exit(1) from None
+    except ClaudeWarpError as e:
+        logger.error(f"操作失败: {e}")
+        raise typer.Exit(1) from None
+
+
+@fallbacks_app.command("list")
+def fallbacks_list():
+    """列出各代理的备用代理列表"""
+    from rich.markup import escape
+
+    console = get_console()
+    fallbacks = get_proxy_manager().get_all_fallbacks()
+    if not fallbacks:
+        console.print("没有设置备用代理")
+        return
+    for name, names in fallbacks.items():
+        console.print(f"{escape(name)}: {escape(' -> '.join(names))}")
+
+
+@app.command()
+def check(
+    names: Optional[List[str]] = typer.Argument(None, help="代理名称(不指定则检查当前代理)"),
+    tag: Optional[str] = typer.Option(None, "--tag", "-t", help="检查包含该标签的代理"),
+    all_proxies: bool = typer.Option(False, "--all", "-a", help="检查全部代理"),
+    concurrency: int = typer.Option(32, "--concurrency", "-c", help="最大并发检查数"),
+    connect_timeout: float = typer.Option(
+        5.0, "--connect-timeout", help="DNS解析、TCP连接和TLS握手各自的超时时间(秒)"
+    ),
+    timeout: float = typer.Option(10.0, "--timeout", help="等待HTTP响应的超时时间(秒)"),
+    format: str = typer.Option("table", "--format", "-f", help="输出格式: table, json"),
+):
+    """并发检查代理服务器的连通性和认证"""
+    import json
+
+    from rich.progress import BarColumn, Progress, SpinnerColumn, TextColumn
+
+    from claudewarp.cli.formatters import format_check_results
+
+    console = get_console()
+
+    try:
+        manager = get_proxy_manager()
+
+        if names:
+            selected: Optional[List[str]] = names
+        elif tag is not None or all_proxies:
+            selected = None
+        else:
+            current = manager.get_current_proxy()
+            if current is None:
+                logger.error("没有当前代理，请指定代理名称、--tag 或 --all")
+                raise typer.Exit(1)
+            selected = [current.name]
+
+        timeouts = {
+            "dns": connect_timeout,
+            "connect": connect_timeout,
+            "tls": connect_timeout,
+            "http": timeout,
+        }
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TextColumn("{task.completed} 个"),
+            console=console,
+            transient=True,
+            disable=format == "json",
+        ) as progress:
+            task = progress.add_task("检查代理连通性", total=None)
+            results = manager.check_proxies(
+                selected,
+                tag=tag,
+                concurrency=concurrency,
+                timeouts=timeouts,
+                progress=lambda result: progress.advance(task),
+            )
+
+        if not results:
+            logger.warning("没有符合条件的代理")
+            return
+
+        if format == "json":
+            print(json.dumps(results, indent=2, ensure_ascii=False))
+        else:
+            console.print(format_check_results(results))
+            failed = sum(1 for result in results if result["status"] != "ok")
+            console.print(f"共检查 {len(results)} 个代理，正常 {len(results) - failed}，失败 {failed}")
+
+        if any(result["status"] != "ok" for result in results):
+            raise typer.Exit(1)
+
     except ProxyNotFoundError as e:
         logger.error(str(e))
         raise typer.Exit(1) from None
     except ClaudeWarpError as e:
         logger.error(f"操作失败: {e}")
         raise typer.Exit(1) from None
+    except typer.Exit:
+        raise
     except Exception as e:
         logger.error(f"未知错误: {e}")
         raise typer.Exit(1) from None
 
 
+@app.command()
+def bench(
+    name: Optional[str] = typer.Argument(None, help="代理名称(不指定则测试当前代理)"),
+    requests: int = typer.Option(20, "--requests", "-n", help="请求总数"),
+    concurrency: int = typer.Option(4, "--concurrency", "-c", help="最大并发请求数"),
+    rate: Optional[float] = typer.Option(
+        None, "--rate", "-r", help="每秒发出的请求数(不指定则以最大并发持续发送)"
+    ),
+    mode: str = typer.Option("stream", "--mode", "-m", help="请求模式: stream, nonstream, mixed"),
+    model: Optional[str] = typer.Option(None, "--model", help="使用的模型(默认使用代理的大模型)"),
+    small: bool = typer.Option(False, "--small", help="使用代理的小模型"),
+    max_tokens: int = typer.Option(128, "--max-tokens", help="每个请求的最大输出 token 数"),
+    timeout: float = typer.Option(120.0, "--timeout", help="单个请求的超时时间(秒)"),
+    format: str = typer.Option("table", "--format", "-f", help="输出格式: table, json"),
+):
+    """对代理进行吞吐和流式性能测试(会消耗代理额度)"""
+    import json
+
+    from rich.progress import BarColumn, Progress, SpinnerColumn, TextColumn
+
+    from claudewarp.cli.formatters import format_bench_report
+
+    console = get_console()
+
+    try:
+        manager = get_proxy_manager()
+
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TextColumn("{task.completed}/{task.total}"),
+            console=console,
+            transient=True,
+            disable=format == "json",
+        ) as progress:
+            task = progress.add_task("性能测试", total=requests)
+            report = manager.benchmark_proxy(
+                name,
+                model=model,
+                small=small,
+                requests=requests,
+                concurrency=concurrency,
+                rate=rate,
+                mode=mode,
+                max_tokens=max_tokens,
+                timeout=timeout,
+                progress=lambda result: progress.advance(task),
+            )
+
+        if format == "json":
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+        else:
+            console.print(format_bench_report(report))
+
+        if report["summary"]["successes"] == 0:
+            raise typer.Exit(1)
+
+    except ProxyNotFoundError as e:
+        logger.error(str(e))
+        raise typer.Exit(1) from None
+    except ClaudeWarpError as e:
+        logger.error(f"操作失败: {e}")
+        raise typer.Exit(1) from None
+    except typer.Exit:
+        raise
+    except Exception as e:
+        logger.error(f"未知错误: {e}")
+        raise typer.Exit(1) from None
+
+
+@app.command()
+def serve(
+    host: Optional[str] = typer.Option(None, "--host", help="监听地址(默认 127.0.0.1)"),
+    port: Optional[int] = typer.Option(None, "--port", "-p", help="监听端口(默认 8787)"),
+    apply: bool = typer.Option(
+        False, "--apply", help="启用本地转发：Claude Code 配置改为指向本地转发代理"
+    ),
+    restore: bool = typer.Option(
+        False, "--restore", help="停用本地转发：Claude Code 配置恢复为直接连接当前代理，然后退出"
+    ),
+    connect_timeout: float = typer.Option(10.0, "--connect-timeout", help="连接上游的超时时间(秒)"),
+    read_timeout: float = typer.Option(
+        600.0, "--read-timeout", help="等待上游响应头或下一个数据块的超时时间(秒)"
+    ),
+    pool: Optional[str] = typer.Option(
+        None, "--pool", help="代理池标签：请求分摊到带有该标签的所有启用代理"
+    ),
+    strategy: str = typer.Option(
+        "round-robin", "--strategy", help="代理池负载均衡策略: round-robin|weighted|least-outstanding"
+    ),
+    weight: Optional[List[str]] = typer.Option(
+        None, "--weight", help="设置代理权重(NAME=N，可重复，保存到配置)"
+    ),
+    failover: bool = typer.Option(
+        False, "--failover", help="故障转移：上游连接错误、5xx 或 529 时在备用代理上重试"
+    ),
+    max_attempts: int = typer.Option(
+        3, "--max-attempts", help="故障转移时每个请求最多尝试的次数(包括第一次)"
+    ),
+    rate_limit: bool = typer.Option(
+        False,
+        "--rate-limit",
+        help="速率限制调度：按上游返回的 anthropic-ratelimit-*/retry-after 排队或改用其他代理，避免 429",
+    ),
+    max_queue_wait: float = typer.Option(
+        60.0, "--max-queue-wait", help="速率限制调度时请求在本地排队的最长时间(秒)"
+    ),
+    metering: bool = typer.Option(
+        True, "--metering/--no-metering", help="按代理和模型统计请求和 token 用量(见 'cw stats')"
+    ),
+):
+    """启动本地转发代理，请求转发到当前代理，切换代理后立即对所有会话生效"""
+    from claudewarp.cli.formatters import format_success
+    from claudewarp.core.local_proxy import DEFAULT_SERVE_HOST, DEFAULT_SERVE_PORT
+
+    console = get_console()
+
+    if apply and restore:
+        logger.error("--apply 和 --restore 不能同时使用")
+        raise typer.Exit(1)
+
+    weights = {}
+    for item in weight or []:
+        name, _, value = item.partition("=")
+        try:
+            weights[name.strip()] = int(value)
+        except ValueError:
+            logger.error(f"无效的权重: {item}(格式为 NAME=N)")
+            raise typer.Exit(1) from None
+
+    try:
+        manager = get_proxy_manager()
+
+        if restore:
+            if manager.disable_local_proxy():
+                console.print(format_success("已停用本地转发，Claude Code 配置已恢复为直接连接当前代理"))
+            else:
+                logger.warning("本地转发未启用")
+            return
+
+        if apply:
+            existing = manager.get_local_proxy_settings() or {}
+            settings = manager.enable_local_proxy(
+                host or existing.get("host") or DEFAULT_SERVE_HOST,
+                port or existing.get("port") or DEFAULT_SERVE_PORT,
+            )
+            console.print(format_success("已启用本地转发，Claude Code 配置已指向本地转发代理"))
+            host, port = settings["host"], settings["port"]
+        elif manager.get_local_proxy_settings() is None:
+            logger.warning("本地转发未启用，Claude Code 不会使用本地转发代理(使用 --apply 启用)")
+
+        if weights:
+            manager.set_pool_weights(weights)
+
+        server = manager.create_local_proxy_server(
+            host,
+            port,
+            timeouts={"connect": connect_timeout, "read": read_timeout},
+            pool_tag=pool,
+            strategy=strategy,
+            failover=failover,
+            max_attempts=max_attempts,
+            rate_limit=rate_limit,
+            max_queue_wait=max_queue_wait,
+            metering=metering,
+        )
+        if pool:
+            members = manager.get_pool_members(pool)
+            if not members:
+                logger.warning(f"代理池 '{pool}' 当前没有启用的代理，请求将返回 503")
+            pool_weights = manager.get_pool_weights()
+            listing = "、".join(
+                f"{proxy.name}(权重 {pool_weights.get(proxy.name, 1)})"
+                if strategy != "round-robin"
+                else proxy.name
+                for proxy in sorted(members, key=lambda proxy: proxy.name)
+            )
+            console.print(
+                f"本地转发代理监听 {server.url} ，代理池 '{pool}'({strategy}): {listing or '-'}，"
+                "按 Ctrl+C 停止"
+            )
+        else:
+            current = manager.get_current_proxy()
+            console.print(
+                f"本地转发代理监听 {server.url} ，当前代理: {current.name if current else '-'}，"
+                "按 Ctrl+C 停止"
+            )
+        routes = manager.get_model_routes()
+        if routes:
+            console.print(
+                "模型路由: " + "，".join(f"{rule} -> {target}" for rule, target in routes.items())
+            )
+        if failover:
+            fallbacks = manager.get_all_fallbacks()
+            console.print(
+                f"故障转移已启用(每个请求最多尝试 {max_attempts} 次)"
+                + (
+                    "，备用代理: "
+                    + "；".join(f"{name} -> {' -> '.join(names)}" for name, names in fallbacks.items())
+                    if fallbacks
+                    else "，没有设置备用代理(只在同一代理上重试，使用 'cw fallbacks set' 设置)"
+                )
+            )
+        if rate_limit:
+            console.print(
+                f"速率限制调度已启用，容量不足时请求按会话轮流排队(最长 {max_queue_wait:g} 秒)"
+            )
+        server.run()
+
+    except ClaudeWarpError as e:
+        logger.error(f"操作失败: {e}")
+        raise typer.Exit(1) from None
+    except OSError as e:
+        logger.error(f"启动本地转发代理失败: {e}")
+        raise typer.Exit(1) from None
+
+
+@app.command()
+def stats(
+    since: Optional[str] = typer.Option(
+        None, "--since", "-s", help="统计最近一段时间(如 30m、12h、7d、2w)或某个时间之后(ISO 格式)"
+    ),
+    by: str = typer.Option("proxy", "--by", "-b", help="分组方式: proxy, model"),
+    format: str = typer.Option("table", "--format", "-f", help="输出格式: table, json"),
+):
+    """查看本地转发代理记录的请求数、耗时、错误和 token 用量"""
+    import json
+
+    from claudewarp.cli.formatters import format_usage_stats
+    from claudewarp.core.metering import parse_since
+
+    console = get_console()
+
+    start = None
+    if since is not None:
+        try:
+            start = parse_since(since)
+        except ValueError:
+            logger.error(f"无效的时间: {since}(格式为 30m、12h、7d、2w 或 ISO 格式的时间)")
+            raise typer.Exit(1) from None
+
+    try:
+        manager = get_proxy_manager()
+        usage = manager.get_usage_stats(start, by)
+
+        if format == "json":
+            print(json.dumps(usage, indent=2, ensure_ascii=False))
+            return
+        if not usage:
+            console.print("没有用量记录(用量由 'cw serve' 转发的请求记录)")
+            return
+        title = "用量统计"
+        if since is not None:
+            title += f"(最近 {since})" if since.strip()[-1:].isalpha() else f"({since} 之后)"
+        console.print(format_usage_stats(usage, by, title))
+
+    except ClaudeWarpError as e:
+        logger.error(f"操作失败: {e}")
+        raise typer.Exit(1) from None
+
+
+@app.command("stub-server")
+def stub_server(
+    host: str = typer.Option("127.0.0.1", "--host", help="监听地址"),
+    port: int = typer.Option(8765, "--port", "-p", help="监听端口"),
+    ttft: float = typer.Option(0.05, "--ttft", help="返回第一个 token 前的等待时间(秒)"),
+    token_delay: float = typer.Option(0.01, "--token-delay", help="相邻 token 的间隔(秒)"),
+    tokens: int = typer.Option(64, "--tokens", help="每个响应最多生成的 token 数"),
+    error_rate: float = typer.Option(0.0, "--error-rate", help="随机返回 529 的比例(0-1)"),
+    api_key: Optional[str] = typer.Option(None, "--api-key", help="要求的凭据(默认接受任意凭据)"),
+    rate_limit: Optional[int] = typer.Option(
+        None, "--rate-limit", help="每分钟请求数上限，超过时返回 429(默认不限制)"
+    ),
+):
+    """启动模拟 Claude API 的本地服务器，用于离线测试"""
+    from claudewarp.core.stub import StubServer
+
+    server = StubServer(
+        host=host,
+        port=port,
+        ttft=ttft,
+        token_delay=token_delay,
+        tokens=tokens,
+        error_rate=error_rate,
+        api_key=api_key,
+        rate_limit=rate_limit,
+    )
+    get_console().print(f"模拟服务器监听 http://{host}:{port}/ ，按 Ctrl+C 停止")
+    try:
+        server.run()
+    except OSError as e:
+        logger.error(f"启动模拟服务器失败: {e}")
+        raise typer.Exit(1) from None
+
+
 @app.command()
 def current():
     """显示当前代理服务器信息"""
+    from claudewarp.cli.formatters import format_proxy_info
+
+    console = get_console()
 
     try:
         manager = get_proxy_manager()
@@ -387,6 +1183,11 @@ def remove(
     force: bool = typer.Option(False, "--force", "-f", help="强制删除(不询问确认)"),
 ):
     """删除指定的代理服务器"""
+    from rich.prompt import Confirm
+
+    from claudewarp.cli.formatters import format_success
+
+    console = get_console()
 
     try:
         manager = get_proxy_manager()
@@ -447,6 +1248,10 @@ def export(
     output: Optional[str] = typer.Option(None, "--output", "-o", help="输出到文件"),
 ):
     """导出环境变量设置命令"""
+    from claudewarp.cli.formatters import format_export_output, format_success
+    from claudewarp.core.models import ExportFormat
+
+    console = get_console()
 
     try:
         manager = get_proxy_manager()
@@ -485,9 +1290,102 @@ def export(
         raise typer.Exit(1) from None
 
 
+@app.command("import")
+def import_proxies(
+    file: Optional[str] = typer.Argument(None, help="导入文件路径，省略或为 - 时从标准输入读取"),
+    fmt: Optional[str] = typer.Option(
+        None, "--format", "-F", help="文件格式: csv, json, jsonl, toml (默认按扩展名推断)"
+    ),
+    on_conflict: str = typer.Option(
+        "fail", "--on-conflict", "-c", help="名称冲突处理: fail(报错), skip(跳过), upsert(覆盖)"
+    ),
+    chunk_size: int = typer.Option(500, "--chunk-size", help="每批验证的记录数"),
+):
+    """从文件批量导入代理服务器"""
+    from pathlib import Path
+
+    from rich.markup import escape
+    from rich.progress import BarColumn, Progress, SpinnerColumn, TextColumn
+
+    from claudewarp.cli.formatters import format_error, format_success, format_warning
+    from claudewarp.core.importer import (
+        detect_import_format,
+        iter_import_records,
+        open_import_source,
+    )
+
+    console = get_console()
+
+    try:
+        if fmt is None:
+            if file is None or file == "-":
+                logger.error("从标准输入导入时必须使用 --format 指定格式")
+                raise typer.Exit(1)
+            fmt = detect_import_format(Path(file))
+
+        manager = get_proxy_manager()
+
+        with open_import_source(file) as stream:
+            records = iter_import_records(stream, fmt.lower(), source=file)
+            with Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                TextColumn("{task.completed} 条"),
+                console=console,
+                transient=True,
+            ) as progress:
+                task = progress.add_task("验证代理记录", total=None)
+                result = manager.import_proxies(
+                    records,
+                    on_conflict=on_conflict,
+                    chunk_size=chunk_size,
+                    progress=lambda count: progress.advance(task, count),
+                )
+
+        console.print(
+            format_success(
+                f"导入完成: 新增 {len(result['added'])} 个，更新 {len(result['updated'])} 个"
+            )
+        )
+        skipped = result["skipped"]
+        if skipped:
+            names = ", ".join(skipped[:10]) + (" ..." if len(skipped) > 10 else "")
+            console.print(format_warning(f"跳过 {len(skipped)} 个已存在的代理: {names}"))
+
+    except ProxyImportError as e:
+        errors = e.details.get("errors", [])
+        for item in errors:
+            label = f" ({item['name']})" if item.get("name") else ""
+            message = escape(f"位置 {item['position']}{label}: {item['message']}")
+            console.print(format_error(message))
+        logger.error(str(e))
+        raise typer.Exit(1) from None
+    except ValidationError as e:
+        logger.error(str(e))
+        raise typer.Exit(1) from None
+    except ClaudeWarpError as e:
+        logger.error(f"操作失败: {e}")
+        raise typer.Exit(1) from None
+    except typer.Exit:
+        raise
+    except Exception as e:
+        logger.error(f"未知错误: {e}")
+        raise typer.Exit(1) from None
+
+
 @app.command()
-def info(name: Optional[str] = typer.Argument(None, help="代理名称(不指定则显示统计信息)")):
+def info(
+    name: Optional[str] = typer.Argument(None, help="代理名称(不指定则显示统计信息)"),
+    latency: bool = typer.Option(False, "--latency", "-l", help="同时显示历史延迟统计"),
+    max_age: Optional[float] = typer.Option(
+        None, "--max-age", help="只统计最近 N 秒内的检查记录"
+    ),
+):
     """显示代理详细信息或统计信息"""
+    from claudewarp.cli.formatters import format_latency_summary, format_proxy_info
+
+    console = get_console()
     if not name:
         console.print("使用 'cw info <name>' 查看特定代理的详细信息")
         return
@@ -501,6 +1399,10 @@ def info(name: Optional[str] = typer.Argument(None, help="代理名称(不指定
         console.print()
         console.print(format_proxy_info(proxy, detailed=True))
 
+        if latency:
+            summary = manager.get_latency_summaries([name], max_age)[name]
+            console.print(format_latency_summary(summary))
+
     except ProxyNotFoundError as e:
         logger.error(str(e))
         raise typer.Exit(1) from None
@@ -529,6 +1431,11 @@ def edit(
     interactive: bool = typer.Option(False, "--interactive", "-i", help="交互式编辑"),
 ):
     """编辑代理服务器配置"""
+    from rich.prompt import Confirm, Prompt
+
+    from claudewarp.cli.formatters import format_proxy_info
+
+    console = get_console()
 
     try:
         manager = get_proxy_manager()
@@ -693,6 +1600,9 @@ def search(
     ),
 ):
     """搜索代理服务器"""
+    from claudewarp.cli.formatters import format_proxy_table
+
+    console = get_console()
 
     try:
         manager = get_proxy_manager()
@@ -728,6 +1638,69 @@ def search(
         raise typer.Exit(1) from None
 
 
+@app.command()
+def batch(
+    file: Optional[str] = typer.Argument(None, help="命令文件路径，省略或为 - 时从标准输入读取"),
+):
+    """批量执行命令，所有修改合并为一次保存
+
+    每行一条命令（不含 cw 前缀），空行和以 # 开头的行会被忽略。
+    任意一条命令失败时，所有修改都会回滚。
+    """
+    global _batch_manager
+    import shlex
+
+    try:
+        if file is None or file == "-":
+            content = sys.stdin.read()
+        else:
+            with open(file, "r", encoding="utf-8") as f:
+                content = f.read()
+    except OSError as e:
+        logger.error(f"读取命令文件失败: {e}")
+        raise typer.Exit(1) from None
+
+    commands = []
+    for lineno, line in enumerate(content.splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            args = shlex.split(line)
+        except ValueError as e:
+            # 例如引号不成对；所有命令执行前先解析，出错时不执行任何命令
+            logger.error(f"第 {lineno} 行: 无法解析命令（{e}），批处理未执行")
+            raise typer.Exit(1) from None
+        if args[0] == "batch":
+            logger.error(f"第 {lineno} 行: 批处理中不能嵌套 batch 命令")
+            raise typer.Exit(1)
+        commands.append((lineno, line, args))
+
+    if not commands:
+        logger.warning("没有需要执行的命令")
+        return
+
+    manager = get_proxy_manager()
+    _batch_manager = manager
+    try:
+        with manager.transaction():
+            for lineno, line, args in commands:
+                logger.debug(f"执行第 {lineno} 行: {line}")
+                exit_code = app(args=args, prog_name="cw", standalone_mode=False)
+                if exit_code:
+                    raise ClaudeWarpError(f"第 {lineno} 行命令执行失败: {line}")
+        logger.info(f"批处理完成，共执行 {len(commands)} 条命令")
+
+    except ClaudeWarpError as e:
+        logger.error(f"批处理已回滚: {e}")
+        raise typer.Exit(1) from None
+    except Exception as e:
+        logger.error(f"批处理已回滚: {e}")
+        raise typer.Exit(1) from None
+    finally:
+        _batch_manager = None
+
+
 def main():
     """CLI主入口函数"""
     try:
@@ -0,0 +1,113 @@
+"""
+高频命令的快速路径
+
+'cw current' 被 shell 提示符和 CI 频繁调用，完整路径需要导入 Typer、日志配置、
+Pydantic 数据模型和配置管理器，启动耗时远超读取配置本身。
+这里直接用 tomllib 读取配置文件并复用 CLI 的格式化输出，结果与完整路径一致；
+无法确定结果与完整路径相同时（非TOML后端、存在变更日志、配置缺失或格式异常等）
+返回 False，由调用方回退到完整路径。
+"""
+
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# 与 ConfigManager 相同的配置路径环境变量和支持的配置版本
+CONFIG_PATH_ENV = "CLAUDEWARP_CONFIG"
+SUPPORTED_CONFIG_VERSIONS = ("1.0",)
+
+
+class ProxyRecord:
+    """配置文件中代理记录的只读视图
+
+    提供 format_proxy_info 用到的属性，缺省值与 ProxyServer 模型一致（TOML不保存None值）。
+    """
+
+    def __init__(self, name: str, record: Dict[str, Any]):
+        self.name = name
+        self.base_url: str = record["base_url"]
+        self.api_key: Optional[str] = record.get("api_key")
+        self.auth_token: Optional[str] = record.get("auth_token")
+        self.description: str = record.get("description", "")
+        self.tags = list(record.get("tags", []))
+        self.is_active: bool = record.get("is_active", True)
+        self.bigmodel: Optional[str] = record.get("bigmodel")
+        self.smallmodel: Optional[str] = record.get("smallmodel")
+        self.created_at: str = record["created_at"]
+        self.updated_at: str = record["updated_at"]
+
+    def get_auth_method(self) -> str:
+        """获取当前使用的认证方法（与 ProxyServer.get_auth_method 相同）"""
+        if self.auth_token and self.auth_token.strip():
+            return "auth_token"
+        elif self.api_key and self.api_key.strip():
+            return "api_key"
+        else:
+            return "none"
+
+
+def _config_path() -> Optional[Path]:
+    """获取配置文件路径，非默认平台路径规则（Windows）时返回None"""
+    env_path = os.environ.get(CONFIG_PATH_ENV)
+    if env_path:
+        return Path(env_path).expanduser()
+    if os.name == "nt":
+        return None
+
+    xdg_config = os.environ.get("XDG_CONFIG_HOME")
+    config_dir = Path(xdg_config) if xdg_config else Path.home() / ".config"
+    return config_dir / "claudewarp" / "config.toml"
+
+
+def _read_current_proxy() -> Optional[ProxyRecord]:
+    """读取当前代理，无法走快速路径时返回None"""
+    import tomllib
+
+    path = _config_path()
+    if path is None or path.suffix.lower() != ".toml":
+        return None
+    # 变更日志需要在配置文件之上重放，交给完整路径处理
+    if path.with_name(path.name + ".journal").exists():
+        return None
+
+    try:
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if data.get("version", "1.0") not in SUPPORTED_CONFIG_VERSIONS:
+        return None
+    name = data.get("current_proxy")
+    record = data.get("proxies", {}).get(name) if isinstance(name, str) else None
+    if not isinstance(record, dict):
+        return None
+
+    try:
+        return ProxyRecord(name, record)
+    except (KeyError, TypeError):
+        return None
+
+
+def show_current() -> bool:
+    """显示当前代理服务器信息
+
+    Returns:
+        bool: 是否已通过快速路径输出，为False时调用方应执行完整命令
+    """
+    proxy = _read_current_proxy()
+    if proxy is None:
+        return False
+
+    from rich.console import Console
+
+    from claudewarp.cli.formatters import format_proxy_info
+
+    console = Console()
+    console.print("[bold blue]当前代理服务器[/bold blue]")
+    console.print()
+    console.print(format_proxy_info(proxy))
+    return True
+
+
+__all__ = ["ProxyRecord", "show_current"]
@@ -5,26 +5,33 @@ CLI输出格式化模块
 """
 
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 from rich import box
 from rich.console import Group
+from rich.markup import escape
 from rich.panel import Panel
-from rich.syntax import Syntax
 from rich.table import Table
 from rich.text import Text
 
-from ..core.models import ProxyServer
+if TYPE_CHECKING:
+    # rich.syntax 会引入 pygments，只在导出命令中按需导入
+    from rich.syntax import Syntax
+
+    from ..core.models import ProxyServer
 
 
 def format_proxy_table(
-    proxies: Dict[str, ProxyServer], current_proxy: Optional[str] = None
+    proxies: Dict[str, "ProxyServer"],
+    current_proxy: Optional[str] = None,
+    latency: Optional[Dict[str, Dict[str, Any]]] = None,
 ) -> Table:
     """格式化代理列表为表格
 
     Args:
         proxies: 代理字典
         current_proxy: 当前代理名称
+        latency: 代理的历史延迟统计，指定时显示延迟列
 
     Returns:
         Table: 格式化的表格
@@ -39,6 +46,8 @@ def format_proxy_table(
     table.add_column("描述", style="")
     table.add_column("标签", style="cyan")
     table.add_column("更新时间", style="dim")
+    if latency is not None:
+        table.add_column("延迟(p50/p95)", style="", justify="right")
 
     # 添加行
     for name, proxy in proxies.items():
@@ -80,7 +89,7 @@ def format_proxy_table(
         # 名称样式
         name_style = "bold green" if name == current_proxy else ""
 
-        table.add_row(
+        row = [
             status,
             f"[{name_style}]{name}[/{name_style}]" if name_style else name,
             url_display,
@@ -88,12 +97,31 @@ def format_proxy_table(
             proxy.description or "-",
             tags_display,
             time_display,
-        )
+        ]
+        if latency is not None:
+            row.append(_format_latency_cell(latency.get(name)))
+
+        table.add_row(*row)
 
     return table
 
 
-def format_proxy_info(proxy: ProxyServer, detailed: bool = True) -> Panel:
+def _format_ms(seconds: Optional[float]) -> str:
+    """秒转换为毫秒显示，缺失时显示 -"""
+    return f"{seconds * 1000:.0f}ms" if seconds is not None else "-"
+
+
+def _format_latency_cell(summary: Optional[Dict[str, Any]]) -> str:
+    """代理列表中的延迟列"""
+    if not summary or not summary["samples"]:
+        return "[dim]-[/dim]"
+    if summary["p50"] is None:
+        return "[red]失败[/red]"
+    color = "green" if summary["error_rate"] == 0 else "yellow"
+    return f"[{color}]{_format_ms(summary['p50'])}[/{color}] / {_format_ms(summary['p95'])}"
+
+
+def format_proxy_info(proxy: "ProxyServer", detailed: bool = True) -> Panel:
     """格式化代理详细信息
 
     Args:
@@ -155,7 +183,7 @@ def format_proxy_info(proxy: ProxyServer, detailed: bool = True) -> Panel:
     )
 
 
-def format_export_output(export_content: str, shell_type: str) -> Syntax:
+def format_export_output(export_content: str, shell_type: str) -> "Syntax":
     """格式化环境变量导出输出
 
     Args:
@@ -165,6 +193,8 @@ def format_export_output(export_content: str, shell_type: str) -> Syntax:
     Returns:
         Syntax: 格式化的语法高亮文本
     """
+    from rich.syntax import Syntax
+
     # 根据shell类型选择语法高亮
     syntax_map = {"bash": "bash", "fish": "fish", "powershell": "powershell", "zsh": "bash"}
 
@@ -261,8 +291,279 @@ def format_stats_table(stats: Dict[str, Any]) -> Table:
     return table
 
 
+def format_target_results(results: List[Dict[str, Any]]) -> Table:
+    """格式化 Claude Code 配置目标的同步结果
+
+    Args:
+        results: 同步结果列表
+
+    Returns:
+        Table: 格式化的表格
+    """
+    table = Table(
+        title="Claude Code 配置同步", box=box.ROUNDED, show_header=True, header_style="bold blue"
+    )
+
+    table.add_column("状态", style="", width=8, justify="center")
+    table.add_column("目标", style="")
+    table.add_column("耗时", style="dim", justify="right")
+    table.add_column("错误", style="red")
+
+    labels = {
+        "updated": "[green]已更新[/green]",
+        "unchanged": "[dim]无变化[/dim]",
+        "skipped": "[dim]已最新[/dim]",
+        "failed": "[red]失败[/red]",
+    }
+    for result in results:
+        table.add_row(
+            labels.get(result["status"], result["status"]),
+            escape(result["path"]),
+            f"{result['elapsed'] * 1000:.1f}ms",
+            escape(result["error"] or ""),
+        )
+
+    return table
+
+
+def format_check_results(results: List[Dict[str, Any]]) -> Table:
+    """格式化代理连通性检查结果
+
+    Args:
+        results: 检查结果列表
+
+    Returns:
+        Table: 格式化的表格
+    """
+    table = Table(title="连通性检查", box=box.ROUNDED, show_header=True, header_style="bold blue")
+
+    table.add_column("状态", style="", width=8, justify="center")
+    table.add_column("名称", style="bold")
+    table.add_column("延迟", style="", justify="right")
+    table.add_column("DNS", style="dim", justify="right")
+    table.add_column("连接", style="dim", justify="right")
+    table.add_column("TLS", style="dim", justify="right")
+    table.add_column("首字节", style="dim", justify="right")
+    table.add_column("说明", style="")
+
+    labels = {
+        "ok": "[green]✓ 正常[/green]",
+        "auth_error": "[yellow]认证失败[/yellow]",
+        "dns_error": "[red]DNS[/red]",
+        "connect_error": "[red]连接[/red]",
+        "tls_error": "[red]TLS[/red]",
+        "http_error": "[red]HTTP[/red]",
+    }
+
+    def ms(value: Optional[float]) -> str:
+        return f"{value * 1000:.0f}ms" if value is not None else "-"
+
+    for result in results:
+        timings = result["timings"]
+        dns = ms(timings.get("dns"))
+        if result.get("dns_reused") and "dns" in timings:
+            dns += "*"
+        table.add_row(
+            labels.get(result["status"], result["status"]),
+            result["proxy_name"],
+            ms(result["latency"]),
+            dns,
+            ms(timings.get("connect")),
+            ms(timings.get("tls")),
+            ms(timings.get("ttfb")),
+            escape(result["message"]),
+        )
+
+    if any(result.get("dns_reused") for result in results):
+        table.caption = "* 复用了同一主机的 DNS 解析结果"
+
+    return table
+
+
+def format_ranking_table(ranking: List[Dict[str, Any]], selected: Optional[str] = None) -> Table:
+    """格式化代理延迟排名
+
+    Args:
+        ranking: 按错误率和延迟排序的汇总结果
+        selected: 被选中的代理名称
+
+    Returns:
+        Table: 格式化的表格
+    """
+    table = Table(title="代理延迟排名", box=box.ROUNDED, show_header=True, header_style="bold blue")
+
+    table.add_column("排名", style="", width=6, justify="center")
+    table.add_column("名称", style="bold")
+    table.add_column("延迟(中位数)", style="", justify="right")
+    table.add_column("成功/次数", style="", justify="right")
+    table.add_column("最近错误", style="dim")
+
+    for index, item in enumerate(ranking, start=1):
+        latency = f"{item['latency'] * 1000:.0f}ms" if item["latency"] is not None else "-"
+        name = item["proxy_name"]
+        if name == selected:
+            name = f"[green]● {name}[/green]"
+        color = "green" if item["error_rate"] == 0 else "yellow" if item["successes"] else "red"
+        table.add_row(
+            str(index),
+            name,
+            latency,
+            f"[{color}]{item['successes']}/{item['samples']}[/{color}]",
+            escape(item["last_error"] or ""),
+        )
+
+    return table
+
+
+def format_bench_report(report: Dict[str, Any]) -> Table:
+    """格式化性能测试报告
+
+    Args:
+        report: BenchmarkRunner.run 返回的测试报告
+
+    Returns:
+        Table: 格式化的表格，mixed 模式下分别列出流式和非流式请求
+    """
+    load = f"速率 {report['rate']:g}/s" if report["rate"] else "最大并发"
+    table = Table(
+        title=f"性能测试: {report['proxy_name']} ({escape(report['model'])})",
+        caption=(
+            f"{report['requests']} 个请求，并发 {report['concurrency']}，{load}，"
+            f"耗时 {report['duration']:.2f}s，连接 {report['connections']} 个"
+        ),
+        box=box.ROUNDED,
+        show_header=True,
+        header_style="bold blue",
+    )
+
+    table.add_column("请求", style="bold")
+    table.add_column("成功/次数", style="", justify="right")
+    table.add_column("请求/s", style="", justify="right")
+    table.add_column("token/s", style="", justify="right")
+    table.add_column("TTFT p50/p95", style="", justify="right")
+    table.add_column("ITL p50/p95", style="", justify="right")
+    table.add_column("耗时 p50/p95/p99", style="", justify="right")
+    table.add_column("错误", style="dim")
+
+    def rate(value: Optional[float]) -> str:
+        return f"{value:.1f}" if value is not None else "-"
+
+    labels = {"stream": "流式", "nonstream": "非流式"}
+    rows = [(labels.get(report["mode"], "全部"), report["summary"])]
+    if report["by_mode"]:
+        rows = [("全部", report["summary"])] + [
+            (labels[mode], summary) for mode, summary in report["by_mode"].items()
+        ]
+
+    for label, summary in rows:
+        color = "green" if summary["error_rate"] == 0 else "yellow" if summary["successes"] else "red"
+        errors = ", ".join(f"{reason} ×{count}" for reason, count in summary["errors"].items())
+        table.add_row(
+            label,
+            f"[{color}]{summary['successes']}/{summary['requests']}[/{color}]",
+            rate(summary["requests_per_second"]),
+            rate(summary["tokens_per_second"]),
+            f"{_format_ms(summary['ttft']['p50'])} / {_format_ms(summary['ttft']['p95'])}",
+            f"{_format_ms(summary['itl']['p50'])} / {_format_ms(summary['itl']['p95'])}",
+            " / ".join(_format_ms(summary["latency"][key]) for key in ("p50", "p95", "p99")),
+            escape(errors) or "-",
+        )
+
+    return table
+
+
+def format_latency_summary(summary: Dict[str, Any]) -> Panel:
+    """格式化代理的历史延迟统计
+
+    Args:
+        summary: LatencyHistory.summary 返回的统计结果
+
+    Returns:
+        Panel: 格式化的面板
+    """
+    if not summary["samples"]:
+        content = "[yellow]暂无检查记录，使用 'cw check' 检查代理[/yellow]"
+    else:
+        error_rate = summary["error_rate"]
+        color = "green" if error_rate == 0 else "yellow" if summary["successes"] else "red"
+        lines = [
+            f"[bold]检查次数:[/bold] {summary['samples']}",
+            f"[bold]成功率:[/bold] [{color}]{summary['successes']}/{summary['samples']}"
+            f" ({(1 - error_rate) * 100:.1f}%)[/{color}]",
+            f"[bold]延迟:[/bold] p50 {_format_ms(summary['p50'])}  "
+            f"p95 {_format_ms(summary['p95'])}  p99 {_format_ms(summary['p99'])}",
+        ]
+        if summary["phases"]:
+            phases = "  ".join(
+                f"{phase} {_format_ms(value)}" for phase, value in summary["phases"].items()
+            )
+            lines.append(f"[bold]阶段(中位数):[/bold] {phases}")
+        try:
+            last_checked = datetime.fromisoformat(summary["last_checked"]).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+        except (TypeError, ValueError):
+            last_checked = "-"
+        lines.append(f"[bold]最近检查:[/bold] {last_checked} ({summary['last_status']})")
+        content = "\n".join(lines)
+
+    return Panel(content, title=f"延迟历史: {summary['proxy_name']}", border_style="blue")
+
+
+def format_usage_stats(stats: List[Dict[str, Any]], by: str, title: str) -> Table:
+    """格式化本地转发的用量统计
+
+    Args:
+        stats: UsageStore.query 返回的统计结果
+        by: 分组方式（proxy、model）
+        title: 表格标题
+
+    Returns:
+        Table: 格式化的表格，最后一行为合计
+    """
+    table = Table(title=title, box=box.ROUNDED, show_header=True, header_style="bold blue")
+
+    table.add_column("代理" if by == "proxy" else "模型", style="bold")
+    table.add_column("请求", style="", justify="right")
+    table.add_column("错误", style="", justify="right")
+    table.add_column("耗时 平均/p95", style="", justify="right")
+    table.add_column("输入", style="", justify="right")
+    table.add_column("输出", style="", justify="right")
+    table.add_column("缓存写入", style="", justify="right")
+    table.add_column("缓存读取", style="", justify="right")
+
+    fields = (
+        "input_tokens",
+        "output_tokens",
+        "cache_creation_input_tokens",
+        "cache_read_input_tokens",
+    )
+    for item in stats:
+        color = "green" if item["errors"] == 0 else "yellow"
+        table.add_row(
+            escape(item["name"]) or "[dim](未知)[/dim]",
+            str(item["requests"]),
+            f"[{color}]{item['errors']} ({item['error_rate']:.1%})[/{color}]",
+            f"{_format_ms(item['avg_latency'])} / {_format_ms(item['p95'])}",
+            *(f"{item[field]:,}" for field in fields),
+        )
+
+    if len(stats) > 1:
+        table.add_section()
+        table.add_row(
+            "合计",
+            str(sum(item["requests"] for item in stats)),
+            str(sum(item["errors"] for item in stats)),
+            "",
+            *(f"{sum(item[field] for item in stats):,}" for field in fields),
+            style="bold",
+        )
+
+    return table
+
+
 def format_search_results(
-    results: Dict[str, ProxyServer], query: str, current_proxy: Optional[str] = None
+    results: Dict[str, "ProxyServer"], query: str, current_proxy: Optional[str] = None
 ) -> Panel:
     """格式化搜索结果
 
@@ -316,10 +617,9 @@ def _mask_api_key(api_key: str, show_chars: int = 4) -> str:
     Returns:
         str: 遮蔽后的API密钥
     """
-    if len(api_key) <= show_chars * 2:
-        return "*" * len(api_key)
+    from claudewarp.core.utils import mask_secret
 
-    return f"{api_key[:show_chars]}{'*' * (len(api_key) - show_chars * 2)}{api_key[-show_chars:]}"
+    return mask_secret(api_key, show_chars)
 
 
 def _format_datetime(iso_string: str) -> str:
@@ -388,6 +688,12 @@ __all__ = [
     "format_loading",
     "format_stats_table",
     "format_search_results",
+    "format_bench_report",
+    "format_check_results",
+    "format_latency_summary",
+    "format_ranking_table",
+    "format_target_results",
+    "format_usage_stats",
     "format_progress_bar",
     "create_banner",
     "create_help_table",
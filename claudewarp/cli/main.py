@@ -5,17 +5,19 @@ CLI应用主程序
 提供完整的命令行交互功能，支持所有代理管理操作。
 """
 
-import logging
 import sys
 
-import colorlog
-
-from claudewarp.core.utils import LevelAlignFilter
-
 
 # 设置彩色日志
 def setup_colored_logging():
     """设置彩色日志配置"""
+    # logging 在这里导入，'cw current' 的快速路径不需要加载
+    import logging
+
+    import colorlog
+
+    from claudewarp.core.utils import LevelAlignFilter
+
     handler = colorlog.StreamHandler()
     handler.addFilter(LevelAlignFilter())
     handler.setFormatter(
@@ -40,12 +42,18 @@ def setup_colored_logging():
     logger.addHandler(handler)
 
 
-# 设置彩色日志
-setup_colored_logging()
-
-
 def main() -> int:
     """CLI主程序入口"""
+    # 高频的 'cw current' 能直接读取配置时跳过 Typer、日志配置和数据模型的导入
+    if sys.argv[1:] == ["current"]:
+        from claudewarp.cli.fastpath import show_current
+
+        if show_current():
+            return 0
+
+    # 在入口处而非导入时配置日志，导入本模块不产生副作用
+    setup_colored_logging()
+
     try:
         # 导入commands模块并运行Typer应用
         from claudewarp.cli.commands import main as typer_main
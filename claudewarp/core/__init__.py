@@ -13,25 +13,37 @@ from .exceptions import (
     DuplicateProxyError,
     ProxyNotFoundError,
 )
-from .models import ExportFormat, ProxyConfig, ProxyServer
 
-# ConfigManager and ProxyManager require external dependencies
-# They will be imported only when available
-try:
-    from .config import ConfigManager
+# 数据模型、ConfigManager 和 ProxyManager 依赖 pydantic/toml 等外部库，
+# 在首次访问时才导入，使只需要异常类或工具函数的调用方保持轻量
+_LAZY_EXPORTS = {
+    "ProxyServer": ".models",
+    "ProxyConfig": ".models",
+    "ExportFormat": ".models",
+    "ConfigManager": ".config",
+    "ProxyManager": ".manager",
+}
+
+
+def __getattr__(name: str):
+    """延迟导入核心组件"""
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+
+    try:
+        value = getattr(importlib.import_module(module_name, __name__), name)
+    except ImportError:
+        # 外部依赖不可用时保持原有行为：返回None
+        if name in ("ConfigManager", "ProxyManager"):
+            value = None
+        else:
+            raise
+    globals()[name] = value
+    return value
 
-    _CONFIG_AVAILABLE = True
-except ImportError:
-    _CONFIG_AVAILABLE = False
-    ConfigManager = None
-
-try:
-    from .manager import ProxyManager
-
-    _MANAGER_AVAILABLE = True
-except ImportError:
-    _MANAGER_AVAILABLE = False
-    ProxyManager = None
 
 __all__ = [
     "ClaudeWarpError",
@@ -41,10 +53,6 @@ __all__ = [
     "ProxyServer",
     "ProxyConfig",
     "ExportFormat",
+    "ConfigManager",
+    "ProxyManager",
 ]
-
-# Add available components
-if _CONFIG_AVAILABLE:
-    __all__.append("ConfigManager")
-if _MANAGER_AVAILABLE:
-    __all__.append("ProxyManager")
@@ -0,0 +1,229 @@
+"""
+配置备份存储
+
+以内容寻址的方式保存配置文件备份：备份内容按规范化后的指纹命名并以gzip压缩存放，
+内容与最近一次备份相同时不再重复备份。每个配置文件对应一个清单文件，
+列出和轮换备份只需读取清单，无需遍历备份目录。
+
+目录结构::
+
+    backups/
+        config.toml.manifest.json
+        objects/
+            <指纹>.gz
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .exceptions import ConfigError
+from .utils import atomic_write, ensure_directory, resolve_durability
+
+# 备份清单格式版本
+BACKUP_MANIFEST_VERSION = 1
+
+# 备份压缩级别（配置文件很小，使用较高压缩级别开销可以忽略）
+BACKUP_COMPRESS_LEVEL = 9
+
+
+class BackupStore:
+    """内容寻址的配置备份存储"""
+
+    def __init__(
+        self,
+        config_path: Path,
+        backup_dir: Optional[Path] = None,
+        durability: Optional[str] = None,
+    ):
+        """初始化备份存储
+
+        Args:
+            config_path: 被备份的配置文件路径
+            backup_dir: 备份目录，默认为配置文件同目录下的 backups
+            durability: 写入备份和清单的持久化级别
+        """
+        self.config_path = config_path
+        self.durability = resolve_durability(durability)
+        self.backup_dir = backup_dir or config_path.parent / "backups"
+        self.objects_dir = self.backup_dir / "objects"
+        self.manifest_path = self.backup_dir / f"{config_path.name}.manifest.json"
+        self.logger = logging.getLogger(__name__)
+
+    def _read_manifest(self) -> List[Dict[str, Any]]:
+        """读取清单中的备份条目（按时间先后排列）"""
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"备份清单损坏，将重新创建: {self.manifest_path}, 错误: {e}")
+            return []
+
+        if manifest.get("version") != BACKUP_MANIFEST_VERSION:
+            return []
+        return manifest.get("entries", [])
+
+    def _write_manifest(self, entries: List[Dict[str, Any]]) -> None:
+        """原子写入清单"""
+        manifest = {
+            "version": BACKUP_MANIFEST_VERSION,
+            "source": self.config_path.name,
+            "entries": entries,
+        }
+        content = json.dumps(manifest, ensure_ascii=False, indent=2) + "\n"
+        if not atomic_write(self.manifest_path, content, durability=self.durability):
+            raise ConfigError(f"写入备份清单失败: {self.manifest_path}")
+
+    def _object_path(self, fingerprint: str) -> Path:
+        """获取备份内容文件路径"""
+        return self.objects_dir / f"{fingerprint}.gz"
+
+    def list_backups(self) -> List[Dict[str, Any]]:
+        """列出备份（最新的在前）
+
+        Returns:
+            List[Dict[str, Any]]: 备份条目，包含 id、created_at、size、stored_size 和 path
+        """
+        entries = self._read_manifest()
+        return [
+            dict(entry, path=str(self._object_path(entry["id"]))) for entry in reversed(entries)
+        ]
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """获取最近一次备份条目"""
+        entries = self._read_manifest()
+        return entries[-1] if entries else None
+
+    def create(self, raw: bytes, fingerprint: str, max_backups: int) -> Optional[Dict[str, Any]]:
+        """创建备份
+
+        内容指纹与最近一次备份相同时跳过；相同内容的备份共用一份压缩数据。
+
+        Args:
+            raw: 配置文件原始内容
+            fingerprint: 规范化内容指纹
+            max_backups: 最多保留的备份数量
+
+        Returns:
+            Optional[Dict[str, Any]]: 新建的备份条目，跳过时返回None
+        """
+        entries = self._read_manifest()
+        if entries and entries[-1]["id"] == fingerprint:
+            self.logger.debug("配置内容与最近一次备份相同，跳过备份")
+            return None
+
+        # 备份中含有 API 密钥，backups 和 objects 目录都只允许所有者访问
+        ensure_directory(self.backup_dir, mode=0o700)
+        ensure_directory(self.objects_dir, mode=0o700)
+        object_path = self._object_path(fingerprint)
+        if object_path.exists():
+            stored_size = object_path.stat().st_size
+        else:
+            import gzip
+
+            compressed = gzip.compress(raw, compresslevel=BACKUP_COMPRESS_LEVEL, mtime=0)
+            if not atomic_write(object_path, compressed, durability=self.durability):
+                raise ConfigError(f"写入备份失败: {object_path}")
+            os.chmod(object_path, 0o600)
+            stored_size = len(compressed)
+
+        entry = {
+            "id": fingerprint,
+            "created_at": datetime.now().isoformat(),
+            "size": len(raw),
+            "stored_size": stored_size,
+        }
+        entries.append(entry)
+        removed = entries[:-max_backups] if max_backups > 0 else []
+        entries = entries[len(removed) :]
+        self._write_manifest(entries)
+        self._delete_unreferenced(removed, entries)
+        return entry
+
+    def prune(self, max_backups: int) -> int:
+        """只保留最近的若干个备份
+
+        Args:
+            max_backups: 保留的备份数量
+
+        Returns:
+            int: 删除的备份条目数量
+        """
+        entries = self._read_manifest()
+        if len(entries) <= max_backups:
+            return 0
+
+        removed = entries[: len(entries) - max_backups]
+        entries = entries[len(removed) :]
+        self._write_manifest(entries)
+        self._delete_unreferenced(removed, entries)
+        return len(removed)
+
+    def _delete_unreferenced(
+        self, removed: List[Dict[str, Any]], remaining: List[Dict[str, Any]]
+    ) -> None:
+        """删除不再被任何清单引用的备份内容"""
+        candidates = {entry["id"] for entry in removed} - {entry["id"] for entry in remaining}
+        if not candidates:
+            return
+
+        # 同一目录下其他配置文件的清单可能引用相同内容
+        for manifest_path in self.backup_dir.glob("*.manifest.json"):
+            if manifest_path == self.manifest_path:
+                continue
+            try:
+                other = json.loads(manifest_path.read_text(encoding="utf-8"))
+                candidates -= {entry["id"] for entry in other.get("entries", [])}
+            except (OSError, ValueError):
+                # 无法确认引用关系时保守处理，不删除
+                return
+
+        for fingerprint in candidates:
+            try:
+                self._object_path(fingerprint).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.logger.warning(f"删除备份失败: {fingerprint}, 错误: {e}")
+
+    def find(self, backup: str) -> Optional[Dict[str, Any]]:
+        """按ID（或唯一前缀）查找备份条目
+
+        Args:
+            backup: 备份ID或其前缀
+
+        Returns:
+            Optional[Dict[str, Any]]: 最近一次匹配的备份条目
+        """
+        for entry in self.list_backups():
+            if entry["id"].startswith(backup):
+                return entry
+        return None
+
+    def read(self, fingerprint: str) -> bytes:
+        """读取备份内容
+
+        Args:
+            fingerprint: 备份ID
+
+        Returns:
+            bytes: 解压后的配置文件内容
+
+        Raises:
+            ConfigError: 备份不存在或已损坏
+        """
+        import gzip
+
+        try:
+            return gzip.decompress(self._object_path(fingerprint).read_bytes())
+        except FileNotFoundError:
+            raise ConfigError(f"备份不存在: {fingerprint}") from None
+        except (OSError, EOFError, gzip.BadGzipFile) as e:
+            raise ConfigError(f"备份已损坏: {fingerprint}, 错误: {e}") from None
+
+
+__all__ = ["BackupStore", "BACKUP_MANIFEST_VERSION"]
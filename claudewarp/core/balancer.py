@@ -0,0 +1,145 @@
+"""
+上游负载均衡
+
+本地转发代理以代理池模式运行时，把请求分摊到带有指定标签的所有启用代理上。支持三种策略：
+
+- round-robin：依次轮流；
+- weighted：平滑加权轮询（nginx 的算法），权重高的代理按比例分到更多请求，且不会连续集中：
+  权重不超过总权重一半的代理不会被连续选中两次；
+- least-outstanding：选择正在进行的请求数（按权重折算）最少的代理，相同时轮流。
+
+权重保存在配置项 settings.pool_weights 中（代理名称到正整数），未设置的代理权重为 1。
+候选代理在每次选择时传入，配置变化（增删代理、启用/禁用）立即生效。
+"""
+
+import itertools
+import threading
+from typing import Dict, Optional, Sequence
+
+from .models import ProxyServer
+
+# 配置项中保存代理权重的键
+POOL_WEIGHTS_SETTING_KEY = "pool_weights"
+
+STRATEGY_ROUND_ROBIN = "round-robin"
+STRATEGY_WEIGHTED = "weighted"
+STRATEGY_LEAST_OUTSTANDING = "least-outstanding"
+BALANCE_STRATEGIES = (STRATEGY_ROUND_ROBIN, STRATEGY_WEIGHTED, STRATEGY_LEAST_OUTSTANDING)
+
+
+class LoadBalancer:
+    """在多个上游代理之间分配请求"""
+
+    def __init__(
+        self, strategy: str = STRATEGY_ROUND_ROBIN, weights: Optional[Dict[str, int]] = None
+    ):
+        """初始化负载均衡器
+
+        Args:
+            strategy: 策略（round-robin、weighted、least-outstanding）
+            weights: 代理名称到权重的映射，未设置的代理权重为 1
+
+        Raises:
+            ValueError: 策略无效
+        """
+        if strategy not in BALANCE_STRATEGIES:
+            raise ValueError(f"不支持的负载均衡策略: {strategy}")
+        self.strategy = strategy
+        self.weights: Dict[str, int] = {}
+        self.update_weights(weights or {})
+        self._counter = itertools.count()
+        self._current: Dict[str, int] = {}
+        self._last: Optional[str] = None
+        self._outstanding: Dict[str, int] = {}
+        self._requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def update_weights(self, weights: Dict[str, int]) -> None:
+        """更新代理权重（配置重新加载后调用）"""
+        self.weights = {name: max(1, int(weight)) for name, weight in weights.items()}
+
+    def weight(self, name: str) -> int:
+        return self.weights.get(name, 1)
+
+    def select(self, proxies: Sequence[ProxyServer]) -> ProxyServer:
+        """从候选代理中选择一个
+
+        Args:
+            proxies: 候选代理（非空）
+
+        Returns:
+            ProxyServer: 选中的代理
+        """
+        if not proxies:
+            raise ValueError("没有候选代理")
+        candidates = sorted(proxies, key=lambda proxy: proxy.name)
+        with self._lock:
+            if self.strategy == STRATEGY_WEIGHTED:
+                return self._select_weighted(candidates)
+
+            offset = next(self._counter)
+            # 从轮转位置开始排列，least-outstanding 在负载相同时也能轮流
+            rotated = [candidates[(offset + i) % len(candidates)] for i in range(len(candidates))]
+            if self.strategy == STRATEGY_ROUND_ROBIN:
+                return rotated[0]
+            return min(
+                rotated,
+                key=lambda proxy: self._outstanding.get(proxy.name, 0) / self.weight(proxy.name),
+            )
+
+    def _select_weighted(self, candidates: Sequence[ProxyServer]) -> ProxyServer:
+        """平滑加权轮询：每次为所有候选加上各自权重，选出当前值最大的并减去总权重
+
+        权重不超过总权重一半的代理不会连续选中两次：上次选中的代理当前值仍最大时改选次大的，
+        它的当前值保留到下一次选择，长期的分配比例不变。
+        """
+        names = {proxy.name for proxy in candidates}
+        for name in list(self._current):
+            if name not in names:
+                del self._current[name]
+
+        total = 0
+        for proxy in candidates:
+            weight = self.weight(proxy.name)
+            total += weight
+            self._current[proxy.name] = self._current.get(proxy.name, 0) + weight
+        ranked = sorted(candidates, key=lambda proxy: -self._current[proxy.name])
+        best = ranked[0]
+        if best.name == self._last and len(ranked) > 1 and self.weight(best.name) * 2 <= total:
+            best = ranked[1]
+        self._current[best.name] -= total
+        self._last = best.name
+        return best
+
+    def acquire(self, name: str) -> None:
+        """记录开始转发到代理的一个请求"""
+        with self._lock:
+            self._outstanding[name] = self._outstanding.get(name, 0) + 1
+            self._requests[name] = self._requests.get(name, 0) + 1
+
+    def release(self, name: str) -> None:
+        """记录转发到代理的一个请求已结束"""
+        with self._lock:
+            self._outstanding[name] = max(0, self._outstanding.get(name, 0) - 1)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """各代理的正在进行请求数（outstanding）、累计请求数（requests）和权重（weight）"""
+        with self._lock:
+            return {
+                name: {
+                    "outstanding": self._outstanding.get(name, 0),
+                    "requests": count,
+                    "weight": self.weight(name),
+                }
+                for name, count in self._requests.items()
+            }
+
+
+__all__ = [
+    "BALANCE_STRATEGIES",
+    "LoadBalancer",
+    "POOL_WEIGHTS_SETTING_KEY",
+    "STRATEGY_LEAST_OUTSTANDING",
+    "STRATEGY_ROUND_ROBIN",
+    "STRATEGY_WEIGHTED",
+]
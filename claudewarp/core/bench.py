@@ -0,0 +1,331 @@
+"""
+代理性能测试
+
+向代理的 <base_url>v1/messages 并发发送真实的 Messages 请求（流式和/或非流式），统计：
+
+- 吞吐：每秒完成的请求数、每秒输出的 token 数；
+- 首 token 时间（TTFT）：发出请求到收到第一个 content_block_delta 的时间（仅流式）；
+- token 间隔（ITL）：相邻两个 content_block_delta 之间的时间（仅流式，以事件近似 token）；
+- 总耗时百分位和按原因分类的错误率。
+
+负载可以是固定并发（每个工作协程完成一个请求后立即发送下一个），
+也可以是固定速率（按 rate 均匀发出请求，同时进行的请求数仍不超过 concurrency）。
+同一次测试中的请求复用 HTTP 长连接。
+"""
+
+import asyncio
+import json
+import ssl
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from .checker import ANTHROPIC_VERSION
+from .history import percentile
+from .models import ProxyServer
+from .transport import ConnectionPool, Headers, HTTPProtocolError
+
+# 默认请求数、并发数和每个请求的最大输出 token 数
+DEFAULT_BENCH_REQUESTS = 20
+DEFAULT_BENCH_CONCURRENCY = 4
+DEFAULT_BENCH_MAX_TOKENS = 128
+
+# 单个请求的默认超时时间（秒）
+DEFAULT_BENCH_TIMEOUT = 120.0
+
+DEFAULT_BENCH_PROMPT = "Count from 1 to 200, separated by spaces."
+
+MESSAGES_PATH = "v1/messages"
+
+# 请求模式
+BENCH_STREAM = "stream"
+BENCH_NONSTREAM = "nonstream"
+BENCH_MIXED = "mixed"
+BENCH_MODES = (BENCH_STREAM, BENCH_NONSTREAM, BENCH_MIXED)
+
+
+def proxy_auth_headers(proxy: ProxyServer) -> Headers:
+    """代理的认证头：Auth令牌使用 Authorization: Bearer，API密钥使用 x-api-key"""
+    credential = proxy.get_active_credential()
+    if credential is None:
+        return []
+    if proxy.get_auth_method() == "auth_token":
+        return [("Authorization", f"Bearer {credential}")]
+    return [("x-api-key", credential)]
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    ordered = sorted(values)
+    return {
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+    }
+
+
+def summarize_results(results: List[Dict[str, Any]], duration: float) -> Dict[str, Any]:
+    """汇总一组请求的结果
+
+    Args:
+        results: BenchmarkRunner 的单个请求结果
+        duration: 测试持续时间（秒）
+
+    Returns:
+        Dict[str, Any]: requests、successes、error_rate、errors（按原因计数）、
+        requests_per_second、output_tokens、tokens_per_second（全部请求合计）、
+        latency/ttft/itl 的 p50/p95/p99（秒）和 stream_tokens_per_second（单个流式请求生成速度的中位数）
+    """
+    successes = [result for result in results if result["ok"]]
+    errors: Dict[str, int] = {}
+    for result in results:
+        if not result["ok"]:
+            errors[result["error"]] = errors.get(result["error"], 0) + 1
+
+    output_tokens = sum(result["output_tokens"] for result in successes)
+    itl = [gap for result in successes for gap in result["itl"]]
+    stream_rates = sorted(
+        result["output_tokens"] / (result["latency"] - result["ttft"])
+        for result in successes
+        if result["ttft"] is not None and result["latency"] > result["ttft"]
+    )
+    return {
+        "requests": len(results),
+        "successes": len(successes),
+        "error_rate": 1 - len(successes) / len(results) if results else None,
+        "errors": errors,
+        "requests_per_second": len(successes) / duration if duration > 0 else None,
+        "output_tokens": output_tokens,
+        "tokens_per_second": output_tokens / duration if duration > 0 else None,
+        "latency": _percentiles([result["latency"] for result in successes]),
+        "ttft": _percentiles(
+            [result["ttft"] for result in successes if result["ttft"] is not None]
+        ),
+        "itl": _percentiles(itl),
+        "stream_tokens_per_second": percentile(stream_rates, 50),
+    }
+
+
+class BenchmarkRunner:
+    """代理性能测试"""
+
+    def __init__(
+        self,
+        proxy: ProxyServer,
+        model: str,
+        requests: int = DEFAULT_BENCH_REQUESTS,
+        concurrency: int = DEFAULT_BENCH_CONCURRENCY,
+        rate: Optional[float] = None,
+        mode: str = BENCH_STREAM,
+        max_tokens: int = DEFAULT_BENCH_MAX_TOKENS,
+        prompt: str = DEFAULT_BENCH_PROMPT,
+        timeout: float = DEFAULT_BENCH_TIMEOUT,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ):
+        """初始化性能测试
+
+        Args:
+            proxy: 代理服务器对象
+            model: 请求使用的模型
+            requests: 请求总数
+            concurrency: 最大并发请求数
+            rate: 每秒发出的请求数，为None时以最大并发持续发送
+            mode: 请求模式（stream、nonstream、mixed，mixed 时流式和非流式交替）
+            max_tokens: 每个请求的最大输出 token 数
+            prompt: 请求内容
+            timeout: 单个请求的超时时间（秒）
+            ssl_context: TLS 上下文，为None时使用系统默认的证书验证
+        """
+        if mode not in BENCH_MODES:
+            raise ValueError(f"不支持的请求模式: {mode}")
+        self.proxy = proxy
+        self.model = model
+        self.requests = max(1, requests)
+        self.concurrency = max(1, concurrency)
+        self.rate = rate if rate and rate > 0 else None
+        self.mode = mode
+        self.max_tokens = max(1, max_tokens)
+        self.prompt = prompt
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+
+        url = urlsplit(proxy.base_url)
+        self.target = (url.path or "/").rstrip("/") + "/" + MESSAGES_PATH
+
+    def _is_stream(self, index: int) -> bool:
+        if self.mode == BENCH_MIXED:
+            return index % 2 == 0
+        return self.mode == BENCH_STREAM
+
+    def _build_request(self, stream: bool) -> bytes:
+        body = {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "messages": [{"role": "user", "content": self.prompt}],
+        }
+        if stream:
+            body["stream"] = True
+        return json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+    def _headers(self, stream: bool) -> Headers:
+        return [
+            ("User-Agent", "claudewarp-bench"),
+            ("Content-Type", "application/json"),
+            ("Accept", "text/event-stream" if stream else "application/json"),
+            ("anthropic-version", ANTHROPIC_VERSION),
+            *proxy_auth_headers(self.proxy),
+        ]
+
+    async def _exchange(self, pool: ConnectionPool, stream: bool, result: Dict[str, Any]) -> None:
+        """发送一个请求并读取完整响应，结果写入 result"""
+        started = time.perf_counter()
+        response = await pool.request(
+            "POST", self.target, self._headers(stream), self._build_request(stream)
+        )
+        try:
+            result["status"] = response.status
+            if response.status >= 400:
+                await response.read()
+                result["error"] = f"HTTP {response.status}"
+                return
+
+            if not stream:
+                message = json.loads(await response.read())
+                result["output_tokens"] = int(message.get("usage", {}).get("output_tokens", 0))
+                result["latency"] = time.perf_counter() - started
+                result["ok"] = True
+                return
+
+            last: Optional[float] = None
+            deltas = 0
+            async for event, data in response.iter_sse():
+                now = time.perf_counter()
+                if event == "content_block_delta":
+                    deltas += 1
+                    if last is None:
+                        result["ttft"] = now - started
+                    else:
+                        result["itl"].append(now - last)
+                    last = now
+                elif event == "message_delta":
+                    usage = json.loads(data).get("usage", {})
+                    result["output_tokens"] = int(usage.get("output_tokens", deltas))
+                elif event == "error":
+                    error = json.loads(data).get("error", {})
+                    result["error"] = f"流中断: {error.get('type', 'error')}"
+                    return
+            result["output_tokens"] = result["output_tokens"] or deltas
+            result["latency"] = time.perf_counter() - started
+            result["ok"] = True
+        finally:
+            pool.release(response.connection)
+
+    async def _send(self, pool: ConnectionPool, index: int) -> Dict[str, Any]:
+        """发送第 index 个请求，返回结果"""
+        stream = self._is_stream(index)
+        result: Dict[str, Any] = {
+            "index": index,
+            "stream": stream,
+            "ok": False,
+            "status": None,
+            "error": None,
+            "latency": None,
+            "ttft": None,
+            "itl": [],
+            "output_tokens": 0,
+        }
+        try:
+            await asyncio.wait_for(self._exchange(pool, stream, result), self.timeout)
+        except asyncio.TimeoutError:
+            result["error"] = "超时"
+        except ssl.SSLError as e:
+            result["error"] = f"TLS错误: {e.reason or e}"
+        except (OSError, asyncio.IncompleteReadError) as e:
+            result["error"] = f"连接错误: {type(e).__name__}"
+        except (HTTPProtocolError, ValueError) as e:
+            result["error"] = f"响应无效: {e}"
+        return result
+
+    async def run_async(
+        self, progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """执行性能测试
+
+        Args:
+            progress: 每个请求完成时调用，参数为该请求的结果
+
+        Returns:
+            Dict[str, Any]: 测试报告，包含 proxy_name、base_url、model、mode、requests、
+            concurrency、rate、duration、timestamp、summary（全部请求的 summarize_results 结果）
+            和 by_mode（mixed 模式下按 stream/nonstream 分别汇总）
+        """
+        pool = ConnectionPool(self.proxy.base_url, self.ssl_context, max_idle=self.concurrency)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: List[Dict[str, Any]] = []
+
+        async def send(index: int) -> None:
+            async with semaphore:
+                result = await self._send(pool, index)
+            results.append(result)
+            if progress is not None:
+                progress(result)
+
+        timestamp = datetime.now().isoformat()
+        started = time.perf_counter()
+        try:
+            if self.rate is None:
+                await asyncio.gather(*(send(index) for index in range(self.requests)))
+            else:
+                # 固定速率：按计划时间发出请求，不等待前面的请求完成
+                tasks = []
+                for index in range(self.requests):
+                    delay = started + index / self.rate - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    tasks.append(asyncio.ensure_future(send(index)))
+                await asyncio.gather(*tasks)
+        finally:
+            await pool.aclose()
+        duration = time.perf_counter() - started
+
+        results.sort(key=lambda result: result["index"])
+        by_mode = {}
+        if self.mode == BENCH_MIXED:
+            for name, stream in ((BENCH_STREAM, True), (BENCH_NONSTREAM, False)):
+                group = [result for result in results if result["stream"] == stream]
+                by_mode[name] = summarize_results(group, duration)
+
+        return {
+            "proxy_name": self.proxy.name,
+            "base_url": self.proxy.base_url,
+            "model": self.model,
+            "mode": self.mode,
+            "requests": self.requests,
+            "concurrency": self.concurrency,
+            "rate": self.rate,
+            "max_tokens": self.max_tokens,
+            "duration": duration,
+            "connections": pool.created,
+            "timestamp": timestamp,
+            "summary": summarize_results(results, duration),
+            "by_mode": by_mode,
+        }
+
+    def run(self, progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """在新的事件循环中执行性能测试（同步接口）"""
+        return asyncio.run(self.run_async(progress))
+
+
+__all__ = [
+    "BENCH_MIXED",
+    "BENCH_MODES",
+    "BENCH_NONSTREAM",
+    "BENCH_STREAM",
+    "BenchmarkRunner",
+    "DEFAULT_BENCH_CONCURRENCY",
+    "DEFAULT_BENCH_MAX_TOKENS",
+    "DEFAULT_BENCH_REQUESTS",
+    "DEFAULT_BENCH_TIMEOUT",
+    "proxy_auth_headers",
+    "summarize_results",
+]
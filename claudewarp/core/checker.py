@@ -0,0 +1,405 @@
+"""
+代理连通性检查
+
+基于 asyncio 的并发连通性检查：对每个代理的 base_url 依次进行 DNS 解析、TCP 连接、
+TLS 握手和 HTTP 请求（GET <base_url>v1/models，携带代理的认证凭据），
+每个阶段单独计时并使用独立的超时时间，失败时区分是哪一个阶段出错。
+HTTP 阶段另外记录首字节时间（TTFB），即发出请求到收到响应第一个字节的耗时。
+
+同一次检查中主机名和端口相同的代理共用一次 DNS 解析结果，同一代理的多次检查也只解析一次。
+
+只使用标准库，不引入额外的 HTTP 依赖；只读取响应头，不下载响应体。
+"""
+
+import asyncio
+import contextlib
+import socket
+import ssl
+import statistics
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .exceptions import APIKeyError, ClaudeWarpError, ErrorCodes, ProxyConnectionError
+from .models import ProxyServer
+
+# 默认最大并发检查数
+DEFAULT_CHECK_CONCURRENCY = 32
+
+# 各阶段默认超时时间（秒）
+DEFAULT_CHECK_TIMEOUTS = {"dns": 5.0, "connect": 5.0, "tls": 5.0, "http": 10.0}
+
+# 检查请求的路径（相对 base_url）
+CHECK_PATH = "v1/models"
+
+ANTHROPIC_VERSION = "2023-06-01"
+
+# 检查结果状态
+CHECK_OK = "ok"
+CHECK_DNS_ERROR = "dns_error"
+CHECK_CONNECT_ERROR = "connect_error"
+CHECK_TLS_ERROR = "tls_error"
+CHECK_HTTP_ERROR = "http_error"
+CHECK_AUTH_ERROR = "auth_error"
+
+_PHASE_STATUS = {
+    "dns": CHECK_DNS_ERROR,
+    "connect": CHECK_CONNECT_ERROR,
+    "tls": CHECK_TLS_ERROR,
+    "http": CHECK_HTTP_ERROR,
+}
+
+_PHASE_NAMES = {"dns": "DNS解析", "connect": "TCP连接", "tls": "TLS握手", "http": "HTTP请求"}
+
+# 说明服务可达、凭据未被拒绝的状态码（中转站可能未实现检查路径或正在限流）
+_REACHABLE_STATUS_CODES = {404, 405, 429}
+
+# 表示凭据被拒绝的状态码
+_AUTH_STATUS_CODES = {401, 403}
+
+
+class _CheckFailure(Exception):
+    """检查过程中某个阶段失败"""
+
+    def __init__(self, phase: str, reason: str, timeout: bool = False):
+        super().__init__(reason)
+        self.phase = phase
+        self.reason = reason
+        self.timeout = timeout
+
+
+class ConnectivityChecker:
+    """代理连通性检查器
+
+    在一个事件循环中并发检查多个代理，同时进行的检查数不超过 concurrency。
+    """
+
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CHECK_CONCURRENCY,
+        timeouts: Optional[Dict[str, float]] = None,
+        path: str = CHECK_PATH,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ):
+        """初始化检查器
+
+        Args:
+            concurrency: 最大并发检查数
+            timeouts: 各阶段超时时间（dns、connect、tls、http），未指定的阶段使用默认值
+            path: 检查请求的路径（相对 base_url）
+            ssl_context: TLS 上下文，为None时使用系统默认的证书验证
+        """
+        self.concurrency = max(1, concurrency)
+        self.timeouts = {**DEFAULT_CHECK_TIMEOUTS, **(timeouts or {})}
+        self.path = path.lstrip("/")
+        self.ssl_context = ssl_context or ssl.create_default_context()
+
+        # 本次检查中各主机的解析任务，只在创建它们的事件循环中有效
+        self._addresses: Dict[Tuple[str, int], "asyncio.Future[Any]"] = {}
+        self._addresses_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _build_request(self, proxy: ProxyServer, host_header: str, path: str) -> bytes:
+        """构造检查请求"""
+        headers = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {host_header}",
+            "User-Agent: claudewarp-check",
+            "Accept: */*",
+            f"anthropic-version: {ANTHROPIC_VERSION}",
+            "Connection: close",
+        ]
+        if proxy.get_auth_method() == "auth_token":
+            headers.append(f"Authorization: Bearer {proxy.auth_token}")
+        elif proxy.api_key:
+            headers.append(f"x-api-key: {proxy.api_key}")
+        return ("\r\n".join(headers) + "\r\n\r\n").encode("utf-8")
+
+    async def _run_phase(self, phase: str, awaitable: Any) -> Any:
+        """在阶段超时时间内等待操作完成"""
+        try:
+            return await asyncio.wait_for(awaitable, self.timeouts[phase])
+        except asyncio.TimeoutError:
+            raise _CheckFailure(
+                phase, f"{_PHASE_NAMES[phase]}超时（{self.timeouts[phase]:g}秒）", timeout=True
+            ) from None
+
+    def _resolve(self, host: str, port: int) -> Tuple["asyncio.Future[Any]", bool]:
+        """获取主机的解析任务，已有相同主机和端口的解析时复用
+
+        Returns:
+            Tuple[asyncio.Future, bool]: 解析任务（已 shield，超时不会取消共享的解析）和是否复用
+        """
+        loop = asyncio.get_running_loop()
+        if self._addresses_loop is not loop:
+            self._addresses = {}
+            self._addresses_loop = loop
+
+        key = (host, port)
+        task = self._addresses.get(key)
+        reused = task is not None
+        if task is None:
+            task = asyncio.ensure_future(loop.getaddrinfo(host, port, type=socket.SOCK_STREAM))
+            # 等待方都已超时时，取走解析异常，避免事件循环报告未处理的异常
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._addresses[key] = task
+        return asyncio.shield(task), reused
+
+    async def _open_connection(
+        self, addresses: List[Tuple[Any, ...]]
+    ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """依次尝试解析得到的地址，返回第一个连接成功的流"""
+        last_error: Optional[OSError] = None
+        for sockaddr in dict.fromkeys(info[4][:2] for info in addresses):
+            try:
+                return await asyncio.open_connection(sockaddr[0], sockaddr[1])
+            except OSError as e:
+                last_error = e
+        raise last_error or OSError("没有可用的地址")
+
+    async def _probe(
+        self, proxy: ProxyServer, timings: Dict[str, float], result: Dict[str, Any]
+    ) -> int:
+        """执行一次检查，返回HTTP状态码
+
+        Raises:
+            _CheckFailure: 某个阶段失败
+        """
+        url = urlsplit(proxy.base_url)
+        https = url.scheme == "https"
+        host = url.hostname or ""
+        port = url.port or (443 if https else 80)
+        host_header = f"[{host}]" if ":" in host else host
+        if port != (443 if https else 80):
+            host_header += f":{port}"
+        path = (url.path or "/").rstrip("/") + "/" + self.path
+
+        writer: Optional[asyncio.StreamWriter] = None
+        phase = "dns"
+        try:
+            started = time.perf_counter()
+            resolving, result["dns_reused"] = self._resolve(host, port)
+            addresses = await self._run_phase("dns", resolving)
+            timings["dns"] = time.perf_counter() - started
+
+            phase = "connect"
+            started = time.perf_counter()
+            reader, writer = await self._run_phase("connect", self._open_connection(addresses))
+            timings["connect"] = time.perf_counter() - started
+
+            if https:
+                phase = "tls"
+                started = time.perf_counter()
+                await self._run_phase(
+                    "tls", writer.start_tls(self.ssl_context, server_hostname=host)
+                )
+                timings["tls"] = time.perf_counter() - started
+
+            phase = "http"
+            started = time.perf_counter()
+            writer.write(self._build_request(proxy, host_header, path))
+            head = await self._run_phase("http", self._read_head(reader, started, timings))
+            timings["http"] = time.perf_counter() - started
+
+        except _CheckFailure:
+            raise
+        except socket.gaierror as e:
+            raise _CheckFailure("dns", f"无法解析主机名 {host}: {e.strerror or e}") from None
+        except ssl.SSLError as e:
+            raise _CheckFailure("tls", f"TLS握手失败: {e.reason or e}") from None
+        except asyncio.IncompleteReadError:
+            raise _CheckFailure(phase, "连接在返回响应前被关闭") from None
+        except asyncio.LimitOverrunError:
+            raise _CheckFailure(phase, "响应头过长") from None
+        except OSError as e:
+            raise _CheckFailure(phase, f"{_PHASE_NAMES[phase]}失败: {e.strerror or e}") from None
+        finally:
+            if writer is not None:
+                writer.close()
+                # 等待连接关闭，同时取走握手失败等异常，避免事件循环报告未处理的异常
+                with contextlib.suppress(Exception):
+                    await asyncio.wait_for(writer.wait_closed(), self.timeouts["connect"])
+
+        status_line = head.split(b"\r\n", 1)[0].decode("latin-1")
+        parts = status_line.split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+            raise _CheckFailure("http", f"无效的HTTP响应: {status_line[:60]}")
+        return int(parts[1])
+
+    async def _read_head(
+        self, reader: asyncio.StreamReader, started: float, timings: Dict[str, float]
+    ) -> bytes:
+        """读取响应头，同时记录首字节时间"""
+        first = await reader.readexactly(1)
+        timings["ttfb"] = time.perf_counter() - started
+        return first + await reader.readuntil(b"\r\n\r\n")
+
+    async def check_proxy(self, proxy: ProxyServer) -> Dict[str, Any]:
+        """检查单个代理
+
+        Args:
+            proxy: 代理服务器对象
+
+        Returns:
+            Dict[str, Any]: 检查结果，包含 proxy_name、base_url、status（ok、dns_error、
+            connect_error、tls_error、http_error、auth_error）、message、http_status、
+            latency（总耗时，秒）、timings（各阶段耗时：dns、connect、tls、ttfb、http）、
+            dns_reused（是否复用了同一次检查中的 DNS 解析）、error（失败时对应异常的字典表示）和 timestamp
+        """
+        timings: Dict[str, float] = {}
+        result: Dict[str, Any] = {
+            "proxy_name": proxy.name,
+            "base_url": proxy.base_url,
+            "status": CHECK_OK,
+            "message": "",
+            "http_status": None,
+            "latency": None,
+            "timings": timings,
+            "dns_reused": False,
+            "error": None,
+            "timestamp": datetime.now().isoformat(),
+        }
+
+        started = time.perf_counter()
+        error: Optional[ClaudeWarpError] = None
+        try:
+            status_code = await self._probe(proxy, timings, result)
+        except _CheckFailure as e:
+            result["status"] = _PHASE_STATUS[e.phase]
+            result["message"] = e.reason
+            error = ProxyConnectionError(proxy.name, proxy.base_url, e.reason)
+            error.details["phase"] = e.phase
+            if e.timeout:
+                error.timeout = True
+                error.details["timeout"] = True
+        else:
+            result["http_status"] = status_code
+            result["latency"] = time.perf_counter() - started
+            if status_code in _AUTH_STATUS_CODES:
+                result["status"] = CHECK_AUTH_ERROR
+                result["message"] = f"认证凭据被拒绝（HTTP {status_code}）"
+                error = APIKeyError(f"代理 '{proxy.name}' 的{result['message']}")
+                error.url, error.status_code = proxy.base_url, status_code
+                error.details.update(
+                    {"proxy_name": proxy.name, "url": proxy.base_url, "status_code": status_code}
+                )
+            elif status_code < 400 or status_code in _REACHABLE_STATUS_CODES:
+                result["message"] = f"HTTP {status_code}"
+            else:
+                result["status"] = CHECK_HTTP_ERROR
+                result["message"] = f"HTTP {status_code}"
+                error = ProxyConnectionError(proxy.name, proxy.base_url, result["message"])
+                error.status_code = status_code
+                error.details.update({"phase": "http", "status_code": status_code})
+
+        if error is not None:
+            result["error"] = error.to_dict()
+        return result
+
+    async def check_all(
+        self,
+        proxies: Iterable[ProxyServer],
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> List[Dict[str, Any]]:
+        """并发检查多个代理
+
+        Args:
+            proxies: 代理服务器列表
+            progress: 每个代理检查完成时调用，参数为该代理的检查结果
+
+        Returns:
+            List[Dict[str, Any]]: 与输入顺序一致的检查结果
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def check(proxy: ProxyServer) -> Dict[str, Any]:
+            async with semaphore:
+                result = await self.check_proxy(proxy)
+            if progress is not None:
+                progress(result)
+            return result
+
+        return list(await asyncio.gather(*(check(proxy) for proxy in proxies)))
+
+    def run(
+        self,
+        proxies: Iterable[ProxyServer],
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> List[Dict[str, Any]]:
+        """在新的事件循环中并发检查多个代理（同步接口）"""
+        return asyncio.run(self.check_all(proxies, progress))
+
+
+def rank_results(results: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """按错误率和延迟对多次检查的结果排序
+
+    同一代理的多次检查结果合并为一项：错误率低的在前，错误率相同时按成功检查的延迟中位数排序，
+    没有成功检查的代理排在最后。
+
+    Args:
+        results: check_proxy 返回的检查结果，同一代理可以有多条
+
+    Returns:
+        List[Dict[str, Any]]: 排序后的汇总，每项包含 proxy_name、samples（检查次数）、
+        successes（成功次数）、error_rate、latency（成功检查的延迟中位数，秒）和 last_error
+    """
+    summaries: Dict[str, Dict[str, Any]] = {}
+    latencies: Dict[str, List[float]] = {}
+    for result in results:
+        name = result["proxy_name"]
+        summary = summaries.setdefault(
+            name,
+            {"proxy_name": name, "samples": 0, "successes": 0, "latency": None, "last_error": None},
+        )
+        summary["samples"] += 1
+        if result["status"] == CHECK_OK:
+            summary["successes"] += 1
+            latencies.setdefault(name, []).append(result["latency"])
+        else:
+            summary["last_error"] = result["message"]
+
+    for name, summary in summaries.items():
+        summary["error_rate"] = 1 - summary["successes"] / summary["samples"]
+        if name in latencies:
+            summary["latency"] = statistics.median(latencies[name])
+
+    return sorted(
+        summaries.values(),
+        key=lambda item: (
+            item["error_rate"],
+            item["latency"] if item["latency"] is not None else float("inf"),
+        ),
+    )
+
+
+def raise_for_result(result: Dict[str, Any]) -> None:
+    """检查失败时抛出对应的异常
+
+    Args:
+        result: check_proxy 返回的检查结果
+
+    Raises:
+        APIKeyError: 认证凭据被拒绝
+        ProxyConnectionError: DNS、连接、TLS 或 HTTP 阶段失败
+    """
+    error = result.get("error")
+    if not error:
+        return
+    if error["error_code"] == ErrorCodes.API_KEY_ERROR:
+        raise APIKeyError(error["message"])
+    raise ProxyConnectionError(result["proxy_name"], result["base_url"], result["message"])
+
+
+__all__ = [
+    "CHECK_AUTH_ERROR",
+    "CHECK_CONNECT_ERROR",
+    "CHECK_DNS_ERROR",
+    "CHECK_HTTP_ERROR",
+    "CHECK_OK",
+    "CHECK_TLS_ERROR",
+    "ConnectivityChecker",
+    "DEFAULT_CHECK_CONCURRENCY",
+    "DEFAULT_CHECK_TIMEOUTS",
+    "raise_for_result",
+    "rank_results",
+]
@@ -0,0 +1,389 @@
+"""
+Claude Code settings.json 局部修改
+
+settings.json 中除了 claudewarp 管理的环境变量，通常还有用户维护的权限列表、hooks 等大量内容。
+这里直接在原始文本上修改 "env" 中归 claudewarp 管理的键：只替换、插入或删除对应的成员，
+文件的其余字节（缩进、键顺序、换行符、其他字段）保持不变。
+
+解析结果按文件状态（inode、大小、修改时间）缓存，文件未被外部修改时重复应用无需重新解析；
+修改后的内容与原文件相同时不写入文件。
+"""
+
+import json
+import logging
+from json.decoder import WHITESPACE, scanstring
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .utils import atomic_write, file_signature
+
+# claudewarp 管理的 Claude Code 环境变量
+MANAGED_ENV_KEYS = (
+    "ANTHROPIC_API_KEY",
+    "ANTHROPIC_AUTH_TOKEN",
+    "ANTHROPIC_BASE_URL",
+    "ANTHROPIC_MODEL",
+    "ANTHROPIC_SMALL_FAST_MODEL",
+    "CLAUDE_CODE_DISABLE_NONESSENTIAL_TRAFFIC",
+)
+
+# 新建文件或无法推断缩进时使用的缩进宽度
+DEFAULT_INDENT = 2
+
+_DECODER = json.JSONDecoder()
+
+# 对象成员的位置：(键, 键起始位置, 键结束位置, 值起始位置, 值结束位置)
+Member = Tuple[str, int, int, int, int]
+
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    return WHITESPACE.match(text, pos).end()
+
+
+def _scan_object(text: str, start: int) -> Tuple[Dict[str, Any], List[Member], int]:
+    """解析从 start 处开始的 JSON 对象，同时记录每个成员在文本中的位置
+
+    Args:
+        text: JSON 文本
+        start: 对象起始 "{" 的位置
+
+    Returns:
+        Tuple[Dict[str, Any], List[Member], int]: (解析结果, 成员位置列表, 结束 "}" 的位置)
+
+    Raises:
+        ValueError: 文本不是合法的 JSON 对象
+    """
+    if text[start : start + 1] != "{":
+        raise ValueError(f"位置 {start} 处应为 JSON 对象")
+
+    data: Dict[str, Any] = {}
+    members: List[Member] = []
+    pos = _skip_whitespace(text, start + 1)
+    if text[pos : pos + 1] == "}":
+        return data, members, pos
+
+    while True:
+        if text[pos : pos + 1] != '"':
+            raise ValueError(f"位置 {pos} 处应为属性名")
+        key, key_end = scanstring(text, pos + 1)
+        colon = _skip_whitespace(text, key_end)
+        if text[colon : colon + 1] != ":":
+            raise ValueError(f"位置 {colon} 处应为 ':'")
+        value_start = _skip_whitespace(text, colon + 1)
+        value, value_end = _DECODER.raw_decode(text, value_start)
+
+        data[key] = value
+        members.append((key, pos, key_end, value_start, value_end))
+
+        pos = _skip_whitespace(text, value_end)
+        char = text[pos : pos + 1]
+        if char == "}":
+            return data, members, pos
+        if char != ",":
+            raise ValueError(f"位置 {pos} 处应为 ',' 或 '}}'")
+        pos = _skip_whitespace(text, pos + 1)
+
+
+def _same_json(a: Any, b: Any) -> bool:
+    """按 JSON 语义比较两个值（区分 1 和 true，忽略对象键顺序）"""
+    return json.dumps(a, sort_keys=True) == json.dumps(b, sort_keys=True)
+
+
+def _line_indent(text: str, pos: int) -> str:
+    """获取 pos 所在行的前导空白"""
+    line_start = text.rfind("\n", 0, pos) + 1
+    return text[line_start : _skip_whitespace(text, line_start)]
+
+
+def _dump_value(value: Any, indent_unit: Optional[str], base_indent: str) -> str:
+    """按文件现有风格序列化值，多行内容的后续行与 base_indent 对齐"""
+    if indent_unit is None:
+        return json.dumps(value, ensure_ascii=False)
+    dumped = json.dumps(value, indent=indent_unit, ensure_ascii=False)
+    return dumped.replace("\n", "\n" + base_indent)
+
+
+def _find_member(members: List[Member], key: str) -> Optional[int]:
+    """查找键对应的成员下标（重复的键以最后一个为准，与 json.load 一致）"""
+    for index in range(len(members) - 1, -1, -1):
+        if members[index][0] == key:
+            return index
+    return None
+
+
+def _remove_member(text: str, members: List[Member], index: int, close: int) -> str:
+    """从对象文本中删除一个成员及其分隔符"""
+    if index + 1 < len(members):
+        # 删除到下一个成员的键之前，连同逗号和换行缩进
+        start, end = members[index][1], members[index + 1][1]
+    elif index > 0:
+        # 最后一个成员：从上一个成员的值之后删除，连同前面的逗号
+        start, end = members[index - 1][4], members[index][4]
+    else:
+        # 唯一的成员：删除后成为空对象
+        start, end = 1, close
+    return text[:start] + text[end:]
+
+
+def _set_member(
+    text: str,
+    members: List[Member],
+    key: str,
+    value: Any,
+    indent_unit: Optional[str],
+    base_indent: str,
+) -> str:
+    """在对象文本中设置一个成员：已存在时只替换值，否则追加到最后一个成员之后"""
+    index = _find_member(members, key)
+    if index is not None:
+        _, _, _, value_start, value_end = members[index]
+        member_indent = _line_indent(text, members[index][1])
+        dumped = _dump_value(value, indent_unit, member_indent)
+        return text[:value_start] + dumped + text[value_end:]
+
+    if not members:
+        # 空对象：按文件缩进风格重新生成
+        return _dump_value({key: value}, indent_unit, base_indent)
+
+    # 沿用现有成员之间的分隔符和键值分隔符
+    key_separator = text[members[-1][2] : members[-1][3]]
+    if len(members) >= 2:
+        separator = text[members[-2][4] : members[-1][1]]
+    else:
+        # 只有一个成员时无从得知逗号后的空白，单行格式下与键值分隔符保持一致
+        leading = text[1 : members[0][1]]
+        if "\n" not in leading and key_separator.endswith(" "):
+            leading = " "
+        separator = "," + leading
+    member_indent = _line_indent(text, members[-1][1])
+    insertion = (
+        separator
+        + json.dumps(key, ensure_ascii=False)
+        + key_separator
+        + _dump_value(value, indent_unit, member_indent)
+    )
+    end = members[-1][4]
+    return text[:end] + insertion + text[end:]
+
+
+def patch_object_text(
+    text: str,
+    updates: Dict[str, Any],
+    remove: Iterable[str] = (),
+    indent_unit: Optional[str] = " " * DEFAULT_INDENT,
+    base_indent: str = "",
+) -> str:
+    """修改 JSON 对象文本中的指定成员，其余内容保持原样
+
+    Args:
+        text: 完整的 JSON 对象文本（以 "{" 开头、"}" 结尾）
+        updates: 需要设置的成员，值与现有值相同时不修改
+        remove: 需要删除的成员
+        indent_unit: 新增多行值时使用的缩进，为None时使用紧凑格式
+        base_indent: 对象所在行的缩进
+
+    Returns:
+        str: 修改后的对象文本
+    """
+    data, members, close = _scan_object(text, 0)
+
+    for key in remove:
+        while key in data:
+            index = _find_member(members, key)
+            text = _remove_member(text, members, index, close)
+            data, members, close = _scan_object(text, 0)
+
+    for key, value in updates.items():
+        if key in data and _same_json(data[key], value):
+            continue
+        text = _set_member(text, members, key, value, indent_unit, base_indent)
+        data, members, close = _scan_object(text, 0)
+
+    return text
+
+
+class _SettingsDocument:
+    """一次读取到的 settings.json 内容及其结构位置"""
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        # 保留 UTF-8 BOM 和对象前后的空白
+        self.prefix_end = _skip_whitespace(raw, 1 if raw.startswith("\ufeff") else 0)
+        self.data, self.members, self.close = _scan_object(raw, self.prefix_end)
+        if raw[self.close + 1 :].strip():
+            raise ValueError(f"位置 {self.close + 1} 之后存在多余内容")
+
+    def indent_unit(self) -> Optional[str]:
+        """推断文件使用的缩进：单行（紧凑）格式返回None"""
+        if not self.members:
+            return " " * DEFAULT_INDENT
+        leading = self.raw[self.prefix_end + 1 : self.members[0][1]]
+        if "\n" not in leading:
+            return None
+        return leading[leading.rfind("\n") + 1 :] or " " * DEFAULT_INDENT
+
+
+class ClaudeSettingsFile:
+    """Claude Code settings.json 文件
+
+    只修改 "env" 中指定的环境变量，其余内容逐字节保留；
+    解析结果按文件状态缓存，修改后的内容与原文件相同时跳过写入。
+    """
+
+    def __init__(self, path: Path, durability: Optional[str] = None):
+        """初始化 settings.json 文件
+
+        Args:
+            path: settings.json 路径
+            durability: 写入的持久化级别，为None时使用默认级别
+        """
+        self.path = Path(path)
+        self.durability = durability
+        self.logger = logging.getLogger(__name__)
+
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._document: Optional[_SettingsDocument] = None
+
+    def _load(self) -> Optional[_SettingsDocument]:
+        """读取并解析文件，文件未变化时使用缓存
+
+        Returns:
+            Optional[_SettingsDocument]: 文件内容，文件不存在或无法解析时返回None
+        """
+        signature = file_signature(self.path)
+        if signature is None:
+            self._signature, self._document = None, None
+            return None
+        if signature == self._signature and self._document is not None:
+            return self._document
+
+        try:
+            # newline="" 保留原有换行符
+            with open(self.path, "r", encoding="utf-8", newline="") as f:
+                document = _SettingsDocument(f.read())
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"读取 Claude Code 配置文件失败: {e}")
+            self._signature, self._document = None, None
+            return None
+
+        self._signature, self._document = signature, document
+        self.logger.debug(f"已读取 Claude Code 配置文件: {self.path}")
+        return document
+
+    def read(self) -> Dict[str, Any]:
+        """读取 settings.json 内容（请勿修改返回的字典）
+
+        Returns:
+            Dict[str, Any]: 配置内容，文件不存在或无法解析时返回空字典
+        """
+        document = self._load()
+        return document.data if document is not None else {}
+
+    def update_env(
+        self,
+        updates: Dict[str, Any],
+        remove: Iterable[str] = (),
+        defaults: Optional[Dict[str, Any]] = None,
+        prune_empty: bool = False,
+    ) -> bool:
+        """修改 "env" 中的环境变量
+
+        Args:
+            updates: 需要设置的环境变量
+            remove: 需要删除的环境变量
+            defaults: 文件中缺少时才添加的顶层字段
+            prune_empty: "env" 变为空时删除该字段，整个文件变为空对象时删除文件
+
+        Returns:
+            bool: 是否写入（或删除）了文件，内容没有变化时返回False
+
+        Raises:
+            OSError: 写入或删除文件失败
+        """
+        remove = [key for key in remove if key not in updates]
+        defaults = defaults or {}
+        document = self._load()
+
+        if document is None:
+            if self.path.exists():
+                self.logger.warning(f"无法解析 {self.path}，将重新生成")
+            if not updates:
+                return False
+            content = {"env": dict(updates)}
+            content.update((key, value) for key, value in defaults.items() if key != "env")
+            return self._write(json.dumps(content, indent=DEFAULT_INDENT, ensure_ascii=False))
+
+        data = document.data
+        env = data.get("env")
+        has_env = isinstance(env, dict)
+        current_env = env if has_env else {}
+
+        # 先在解析结果上判断是否需要修改
+        changed_env = any(
+            key not in current_env or not _same_json(current_env[key], value)
+            for key, value in updates.items()
+        ) or any(key in current_env for key in remove)
+        missing_defaults = {key: value for key, value in defaults.items() if key not in data}
+        drop_env = (
+            prune_empty
+            and has_env
+            and not any(key not in remove for key in current_env)
+            and not updates
+        )
+        if not changed_env and not missing_defaults and not drop_env:
+            return False
+
+        raw = document.raw
+        start, end = document.prefix_end, document.close + 1
+        indent_unit = document.indent_unit()
+        top_text = raw[start:end]
+
+        if drop_env:
+            top_text = patch_object_text(top_text, {}, ["env"], indent_unit)
+        elif has_env:
+            # 只修改 "env" 对象对应的文本片段
+            index = _find_member(document.members, "env")
+            _, key_start, _, value_start, value_end = document.members[index]
+            env_text = patch_object_text(
+                raw[value_start:value_end],
+                updates,
+                remove,
+                indent_unit,
+                _line_indent(raw, key_start),
+            )
+            top_text = (
+                top_text[: value_start - start] + env_text + top_text[value_end - start :]
+            )
+        elif updates:
+            # "env" 不存在（或不是对象）时整体设置
+            top_text = patch_object_text(top_text, {"env": dict(updates)}, (), indent_unit)
+
+        if missing_defaults:
+            top_text = patch_object_text(top_text, missing_defaults, (), indent_unit)
+
+        if drop_env and len(data) == 1:
+            self.path.unlink()
+            self._signature, self._document = None, None
+            self.logger.info(f"已删除空的 Claude Code 配置文件: {self.path}")
+            return True
+
+        return self._write(raw[:start] + top_text + raw[end:])
+
+    def _write(self, content: str) -> bool:
+        """写入文件并更新缓存
+
+        Raises:
+            OSError: 写入文件失败
+        """
+        # 以字节写入，避免在 Windows 上转换换行符
+        if not atomic_write(self.path, content.encode("utf-8"), durability=self.durability):
+            raise OSError(f"写入 {self.path} 失败")
+        self._signature, self._document = file_signature(self.path), _SettingsDocument(content)
+        return True
+
+
+__all__ = [
+    "ClaudeSettingsFile",
+    "MANAGED_ENV_KEYS",
+    "patch_object_text",
+]
@@ -1,18 +1,23 @@
 """
 配置文件管理器
 
-负责处理TOML格式的配置文件读写、验证和管理。
+负责处理配置文件读写、验证和管理，默认使用TOML格式，
+也可通过存储后端切换为JSON或SQLite。
 支持跨平台路径处理、文件安全和备份恢复功能。
 """
 
+import hashlib
 import logging
+import os
+import pickle
+import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-
-import toml
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
+from .backup import BackupStore
 from .exceptions import (
+    ConfigConflictError,
     ConfigError,
     ConfigFileCorruptedError,
     ConfigFileNotFoundError,
@@ -20,14 +25,27 @@ from .exceptions import (
     SystemError,
     ValidationError,
 )
+from .journal import (
+    DEFAULT_JOURNAL_MAX_AGE,
+    DEFAULT_JOURNAL_MAX_BYTES,
+    ConfigJournal,
+    apply_journal_records,
+    hash_content,
+    make_journal_record,
+)
+from .locking import DEFAULT_LOCK_TIMEOUT, ConfigLock
 from .models import ProxyConfig, ProxyServer
+from .storage import StorageBackend, get_storage_backend
 from .utils import (
+    DURABILITY_RELAXED,
     atomic_write,
     check_disk_space,
     check_file_permissions,
-    create_backup,
     ensure_directory,
+    file_content_equals,
+    get_cache_directory,
     get_config_directory,
+    resolve_durability,
     set_file_permissions,
 )
 
@@ -37,16 +55,38 @@ CURRENT_CONFIG_VERSION = "1.0"
 # 支持的配置文件版本列表
 SUPPORTED_CONFIG_VERSIONS = ["1.0"]
 
+# 指定配置文件路径的环境变量，扩展名决定默认存储后端（如 config.db 使用SQLite）
+CONFIG_PATH_ENV = "CLAUDEWARP_CONFIG"
+
+# 配置快照格式版本，数据模型字段变化时需要递增以使旧快照失效
+SNAPSHOT_FORMAT_VERSION = 5
+
+
+def _file_identity(stat: os.stat_result) -> Tuple[int, ...]:
+    """文件标识，内容被替换或修改后至少有一项会变化"""
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns)
+
 
 class ConfigManager:
     """配置文件管理器
 
     负责处理配置文件的读取、写入、验证和备份。
-    支持TOML格式，具有跨平台兼容性和安全性保障。
+    具体的存储格式由存储后端决定（TOML、JSON或SQLite），具有跨平台兼容性和安全性保障。
     """
 
     def __init__(
-        self, config_path: Optional[Path] = None, auto_backup: bool = True, max_backups: int = 5
+        self,
+        config_path: Optional[Path] = None,
+        auto_backup: bool = True,
+        max_backups: int = 5,
+        use_snapshot: bool = True,
+        storage: Optional[Union[str, StorageBackend]] = None,
+        use_journal: Optional[bool] = None,
+        journal_max_bytes: int = DEFAULT_JOURNAL_MAX_BYTES,
+        journal_max_age: float = DEFAULT_JOURNAL_MAX_AGE,
+        durability: Optional[str] = None,
+        backup_durability: Optional[str] = None,
+        lock_timeout: float = DEFAULT_LOCK_TIMEOUT,
     ):
         """初始化配置管理器
 
@@ -54,10 +94,35 @@ class ConfigManager:
             config_path: 配置文件路径，为None时使用默认路径
             auto_backup: 是否自动备份
             max_backups: 最大备份数量
+            use_snapshot: 是否使用已验证配置的二进制快照加速加载
+            storage: 存储后端名称（toml、json、sqlite）或实例，为None时根据文件扩展名推断
+            use_journal: 是否使用变更日志模式，为None时读取配置项 settings.journal
+            journal_max_bytes: 变更日志达到该大小（字节）时压缩到配置文件
+            journal_max_age: 变更日志创建超过该时间（秒）时压缩到配置文件
+            durability: 配置文件和变更日志的持久化级别（strict、standard、relaxed、group），
+                为None时读取环境变量 CLAUDEWARP_DURABILITY，默认为standard
+            backup_durability: 备份的持久化级别，为None时与配置文件相同
+            lock_timeout: 修改配置时等待跨进程锁的超时时间（秒）
         """
         self.config_path = config_path or self._get_default_config_path()
         self.auto_backup = auto_backup
         self.max_backups = max_backups
+        self.use_snapshot = use_snapshot
+        self.durability = resolve_durability(durability)
+        self.storage = get_storage_backend(storage, self.config_path)
+        self.storage.durability = self.durability
+        self.use_journal = use_journal
+        self.journal_max_bytes = journal_max_bytes
+        self.journal_max_age = journal_max_age
+        self.journal = ConfigJournal(self.config_path, durability=self.durability)
+        self.backups = BackupStore(
+            self.config_path, durability=backup_durability or self.durability
+        )
+        self.lock = ConfigLock(self.config_path, timeout=lock_timeout)
+        # 最近一次加载或保存时的磁盘状态：(内容标识, 修订号)，用于检测其他进程的修改
+        self._disk_state: Optional[Tuple[Tuple[Any, ...], int]] = None
+        # 最近一次加载或写入时配置文件的 (文件标识, 内容哈希)，文件未变化时无需重新读取计算
+        self._base_hash_cache: Optional[Tuple[Tuple[int, ...], str]] = None
         self.logger = logging.getLogger(__name__)
 
         # 确保配置目录存在
@@ -66,9 +131,15 @@ class ConfigManager:
     def _get_default_config_path(self) -> Path:
         """获取默认配置文件路径
 
+        优先使用环境变量 CLAUDEWARP_CONFIG 指定的路径。
+
         Returns:
             Path: 默认配置文件路径
         """
+        env_path = os.environ.get(CONFIG_PATH_ENV)
+        if env_path:
+            return Path(env_path).expanduser()
+
         config_dir = get_config_directory("claudewarp")
         return config_dir / "config.toml"
 
@@ -118,22 +189,40 @@ class ConfigManager:
         try:
             self.logger.debug(f"加载配置文件: {self.config_path}")
 
-            # 读取TOML文件
-            with open(self.config_path, "r", encoding="utf-8") as f:
-                data = toml.load(f)
+            # 读取原始内容，同时记录文件标识用于快照校验
+            with open(self.config_path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                raw = f.read()
+            journal_raw = self.journal.read_bytes() if self.storage.is_document else b""
+            base_hash = self._remember_base_hash(stat, raw)
+            snapshot_key = self._make_snapshot_key(stat, base_hash)
+
+            # 文件未变化时直接使用快照（只重放快照之后追加的变更日志），跳过解析和模型验证
+            config = self._load_snapshot(snapshot_key, base_hash, journal_raw)
+            if config is not None:
+                self._remember_disk_state(base_hash, journal_raw, config.revision)
+                self.logger.info(f"从快照加载配置，包含 {len(config.proxies)} 个代理服务器")
+                return config
+
+            # 通过存储后端读取配置数据，并重放变更日志
+            data = self._read_config_data(raw, journal_raw)
 
             # 验证配置版本
             self._validate_config_version(data)
 
             # 转换为ProxyConfig对象
             config = self._parse_config_data(data)
+            config.mark_saved()
+            self._remember_disk_state(base_hash, journal_raw, config.revision)
+
+            self._save_snapshot(snapshot_key, config, journal_raw)
 
             self.logger.info(f"成功加载配置，包含 {len(config.proxies)} 个代理服务器")
             return config
 
-        except toml.TomlDecodeError as e:
-            self.logger.error(f"TOML格式错误: {e}")
-            raise ConfigFileCorruptedError(str(self.config_path), str(e)) from None
+        except ConfigFileCorruptedError as e:
+            self.logger.error(f"配置文件格式错误: {e}")
+            raise
 
         except (OSError, PermissionError) as e:
             self.logger.error(f"文件访问错误: {e}")
@@ -147,48 +236,141 @@ class ConfigManager:
             self.logger.error(f"配置加载失败: {e}")
             raise ConfigError(f"加载配置失败: {e}") from None
 
-    def save_config(self, config: ProxyConfig) -> bool:
+    def save_config(
+        self,
+        config: ProxyConfig,
+        changed_proxies: Optional[Iterable[str]] = None,
+        removed_proxies: Optional[Iterable[str]] = None,
+        force: bool = False,
+    ) -> bool:
         """保存配置文件
 
+        配置自上次加载或保存以来没有实质变化时直接返回，不进行序列化、备份和写入；
+        序列化结果与现有文件完全相同时同样跳过写入。
+        写入在跨进程锁内进行，配置文件的修订号与 config.revision 不一致时说明
+        配置已被其他进程修改，抛出 ConfigConflictError，调用方应重新加载后重试。
+
         Args:
             config: 配置对象
+            changed_proxies: 新增或修改的代理名称，用于支持增量写入的后端
+            removed_proxies: 删除的代理名称，用于支持增量写入的后端
+            force: 配置没有变化时也执行写入
+
+        Note:
+            两个变更参数都为None时写入完整配置；文档型后端（TOML/JSON）总是整份写入。
 
         Returns:
             bool: 是否成功保存
 
         Raises:
             ValidationError: 配置验证失败
+            ConfigConflictError: 配置已被其他进程修改
             ConfigPermissionError: 权限不足
             SystemError: 系统错误
         """
-        try:
-            # 验证配置
-            self._validate_config(config)
+        # 验证配置
+        self._validate_config(config)
+
+        if not force and not config.is_dirty() and self.config_path.exists():
+            self.logger.debug("配置未变化，跳过写入")
+            return True
 
-            # 检查磁盘空间
-            config_data = self._serialize_config(config)
-            estimated_size = len(config_data.encode("utf-8")) * 2  # 预留空间
-            check_disk_space(self.config_path.parent, estimated_size)
+        with self.lock.hold():
+            base_revision = config.revision
+            try:
+                return self._save_config_locked(config, changed_proxies, removed_proxies)
+            except BaseException:
+                config.revision = base_revision
+                raise
+
+    def _save_config_locked(
+        self,
+        config: ProxyConfig,
+        changed_proxies: Optional[Iterable[str]],
+        removed_proxies: Optional[Iterable[str]],
+    ) -> bool:
+        """在持有配置锁时写入配置
 
-            # 创建备份
-            if self.auto_backup and self.config_path.exists():
-                backup_path = create_backup(self.config_path, max_backups=self.max_backups)
-                if backup_path:
-                    self.logger.debug(f"已创建备份: {backup_path}")
+        Args:
+            config: 配置对象
+            changed_proxies: 新增或修改的代理名称
+            removed_proxies: 删除的代理名称
 
-            # 原子性写入
-            success = atomic_write(self.config_path, config_data, encoding="utf-8")
+        Returns:
+            bool: 是否成功保存
+        """
+        try:
+            # 确认磁盘上的配置仍是本次修改的基础版本
+            self._check_revision(config)
+            config.revision += 1
+
+            # 只有内容变化时才刷新更新时间，避免无意义的写入
+            if config.is_dirty():
+                config.touch()
+
+            if self.storage.is_document:
+                content = None
+                success = True
+
+                # 变更日志模式下只追加一条记录，达到阈值时才整份写入（压缩）
+                compact = True
+                if self._should_journal(config, changed_proxies, removed_proxies):
+                    compact = self._append_journal(config, changed_proxies, removed_proxies)
+
+                if compact:
+                    config_data = self.storage.dumps(self._config_to_data(config))
+                    content = config_data.encode("utf-8")
+
+                    if file_content_equals(self.config_path, content):
+                        self.logger.debug("配置文件内容未变化，跳过写入")
+                    else:
+                        # 检查磁盘空间
+                        estimated_size = len(content) * 2  # 预留空间
+                        check_disk_space(self.config_path.parent, estimated_size)
+
+                        # 创建备份
+                        self._backup_before_write()
+
+                        # 原子性写入
+                        success = atomic_write(
+                            self.config_path,
+                            config_data,
+                            encoding="utf-8",
+                            durability=self.durability,
+                        )
+
+                    # 配置文件已包含全部变更，清除变更日志
+                    if success and self.journal.discard():
+                        self.logger.debug("变更日志已压缩到配置文件")
+            else:
+                content = None
+                success = self._write_storage(
+                    self._config_to_data(config), changed_proxies, removed_proxies
+                )
 
             if success:
-                # 设置文件权限
-                set_file_permissions(self.config_path, 0o600)
+                # 只追加了变更日志时配置文件没有改动，无需重新设置权限（chmod会改变文件标识），
+                # 快照也仍对应配置文件，加载时重放新增的记录即可
+                rewritten = content is not None or not self.storage.is_document
+                if rewritten:
+                    set_file_permissions(self.config_path, 0o600)
+
+                config.mark_saved()
+                if content is not None:
+                    self._remember_base_hash(self.config_path.stat(), content)
+                self._remember_disk_state(revision=config.revision)
+
+                # 刷新快照，使下次启动无需重新解析刚写入的文件
+                if rewritten:
+                    self._refresh_snapshot_after_write(config, content)
+
                 self.logger.info(f"配置已保存: {self.config_path}")
                 return True
             else:
                 raise SystemError("写入配置文件失败")
 
-        except ValidationError:
-            # 重新抛出验证错误
+        except (ValidationError, ConfigConflictError):
+            # 重新抛出验证错误和并发冲突
             raise
 
         except (OSError, PermissionError) as e:
@@ -199,6 +381,610 @@ class ConfigManager:
             self.logger.error(f"保存配置失败: {e}")
             raise ConfigError(f"保存配置失败: {e}") from None
 
+    def _remember_base_hash(self, stat: os.stat_result, raw: bytes) -> str:
+        """计算并缓存配置文件的内容哈希
+
+        Args:
+            stat: 读取或写入配置文件时的stat结果
+            raw: 配置文件内容
+
+        Returns:
+            str: 内容哈希
+        """
+        base_hash = hash_content(raw)
+        self._base_hash_cache = (_file_identity(stat), base_hash)
+        return base_hash
+
+    def _get_base_hash(self) -> Optional[str]:
+        """获取配置文件的内容哈希
+
+        文件标识（inode、大小、修改和变更时间）与缓存一致时直接使用缓存，
+        追加变更日志时无需重新读取和哈希整个配置文件。
+
+        Returns:
+            Optional[str]: 内容哈希，配置文件不存在时返回None
+        """
+        try:
+            stat = self.config_path.stat()
+            if self._base_hash_cache and self._base_hash_cache[0] == _file_identity(stat):
+                return self._base_hash_cache[1]
+
+            with open(self.config_path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        return self._remember_base_hash(stat, raw)
+
+    def _read_disk_key(
+        self, base_hash: Optional[str] = None, journal_raw: Optional[bytes] = None
+    ) -> Optional[Tuple[Any, ...]]:
+        """获取磁盘上配置的内容标识
+
+        文档型后端使用配置文件和变更日志的内容哈希，其他后端使用存储中的修订号。
+
+        Args:
+            base_hash: 已读取的配置文件内容哈希，为None时使用缓存或从文件读取
+            journal_raw: 已读取的变更日志内容，为None时从文件读取
+
+        Returns:
+            Optional[Tuple[Any, ...]]: 内容标识，配置文件不存在时返回None
+        """
+        if not self.storage.is_document:
+            if not self.config_path.exists():
+                return None
+            return ("revision", self.storage.read_revision(self.config_path))
+
+        if base_hash is None:
+            base_hash = self._get_base_hash()
+            if base_hash is None:
+                return None
+        if journal_raw is None:
+            journal_raw = self.journal.read_bytes()
+        return (base_hash, hash_content(journal_raw) if journal_raw else None)
+
+    def _remember_disk_state(
+        self,
+        base_hash: Optional[str] = None,
+        journal_raw: Optional[bytes] = None,
+        revision: int = 0,
+    ) -> None:
+        """记录刚加载或写入的磁盘状态
+
+        Args:
+            base_hash: 配置文件内容哈希，为None时使用缓存或从文件读取
+            journal_raw: 变更日志内容，为None时从文件读取
+            revision: 对应的配置修订号
+        """
+        try:
+            key = self._read_disk_key(base_hash, journal_raw)
+        except (OSError, ConfigError):
+            key = None
+        self._disk_state = (key, revision) if key is not None else None
+
+    def has_external_changes(self) -> bool:
+        """判断配置文件在最近一次加载或保存后是否被其他进程修改
+
+        只比较内容标识，不解析配置文件。
+
+        Returns:
+            bool: 是否需要重新加载配置
+        """
+        try:
+            key = self._read_disk_key()
+        except (OSError, ConfigError):
+            return True
+
+        if self._disk_state is None:
+            return key is not None
+        return key != self._disk_state[0]
+
+    def _check_revision(self, config: ProxyConfig) -> None:
+        """确认磁盘上配置的修订号与待保存配置一致（需持有配置锁）
+
+        Args:
+            config: 待保存的配置对象
+
+        Raises:
+            ConfigConflictError: 配置已被其他进程修改
+        """
+        key = self._read_disk_key()
+        if key is None:
+            return
+
+        if self._disk_state is not None and key == self._disk_state[0]:
+            disk_revision = self._disk_state[1]
+        elif not self.storage.is_document:
+            disk_revision = key[1]
+        else:
+            # 调用方持有配置锁，此时与配置文件不匹配的变更日志确实已失效，可以移走
+            data = self._read_config_data(
+                self.config_path.read_bytes(), self.journal.read_bytes(), set_aside_orphaned=True
+            )
+            disk_revision = int(data.get("revision") or 0)
+
+        if disk_revision != config.revision:
+            self.logger.info(f"配置修订号不一致: {config.revision} -> {disk_revision}")
+            raise ConfigConflictError(str(self.config_path), config.revision, disk_revision)
+
+    def _read_config_data(
+        self,
+        raw: bytes,
+        journal_raw: bytes = b"",
+        until: Optional[str] = None,
+        set_aside_orphaned: bool = False,
+    ) -> Dict[str, Any]:
+        """通过存储后端读取配置数据并重放变更日志
+
+        读取不加锁时，读到的配置文件可能早于变更日志（其他进程刚压缩完并追加了新记录），
+        这时日志与配置文件不匹配但仍然有效，只能忽略，不能移走。
+
+        Args:
+            raw: 配置文件原始内容
+            journal_raw: 变更日志原始内容
+            until: 只重放不晚于该时间点（ISO格式）的变更记录
+            set_aside_orphaned: 日志与配置文件不匹配时将其移走保留（调用方必须持有配置锁）
+
+        Returns:
+            Dict[str, Any]: 配置数据
+        """
+        if not self.storage.is_document:
+            return self.storage.read(self.config_path)
+
+        data = self.storage.loads(self.config_path, raw)
+        if not journal_raw:
+            return data
+
+        header, records = self.journal.parse(journal_raw)
+        if header is None:
+            return data
+
+        if header.get("base") != hash_content(raw):
+            # 配置文件在日志之后被整体替换（外部编辑或压缩中断），日志已不适用
+            if set_aside_orphaned:
+                orphaned = self.journal.set_aside()
+                self.logger.warning(f"变更日志与配置文件不匹配，已忽略并保留为: {orphaned}")
+            else:
+                self.logger.debug("变更日志与配置文件不匹配，本次读取忽略变更日志")
+            return data
+
+        self.logger.debug(f"重放 {len(records)} 条变更日志记录")
+        return apply_journal_records(data, records, until=until)
+
+    def _should_journal(
+        self,
+        config: ProxyConfig,
+        changed_proxies: Optional[Iterable[str]],
+        removed_proxies: Optional[Iterable[str]],
+    ) -> bool:
+        """判断本次保存是否以变更日志的方式写入
+
+        Args:
+            config: 配置对象
+            changed_proxies: 新增或修改的代理名称
+            removed_proxies: 删除的代理名称
+
+        Returns:
+            bool: 是否追加变更日志
+        """
+        if changed_proxies is None and removed_proxies is None:
+            return False
+        if not self.storage.is_document or not self.config_path.exists():
+            return False
+        if self.use_journal is not None:
+            return self.use_journal
+        return bool(config.settings.get("journal", False))
+
+    def _append_journal(
+        self,
+        config: ProxyConfig,
+        changed_proxies: Optional[Iterable[str]],
+        removed_proxies: Optional[Iterable[str]],
+    ) -> bool:
+        """追加一条变更记录
+
+        只序列化变更的代理和全局字段，配置文件的哈希使用缓存，开销与代理总数无关。
+
+        Args:
+            config: 配置对象
+            changed_proxies: 新增或修改的代理名称
+            removed_proxies: 删除的代理名称
+
+        Returns:
+            bool: 日志是否已达到压缩阈值
+        """
+        changed = list(changed_proxies or ())
+        data = self._config_meta_to_data(config)
+        data["proxies"] = {
+            name: config.proxies[name].model_dump() for name in changed if name in config.proxies
+        }
+        record = make_journal_record(data, changed, removed_proxies or ())
+        base_hash = self._get_base_hash()
+
+        # 不加锁的读取只会忽略不匹配的日志，追加前（持有配置锁）将其移走，避免新记录写入失效的日志
+        header = self.journal.read_header()
+        if header is not None and header.get("base") != base_hash:
+            orphaned = self.journal.set_aside()
+            self.logger.warning(f"变更日志与配置文件不匹配，已保留为: {orphaned}")
+
+        size = self.journal.append(record, base_hash)
+        self.logger.debug(f"已追加变更日志: {self.journal.path} ({size} 字节)")
+
+        return self.journal.needs_compaction(
+            size, self.journal.read_header(), self.journal_max_bytes, self.journal_max_age
+        )
+
+    def compact_journal(self) -> bool:
+        """立即将变更日志压缩到配置文件
+
+        Returns:
+            bool: 是否执行了压缩
+        """
+        if not self.journal.exists():
+            return False
+        with self.lock.hold():
+            return self.save_config(self.load_config(), force=True)
+
+    def load_config_incremental(
+        self, previous: ProxyConfig
+    ) -> Tuple[ProxyConfig, Dict[str, Any]]:
+        """基于已加载的配置增量重新加载
+
+        重新读取配置文件后逐个比较代理记录，未变化的代理直接复用原对象，
+        只对新增和修改的代理进行模型验证。
+
+        Args:
+            previous: 当前已加载的配置对象
+
+        Returns:
+            Tuple[ProxyConfig, Dict[str, Any]]: 新的配置对象和变更摘要
+            （added、changed、removed 代理名称列表，current_proxy_changed、settings_changed）
+
+        Raises:
+            ConfigFileNotFoundError: 配置文件不存在
+            ValidationError: 变化的代理或全局字段验证失败
+        """
+        if not self.config_path.exists():
+            raise ConfigFileNotFoundError(str(self.config_path))
+
+        raw = self.config_path.read_bytes()
+        journal_raw = self.journal.read_bytes() if self.storage.is_document else b""
+        data = self._read_config_data(raw, journal_raw)
+        self._validate_config_version(data)
+
+        proxies: Dict[str, ProxyServer] = {}
+        added: List[str] = []
+        changed: List[str] = []
+        try:
+            for name, proxy_info in data.get("proxies", {}).items():
+                if not isinstance(proxy_info, dict):
+                    raise ValidationError(f"代理 '{name}' 的配置格式错误")
+                proxy_info["name"] = name
+
+                old = previous.proxies.get(name)
+                if old is not None and self._same_proxy_record(old, proxy_info):
+                    proxies[name] = old
+                    continue
+
+                proxies[name] = ProxyServer(**proxy_info)
+                (changed if old is not None else added).append(name)
+
+            # 代理已是验证过的模型实例，构造配置时不会重复验证
+            config = ProxyConfig(
+                version=data.get("version", CURRENT_CONFIG_VERSION),
+                current_proxy=data.get("current_proxy"),
+                proxies=proxies,
+                settings=data.get("settings", {}),
+                created_at=data.get("created_at", previous.created_at),
+                updated_at=data.get("updated_at", previous.updated_at),
+                revision=data.get("revision") or 0,
+            )
+        except ValidationError:
+            raise
+        except ValueError as e:
+            raise ValidationError(f"配置数据格式错误: {e}") from None
+
+        config.mark_saved()
+        self._remember_disk_state(hash_content(raw), journal_raw, config.revision)
+
+        changes = {
+            "added": added,
+            "changed": changed,
+            "removed": [name for name in previous.proxies if name not in proxies],
+            "current_proxy_changed": config.current_proxy != previous.current_proxy,
+            "settings_changed": config.settings != previous.settings,
+        }
+        self.logger.info(
+            f"增量加载配置: 新增 {len(added)} 个，修改 {len(changed)} 个，"
+            f"删除 {len(changes['removed'])} 个代理"
+        )
+        return config, changes
+
+    @staticmethod
+    def _same_proxy_record(proxy: ProxyServer, record: Dict[str, Any]) -> bool:
+        """判断存储中的代理记录是否与已验证的代理对象一致
+
+        TOML不保存None值，记录中缺少的字段视为None。
+        """
+        dumped = proxy.model_dump()
+        if not set(record) <= set(dumped):
+            return False
+        return all(record.get(key) == value for key, value in dumped.items())
+
+    def load_config_at(self, timestamp: str) -> ProxyConfig:
+        """加载指定时间点的配置（基于尚未压缩的变更日志）
+
+        Args:
+            timestamp: ISO格式的时间点
+
+        Returns:
+            ProxyConfig: 该时间点的配置对象
+
+        Raises:
+            ConfigFileNotFoundError: 配置文件不存在
+            ValidationError: 数据验证失败
+        """
+        if not self.config_path.exists():
+            raise ConfigFileNotFoundError(str(self.config_path))
+
+        raw = self.config_path.read_bytes()
+        data = self._read_config_data(raw, self.journal.read_bytes(), until=timestamp)
+        self._validate_config_version(data)
+        return self._parse_config_data(data)
+
+    def _backup_before_write(self) -> None:
+        """写入前按需备份现有配置文件"""
+        if self.auto_backup:
+            self.create_backup()
+
+    def create_backup(self) -> Optional[Dict[str, Any]]:
+        """备份当前配置文件
+
+        内容（忽略更新时间等易变字段）与最近一次备份相同时不会重复备份。
+        备份失败只记录警告，不影响后续写入。
+
+        Returns:
+            Optional[Dict[str, Any]]: 新建的备份条目，未备份时返回None
+        """
+        if not self.config_path.exists():
+            return None
+
+        try:
+            raw = self.config_path.read_bytes()
+            fingerprint = self.storage.fingerprint(self.config_path, raw)
+            entry = self.backups.create(raw, fingerprint, self.max_backups)
+        except (OSError, ConfigError) as e:
+            self.logger.warning(f"创建备份失败: {e}")
+            return None
+
+        if entry:
+            self.logger.debug(f"已创建备份: {entry['id'][:12]}")
+        return entry
+
+    def _write_storage(
+        self,
+        data: Dict[str, Any],
+        changed_proxies: Optional[Iterable[str]],
+        removed_proxies: Optional[Iterable[str]],
+    ) -> bool:
+        """通过非文档型存储后端写入配置
+
+        后端支持增量写入且调用方给出了变更范围时，只写入变更的代理和全局字段，
+        此时不创建整份备份；否则先备份再写入完整配置。
+
+        Args:
+            data: 配置数据
+            changed_proxies: 新增或修改的代理名称
+            removed_proxies: 删除的代理名称
+
+        Returns:
+            bool: 是否成功写入
+        """
+        incremental = (
+            self.storage.supports_incremental
+            and self.config_path.exists()
+            and (changed_proxies is not None or removed_proxies is not None)
+        )
+        if incremental:
+            return self.storage.write_changes(
+                self.config_path, data, changed_proxies or (), removed_proxies or ()
+            )
+
+        self._backup_before_write()
+        return self.storage.write(self.config_path, data)
+
+    def _get_snapshot_path(self) -> Path:
+        """获取配置快照文件路径
+
+        快照存放在缓存目录中（权限0600），文件名由配置文件绝对路径的哈希决定，
+        不同位置的配置文件互不干扰。
+
+        Returns:
+            Path: 快照文件路径
+        """
+        path_hash = hashlib.sha256(str(self.config_path.resolve()).encode("utf-8")).hexdigest()
+        return get_cache_directory("claudewarp") / "snapshots" / f"{path_hash[:16]}.pickle"
+
+    def _make_snapshot_key(self, stat: os.stat_result, base_hash: str) -> Tuple[Any, ...]:
+        """生成配置文件的快照校验键
+
+        变更日志不在校验键中，快照单独记录其已包含的日志前缀，追加记录不会使快照失效。
+
+        Args:
+            stat: 配置文件的stat结果
+            base_hash: 配置文件内容哈希
+
+        Returns:
+            Tuple[Any, ...]: 由路径、大小、修改时间和内容哈希组成的校验键
+        """
+        return (str(self.config_path.resolve()), stat.st_size, stat.st_mtime_ns, base_hash)
+
+    def _get_snapshot_header(self, snapshot_key: Tuple[Any, ...]) -> Dict[str, Any]:
+        """生成快照文件头
+
+        文件头记录快照格式、运行环境和配置文件校验键，任意一项不一致时快照失效。
+
+        Args:
+            snapshot_key: 配置文件的校验键
+
+        Returns:
+            Dict[str, Any]: 快照文件头
+        """
+        import pydantic
+
+        return {
+            "format": SNAPSHOT_FORMAT_VERSION,
+            "python": sys.version_info[:2],
+            "pydantic": pydantic.VERSION,
+            "key": snapshot_key,
+        }
+
+    def _load_snapshot(
+        self, snapshot_key: Tuple[Any, ...], base_hash: str, journal_raw: bytes = b""
+    ) -> Optional[ProxyConfig]:
+        """从快照加载已验证的配置
+
+        快照包含的变更日志必须是当前日志的前缀（日志只追加），之后追加的记录在快照配置上重放。
+
+        Args:
+            snapshot_key: 当前配置文件的校验键
+            base_hash: 当前配置文件内容哈希
+            journal_raw: 当前变更日志内容
+
+        Returns:
+            Optional[ProxyConfig]: 快照有效时返回配置对象，否则返回None
+        """
+        if not self.use_snapshot:
+            return None
+
+        try:
+            with open(self._get_snapshot_path(), "rb") as f:
+                # 先读取并校验文件头，快照过期时不必反序列化配置数据
+                header = pickle.load(f)
+                size, digest, covered = header.pop("journal", None) or (0, None, 0)
+                if header != self._get_snapshot_header(snapshot_key) or (
+                    size and hash_content(journal_raw[:size]) != digest
+                ):
+                    self.logger.debug("配置快照已失效")
+                    return None
+
+                # 快照中的配置在写入前已经过完整验证，反序列化时不会重复验证
+                config = pickle.load(f)
+
+            if not isinstance(config, ProxyConfig):
+                return None
+            if len(journal_raw) > size:
+                return self._replay_journal_tail(config, base_hash, journal_raw, covered)
+            return config
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.debug(f"读取配置快照失败: {e}")
+            return None
+
+    def _replay_journal_tail(
+        self, config: ProxyConfig, base_hash: str, journal_raw: bytes, covered: int
+    ) -> Optional[ProxyConfig]:
+        """在快照配置上重放快照之后追加的变更日志记录
+
+        只验证记录中变更的代理，开销与追加的记录数成正比。
+
+        Args:
+            config: 快照中的配置对象（会被原地修改）
+            base_hash: 当前配置文件内容哈希
+            journal_raw: 当前变更日志内容
+            covered: 快照已包含的记录数
+
+        Returns:
+            Optional[ProxyConfig]: 重放后的配置，日志与配置文件不匹配时返回None
+        """
+        header, records = self.journal.parse(journal_raw)
+        if header is None or header.get("base") != base_hash or len(records) < covered:
+            return None
+
+        try:
+            for record in records[covered:]:
+                for name in record.get("removed", []):
+                    config.proxies.pop(name, None)
+                for name, proxy_info in record.get("changed", {}).items():
+                    config.proxies[name] = ProxyServer(**{**proxy_info, "name": name})
+                for key, value in record.get("meta", {}).items():
+                    if key in ProxyConfig.model_fields:
+                        setattr(config, key, value)
+            self._validate_config_version({"version": config.version})
+        except ValueError as e:
+            self.logger.debug(f"重放变更日志失败，改为完整加载: {e}")
+            return None
+
+        self.logger.debug(f"在快照上重放 {len(records) - covered} 条变更日志记录")
+        config.mark_saved()
+        return config
+
+    def _save_snapshot(
+        self, snapshot_key: Tuple[Any, ...], config: ProxyConfig, journal_raw: bytes = b""
+    ) -> None:
+        """保存已验证配置的快照
+
+        快照只是加速手段，任何失败都只记录日志，不影响正常流程。
+
+        Args:
+            snapshot_key: 配置文件的校验键
+            config: 已验证的配置对象
+            journal_raw: 配置对象已包含的变更日志内容
+        """
+        if not self.use_snapshot:
+            return
+
+        try:
+            header = self._get_snapshot_header(snapshot_key)
+            if journal_raw:
+                _, records = self.journal.parse(journal_raw)
+                header["journal"] = (len(journal_raw), hash_content(journal_raw), len(records))
+            content = pickle.dumps(header, protocol=pickle.HIGHEST_PROTOCOL) + pickle.dumps(
+                config, protocol=pickle.HIGHEST_PROTOCOL
+            )
+
+            snapshot_path = self._get_snapshot_path()
+            ensure_directory(snapshot_path.parent, mode=0o700)
+            # 快照只是缓存，损坏时会被丢弃并重新生成，无需fsync
+            if atomic_write(snapshot_path, content, durability=DURABILITY_RELAXED):
+                set_file_permissions(snapshot_path, 0o600)
+                self.logger.debug(f"已更新配置快照: {snapshot_path}")
+        except Exception as e:
+            self.logger.debug(f"保存配置快照失败: {e}")
+
+    def _refresh_snapshot_after_write(
+        self, config: ProxyConfig, content: Optional[bytes] = None
+    ) -> None:
+        """配置写入后刷新快照
+
+        Args:
+            config: 已写入的配置对象
+            content: 已写入的文件内容，为None时从文件重新读取
+        """
+        if not self.use_snapshot:
+            return
+
+        try:
+            stat = self.config_path.stat()
+            if content is None:
+                content = self.config_path.read_bytes()
+        except OSError:
+            return
+        self._save_snapshot(self._make_snapshot_key(stat, hash_content(content)), config)
+
+    def invalidate_snapshot(self) -> bool:
+        """删除配置快照，下次加载时将重新解析配置文件
+
+        Returns:
+            bool: 是否删除了快照文件
+        """
+        try:
+            self._get_snapshot_path().unlink()
+            return True
+        except OSError:
+            return False
+
     def _create_default_config(self) -> ProxyConfig:
         """创建默认配置
 
@@ -217,8 +1003,12 @@ class ConfigManager:
             },
         )
 
-        # 保存默认配置
-        self.save_config(config)
+        # 保存默认配置；其他进程已抢先创建时改为加载其配置
+        try:
+            self.save_config(config)
+        except ConfigConflictError:
+            self.logger.info("配置文件已由其他进程创建，重新加载")
+            return self.load_config()
         self.logger.info("已创建默认配置文件")
 
         return config
@@ -275,7 +1065,8 @@ class ConfigManager:
                 proxies=proxies,
                 settings=data.get("settings", {}),
                 created_at=data.get("created_at", datetime.now().isoformat()),
-                updated_at=datetime.now().isoformat(),
+                updated_at=data.get("updated_at", datetime.now().isoformat()),
+                revision=data.get("revision") or 0,
             )
 
             return config
@@ -286,45 +1077,53 @@ class ConfigManager:
             traceback.print_exc()
             raise ValidationError(f"配置数据格式错误: {e}") from None
 
-    def _serialize_config(self, config: ProxyConfig) -> str:
-        """序列化配置为TOML格式
+    def _config_to_data(self, config: ProxyConfig) -> Dict[str, Any]:
+        """将配置对象转换为存储后端使用的字典结构
 
         Args:
             config: 配置对象
 
         Returns:
-            str: TOML格式的配置字符串
+            Dict[str, Any]: 配置数据
         """
-        # 转换为字典格式
-        data = {
+        data = self._config_meta_to_data(config)
+        data["proxies"] = {}
+
+        # 转换代理服务器数据
+        for name, proxy in config.proxies.items():
+            data["proxies"][name] = proxy.model_dump()
+
+        return data
+
+    @staticmethod
+    def _config_meta_to_data(config: ProxyConfig) -> Dict[str, Any]:
+        """将配置中代理以外的全局字段转换为字典
+
+        Args:
+            config: 配置对象
+
+        Returns:
+            Dict[str, Any]: 全局字段数据
+        """
+        return {
             "version": config.version,
+            "revision": config.revision,
             "current_proxy": config.current_proxy,
             "created_at": config.created_at,
             "updated_at": config.updated_at,
             "settings": config.settings,
-            "proxies": {},
         }
 
-        # 转换代理服务器数据
-        for name, proxy in config.proxies.items():
-            data["proxies"][name] = proxy.dict()
-
-        # 生成TOML字符串
-        try:
-            toml_content = toml.dumps(data)
-
-            # 添加文件头注释
-            header = f"""# Claude中转站管理工具配置文件
-# 配置文件版本: {config.version}
-# 最后更新: {config.updated_at}
-# 警告: 请勿手动编辑此文件，除非您了解其格式
-
-"""
+    def _serialize_config(self, config: ProxyConfig) -> str:
+        """使用文档型存储后端序列化配置
 
-            return header + toml_content
+        Args:
+            config: 配置对象
 
-        except Exception as e:
-            raise ConfigError(f"序列化配置失败: {e}") from None
+        Returns:
+            str: 配置文件内容
+        """
+        return self.storage.dumps(self._config_to_data(config))
 
     def _validate_config(self, config: ProxyConfig) -> None:
         """验证配置对象
@@ -335,29 +1134,34 @@ class ConfigManager:
         Raises:
             ValidationError: 验证失败
         """
-        # 使用Pydantic的内置验证
-        try:
-            # 触发完整验证
-            config.model_dump()
-        except Exception as e:
-            raise ValidationError(f"配置验证失败: {e}") from None
+        # 字段赋值已由Pydantic验证，代理字典的条目赋值不经过验证，只需检查条目本身；
+        # 不序列化整个配置，保存的开销不随代理数量增长
+        for name, proxy in config.proxies.items():
+            if not isinstance(proxy, ProxyServer):
+                raise ValidationError(f"配置验证失败: 代理 '{name}' 不是有效的代理对象")
+            if proxy.name != name:
+                raise ValidationError(f"配置验证失败: 代理 '{name}' 的名称为 '{proxy.name}'")
 
         # 额外的业务逻辑验证
         if config.current_proxy:
             if config.current_proxy not in config.proxies:
                 raise ValidationError(f"当前代理 '{config.current_proxy}' 不存在于代理列表中")
 
-    def get_backup_files(self) -> List[Path]:
-        """获取备份文件列表
+    def get_backups(self) -> List[Dict[str, Any]]:
+        """获取备份列表（只读取备份清单）
 
         Returns:
-            List[Path]: 备份文件路径列表
+            List[Dict[str, Any]]: 备份条目，最新的在前
         """
-        backup_dir = self.config_path.parent / "backups"
+        return self.backups.list_backups()
+
+    def _get_legacy_backup_files(self) -> List[Path]:
+        """获取旧版本按时间戳命名的完整备份文件，最新的在前"""
+        backup_dir = self.backups.backup_dir
         if not backup_dir.exists():
             return []
 
-        pattern = f"{self.config_path.stem}_*.toml"
+        pattern = f"{self.config_path.stem}_*{self.config_path.suffix}"
         backup_files = list(backup_dir.glob(pattern))
 
         # 按修改时间排序，最新的在前
@@ -365,40 +1169,58 @@ class ConfigManager:
 
         return backup_files
 
-    def restore_from_backup(self, backup_path: Path) -> bool:
+    def get_backup_files(self) -> List[Path]:
+        """获取备份文件列表
+
+        Returns:
+            List[Path]: 备份文件路径列表，内容寻址备份在前，旧版本备份文件在后
+        """
+        backups = [Path(entry["path"]) for entry in self.backups.list_backups()]
+        return backups + self._get_legacy_backup_files()
+
+    def restore_from_backup(self, backup: Union[str, Path]) -> bool:
         """从备份恢复配置
 
         Args:
-            backup_path: 备份文件路径
+            backup: 备份ID（或唯一前缀）、备份内容文件路径，或旧版本备份文件路径
 
         Returns:
             bool: 是否成功恢复
 
         Raises:
-            ConfigFileNotFoundError: 备份文件不存在
+            ConfigFileNotFoundError: 备份不存在
             ConfigError: 恢复失败
         """
-        if not backup_path.exists():
-            raise ConfigFileNotFoundError(str(backup_path))
+        backup_path = Path(backup)
+        if backup_path.parent == self.backups.objects_dir and backup_path.name.endswith(".gz"):
+            backup = backup_path.name[: -len(".gz")]
+
+        entry = None
+        if not backup_path.is_file() or backup_path.parent == self.backups.objects_dir:
+            entry = self.backups.find(str(backup))
+            if entry is None:
+                raise ConfigFileNotFoundError(str(backup))
 
         try:
-            # 验证备份文件
-            # with open(backup_path, 'r', encoding='utf-8') as f:
-            #     data = toml.load(f)
+            content = self.backups.read(entry["id"]) if entry else backup_path.read_bytes()
 
-            # 解析为配置对象进行验证
-            # config = self._parse_config_data(data)
+            with self.lock.hold():
+                # 备份当前配置
+                current_backup = self.create_backup()
+                if current_backup:
+                    self.logger.info(f"已备份当前配置: {current_backup['id'][:12]}")
 
-            # 备份当前配置
-            if self.config_path.exists():
-                current_backup = create_backup(self.config_path)
-                self.logger.info(f"已备份当前配置: {current_backup}")
+                if not atomic_write(self.config_path, content, durability=self.durability):
+                    raise SystemError("写入配置文件失败")
+                set_file_permissions(self.config_path, 0o600)
 
-            # 复制备份文件到配置路径
-            import shutil
+                # 变更日志基于被替换的配置文件，保留以便人工恢复
+                if self.journal.exists():
+                    orphaned = self.journal.set_aside()
+                    self.logger.info(f"已保留原变更日志: {orphaned}")
 
-            shutil.copy2(backup_path, self.config_path)
-            set_file_permissions(self.config_path, 0o600)
+                # 已加载的配置不再对应磁盘内容，下次保存前需要重新加载
+                self._disk_state = None
 
             self.logger.info(f"已从备份恢复配置: {backup_path}")
             return True
@@ -418,6 +1240,13 @@ class ConfigManager:
             "exists": self.config_path.exists(),
             "auto_backup": self.auto_backup,
             "max_backups": self.max_backups,
+            "storage": self.storage.name,
+            "durability": self.durability,
+            "lock_path": str(self.lock.path),
+            "use_snapshot": self.use_snapshot,
+            "journal_path": str(self.journal.path),
+            "journal_exists": self.journal.exists(),
+            "snapshot_path": str(self._get_snapshot_path()),
         }
 
         if self.config_path.exists():
@@ -430,14 +1259,15 @@ class ConfigManager:
                 }
             )
 
-            # 获取备份信息
-            backups = self.get_backup_files()
+            # 获取备份信息（只读取备份清单）
+            backups = self.backups.list_backups()
             info["backup_count"] = len(backups)
             if backups:
                 latest_backup = backups[0]
                 info["latest_backup"] = {
-                    "path": str(latest_backup),
-                    "created": datetime.fromtimestamp(latest_backup.stat().st_mtime).isoformat(),
+                    "id": latest_backup["id"],
+                    "path": latest_backup["path"],
+                    "created": latest_backup["created_at"],
                 }
 
         return info
@@ -448,14 +1278,11 @@ class ConfigManager:
         Returns:
             int: 清理的备份文件数量
         """
-        backup_files = self.get_backup_files()
-
-        if len(backup_files) <= self.max_backups:
-            return 0
+        deleted_count = self.backups.prune(self.max_backups)
 
-        # 删除超出数量限制的备份
+        # 旧版本的完整备份文件同样只保留最近的若干个
+        backup_files = self._get_legacy_backup_files()
         files_to_delete = backup_files[self.max_backups :]
-        deleted_count = 0
 
         for backup_file in files_to_delete:
             try:
@@ -483,23 +1310,25 @@ class ConfigManager:
             return False
 
         try:
-            # 加载当前配置
-            config = self.load_config()
+            with self.lock.hold():
+                # 加载当前配置
+                config = self.load_config()
 
-            if config.version == target_version:
-                return False  # 无需迁移
+                if config.version == target_version:
+                    return False  # 无需迁移
 
-            self.logger.info(f"开始配置迁移: {config.version} -> {target_version}")
+                self.logger.info(f"开始配置迁移: {config.version} -> {target_version}")
 
-            # 创建迁移前备份
-            backup_path = create_backup(self.config_path)
-            self.logger.info(f"迁移前备份: {backup_path}")
+                # 创建迁移前备份
+                backup = self.create_backup()
+                if backup:
+                    self.logger.info(f"迁移前备份: {backup['id'][:12]}")
 
-            # 执行版本迁移
-            migrated_config = self._perform_migration(config, target_version)
+                # 执行版本迁移
+                migrated_config = self._perform_migration(config, target_version)
 
-            # 保存迁移后的配置
-            self.save_config(migrated_config)
+                # 保存迁移后的配置
+                self.save_config(migrated_config)
 
             self.logger.info(f"配置迁移完成: {target_version}")
             return True
@@ -533,4 +1362,6 @@ __all__ = [
     "ConfigManager",
     "CURRENT_CONFIG_VERSION",
     "SUPPORTED_CONFIG_VERSIONS",
+    "SNAPSHOT_FORMAT_VERSION",
+    "CONFIG_PATH_ENV",
 ]
@@ -100,6 +100,37 @@ class ConfigPermissionError(ConfigError):
         self.details["operation"] = operation
 
 
+class ConfigConflictError(ConfigError):
+    """配置并发修改冲突错误
+
+    保存时发现配置文件已被其他进程修改（修订号不一致）时抛出。
+    """
+
+    def __init__(self, config_path: str, expected_revision: int, actual_revision: int):
+        super().__init__(
+            f"配置文件已被其他进程修改（修订号 {expected_revision} -> {actual_revision}）: {config_path}",
+            config_path=config_path,
+            error_code="CONFIG_CONFLICT",
+        )
+        self.expected_revision = expected_revision
+        self.actual_revision = actual_revision
+        self.details["expected_revision"] = expected_revision
+        self.details["actual_revision"] = actual_revision
+
+
+class ConfigLockTimeoutError(ConfigError):
+    """等待配置锁超时错误"""
+
+    def __init__(self, lock_path: str, timeout: float):
+        super().__init__(
+            f"等待配置锁超时（{timeout:g} 秒）: {lock_path}",
+            config_path=lock_path,
+            error_code="CONFIG_LOCK_TIMEOUT",
+        )
+        self.timeout = timeout
+        self.details["timeout"] = timeout
+
+
 class ProxyNotFoundError(ClaudeWarpError):
     """代理服务器未找到错误
 
@@ -295,6 +326,8 @@ class ErrorCodes:
     CONFIG_FILE_NOT_FOUND = "CONFIG_FILE_NOT_FOUND"
     CONFIG_FILE_CORRUPTED = "CONFIG_FILE_CORRUPTED"
     CONFIG_PERMISSION_ERROR = "CONFIG_PERMISSION_ERROR"
+    CONFIG_CONFLICT = "CONFIG_CONFLICT"
+    CONFIG_LOCK_TIMEOUT = "CONFIG_LOCK_TIMEOUT"
 
     # 代理相关
     PROXY_NOT_FOUND = "PROXY_NOT_FOUND"
@@ -329,6 +362,8 @@ EXCEPTION_CATEGORIES = {
         ConfigFileNotFoundError,
         ConfigFileCorruptedError,
         ConfigPermissionError,
+        ConfigConflictError,
+        ConfigLockTimeoutError,
     ],
     "proxy": [
         ProxyNotFoundError,
@@ -425,6 +460,8 @@ __all__ = [
     "ConfigFileNotFoundError",
     "ConfigFileCorruptedError",
     "ConfigPermissionError",
+    "ConfigConflictError",
+    "ConfigLockTimeoutError",
     # 代理相关异常
     "ProxyNotFoundError",
     "DuplicateProxyError",
@@ -0,0 +1,135 @@
+"""
+故障转移
+
+本地转发代理以故障转移模式运行时，上游返回连接错误、5xx 或 529 的请求会在下一个可用代理上重试：
+
+- 候选代理依次为选中的代理和它的备用代理列表（配置项 settings.fallbacks，代理名称到备用代理名称列表）；
+- 相邻两次尝试之间等待带随机抖动的指数退避时间；
+- 每个上游一个熔断器：连续失败达到阈值后断开（open），跳过该代理；
+  冷却时间过后进入半开（half-open），放行一个试探请求，成功则恢复（closed），失败则重新断开。
+
+请求发出之前的失败（建立连接、TLS 握手、复用的连接已失效）总是可以重试；请求已写入上游之后
+连接中断或超时，上游可能已经在处理，只有幂等请求可以重试。上游返回的 5xx 和 529 状态码都可以重试。
+流式响应在转发第一个字节之前可以重试，之后上游中断只能断开客户端连接。
+"""
+
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+# 配置项中保存备用代理列表的键
+FALLBACKS_SETTING_KEY = "fallbacks"
+
+# 视为上游故障、可以重试的状态码
+RETRYABLE_STATUSES = frozenset({500, 502, 503, 504, 529})
+
+# 上游已经开始处理后仍可以安全重试的请求方法
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# 每个请求最多尝试的次数（包括第一次）
+DEFAULT_MAX_ATTEMPTS = 3
+
+# 退避时间：第 n 次重试前等待 [0, min(cap, base * 2^n)] 之间的随机时间（秒）
+DEFAULT_BACKOFF_BASE = 0.25
+DEFAULT_BACKOFF_CAP = 4.0
+
+# 熔断器：连续失败次数阈值和断开后的冷却时间（秒）
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RESET_TIMEOUT = 30.0
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half-open"
+
+
+def backoff_delay(
+    attempt: int, base: float = DEFAULT_BACKOFF_BASE, cap: float = DEFAULT_BACKOFF_CAP
+) -> float:
+    """第 attempt 次重试（从 0 开始）前的等待时间，使用完全随机抖动"""
+    return random.uniform(0, min(cap, base * (2**attempt)))
+
+
+class CircuitBreaker:
+    """单个上游的熔断器"""
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+    ):
+        """初始化熔断器
+
+        Args:
+            failure_threshold: 连续失败多少次后断开
+            reset_timeout: 断开后经过多久进入半开状态（秒）
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CIRCUIT_CLOSED
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return CIRCUIT_OPEN
+        return CIRCUIT_HALF_OPEN
+
+    def available(self) -> bool:
+        """是否可能放行请求（不占用半开状态的试探名额）"""
+        state = self.state
+        return state == CIRCUIT_CLOSED or (state == CIRCUIT_HALF_OPEN and not self._probing)
+
+    def allow(self) -> bool:
+        """是否放行一个请求；半开状态下同一时间只放行一个试探请求"""
+        with self._lock:
+            state = self.state
+            if state == CIRCUIT_CLOSED:
+                return True
+            if state == CIRCUIT_HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self) -> None:
+        """放弃半开状态的试探名额（请求既不算成功也不算失败时调用）"""
+        with self._lock:
+            self._probing = False
+
+    def snapshot(self) -> Dict[str, object]:
+        """熔断器状态（state、failures）"""
+        return {"state": self.state, "failures": self.failures}
+
+
+__all__ = [
+    "CIRCUIT_CLOSED",
+    "CIRCUIT_HALF_OPEN",
+    "CIRCUIT_OPEN",
+    "CircuitBreaker",
+    "DEFAULT_BACKOFF_BASE",
+    "DEFAULT_BACKOFF_CAP",
+    "DEFAULT_FAILURE_THRESHOLD",
+    "DEFAULT_MAX_ATTEMPTS",
+    "DEFAULT_RESET_TIMEOUT",
+    "FALLBACKS_SETTING_KEY",
+    "IDEMPOTENT_METHODS",
+    "RETRYABLE_STATUSES",
+    "backoff_delay",
+]
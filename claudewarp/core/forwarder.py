@@ -0,0 +1,839 @@
+"""
+本地转发代理
+
+在本机监听一个端口，Claude Code 的 ANTHROPIC_BASE_URL 只需指向这里一次。
+每个请求转发到 ProxyManager 当前代理的 base_url，并替换为该代理的认证凭据；
+响应（包括 SSE 流）逐块原样转发给客户端，到各上游的连接保持长连接复用。
+指定代理池标签时，请求按负载均衡策略分摊到带有该标签的所有启用代理（见 balancer 模块）；
+配置了模型路由规则时，先按请求的模型选择代理（见 router 模块）；
+启用故障转移时，上游故障的请求在备用代理上重试（见 failover 模块）；
+启用速率限制调度时，按上游报告的速率限制在本地排队或改用其他代理（见 ratelimit 模块）；
+启用用量统计时，按代理和模型记录请求数、耗时、错误和响应中的 token 用量（见 metering 模块）。
+
+转发代理内嵌 ProxyManager 并监视配置文件，其他进程执行 'cw use' 切换代理后，
+后续请求立即转发到新的代理，已经运行的 Claude Code 会话无需重启，也不需要改写 settings.json。
+
+客户端需要携带启用本地转发时生成的本地令牌（x-api-key 或 Authorization: Bearer），
+避免本机其他程序借用代理的凭据。
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import secrets
+import ssl
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .balancer import STRATEGY_ROUND_ROBIN, LoadBalancer
+from .bench import proxy_auth_headers
+from .failover import (
+    DEFAULT_MAX_ATTEMPTS,
+    IDEMPOTENT_METHODS,
+    RETRYABLE_STATUSES,
+    CircuitBreaker,
+    backoff_delay,
+)
+from .local_proxy import (
+    DEFAULT_SERVE_HOST,
+    DEFAULT_SERVE_PORT,
+    LOCAL_PROXY_SETTING_KEY,
+    generate_local_token,
+    local_proxy_url,
+)
+from .metering import UsageMeter, UsageParser
+from .models import ProxyServer
+from .ratelimit import DEFAULT_MAX_QUEUE_WAIT, SESSION_HEADERS, RateLimiter, estimate_tokens
+from .router import (
+    PeekedModel,
+    class_model,
+    configured_class,
+    match_route,
+    peek_model,
+    replace_model,
+)
+from .transport import (
+    ConnectionPool,
+    Headers,
+    HTTPBodyTooLargeError,
+    HTTPProtocolError,
+    HTTPResponse,
+    StaleConnectionError,
+    encode_chunk,
+    encode_head,
+    header_value,
+    hop_by_hop,
+    is_chunked,
+    iter_body,
+    read_head,
+    wants_close,
+)
+
+if TYPE_CHECKING:
+    from .manager import ProxyManager
+
+# 上游超时时间（秒）：connect 为建立连接（含 TLS 握手），read 为等待响应头或相邻两个数据块的最长时间
+DEFAULT_UPSTREAM_TIMEOUTS = {"connect": 10.0, "read": 600.0}
+
+# 用量统计写入磁盘的间隔（秒）
+METERING_FLUSH_INTERVAL = 60.0
+
+# 请求体的最大长度
+MAX_REQUEST_BODY = 32 * 1024 * 1024
+
+# 每个上游保留的最大空闲连接数
+DEFAULT_MAX_IDLE_CONNECTIONS = 32
+
+# 转发时不传递给上游的请求头（凭据由转发代理替换）
+_CLIENT_ONLY_HEADERS = {"host", "content-length", "x-api-key", "authorization", "expect"}
+
+
+def _error_body(error_type: str, message: str) -> bytes:
+    """Anthropic API 格式的错误响应体"""
+    data = {"type": "error", "error": {"type": error_type, "message": message}}
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def _is_event_stream(response: HTTPResponse) -> bool:
+    content_type = response.header("content-type") or ""
+    return content_type.split(";", 1)[0].strip().lower() == "text/event-stream"
+
+
+class _ClientRequest:
+    """客户端发来的一个请求"""
+
+    def __init__(
+        self,
+        method: str,
+        target: str,
+        version: str,
+        headers: Headers,
+        body: bytes,
+        connection_id: str = "",
+    ):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        self.body = body
+        self.model: Optional[PeekedModel] = peek_model(body) if method == "POST" else None
+        # 客户端会话：优先使用会话标识请求头，没有时以客户端连接区分
+        sessions = (header_value(headers, name) for name in SESSION_HEADERS)
+        self.session = next((value for value in sessions if value), connection_id)
+        # 转发结果：最后尝试的上游代理、发给客户端的状态码、响应用量和上游是否中途中断
+        self.upstream: Optional[str] = None
+        self.status: Optional[int] = None
+        self.usage: Optional[UsageParser] = None
+        self.interrupted = False
+
+    @property
+    def path(self) -> str:
+        """请求路径（含查询参数），代理形式的绝对地址只保留路径部分"""
+        if self.target.startswith(("http://", "https://")):
+            parts = urlsplit(self.target)
+            return (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        return self.target if self.target.startswith("/") else "/" + self.target
+
+
+class _UpstreamError(Exception):
+    """无法从上游获得响应"""
+
+    def __init__(self, status: int, error_type: str, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.status = status
+        self.error_type = error_type
+        self.message = message
+        # 故障转移模式下能否在其他代理上重试
+        self.retryable = retryable
+
+
+class LocalProxyServer:
+    """本地转发代理"""
+
+    def __init__(
+        self,
+        manager: "ProxyManager",
+        host: str = DEFAULT_SERVE_HOST,
+        port: int = DEFAULT_SERVE_PORT,
+        token: Optional[str] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        watch: bool = True,
+        pool_tag: Optional[str] = None,
+        strategy: str = STRATEGY_ROUND_ROBIN,
+        failover: bool = False,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        rate_limit: bool = False,
+        max_queue_wait: float = DEFAULT_MAX_QUEUE_WAIT,
+        metering: bool = False,
+    ):
+        """初始化转发代理
+
+        Args:
+            manager: 代理管理器，每个请求转发到它的当前代理
+            host: 监听地址
+            port: 监听端口，为0时自动分配
+            token: 客户端需要携带的本地令牌，为None时不检查
+            timeouts: 上游超时时间（connect、read），未指定的使用默认值
+            ssl_context: 连接 HTTPS 上游使用的 TLS 上下文，为None时使用系统默认的证书验证
+            watch: 是否监视配置文件，在其他进程切换代理后立即生效
+            pool_tag: 代理池标签，指定时请求分摊到带有该标签的所有启用代理，而不是当前代理
+            strategy: 代理池的负载均衡策略（round-robin、weighted、least-outstanding）
+            failover: 是否启用故障转移，上游故障时在备用代理上重试
+            max_attempts: 故障转移模式下每个请求最多尝试的次数（包括第一次）
+            rate_limit: 是否启用速率限制调度，按上游报告的速率限制排队或改用其他代理
+            max_queue_wait: 请求在本地排队的最长时间（秒），超过后返回 429
+            metering: 是否按代理和模型统计用量，每 METERING_FLUSH_INTERVAL 秒写入 manager.usage_store
+        """
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self.token = token
+        self.timeouts = {**DEFAULT_UPSTREAM_TIMEOUTS, **(timeouts or {})}
+        self.ssl_context = ssl_context
+        self.watch = watch
+        self.pool_tag = pool_tag
+        self.balancer = LoadBalancer(strategy, manager.get_pool_weights())
+        self.failover = failover
+        self.max_attempts = max(1, max_attempts)
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.limiter = RateLimiter(max_queue_wait) if rate_limit else None
+        self.meter = UsageMeter() if metering else None
+        self._flusher: Optional["asyncio.Task[None]"] = None
+        self.logger = logging.getLogger(__name__)
+        self.requests = 0
+        self._pools: Dict[Tuple[str, str, int], ConnectionPool] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._watcher: Any = None
+
+    @property
+    def url(self) -> str:
+        return local_proxy_url({"host": self.host, "port": self.port})
+
+    async def start(self) -> int:
+        """开始监听，返回实际端口"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.watch and self._watcher is None:
+            self._watcher = self.manager.watch()
+        if self.meter is not None and self._flusher is None:
+            self._flusher = asyncio.ensure_future(self._flush_periodically())
+        self.logger.info(f"本地转发代理已启动: {self.url}")
+        return self.port
+
+    async def close(self) -> None:
+        """停止监听，关闭上游连接和配置监视"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+        pools, self._pools = self._pools, {}
+        await asyncio.gather(*(pool.aclose() for pool in pools.values()))
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self.meter is not None:
+            await self.flush_usage()
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    def run(self) -> None:
+        """在新的事件循环中运行，直到被中断"""
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(self.serve_forever())
+
+    async def flush_usage(self) -> None:
+        """把内存中的用量统计写入磁盘，失败时丢弃并记录日志"""
+        if self.meter is None:
+            return
+        buckets = self.meter.take()
+        if not buckets:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.manager.usage_store.append, buckets
+            )
+        except Exception as e:
+            self.logger.warning(f"保存用量统计失败: {e}")
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(METERING_FLUSH_INTERVAL)
+            await self.flush_usage()
+
+    def _record_usage(self, request: _ClientRequest, latency: float) -> None:
+        """记录转发到上游的请求；未通过认证或没有可用代理的请求不计入"""
+        if self.meter is None or request.upstream is None:
+            return
+        usage = request.usage
+        error = (
+            request.status is None
+            or request.status >= 400
+            or request.interrupted
+            or (usage is not None and usage.error)
+        )
+        model = (usage.model if usage is not None else None) or (
+            request.model.model if request.model is not None else None
+        )
+        self.meter.record(
+            request.upstream, model, latency, error, usage.usage if usage is not None else None
+        )
+
+    def _record_failed_attempt(self, request: _ClientRequest, latency: float) -> None:
+        """把故障转移中失败的一次尝试单独计为该上游的一次错误
+
+        记录后清除 request.upstream，请求结束时 _record_usage 只记录最后一次成功转发的尝试。
+        """
+        if self.meter is not None and request.upstream is not None:
+            model = request.model.model if request.model is not None else None
+            self.meter.record(request.upstream, model, latency, True)
+        request.upstream = None
+
+    def _pool(self, base_url: str) -> ConnectionPool:
+        """获取上游源站的连接池，同一源站的代理共用"""
+        parts = urlsplit(base_url)
+        https = parts.scheme == "https"
+        key = (parts.scheme, parts.hostname or "", parts.port or (443 if https else 80))
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(
+                base_url,
+                self.ssl_context,
+                max_idle=DEFAULT_MAX_IDLE_CONNECTIONS,
+                connect_timeout=self.timeouts["connect"],
+            )
+            self._pools[key] = pool
+        return pool
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        """获取代理的熔断器"""
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker()
+        return breaker
+
+    def _authorized(self, headers: Headers) -> bool:
+        if self.token is None:
+            return True
+        credential = header_value(headers, "x-api-key")
+        authorization = header_value(headers, "authorization") or ""
+        if authorization.lower().startswith("bearer "):
+            credential = credential or authorization[7:].strip()
+        return credential is not None and secrets.compare_digest(
+            credential.encode("utf-8"), self.token.encode("utf-8")
+        )
+
+    def _select_upstream(self, request: _ClientRequest) -> ProxyServer:
+        """选择转发请求的上游代理
+
+        Raises:
+            _UpstreamError: 没有可用的代理
+        """
+        routed = self._route_by_model(request)
+        if routed is not None:
+            return routed
+
+        if self.pool_tag is not None:
+            candidates = self.manager.get_pool_members(self.pool_tag)
+            if not candidates:
+                raise _UpstreamError(
+                    503, "api_error", f"代理池 '{self.pool_tag}' 中没有启用的代理"
+                )
+            if self.failover:
+                # 熔断的代理不参与分配；全部熔断时仍从全部成员中选择，由熔断器决定是否放行
+                healthy = [proxy for proxy in candidates if self.breaker(proxy.name).available()]
+                candidates = healthy or candidates
+            if self.limiter is not None:
+                # 优先分配给有剩余容量的代理；都没有时照常分配，在选中的代理上排队
+                ready = [proxy for proxy in candidates if self.limiter.available(proxy.name)]
+                candidates = ready or candidates
+            self.balancer.update_weights(self.manager.get_pool_weights())
+            return self.balancer.select(candidates)
+
+        proxy = self.manager.get_current_proxy()
+        if proxy is None:
+            raise _UpstreamError(503, "api_error", "claudewarp 没有设置当前代理，请先执行 'cw use'")
+        return proxy
+
+    def _route_by_model(self, request: _ClientRequest) -> Optional[ProxyServer]:
+        """按模型路由规则选择代理，没有匹配的规则或目标代理不可用时为None"""
+        routes = self.manager.get_model_routes()
+        if not routes or request.model is None:
+            return None
+        proxies = self.manager.config.proxies
+        matched = match_route(routes, request.model.model, proxies.values())
+        if matched is None:
+            return None
+        rule, name = matched
+        proxy = proxies.get(name)
+        if proxy is None or not proxy.is_active:
+            self.logger.warning(f"模型路由 {rule} 的目标代理 '{name}' 不存在或已禁用，忽略该规则")
+            return None
+        return proxy
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """处理一个客户端连接（长连接上的多个请求）"""
+        peer = writer.get_extra_info("peername")
+        connection_id = ":".join(map(str, peer[:2])) if isinstance(peer, tuple) else str(id(writer))
+        try:
+            while True:
+                try:
+                    start_line, headers = await read_head(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                parts = start_line.split(" ")
+                if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+                    await self._send_error(writer, 400, "invalid_request_error", "无效的请求行")
+                    return
+                # 读取请求体之前检查令牌，未通过认证的请求体不读取，连接随之关闭
+                if not self._authorized(headers):
+                    await self._send_error(writer, 401, "authentication_error", "本地令牌无效")
+                    return
+                try:
+                    chunks = iter_body(reader, headers, False, MAX_REQUEST_BODY)
+                    body = b"".join([chunk async for chunk in chunks])
+                except HTTPBodyTooLargeError:
+                    await self._send_error(writer, 413, "request_too_large", "请求体过大")
+                    return
+                request = _ClientRequest(parts[0], parts[1], parts[2], headers, body, connection_id)
+                self.requests += 1
+                started = time.perf_counter()
+                try:
+                    keep_alive = await self._serve_request(request, writer)
+                finally:
+                    self._record_usage(request, time.perf_counter() - started)
+                if not keep_alive or wants_close(request.version, headers):
+                    return
+        except (HTTPProtocolError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            self.logger.debug(f"客户端请求无效: {e}")
+            with contextlib.suppress(ConnectionError):
+                await self._send_error(writer, 400, "invalid_request_error", str(e))
+        except ConnectionError as e:
+            self.logger.debug(f"客户端连接中断: {e}")
+        finally:
+            writer.close()
+
+    async def _send_error(
+        self, writer: asyncio.StreamWriter, status: int, error_type: str, message: str
+    ) -> None:
+        body = _error_body(error_type, message)
+        headers = [
+            ("Content-Type", "application/json"),
+            ("Content-Length", str(len(body))),
+            ("x-claudewarp-error", error_type),
+        ]
+        writer.write(encode_head(f"HTTP/1.1 {status} Error", headers) + body)
+        await writer.drain()
+
+    async def _serve_request(self, request: _ClientRequest, writer: asyncio.StreamWriter) -> bool:
+        """转发一个请求，返回客户端连接能否继续使用"""
+        started = time.perf_counter()
+        try:
+            proxy = self._select_upstream(request)
+        except _UpstreamError as e:
+            self.logger.warning(f"{request.method} {request.path} 转发失败: {e.message}")
+            await self._send_error(writer, e.status, e.error_type, e.message)
+            return True
+
+        if self.failover:
+            return await self._serve_with_failover(request, proxy, writer, started)
+
+        self.balancer.acquire(proxy.name)
+        try:
+            try:
+                response = await self._open_upstream(proxy, request)
+            except _UpstreamError as e:
+                self.logger.warning(f"{request.method} {request.path} 转发失败: {e.message}")
+                request.status = e.status
+                await self._send_error(writer, e.status, e.error_type, e.message)
+                return True
+
+            pool = self._pool(proxy.base_url)
+            try:
+                keep_alive = await self._relay_response(request, response, writer)
+            finally:
+                pool.release(response.connection)
+        finally:
+            self.balancer.release(proxy.name)
+        self._log_request(request, proxy, response.status, started)
+        return keep_alive
+
+    def _log_request(
+        self, request: _ClientRequest, proxy: ProxyServer, status: int, started: float
+    ) -> None:
+        request.status = status
+        self.logger.info(
+            f"{request.method} {request.path} -> {proxy.name} {status} "
+            f"{(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+
+    def _failover_candidates(self, primary: ProxyServer) -> List[ProxyServer]:
+        """故障转移的候选代理：选中的代理及其启用的备用代理，按配置顺序"""
+        proxies = self.manager.config.proxies
+        candidates = [primary]
+        for name in self.manager.get_fallbacks(primary.name):
+            proxy = proxies.get(name)
+            if proxy is not None and proxy.is_active and all(c.name != name for c in candidates):
+                candidates.append(proxy)
+        return candidates
+
+    async def _serve_with_failover(
+        self,
+        request: _ClientRequest,
+        primary: ProxyServer,
+        writer: asyncio.StreamWriter,
+        started: float,
+    ) -> bool:
+        """转发一个请求，上游故障时依次在候选代理上重试，返回客户端连接能否继续使用
+
+        每次尝试从上一次失败的代理之后开始，跳过熔断的代理；没有更多尝试次数时，
+        最后一次尝试得到的上游响应原样转发给客户端。
+        """
+        candidates = self._failover_candidates(primary)
+        error: Optional[_UpstreamError] = None
+        index = 0
+        for attempt in range(self.max_attempts):
+            proxy = None
+            # 启用速率限制调度时先找有剩余容量的代理，都没有时再在可用的代理上排队
+            for require_capacity in (True, False) if self.limiter is not None else (False,):
+                for offset in range(len(candidates)):
+                    candidate = candidates[(index + offset) % len(candidates)]
+                    if require_capacity and not self.limiter.available(candidate.name):
+                        continue
+                    if self.breaker(candidate.name).allow():
+                        proxy, index = candidate, (index + offset) % len(candidates)
+                        break
+                if proxy is not None:
+                    break
+            if proxy is None:
+                break
+            if attempt:
+                await asyncio.sleep(backoff_delay(attempt - 1))
+                self.logger.warning(
+                    f"{request.method} {request.path} 改用代理 '{proxy.name}' 重试"
+                    f"（第 {attempt + 1} 次尝试）"
+                )
+
+            breaker = self.breaker(proxy.name)
+            last = attempt + 1 >= self.max_attempts
+            attempt_started = time.perf_counter()
+            self.balancer.acquire(proxy.name)
+            try:
+                try:
+                    response = await self._open_upstream(proxy, request)
+                except _UpstreamError as e:
+                    if e.status >= 500:
+                        breaker.record_failure()
+                    self.logger.warning(f"{request.method} {request.path} 转发失败: {e.message}")
+                    error = e
+                    self._record_failed_attempt(request, time.perf_counter() - attempt_started)
+                    if not e.retryable:
+                        break
+                    index += 1
+                    continue
+
+                pool = self._pool(proxy.base_url)
+                try:
+                    body: Optional[bytes] = None
+                    if response.status in RETRYABLE_STATUSES:
+                        breaker.record_failure()
+                        if not last:
+                            self.logger.warning(
+                                f"{request.method} {request.path} 代理 '{proxy.name}' "
+                                f"返回 {response.status}"
+                            )
+                            error = _UpstreamError(
+                                response.status,
+                                "api_error",
+                                f"代理 '{proxy.name}' 返回 {response.status}",
+                            )
+                            await self._discard(response)
+                            self._record_failed_attempt(
+                                request, time.perf_counter() - attempt_started
+                            )
+                            index += 1
+                            continue
+                    else:
+                        breaker.record_success()
+
+                    if response.has_body and not _is_event_stream(response):
+                        # 非流式响应先完整读取，上游中断时还可以重试
+                        try:
+                            body = await self._read_upstream(proxy, request, response)
+                        except _UpstreamError as e:
+                            breaker.record_failure()
+                            self.logger.warning(
+                                f"{request.method} {request.path} 转发失败: {e.message}"
+                            )
+                            error = e
+                            self._record_failed_attempt(
+                                request, time.perf_counter() - attempt_started
+                            )
+                            if not e.retryable:
+                                break
+                            index += 1
+                            continue
+
+                    keep_alive = await self._relay_response(request, response, writer, body)
+                finally:
+                    pool.release(response.connection)
+            finally:
+                # 请求被取消等情况下归还半开状态的试探名额
+                breaker.release()
+                self.balancer.release(proxy.name)
+
+            self._log_request(request, proxy, response.status, started)
+            return keep_alive
+
+        if error is None:
+            error = _UpstreamError(503, "api_error", "所有候选代理均已熔断，请稍后重试")
+        request.status = error.status
+        await self._send_error(writer, error.status, error.error_type, error.message)
+        return True
+
+    async def _discard(self, response: HTTPResponse) -> None:
+        """读取并丢弃上游响应体，出错时关闭连接"""
+        try:
+            async for _ in self._iter_upstream(response):
+                pass
+        except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError, HTTPProtocolError):
+            response.connection.close()
+
+    async def _read_upstream(
+        self, proxy: ProxyServer, request: _ClientRequest, response: HTTPResponse
+    ) -> bytes:
+        """读取完整的上游响应体
+
+        Raises:
+            _UpstreamError: 响应超时、中断或过大
+        """
+        chunks = []
+        size = 0
+        try:
+            async for chunk in self._iter_upstream(response):
+                size += len(chunk)
+                if size > MAX_REQUEST_BODY:
+                    response.connection.close()
+                    raise _UpstreamError(502, "api_error", f"代理 '{proxy.name}' 响应过大")
+                chunks.append(chunk)
+        except asyncio.TimeoutError:
+            response.connection.close()
+            raise _UpstreamError(
+                504,
+                "api_error",
+                f"代理 '{proxy.name}' 响应超时",
+                retryable=request.method in IDEMPOTENT_METHODS,
+            ) from None
+        except (OSError, asyncio.IncompleteReadError, HTTPProtocolError) as e:
+            # 上游已经收到并开始处理请求，只有幂等请求可以重试
+            response.connection.close()
+            raise _UpstreamError(
+                502,
+                "api_error",
+                f"代理 '{proxy.name}' 响应中断: {e or '连接被关闭'}",
+                retryable=request.method in IDEMPOTENT_METHODS,
+            ) from None
+        return b"".join(chunks)
+
+    def _upstream_request(
+        self, proxy: ProxyServer, request: _ClientRequest
+    ) -> Tuple[str, Headers, bytes]:
+        """构造发往上游的请求路径、请求头和请求体
+
+        请求的模型是某个代理配置的 bigmodel/smallmodel 时，替换为目标代理同类别的模型名称。
+        """
+        base_path = (urlsplit(proxy.base_url).path or "/").rstrip("/")
+        skip = hop_by_hop(request.headers) | _CLIENT_ONLY_HEADERS
+        headers = [(key, value) for key, value in request.headers if key.lower() not in skip]
+
+        body = request.body
+        if request.model is not None:
+            category = configured_class(request.model.model, self.manager.config.proxies.values())
+            model = class_model(proxy, category) if category else None
+            if model and model != request.model.model:
+                body = replace_model(body, request.model, model)
+        return base_path + request.path, headers + proxy_auth_headers(proxy), body
+
+    async def _open_upstream(self, proxy: ProxyServer, request: _ClientRequest) -> HTTPResponse:
+        """向上游发送请求并读取响应头，启用速率限制调度时先等待上游有剩余容量
+
+        Raises:
+            _UpstreamError: 排队超时、连接失败、超时或上游响应无效
+        """
+        request.upstream = proxy.name
+        target, headers, body = self._upstream_request(proxy, request)
+        if self.limiter is not None:
+            try:
+                waited = await self.limiter.acquire(
+                    proxy.name, request.session, estimate_tokens(body)
+                )
+            except asyncio.TimeoutError:
+                raise _UpstreamError(
+                    429,
+                    "rate_limit_error",
+                    f"代理 '{proxy.name}' 速率受限，排队超过 {self.limiter.max_wait:.0f} 秒",
+                ) from None
+            if waited >= 0.05:
+                self.logger.info(
+                    f"{request.method} {request.path} 等待代理 '{proxy.name}' 的速率限制 "
+                    f"{waited * 1000:.0f}ms"
+                )
+
+        pool = self._pool(proxy.base_url)
+        # 请求是否已经写入上游连接：写入之前（建立连接、TLS 握手、复用的连接已失效）的失败
+        # 上游没有收到请求，可以在其他代理上重试；写入之后只有幂等请求可以重试
+        sent = False
+        idempotent = request.method in IDEMPOTENT_METHODS
+
+        async def exchange() -> HTTPResponse:
+            nonlocal sent
+            while True:
+                connection = await pool.connect()
+                sent = True
+                try:
+                    return await pool.send(connection, request.method, target, headers, body)
+                except StaleConnectionError:
+                    sent = False
+
+        try:
+            response = await asyncio.wait_for(
+                exchange(), self.timeouts["connect"] + self.timeouts["read"]
+            )
+        except asyncio.TimeoutError:
+            raise _UpstreamError(
+                504,
+                "api_error",
+                f"代理 '{proxy.name}' 响应超时",
+                retryable=not sent or idempotent,
+            ) from None
+        except ssl.SSLError as e:
+            raise _UpstreamError(
+                502,
+                "api_error",
+                f"代理 '{proxy.name}' TLS握手失败: {e.reason or e}",
+                retryable=not sent or idempotent,
+            ) from None
+        except OSError as e:
+            message = f"无法连接代理 '{proxy.name}'" if not sent else f"代理 '{proxy.name}' 连接中断"
+            raise _UpstreamError(
+                502,
+                "api_error",
+                f"{message}: {e.strerror or e}",
+                retryable=not sent or idempotent,
+            ) from None
+        except (asyncio.IncompleteReadError, HTTPProtocolError) as e:
+            raise _UpstreamError(
+                502,
+                "api_error",
+                f"代理 '{proxy.name}' 响应无效: {e or '连接被关闭'}",
+                retryable=idempotent,
+            ) from None
+
+        if self.limiter is not None:
+            self.limiter.update(proxy.name, response.status, response.headers)
+        return response
+
+    async def _iter_upstream(self, response: HTTPResponse) -> AsyncIterator[bytes]:
+        """读取上游消息体，相邻两个数据块间隔超过 read 超时时中止"""
+        chunks = response.iter_bytes().__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), self.timeouts["read"])
+            except StopAsyncIteration:
+                return
+            yield chunk
+
+    async def _relay_response(
+        self,
+        request: _ClientRequest,
+        response: HTTPResponse,
+        writer: asyncio.StreamWriter,
+        body: Optional[bytes] = None,
+    ) -> bool:
+        """把上游响应逐块转发给客户端，返回客户端连接能否继续使用
+
+        body 不为None时表示已经完整读取的响应体，直接以 Content-Length 转发。
+        """
+        headers = [
+            (key, value)
+            for key, value in response.headers
+            if key.lower() not in hop_by_hop(response.headers)
+        ]
+        usage = None
+        if self.meter is not None and response.has_body:
+            usage = request.usage = UsageParser(
+                response.header("content-type"), response.header("content-encoding")
+            )
+        if body is not None:
+            if usage is not None:
+                usage.feed(body)
+                usage.finish()
+            headers = [(key, value) for key, value in headers if key.lower() != "content-length"]
+            headers.append(("Content-Length", str(len(body))))
+            writer.write(encode_head(f"HTTP/1.1 {response.status} {response.reason}", headers))
+            writer.write(body)
+            await writer.drain()
+            return True
+
+        keep_alive = True
+        chunked = False
+        if response.has_body and (
+            is_chunked(response.headers) or header_value(response.headers, "content-length") is None
+        ):
+            # 长度未知（SSE 流等）：HTTP/1.1 客户端使用 chunked 转发，否则以关闭连接结束
+            headers = [(key, value) for key, value in headers if key.lower() != "content-length"]
+            if request.version == "HTTP/1.1":
+                headers.append(("Transfer-Encoding", "chunked"))
+                chunked = True
+            else:
+                headers.append(("Connection", "close"))
+                keep_alive = False
+
+        writer.write(encode_head(f"HTTP/1.1 {response.status} {response.reason}", headers))
+        await writer.drain()
+
+        try:
+            async for chunk in self._iter_upstream(response):
+                if usage is not None:
+                    usage.feed(chunk)
+                writer.write(encode_chunk(chunk) if chunked else chunk)
+                await writer.drain()
+        except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError, HTTPProtocolError) as e:
+            # 响应头已经发出，只能中断客户端连接
+            if isinstance(e, ConnectionError) and writer.is_closing():
+                self.logger.debug(f"客户端在响应完成前断开: {e}")
+            else:
+                request.interrupted = True
+                self.logger.warning(f"{request.method} {request.path} 上游响应中断: {e}")
+            return False
+        if usage is not None:
+            usage.finish()
+
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        return keep_alive
+
+
+__all__ = [
+    "DEFAULT_SERVE_HOST",
+    "DEFAULT_SERVE_PORT",
+    "DEFAULT_UPSTREAM_TIMEOUTS",
+    "LOCAL_PROXY_SETTING_KEY",
+    "LocalProxyServer",
+    "METERING_FLUSH_INTERVAL",
+    "generate_local_token",
+    "local_proxy_url",
+]
@@ -0,0 +1,278 @@
+"""
+代理延迟历史
+
+每次连通性检查的结果（时间、状态、各阶段耗时）按代理保存在缓存目录下固定大小的环形缓冲文件中：
+
+- 文件头 32 字节：魔数、格式版本、记录大小、容量和累计写入次数；
+- 之后是 capacity 条定长记录（每条 36 字节），写满后从头覆盖最旧的记录。
+
+文件创建时即按容量分配（稀疏文件），之后大小不再增长。
+历史数据用于按延迟排序、百分位统计，以及在选择代理时复用近期的检查结果而无需重新检查。
+"""
+
+import logging
+import math
+import struct
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .checker import (
+    CHECK_AUTH_ERROR,
+    CHECK_CONNECT_ERROR,
+    CHECK_DNS_ERROR,
+    CHECK_HTTP_ERROR,
+    CHECK_OK,
+    CHECK_TLS_ERROR,
+)
+from .locking import ConfigLock
+from .utils import ensure_directory, get_cache_directory
+
+# 每个代理默认保留的记录数
+DEFAULT_HISTORY_CAPACITY = 4096
+
+HISTORY_MAGIC = b"CWLH"
+HISTORY_FORMAT_VERSION = 2
+
+# 文件头：魔数、版本、记录大小、容量、累计写入次数
+_HEADER = struct.Struct("<4sHHIQ12x")
+
+# 记录：时间戳、HTTP状态码、检查状态、DNS/连接/TLS/首字节/HTTP/总耗时（秒，缺失为NaN）
+_RECORD = struct.Struct("<dHBx6f")
+
+_PHASES = ("dns", "connect", "tls", "ttfb", "http")
+
+# 检查状态与记录中状态编号的对应关系
+_STATUS_CODES = {
+    CHECK_OK: 0,
+    CHECK_DNS_ERROR: 1,
+    CHECK_CONNECT_ERROR: 2,
+    CHECK_TLS_ERROR: 3,
+    CHECK_HTTP_ERROR: 4,
+    CHECK_AUTH_ERROR: 5,
+}
+_STATUS_NAMES = {code: status for status, code in _STATUS_CODES.items()}
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """计算百分位数（线性插值）
+
+    Args:
+        sorted_values: 已排序的数值
+        q: 百分位（0-100）
+
+    Returns:
+        Optional[float]: 百分位数，没有数据时返回None
+    """
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _optional(value: Optional[float]) -> float:
+    return float("nan") if value is None else value
+
+
+def _from_record(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class LatencyHistory:
+    """按代理保存检查结果的环形缓冲存储"""
+
+    def __init__(self, directory: Optional[Path] = None, capacity: int = DEFAULT_HISTORY_CAPACITY):
+        """初始化延迟历史
+
+        Args:
+            directory: 历史文件目录，为None时使用缓存目录下的 latency 目录
+            capacity: 新建历史文件时每个代理保留的记录数（已有文件沿用创建时的容量）
+        """
+        self.directory = directory or (get_cache_directory("claudewarp") / "latency")
+        self.capacity = max(1, capacity)
+        self.lock = ConfigLock(self.directory / "history", timeout=5.0)
+        self.logger = logging.getLogger(__name__)
+
+    def _path(self, name: str) -> Path:
+        """代理名称只包含字母、数字、下划线和横线，可以直接作为文件名"""
+        return self.directory / f"{name}.bin"
+
+    def _read_header(self, f: Any) -> Optional[Dict[str, int]]:
+        """读取并校验文件头，格式不符时返回None"""
+        f.seek(0)
+        data = f.read(_HEADER.size)
+        if len(data) != _HEADER.size:
+            return None
+        magic, version, record_size, capacity, written = _HEADER.unpack(data)
+        if (
+            magic != HISTORY_MAGIC
+            or version != HISTORY_FORMAT_VERSION
+            or record_size != _RECORD.size
+            or capacity == 0
+        ):
+            return None
+        return {"capacity": capacity, "written": written}
+
+    def _append(self, name: str, records: List[bytes]) -> None:
+        """追加记录到代理的历史文件（调用方需持有锁）"""
+        path = self._path(name)
+        mode = "r+b" if path.exists() else "w+b"
+        with open(path, mode) as f:
+            header = self._read_header(f)
+            if header is None:
+                # 新文件或无法识别的旧文件：按容量重新创建
+                header = {"capacity": self.capacity, "written": 0}
+                f.seek(0)
+                f.truncate(_HEADER.size + header["capacity"] * _RECORD.size)
+
+            capacity, written = header["capacity"], header["written"]
+            for record in records[-capacity:]:
+                f.seek(_HEADER.size + (written % capacity) * _RECORD.size)
+                f.write(record)
+                written += 1
+
+            f.seek(0)
+            f.write(
+                _HEADER.pack(HISTORY_MAGIC, HISTORY_FORMAT_VERSION, _RECORD.size, capacity, written)
+            )
+
+    def record(self, results: Iterable[Dict[str, Any]]) -> None:
+        """保存检查结果
+
+        Args:
+            results: ConnectivityChecker.check_proxy 返回的检查结果
+        """
+        grouped: Dict[str, List[bytes]] = {}
+        for result in results:
+            timings = result.get("timings", {})
+            try:
+                recorded_at = datetime.fromisoformat(result["timestamp"]).timestamp()
+            except (KeyError, TypeError, ValueError):
+                recorded_at = time.time()
+            grouped.setdefault(result["proxy_name"], []).append(
+                _RECORD.pack(
+                    recorded_at,
+                    result.get("http_status") or 0,
+                    _STATUS_CODES.get(result["status"], _STATUS_CODES[CHECK_HTTP_ERROR]),
+                    *(_optional(timings.get(phase)) for phase in _PHASES),
+                    _optional(result.get("latency")),
+                )
+            )
+        if not grouped:
+            return
+
+        ensure_directory(self.directory, mode=0o700)
+        with self.lock.hold():
+            for name, records in grouped.items():
+                self._append(name, records)
+
+    def samples(self, name: str, max_age: Optional[float] = None) -> List[Dict[str, Any]]:
+        """读取代理的历史记录
+
+        Args:
+            name: 代理名称
+            max_age: 只返回最近 max_age 秒内的记录，为None时返回全部
+
+        Returns:
+            List[Dict[str, Any]]: 按时间先后排列的记录，字段与检查结果一致
+            （proxy_name、status、message、http_status、latency、timings、timestamp）
+        """
+        try:
+            with open(self._path(name), "rb") as f:
+                header = self._read_header(f)
+                if header is None:
+                    return []
+                data = f.read(header["capacity"] * _RECORD.size)
+        except OSError:
+            return []
+
+        capacity, written = header["capacity"], header["written"]
+        count = min(written, capacity, len(data) // _RECORD.size)
+        records = list(_RECORD.iter_unpack(data[: count * _RECORD.size]))
+        if written > capacity:
+            start = written % capacity
+            records = records[start:] + records[:start]
+
+        cutoff = time.time() - max_age if max_age is not None else None
+        samples = []
+        for recorded_at, http_status, status_code, *values in records:
+            if cutoff is not None and recorded_at < cutoff:
+                continue
+            status = _STATUS_NAMES.get(status_code, CHECK_HTTP_ERROR)
+            samples.append(
+                {
+                    "proxy_name": name,
+                    "status": status,
+                    "message": f"HTTP {http_status}" if http_status else status,
+                    "http_status": http_status or None,
+                    "latency": _from_record(values[-1]),
+                    "timings": {
+                        phase: _from_record(value)
+                        for phase, value in zip(_PHASES, values)
+                        if not math.isnan(value)
+                    },
+                    "timestamp": datetime.fromtimestamp(recorded_at).isoformat(),
+                }
+            )
+        return samples
+
+    def summary(self, name: str, max_age: Optional[float] = None) -> Dict[str, Any]:
+        """统计代理的历史延迟
+
+        Args:
+            name: 代理名称
+            max_age: 只统计最近 max_age 秒内的记录
+
+        Returns:
+            Dict[str, Any]: samples（记录数）、successes、error_rate、成功检查的总耗时百分位
+            p50/p95/p99（秒）、各阶段耗时中位数 phases、last_status 和 last_checked（ISO格式）
+        """
+        samples = self.samples(name, max_age)
+        latencies = sorted(
+            sample["latency"]
+            for sample in samples
+            if sample["status"] == CHECK_OK and sample["latency"] is not None
+        )
+        phases = {}
+        for phase in _PHASES:
+            values = sorted(
+                sample["timings"][phase]
+                for sample in samples
+                if sample["status"] == CHECK_OK and phase in sample["timings"]
+            )
+            if values:
+                phases[phase] = percentile(values, 50)
+
+        successes = sum(1 for sample in samples if sample["status"] == CHECK_OK)
+        return {
+            "proxy_name": name,
+            "samples": len(samples),
+            "successes": successes,
+            "error_rate": 1 - successes / len(samples) if samples else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "phases": phases,
+            "last_status": samples[-1]["status"] if samples else None,
+            "last_checked": samples[-1]["timestamp"] if samples else None,
+        }
+
+    def remove(self, name: str) -> None:
+        """删除代理的历史记录"""
+        if not self.directory.is_dir():
+            return
+        with self.lock.hold():
+            try:
+                self._path(name).unlink()
+            except FileNotFoundError:
+                pass
+
+
+__all__ = [
+    "DEFAULT_HISTORY_CAPACITY",
+    "LatencyHistory",
+    "percentile",
+]
@@ -0,0 +1,216 @@
+"""
+代理批量导入
+
+从CSV、JSON、JSON Lines或TOML文件中逐条读取代理记录，统一转换为
+ProxyServer可接受的字段字典，供ProxyManager.import_proxies分块验证和一次性提交。
+"""
+
+import csv
+import io
+import json
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, Optional, Tuple
+
+from .exceptions import ImportError as ProxyImportError
+
+# 支持的导入格式
+IMPORT_FORMATS = ("csv", "json", "jsonl", "toml")
+
+# 文件扩展名到导入格式的映射
+_SUFFIX_FORMATS = {
+    ".csv": "csv",
+    ".json": "json",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".toml": "toml",
+}
+
+# 可导入的代理字段（与ProxyServer字段对应）
+IMPORT_FIELDS = (
+    "name",
+    "base_url",
+    "api_key",
+    "auth_token",
+    "description",
+    "tags",
+    "is_active",
+    "bigmodel",
+    "smallmodel",
+    "created_at",
+)
+
+# 为空字符串时视为未设置的可选字段
+_OPTIONAL_FIELDS = ("api_key", "auth_token", "bigmodel", "smallmodel", "created_at")
+
+_TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+_FALSE_VALUES = {"0", "false", "no", "n", "off", ""}
+
+
+def detect_import_format(path: Optional[Path]) -> str:
+    """根据文件扩展名推断导入格式
+
+    Args:
+        path: 导入文件路径
+
+    Returns:
+        str: 导入格式
+
+    Raises:
+        ImportError: 无法推断格式
+    """
+    fmt = _SUFFIX_FORMATS.get(path.suffix.lower()) if path is not None else None
+    if fmt is None:
+        raise ProxyImportError(
+            f"无法识别导入文件格式，请使用 --format 指定: {', '.join(IMPORT_FORMATS)}",
+            source=str(path) if path is not None else None,
+        )
+    return fmt
+
+
+def normalize_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """将一条原始记录转换为ProxyServer字段字典
+
+    CSV等文本格式中的标签可使用逗号或分号分隔，布尔值接受true/false、yes/no、1/0。
+    未知字段会被忽略。
+
+    Args:
+        record: 原始记录
+
+    Returns:
+        Dict[str, Any]: 规范化后的字段字典
+
+    Raises:
+        ValueError: 字段值无法转换
+    """
+    data = {key: record[key] for key in IMPORT_FIELDS if key in record}
+
+    for key in _OPTIONAL_FIELDS:
+        if isinstance(data.get(key), str) and not data[key].strip():
+            data[key] = None
+
+    if data.get("description") is None:
+        data.pop("description", None)
+
+    tags = data.get("tags")
+    if tags is None:
+        data.pop("tags", None)
+    elif isinstance(tags, str):
+        data["tags"] = [t.strip() for t in tags.replace(";", ",").split(",") if t.strip()]
+
+    is_active = data.get("is_active")
+    if isinstance(is_active, str):
+        value = is_active.strip().lower()
+        if value in _TRUE_VALUES:
+            data["is_active"] = True
+        elif value in _FALSE_VALUES:
+            data["is_active"] = False
+        else:
+            raise ValueError(f"is_active 的值无效: {is_active}")
+
+    return data
+
+
+def _iter_document_proxies(data: Any) -> Iterator[Dict[str, Any]]:
+    """从整份文档中取出代理记录
+
+    支持代理列表、``{"proxies": [...]}``，以及配置文件格式的 ``{"proxies": {名称: {...}}}``。
+    """
+    if isinstance(data, dict):
+        data = data.get("proxies", [])
+
+    if isinstance(data, dict):
+        for name, proxy in data.items():
+            if isinstance(proxy, dict):
+                proxy.setdefault("name", name)
+            yield proxy
+    elif isinstance(data, list):
+        yield from data
+    else:
+        raise ProxyImportError("导入文件中没有找到代理列表")
+
+
+def iter_import_records(
+    stream: IO[str], fmt: str, source: Optional[str] = None
+) -> Iterator[Tuple[int, Any]]:
+    """逐条读取导入记录
+
+    CSV和JSON Lines逐行流式读取；JSON和TOML需要整份解析后再逐条产出。
+
+    Args:
+        stream: 文本输入流
+        fmt: 导入格式
+        source: 来源名称，用于错误信息
+
+    Yields:
+        Tuple[int, Any]: (记录位置, 原始记录)，CSV和JSON Lines为行号，其他格式为序号
+
+    Raises:
+        ImportError: 格式不支持或文件无法解析
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        if not reader.fieldnames or "name" not in reader.fieldnames:
+            raise ProxyImportError("CSV文件缺少表头或 name 列", source=source)
+        for row in reader:
+            if not any(value for value in row.values() if isinstance(value, str)):
+                continue
+            yield reader.line_num, {k: v for k, v in row.items() if k is not None}
+
+    elif fmt == "jsonl":
+        for lineno, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield lineno, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield lineno, e
+
+    elif fmt in ("json", "toml"):
+        try:
+            if fmt == "json":
+                data = json.load(stream)
+            else:
+                import toml
+
+                data = toml.load(stream)
+        except (ValueError, TypeError) as e:
+            raise ProxyImportError(f"解析导入文件失败: {e}", source=source) from None
+
+        for index, proxy in enumerate(_iter_document_proxies(data), start=1):
+            yield index, proxy
+
+    else:
+        raise ProxyImportError(
+            f"不支持的导入格式: {fmt}。支持的格式: {', '.join(IMPORT_FORMATS)}", source=source
+        )
+
+
+def open_import_source(path: Optional[str]) -> IO[str]:
+    """打开导入来源，None或"-"表示标准输入
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        IO[str]: 文本输入流
+    """
+    if path is None or path == "-":
+        import sys
+
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="")
+
+    try:
+        return open(path, "r", encoding="utf-8-sig", newline="")
+    except OSError as e:
+        raise ProxyImportError(f"无法打开导入文件: {e}", source=path) from None
+
+
+__all__ = [
+    "IMPORT_FORMATS",
+    "IMPORT_FIELDS",
+    "detect_import_format",
+    "normalize_record",
+    "iter_import_records",
+    "open_import_source",
+]
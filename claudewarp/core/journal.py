@@ -0,0 +1,273 @@
+"""
+配置变更日志
+
+为文档型配置文件（TOML/JSON）提供追加写入的预写日志（write-ahead journal）。
+每次变更只向日志追加一条记录并fsync，加载时在基础配置上重放，
+日志达到大小或时间阈值后再压缩合并回基础配置文件。
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .exceptions import ConfigFileCorruptedError
+from .utils import (
+    DURABILITY_GROUP,
+    DURABILITY_RELAXED,
+    DURABILITY_STRICT,
+    fsync_directory,
+    resolve_durability,
+)
+
+# 日志格式版本
+JOURNAL_FORMAT_VERSION = 1
+
+# 默认压缩阈值：日志文件大小（字节）
+DEFAULT_JOURNAL_MAX_BYTES = 256 * 1024
+
+# 默认压缩阈值：日志创建后的最长保留时间（秒）
+DEFAULT_JOURNAL_MAX_AGE = 24 * 60 * 60
+
+
+def hash_content(raw: bytes) -> str:
+    """计算内容哈希，用于标识日志对应的基础配置文件"""
+    return hashlib.sha256(raw).hexdigest()
+
+
+class ConfigJournal:
+    """配置变更日志
+
+    日志为JSON Lines格式：第一行是记录基础配置文件哈希的文件头，
+    之后每行是一次变更，包含变更的代理完整数据、删除的代理名称和全局字段。
+    所有记录都是幂等的赋值操作，重复重放不会改变结果。
+    """
+
+    def __init__(self, config_path: Path, durability: Optional[str] = None):
+        """初始化变更日志
+
+        Args:
+            config_path: 基础配置文件路径，日志文件与其放在同一目录
+            durability: 追加记录的持久化级别，relaxed时不fsync
+        """
+        self.config_path = config_path
+        self.path = config_path.with_name(config_path.name + ".journal")
+        self.durability = resolve_durability(durability)
+        self.logger = logging.getLogger(__name__)
+
+    def exists(self) -> bool:
+        """日志文件是否存在"""
+        return self.path.exists()
+
+    def read_bytes(self) -> bytes:
+        """读取日志原始内容，日志不存在时返回空字节串"""
+        try:
+            return self.path.read_bytes()
+        except FileNotFoundError:
+            return b""
+
+    def read_header(self) -> Optional[Dict[str, Any]]:
+        """只读取日志文件头
+
+        Returns:
+            Optional[Dict[str, Any]]: 文件头，日志不存在或文件头损坏时返回None
+        """
+        try:
+            with open(self.path, "rb") as f:
+                return json.loads(f.readline().decode("utf-8"))
+        except (OSError, ValueError, UnicodeDecodeError):
+            return None
+
+    def parse(self, raw: bytes) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """解析日志内容
+
+        末尾不完整的记录（写入过程中崩溃）会被忽略。
+
+        Args:
+            raw: 日志原始内容
+
+        Returns:
+            Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]: 文件头和变更记录列表
+
+        Raises:
+            ConfigFileCorruptedError: 日志中间的记录损坏
+        """
+        if not raw:
+            return None, []
+
+        lines = raw.split(b"\n")
+        header: Optional[Dict[str, Any]] = None
+        records: List[Dict[str, Any]] = []
+
+        for index, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line.decode("utf-8"))
+            except (ValueError, UnicodeDecodeError) as e:
+                is_last = all(not rest.strip() for rest in lines[index + 1 :])
+                if is_last:
+                    self.logger.warning(f"忽略变更日志末尾不完整的记录: {self.path}")
+                    break
+                raise ConfigFileCorruptedError(str(self.path), str(e)) from None
+
+            if header is None:
+                if entry.get("journal") != JOURNAL_FORMAT_VERSION:
+                    raise ConfigFileCorruptedError(str(self.path), "变更日志文件头无效")
+                header = entry
+            else:
+                records.append(entry)
+
+        return header, records
+
+    def append(self, record: Dict[str, Any], base_hash: str) -> int:
+        """追加一条变更记录并同步到磁盘
+
+        日志不存在时先写入文件头，记录基础配置文件的内容哈希。
+
+        Args:
+            record: 变更记录
+            base_hash: 当前基础配置文件的内容哈希
+
+        Returns:
+            int: 追加后日志文件的大小（字节）
+        """
+        lines = []
+        created = not self.path.exists()
+        if created:
+            header = {
+                "journal": JOURNAL_FORMAT_VERSION,
+                "base": base_hash,
+                "created_at": datetime.now().isoformat(),
+            }
+            lines.append(json.dumps(header, ensure_ascii=False))
+        lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            os.write(fd, data)
+            if self.durability != DURABILITY_RELAXED:
+                os.fsync(fd)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+
+        # 新建的日志文件还需要持久化目录项
+        if created and self.durability in (DURABILITY_STRICT, DURABILITY_GROUP):
+            fsync_directory(self.path.parent)
+        return size
+
+    def discard(self) -> bool:
+        """删除日志文件（压缩完成或基础配置被整体替换后调用）
+
+        Returns:
+            bool: 是否删除了日志文件
+        """
+        try:
+            self.path.unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def set_aside(self) -> Optional[Path]:
+        """将无法对应基础配置的日志改名保留，便于人工恢复
+
+        Returns:
+            Optional[Path]: 改名后的路径，失败返回None
+        """
+        target = self.path.with_name(
+            f"{self.path.name}.orphaned.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        )
+        try:
+            self.path.replace(target)
+            return target
+        except OSError:
+            return None
+
+    def needs_compaction(
+        self, size: int, header: Optional[Dict[str, Any]], max_bytes: int, max_age: float
+    ) -> bool:
+        """判断日志是否达到压缩阈值
+
+        Args:
+            size: 日志文件大小
+            header: 日志文件头
+            max_bytes: 大小阈值
+            max_age: 时间阈值（秒）
+
+        Returns:
+            bool: 是否需要压缩
+        """
+        if size >= max_bytes:
+            return True
+
+        if header and header.get("created_at"):
+            try:
+                created_at = datetime.fromisoformat(header["created_at"])
+            except ValueError:
+                return True
+            return (datetime.now() - created_at).total_seconds() >= max_age
+
+        return False
+
+
+def make_journal_record(
+    data: Dict[str, Any], changed: Iterable[str] = (), removed: Iterable[str] = ()
+) -> Dict[str, Any]:
+    """根据完整配置数据生成一条变更记录
+
+    Args:
+        data: 完整配置数据
+        changed: 新增或修改的代理名称
+        removed: 删除的代理名称
+
+    Returns:
+        Dict[str, Any]: 变更记录
+    """
+    proxies = data.get("proxies", {})
+    return {
+        "ts": datetime.now().isoformat(),
+        "removed": list(removed),
+        "changed": {name: proxies[name] for name in changed if name in proxies},
+        "meta": {key: value for key, value in data.items() if key != "proxies"},
+    }
+
+
+def apply_journal_records(
+    data: Dict[str, Any], records: Iterable[Dict[str, Any]], until: Optional[str] = None
+) -> Dict[str, Any]:
+    """在基础配置数据上重放变更记录
+
+    Args:
+        data: 基础配置数据（会被原地修改）
+        records: 变更记录
+        until: 只重放时间戳不晚于该值（ISO格式）的记录，用于按时间点恢复
+
+    Returns:
+        Dict[str, Any]: 重放后的配置数据
+    """
+    proxies = data.setdefault("proxies", {})
+    for record in records:
+        if until is not None and record.get("ts", "") > until:
+            break
+        for name in record.get("removed", []):
+            proxies.pop(name, None)
+        for name, proxy in record.get("changed", {}).items():
+            proxies[name] = proxy
+        data.update(record.get("meta", {}))
+    return data
+
+
+__all__ = [
+    "ConfigJournal",
+    "JOURNAL_FORMAT_VERSION",
+    "DEFAULT_JOURNAL_MAX_BYTES",
+    "DEFAULT_JOURNAL_MAX_AGE",
+    "hash_content",
+    "make_journal_record",
+    "apply_journal_records",
+]
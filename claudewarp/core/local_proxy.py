@@ -0,0 +1,38 @@
+"""
+本地转发设置
+
+启用本地转发后，Claude Code 配置指向本地转发代理（见 forwarder 模块）。
+这里只包含切换代理、同步 Claude Code 配置时需要的设置项和地址计算，
+不依赖 asyncio/ssl，'cw use' 等命令导入时保持轻量。
+"""
+
+import secrets
+from typing import Any, Dict
+
+# 配置项中保存本地转发设置（host、port、token）的键
+LOCAL_PROXY_SETTING_KEY = "local_proxy"
+
+DEFAULT_SERVE_HOST = "127.0.0.1"
+DEFAULT_SERVE_PORT = 8787
+
+
+def generate_local_token() -> str:
+    """生成本地转发使用的令牌"""
+    return f"cw-local-{secrets.token_urlsafe(24)}"
+
+
+def local_proxy_url(settings: Dict[str, Any]) -> str:
+    """本地转发设置对应的 ANTHROPIC_BASE_URL"""
+    host = settings.get("host") or DEFAULT_SERVE_HOST
+    if ":" in host:
+        host = f"[{host}]"
+    return f"http://{host}:{settings.get('port') or DEFAULT_SERVE_PORT}/"
+
+
+__all__ = [
+    "DEFAULT_SERVE_HOST",
+    "DEFAULT_SERVE_PORT",
+    "LOCAL_PROXY_SETTING_KEY",
+    "generate_local_token",
+    "local_proxy_url",
+]
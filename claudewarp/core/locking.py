@@ -0,0 +1,136 @@
+"""
+配置文件跨进程锁
+
+使用与配置文件同目录的 `<配置文件名>.lock` 作为咨询锁（advisory lock）：
+POSIX 平台使用 fcntl.flock，Windows 使用 msvcrt.locking。
+只有修改配置的操作需要持有锁，读取配置不加锁，依赖原子替换保证读到完整的文件。
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from .exceptions import ConfigLockTimeoutError
+from .utils import is_windows
+
+# 默认等待锁的超时时间（秒）
+DEFAULT_LOCK_TIMEOUT = 30.0
+
+# 等待锁时的轮询间隔（秒）
+LOCK_POLL_INTERVAL = 0.01
+
+
+class ConfigLock:
+    """配置文件的跨进程互斥锁
+
+    同一个实例可重入：同一线程内嵌套获取只在最外层真正加锁和解锁。
+    """
+
+    def __init__(self, config_path: Path, timeout: float = DEFAULT_LOCK_TIMEOUT):
+        """初始化配置锁
+
+        Args:
+            config_path: 被保护的配置文件路径
+            timeout: 等待锁的超时时间（秒）
+        """
+        self.path = config_path.with_name(config_path.name + ".lock")
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__)
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    @property
+    def is_held(self) -> bool:
+        """当前实例是否持有锁"""
+        return self._depth > 0
+
+    def _try_lock(self, fd: int) -> bool:
+        """尝试以非阻塞方式加锁"""
+        try:
+            if is_windows():
+                import msvcrt
+
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(self, fd: int) -> None:
+        """释放文件锁"""
+        if is_windows():
+            import msvcrt
+
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def acquire(self) -> None:
+        """获取锁
+
+        Raises:
+            ConfigLockTimeoutError: 超时仍未获得锁
+        """
+        if not self._thread_lock.acquire(timeout=self.timeout):
+            raise ConfigLockTimeoutError(str(self.path), self.timeout)
+
+        if self._depth > 0:
+            self._depth += 1
+            return
+
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            deadline = time.monotonic() + self.timeout
+            while not self._try_lock(fd):
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise ConfigLockTimeoutError(str(self.path), self.timeout)
+                time.sleep(LOCK_POLL_INTERVAL)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+        self._fd = fd
+        self._depth = 1
+        self.logger.debug(f"已获取配置锁: {self.path}")
+
+    def release(self) -> None:
+        """释放锁"""
+        if self._depth == 0:
+            return
+
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            try:
+                self._unlock(self._fd)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+            self.logger.debug(f"已释放配置锁: {self.path}")
+        self._thread_lock.release()
+
+    @contextmanager
+    def hold(self) -> Iterator["ConfigLock"]:
+        """在上下文中持有锁"""
+        self.acquire()
+        try:
+            yield self
+        finally:
+            self.release()
+
+
+__all__ = [
+    "ConfigLock",
+    "DEFAULT_LOCK_TIMEOUT",
+]
@@ -5,36 +5,134 @@
 负责协调ConfigManager、数据模型和异常处理。
 """
 
+import functools
 import logging
-import json
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
+from .balancer import (
+    BALANCE_STRATEGIES,
+    POOL_WEIGHTS_SETTING_KEY,
+    STRATEGY_ROUND_ROBIN,
+)
+from .claude_settings import MANAGED_ENV_KEYS, ClaudeSettingsFile
 from .config import ConfigManager
 from .exceptions import (
+    ConfigConflictError,
     ConfigError,
     DuplicateProxyError,
     ExportError,
+    ImportError as ProxyImportError,
+    NetworkError,
     OperationError,
     ProxyNotFoundError,
     ValidationError,
 )
+from .failover import DEFAULT_MAX_ATTEMPTS, FALLBACKS_SETTING_KEY
+from .local_proxy import (
+    DEFAULT_SERVE_HOST,
+    DEFAULT_SERVE_PORT,
+    LOCAL_PROXY_SETTING_KEY,
+    generate_local_token,
+    local_proxy_url,
+)
 from .models import ExportFormat, ProxyConfig, ProxyServer
+from .router import MODEL_CLASSES, MODEL_ROUTES_SETTING_KEY
+from .utils import fsync_group, resolve_durability
+
+# 检查、性能测试、转发和统计等模块依赖 asyncio/ssl/concurrent.futures，
+# 在使用它们的方法中才导入，'cw current'、'cw use' 等命令不加载这些模块
+if TYPE_CHECKING:
+    from .forwarder import LocalProxyServer
+    from .history import LatencyHistory
+    from .metering import UsageStore
+    from .watcher import ConfigWatcher
+
+# 内置代理名称（保留名称），名称检查无需构造模型对象
+BUILTIN_PROXY_NAMES = frozenset({"no"})
+
+# 导入冲突处理策略
+IMPORT_CONFLICT_POLICIES = ("fail", "skip", "upsert")
+
+# 保存时发现配置已被其他进程修改后，基于最新配置重试的最大次数
+MAX_CONFLICT_RETRIES = 5
+
+
+@lru_cache(maxsize=None)
+def get_builtin_proxies() -> Dict[str, ProxyServer]:
+    """获取内置代理配置
+
+    内置代理在首次使用时才构造，避免每次导入模块都进行一次模型验证。
+
+    Returns:
+        Dict[str, ProxyServer]: 内置代理字典
+    """
+    return {
+        "no": ProxyServer(
+            name="no",
+            base_url="http://localhost/",
+            api_key="原生API",
+            description="清空所有代理配置",
+            tags=["原生"],
+            is_active=True,
+            bigmodel=None,
+            smallmodel=None,
+            auth_token=None,
+        )
+    }
 
-# 内置代理配置
-BUILTIN_PROXIES = {
-    "no": ProxyServer(
-        name="no",
-        base_url="http://localhost/",
-        api_key="原生API",
-        description="清空所有代理配置",
-        tags=["原生"],
-        is_active=True,
-        bigmodel=None,
-        smallmodel=None,
-        auth_token=None,
-    )
-}
+
+def _format_validation_error(error: ValueError) -> str:
+    """将数据验证错误格式化为单行消息"""
+    if hasattr(error, "errors"):
+        messages = []
+        for item in error.errors():
+            loc = ".".join(str(part) for part in item.get("loc", ()))
+            messages.append(f"{loc}: {item['msg']}" if loc else item["msg"])
+        return "; ".join(messages)
+    return str(error)
+
+
+def _locked_mutation(method: Callable) -> Callable:
+    """修改配置的方法装饰器
+
+    在跨进程配置锁内执行：先在锁内检查配置是否已被其他进程修改并按需重新加载，
+    再执行修改和保存；保存时仍检测到修订号冲突则基于最新配置重试。
+    事务中的调用已持有锁，直接执行。
+    """
+
+    @functools.wraps(method)
+    def wrapper(self: "ProxyManager", *args: Any, **kwargs: Any) -> Any:
+        if self._transaction is not None:
+            return method(self, *args, **kwargs)
+
+        for attempt in range(1, MAX_CONFLICT_RETRIES + 1):
+            with self.config_manager.lock.hold():
+                self._refresh_if_changed()
+                try:
+                    return method(self, *args, **kwargs)
+                except ConfigConflictError:
+                    # 丢弃基于旧配置的修改，下次重试前重新加载
+                    self._config = None
+                    if attempt == MAX_CONFLICT_RETRIES:
+                        raise
+                    self.logger.info(f"配置已被其他进程修改，重试 {method.__name__}（第 {attempt} 次）")
+
+    return wrapper
 
 
 class ProxyManager:
@@ -45,7 +143,13 @@ class ProxyManager:
     """
 
     def __init__(
-        self, config_path: Optional[Path] = None, auto_backup: bool = True, max_backups: int = 5
+        self,
+        config_path: Optional[Path] = None,
+        auto_backup: bool = True,
+        max_backups: int = 5,
+        storage: Optional[str] = None,
+        durability: Optional[str] = None,
+        claude_code_durability: Optional[str] = None,
     ):
         """初始化代理管理器
 
@@ -53,12 +157,34 @@ class ProxyManager:
             config_path: 配置文件路径，为None时使用默认路径
             auto_backup: 是否自动备份配置文件
             max_backups: 最大备份数量
+            storage: 存储后端名称（toml、json、sqlite），为None时根据文件扩展名推断
+            durability: 配置文件的持久化级别（strict、standard、relaxed、group）
+            claude_code_durability: 写入 Claude Code settings.json 的持久化级别，为None时与配置文件相同
         """
         self.config_manager = ConfigManager(
-            config_path=config_path, auto_backup=auto_backup, max_backups=max_backups
+            config_path=config_path,
+            auto_backup=auto_backup,
+            max_backups=max_backups,
+            storage=storage,
+            durability=durability,
+        )
+        self.claude_code_durability = resolve_durability(
+            claude_code_durability or self.config_manager.durability
         )
         self.logger = logging.getLogger(__name__)
 
+        # 进行中的事务状态，为None表示不在事务中
+        self._transaction: Optional[Dict[str, Any]] = None
+
+        # Claude Code settings.json，首次应用配置时创建
+        self._claude_settings: Optional[ClaudeSettingsFile] = None
+
+        # 代理延迟历史，首次使用时创建
+        self._latency_history: Optional["LatencyHistory"] = None
+
+        # 本地转发的用量统计，首次使用时创建
+        self._usage_store: Optional["UsageStore"] = None
+
         # 加载配置
         self._config = None
         self._load_config()
@@ -83,21 +209,139 @@ class ProxyManager:
             self.logger.error(f"加载配置失败: {e}")
             raise ConfigError(f"初始化代理管理器失败: {e}") from None
 
-    def _save_config(self) -> None:
+    def _save_config(
+        self, changed: Optional[List[str]] = None, removed: Optional[List[str]] = None
+    ) -> None:
         """保存配置文件
 
+        Args:
+            changed: 新增或修改的代理名称，支持增量写入的存储后端只写入这些代理
+            removed: 删除的代理名称
+
         Raises:
             ConfigError: 配置保存失败
         """
+        # 事务中只记录变更范围，提交时统一保存
+        if self._transaction is not None:
+            if changed is None and removed is None:
+                self._transaction["full"] = True
+            self._transaction["changed"].update(dict.fromkeys(changed or []))
+            self._transaction["removed"].update(dict.fromkeys(removed or []))
+            self._transaction["dirty"] = True
+            return
+
         try:
-            success = self.config_manager.save_config(self.config)
+            success = self.config_manager.save_config(
+                self.config, changed_proxies=changed, removed_proxies=removed
+            )
             if not success:
                 raise ConfigError("保存配置文件失败")
             self.logger.debug("配置已保存")
+        except ConfigConflictError:
+            raise
         except Exception as e:
             self.logger.error(f"保存配置失败: {e}")
             raise ConfigError(f"保存配置失败: {e}") from None
 
+    def _refresh_if_changed(self) -> None:
+        """配置已被其他进程修改时重新加载（调用方需持有配置锁）"""
+        if self._config is None or self.config_manager.has_external_changes():
+            self.logger.debug("配置文件已变化，重新加载")
+            self._load_config()
+
+    @contextmanager
+    def transaction(self) -> Iterator["ProxyManager"]:
+        """批量修改事务
+
+        事务内的修改只作用于内存中的配置，退出时统一进行一次验证、一次备份和一次原子写入，
+        并只应用一次 Claude Code 配置和同步目标；事务内抛出异常时全部回滚。嵌套调用会并入外层事务。
+        事务期间持有跨进程配置锁，事务开始时若配置已被其他进程修改会先重新加载。
+
+        Example:
+            with manager.transaction():
+                manager.remove_proxy("old")
+                manager.add_proxy("new", "https://new.example.com/", "sk-xxx")
+                manager.switch_proxy("new")
+
+        Yields:
+            ProxyManager: 当前代理管理器
+
+        Raises:
+            ConfigError: 提交失败（此时配置已回滚）
+        """
+        if self._transaction is not None:
+            yield self
+            return
+
+        # 事务全程持有配置锁，在最新的配置上修改，提交前其他进程无法写入
+        with self.config_manager.lock.hold():
+            self._refresh_if_changed()
+
+            original = self.config.model_copy(deep=True)
+            self._transaction = {
+                "changed": {},
+                "removed": {},
+                "full": False,
+                "dirty": False,
+                "claude_code": None,
+                "targets": None,
+            }
+
+            try:
+                yield self
+            except BaseException:
+                self._transaction = None
+                self._config = original
+                self.logger.info("事务已回滚")
+                raise
+
+            pending = self._transaction
+            self._transaction = None
+
+            # 持久化级别为group时，配置文件和 Claude Code 配置的目录fsync在提交结束时合并执行
+            with fsync_group():
+                if pending["dirty"]:
+                    try:
+                        if pending["full"]:
+                            self._save_config()
+                        else:
+                            self._save_config(
+                                changed=list(pending["changed"]), removed=list(pending["removed"])
+                            )
+                    except Exception:
+                        self._config = original
+                        self.logger.info("事务提交失败，已回滚")
+                        raise
+
+                if pending["claude_code"] is not None:
+                    self._sync_claude_code(pending["claude_code"])
+                if pending["targets"] is not None:
+                    self._sync_targets_after_commit(*pending["targets"])
+
+    def _sync_claude_code(self, proxy_name: str) -> None:
+        """将切换结果同步到 Claude Code 配置
+
+        事务中只记录最后一次切换，提交后再写入 settings.json。
+
+        Args:
+            proxy_name: 切换到的代理名称，"no" 表示清空代理配置
+        """
+        if self._transaction is not None:
+            self._transaction["claude_code"] = proxy_name
+            return
+
+        try:
+            if proxy_name == "no":
+                self._clear_claude_code_config()
+                self.logger.info("已清空 Claude Code 代理配置")
+            else:
+                self.apply_claude_code_setting(proxy_name)
+                self.logger.info(f"已自动应用代理 '{proxy_name}' 到 Claude Code")
+        except Exception as e:
+            # 不影响代理切换的主要功能，只记录警告
+            self.logger.warning(f"应用代理到 Claude Code 失败: {e}")
+
+    @_locked_mutation
     def add_proxy(
         self,
         name: str,
@@ -134,7 +378,7 @@ class ProxyManager:
             ConfigError: 配置操作失败
         """
         # 检查是否为保留名称
-        if name in BUILTIN_PROXIES:
+        if name in BUILTIN_PROXY_NAMES:
             raise ValidationError(f"'{name}' 是保留名称，不能用作代理名称")
         
         # 检查重复
@@ -163,7 +407,7 @@ class ProxyManager:
                 self.config.set_current_proxy(name)
 
             # 保存配置
-            self._save_config()
+            self._save_config(changed=[name])
 
             self.logger.info(f"已添加代理服务器: {name}")
             return proxy
@@ -171,12 +415,15 @@ class ProxyManager:
         except ValueError as e:
             # Pydantic验证错误
             raise ValidationError(f"代理服务器数据验证失败: {e}") from None
+        except ConfigConflictError:
+            raise
         except Exception as e:
             self.logger.error(f"添加代理服务器失败: {e}")
             raise OperationError(
                 f"添加代理服务器失败: {e}", operation="add_proxy", target=name
             ) from None
 
+    @_locked_mutation
     def remove_proxy(self, name: str) -> bool:
         """删除代理服务器
 
@@ -199,16 +446,20 @@ class ProxyManager:
 
             if success:
                 # 保存配置
-                self._save_config()
+                self._save_config(removed=[name])
+                self._remove_latency_history(name)
                 self.logger.info(f"已删除代理服务器: {name}")
                 return True
             else:
                 raise OperationError("删除代理服务器失败", operation="remove_proxy", target=name)
 
+        except ConfigConflictError:
+            raise
         except Exception as e:
             self.logger.error(f"删除代理服务器失败: {e}")
             raise ConfigError(f"删除代理服务器失败: {e}") from None
 
+    @_locked_mutation
     def switch_proxy(self, name: str) -> ProxyServer:
         """切换当前代理服务器
 
@@ -224,22 +475,27 @@ class ProxyManager:
             ConfigError: 配置操作失败
         """
         # 处理内置代理
-        if name in BUILTIN_PROXIES:
-            proxy = BUILTIN_PROXIES[name]
+        if name in BUILTIN_PROXY_NAMES:
+            proxy = get_builtin_proxies()[name]
             
             # 特殊处理 "no" 代理
             if name == "no":
                 try:
                     # 清空当前代理设置
                     self.config.current_proxy = None
-                    self._save_config()
+                    self._save_config(changed=[])
                     self.logger.info("已清除当前代理设置")
-                    
+
                     # 清空 Claude Code 配置
-                    self._clear_claude_code_config()
-                    self.logger.info("已清空 Claude Code 代理配置")
-                    
+                    if self._transaction is not None:
+                        self._transaction["claude_code"] = name
+                    else:
+                        self._clear_claude_code_config()
+                        self.logger.info("已清空 Claude Code 代理配置")
+
                     return proxy
+                except ConfigConflictError:
+                    raise
                 except Exception as e:
                     self.logger.error(f"切换到 'no' 代理失败: {e}")
                     raise ConfigError(f"切换到 'no' 代理失败: {e}") from None
@@ -248,36 +504,37 @@ class ProxyManager:
             
         # 处理用户自定义代理
         if name not in self.config.proxies:
-            if name not in BUILTIN_PROXIES:
+            if name not in BUILTIN_PROXY_NAMES:
                 raise ProxyNotFoundError(name)
 
-        proxy = self.config.proxies[name] if name not in BUILTIN_PROXIES else BUILTIN_PROXIES[name]
+        proxy = (
+            self.config.proxies[name]
+            if name not in BUILTIN_PROXY_NAMES
+            else get_builtin_proxies()[name]
+        )
 
         # 检查代理是否启用（内置代理默认启用）
-        if not proxy.is_active and name not in BUILTIN_PROXIES:
+        if not proxy.is_active and name not in BUILTIN_PROXY_NAMES:
             raise ValidationError(f"代理服务器 '{name}' 未启用，无法切换")
 
         try:
             # 设置当前代理（内置代理不保存到配置中）
-            if name not in BUILTIN_PROXIES:
+            if name not in BUILTIN_PROXY_NAMES:
                 success = self.config.set_current_proxy(name)
                 if success:
                     # 保存配置
-                    self._save_config()
+                    self._save_config(changed=[])
                     self.logger.info(f"已切换到代理服务器: {name}")
 
                     # 自动应用到 Claude Code
-                    try:
-                        self.apply_claude_code_setting(name)
-                        self.logger.info(f"已自动应用代理 '{name}' 到 Claude Code")
-                    except Exception as e:
-                        self.logger.warning(f"应用代理到 Claude Code 失败: {e}")
-                        # 不影响代理切换的主要功能，只记录警告
+                    self._sync_claude_code(name)
 
                     return proxy
                 else:
                     raise OperationError("切换代理服务器失败", operation="switch_proxy", target=name)
 
+        except ConfigConflictError:
+            raise
         except Exception as e:
             self.logger.error(f"切换代理服务器失败: {e}")
             raise ConfigError(f"切换代理服务器失败: {e}") from None
@@ -303,8 +560,8 @@ class ProxyManager:
             ProxyNotFoundError: 代理服务器不存在
         """
         # 检查内置代理
-        if name in BUILTIN_PROXIES:
-            return BUILTIN_PROXIES[name]
+        if name in BUILTIN_PROXY_NAMES:
+            return get_builtin_proxies()[name]
             
         if name not in self.config.proxies:
             raise ProxyNotFoundError(name)
@@ -321,7 +578,7 @@ class ProxyManager:
             Dict[str, ProxyServer]: 代理服务器字典
         """
         # 开始时包含内置代理
-        result = BUILTIN_PROXIES.copy()
+        result = dict(get_builtin_proxies())
         
         if active_only:
             result.update(self.config.get_active_proxies())
@@ -330,6 +587,56 @@ class ProxyManager:
             
         return result
 
+    def iter_proxies(
+        self,
+        active_only: bool = False,
+        fields: Optional[List[str]] = None,
+        mask_credentials: bool = False,
+    ) -> Iterator[Dict[str, Any]]:
+        """逐个产出代理服务器数据（不含内置代理）
+
+        每次只序列化一个代理，适合将大量代理流式写出。
+
+        Args:
+            active_only: 是否只包含启用的代理服务器
+            fields: 只包含的字段，为None时包含全部字段
+            mask_credentials: 是否遮蔽API密钥和Auth令牌
+
+        Yields:
+            Dict[str, Any]: 代理服务器数据
+
+        Raises:
+            ValidationError: 字段名称无效
+        """
+        from .utils import mask_secret
+
+        include = None
+        if fields:
+            unknown = [field for field in fields if field not in ProxyServer.model_fields]
+            if unknown:
+                raise ValidationError(
+                    f"未知的代理字段: {', '.join(unknown)}。"
+                    f"可用字段: {', '.join(ProxyServer.model_fields)}",
+                    field="fields",
+                    value=fields,
+                )
+            include = set(fields)
+
+        # 先取出代理对象列表，迭代过程中配置被修改也不会出错
+        for proxy in tuple(self.config.proxies.values()):
+            if active_only and not proxy.is_active:
+                continue
+
+            data = proxy.model_dump(include=include)
+            if fields:
+                # 按指定的字段顺序输出
+                data = {field: data[field] for field in fields}
+            if mask_credentials:
+                for key in ("api_key", "auth_token"):
+                    if data.get(key):
+                        data[key] = mask_secret(data[key])
+            yield data
+
     def get_proxy_names(self, active_only: bool = False) -> List[str]:
         """获取代理服务器名称列表
 
@@ -344,6 +651,7 @@ class ProxyManager:
         else:
             return self.config.get_proxy_names()
 
+    @_locked_mutation
     def update_proxy(
         self,
         name: str,
@@ -412,6 +720,11 @@ class ProxyManager:
             # 创建新的代理对象（会自动进行数据验证和更新时间戳）
             updated_proxy = ProxyServer(**update_data)
 
+            # 内容没有变化时保留原对象，不刷新更新时间也不写入配置
+            if updated_proxy.same_content(proxy):
+                self.logger.debug(f"代理服务器 '{name}' 没有变化")
+                return proxy
+
             # 更新配置
             self.config.proxies[name] = updated_proxy
 
@@ -429,7 +742,7 @@ class ProxyManager:
                     self.logger.warning(f"代理 '{name}' 被禁用且无其他可用代理")
 
             # 保存配置
-            self._save_config()
+            self._save_config(changed=[name])
 
             self.logger.info(f"已更新代理服务器: {name}")
             return updated_proxy
@@ -437,10 +750,151 @@ class ProxyManager:
         except ValueError as e:
             # Pydantic验证错误
             raise ValidationError(f"代理服务器数据验证失败: {e}") from None
+        except ConfigConflictError:
+            raise
         except Exception as e:
             self.logger.error(f"更新代理服务器失败: {e}")
             raise ConfigError(f"更新代理服务器失败: {e}") from None
 
+    def import_proxies(
+        self,
+        records: Iterable[Tuple[int, Any]],
+        on_conflict: str = "fail",
+        chunk_size: int = 500,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> Dict[str, List[str]]:
+        """批量导入代理服务器
+
+        记录按块读取和验证，所有错误行汇总后一并报告；全部通过后在一个事务中提交，
+        只进行一次配置写入。记录只读取一次（可以是一次性的迭代器），
+        提交时遇到其他进程的修改只重试提交步骤，按最新配置重新判断名称冲突。
+
+        Args:
+            records: (记录位置, 原始记录) 序列，通常来自 importer.iter_import_records
+            on_conflict: 与已有代理重名时的处理方式：fail（报错）、skip（跳过）、upsert（覆盖）
+            chunk_size: 每次读取和验证的记录数
+            progress: 进度回调，参数为本块处理的记录数
+
+        Returns:
+            Dict[str, List[str]]: 导入结果，包含 added、updated、skipped 三个名称列表
+
+        Raises:
+            ValidationError: 冲突策略无效
+            ImportError: 存在无效记录或名称冲突（details["errors"] 中列出所有错误行）
+            ConfigError: 配置保存失败
+        """
+        from .importer import normalize_record
+
+        if on_conflict not in IMPORT_CONFLICT_POLICIES:
+            raise ValidationError(
+                f"无效的冲突处理策略: {on_conflict}。可选: {', '.join(IMPORT_CONFLICT_POLICIES)}",
+                field="on_conflict",
+                value=on_conflict,
+            )
+
+        # 名称 -> (记录位置, 是否指定了创建时间, 代理对象)
+        validated: Dict[str, Tuple[int, bool, ProxyServer]] = {}
+        errors: List[Dict[str, Any]] = []
+
+        def add_error(position: int, name: Optional[str], message: str) -> None:
+            errors.append({"position": position, "name": name, "message": message})
+
+        iterator = iter(records)
+        while True:
+            chunk = list(islice(iterator, max(chunk_size, 1)))
+            if not chunk:
+                break
+
+            for position, record in chunk:
+                if isinstance(record, Exception):
+                    add_error(position, None, str(record))
+                    continue
+                if not isinstance(record, dict):
+                    add_error(position, None, "记录必须是对象")
+                    continue
+
+                name = record.get("name")
+                if not isinstance(name, str) or not name:
+                    add_error(position, None, "缺少 name 字段")
+                    continue
+                try:
+                    data = normalize_record(record)
+                    if name in BUILTIN_PROXY_NAMES:
+                        raise ValueError(f"'{name}' 是保留名称，不能用作代理名称")
+                    if name in validated:
+                        raise ValueError(f"导入数据中存在重复名称: {name}")
+                    validated[name] = (position, "created_at" in data, ProxyServer(**data))
+                except ValueError as e:
+                    add_error(position, name, _format_validation_error(e))
+
+            if progress is not None:
+                progress(len(chunk))
+
+        return self._commit_import(validated, errors, on_conflict)
+
+    @_locked_mutation
+    def _commit_import(
+        self,
+        validated: Dict[str, Tuple[int, bool, ProxyServer]],
+        errors: List[Dict[str, Any]],
+        on_conflict: str,
+    ) -> Dict[str, List[str]]:
+        """按冲突策略提交已验证的导入记录（配置冲突时只重试这一步）
+
+        Args:
+            validated: 名称 -> (记录位置, 是否指定了创建时间, 代理对象)
+            errors: 验证阶段的错误
+            on_conflict: 名称冲突处理方式
+
+        Returns:
+            Dict[str, List[str]]: 导入结果
+        """
+        existing = self.config.proxies
+        errors = list(errors)
+        proxies: Dict[str, ProxyServer] = {}
+        skipped: List[str] = []
+
+        for name, (position, has_created_at, proxy) in validated.items():
+            if name not in existing:
+                proxies[name] = proxy
+            elif on_conflict == "skip":
+                skipped.append(name)
+            elif on_conflict == "fail":
+                errors.append(
+                    {"position": position, "name": name, "message": f"代理服务器已存在: {name}"}
+                )
+            else:
+                # 覆盖时保持原创建时间
+                if not has_created_at:
+                    proxy = proxy.model_copy(update={"created_at": existing[name].created_at})
+                proxies[name] = proxy
+
+        if errors:
+            errors.sort(key=lambda item: item["position"])
+            error = ProxyImportError(f"导入数据中有 {len(errors)} 条无效记录，未做任何修改")
+            error.details["errors"] = errors
+            raise error
+
+        result: Dict[str, List[str]] = {"added": [], "updated": [], "skipped": skipped}
+        if not proxies:
+            return result
+
+        with self.transaction():
+            for name, proxy in proxies.items():
+                if name in self.config.proxies:
+                    self.config.proxies[name] = proxy
+                    result["updated"].append(name)
+                else:
+                    self.config.add_proxy(proxy)
+                    result["added"].append(name)
+            self._save_config(changed=list(proxies))
+
+        self.logger.info(
+            f"已导入代理服务器: 新增 {len(result['added'])} 个，"
+            f"更新 {len(result['updated'])} 个，跳过 {len(skipped)} 个"
+        )
+        return result
+
     def export_environment(
         self, export_format: Optional[ExportFormat] = None, proxy_name: Optional[str] = None
     ) -> str:
@@ -589,34 +1043,285 @@ class ProxyManager:
             "config_info": self.config_manager.get_config_info(),
         }
 
-    def validate_proxy_connection(self, name: str) -> Dict[str, Any]:
-        """验证代理服务器连接（占位方法）
+    def validate_proxy_connection(
+        self, name: str, timeouts: Optional[Dict[str, float]] = None
+    ) -> Dict[str, Any]:
+        """验证代理服务器连接
+
+        依次进行DNS解析、TCP连接、TLS握手，并携带认证凭据请求 <base_url>v1/models。
 
         Args:
             name: 代理服务器名称
+            timeouts: 各阶段超时时间（dns、connect、tls、http），为None时使用默认值
 
         Returns:
-            Dict[str, Any]: 验证结果
+            Dict[str, Any]: 检查结果（proxy_name、status、message、base_url、http_status、
+            latency、timings、error、timestamp），失败时 error 为对应的
+            ProxyConnectionError 或 APIKeyError 的字典表示
 
         Raises:
             ProxyNotFoundError: 代理服务器不存在
+        """
+        return self.check_proxies([name], timeouts=timeouts)[0]
+
+    def check_proxies(
+        self,
+        names: Optional[Iterable[str]] = None,
+        tag: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> List[Dict[str, Any]]:
+        """并发检查多个代理服务器的连通性
+
+        Args:
+            names: 代理名称列表，与 tag 都为None时检查全部代理
+            tag: 只检查包含该标签的代理
+            concurrency: 最大并发检查数，为None时使用 DEFAULT_CHECK_CONCURRENCY
+            timeouts: 各阶段超时时间（dns、connect、tls、http）
+            progress: 每个代理检查完成时调用，参数为该代理的检查结果
 
-        Note:
-            这是一个占位方法，具体的连接测试需要在后续版本中实现
+        Returns:
+            List[Dict[str, Any]]: 检查结果列表，顺序与代理顺序一致
+
+        Raises:
+            ProxyNotFoundError: 指定的代理服务器不存在
         """
-        if name not in self.config.proxies:
-            raise ProxyNotFoundError(name)
+        if names is not None:
+            proxies = [self.get_proxy(name) for name in dict.fromkeys(names)]
+        else:
+            proxies = list(self.config.proxies.values())
+        if tag is not None:
+            proxies = [proxy for proxy in proxies if proxy.name in self.get_proxies_by_tag(tag)]
 
-        proxy = self.config.proxies[name]
+        from .checker import DEFAULT_CHECK_CONCURRENCY, ConnectivityChecker
 
-        # TODO: 实现真实的连接测试
-        return {
-            "proxy_name": name,
-            "status": "unknown",
-            "message": "连接测试功能尚未实现",
-            "base_url": proxy.base_url,
-            "timestamp": proxy.updated_at,
+        checker = ConnectivityChecker(
+            concurrency=DEFAULT_CHECK_CONCURRENCY if concurrency is None else concurrency,
+            timeouts=timeouts,
+        )
+        results = checker.run(proxies, progress)
+        self._record_latency(results)
+        return results
+
+    def benchmark_proxy(
+        self,
+        name: Optional[str] = None,
+        model: Optional[str] = None,
+        small: bool = False,
+        requests: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        rate: Optional[float] = None,
+        mode: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """对代理进行性能测试
+
+        向代理发送真实的 Messages 请求，会消耗代理的额度。
+
+        Args:
+            name: 代理名称，为None时测试当前代理
+            model: 请求使用的模型，为None时使用代理配置的 bigmodel（small 为True时使用 smallmodel）
+            small: 未指定 model 时使用 smallmodel
+            requests: 请求总数，为None时使用 DEFAULT_BENCH_REQUESTS
+            concurrency: 最大并发请求数，为None时使用 DEFAULT_BENCH_CONCURRENCY
+            rate: 每秒发出的请求数，为None时以最大并发持续发送
+            mode: 请求模式（stream、nonstream、mixed），为None时使用流式请求
+            max_tokens: 每个请求的最大输出 token 数，为None时使用 DEFAULT_BENCH_MAX_TOKENS
+            timeout: 单个请求的超时时间（秒），为None时使用 DEFAULT_BENCH_TIMEOUT
+            progress: 每个请求完成时调用，参数为该请求的结果
+
+        Returns:
+            Dict[str, Any]: BenchmarkRunner.run 返回的测试报告
+
+        Raises:
+            ProxyNotFoundError: 代理服务器不存在
+            OperationError: 未指定代理且没有当前代理，或无法确定使用的模型
+            ValidationError: 请求模式无效
+        """
+        if name is None:
+            current = self.get_current_proxy()
+            if current is None:
+                raise OperationError("没有当前代理", operation="benchmark_proxy")
+            name = current.name
+        proxy = self.get_proxy(name)
+
+        if model is None:
+            model = proxy.smallmodel if small else proxy.bigmodel
+        if not model:
+            field = "smallmodel" if small else "bigmodel"
+            raise OperationError(
+                f"代理 '{name}' 未配置 {field}，请指定模型",
+                operation="benchmark_proxy",
+                target=name,
+            )
+        from .bench import BENCH_MODES, BenchmarkRunner
+
+        if mode is not None and mode not in BENCH_MODES:
+            raise ValidationError(f"不支持的请求模式: {mode}", field="mode", value=mode)
+
+        # 未指定的参数使用 BenchmarkRunner 的默认值
+        options = {
+            key: value
+            for key, value in (
+                ("requests", requests),
+                ("concurrency", concurrency),
+                ("mode", mode),
+                ("max_tokens", max_tokens),
+                ("timeout", timeout),
+            )
+            if value is not None
         }
+        runner = BenchmarkRunner(proxy, model, rate=rate, **options)
+        return runner.run(progress)
+
+    @property
+    def latency_history(self) -> "LatencyHistory":
+        """代理延迟历史（首次访问时创建）"""
+        if self._latency_history is None:
+            from .history import LatencyHistory
+
+            self._latency_history = LatencyHistory()
+        return self._latency_history
+
+    def _record_latency(self, results: List[Dict[str, Any]]) -> None:
+        """保存检查结果到延迟历史，失败时只记录日志"""
+        try:
+            self.latency_history.record(results)
+        except Exception as e:
+            self.logger.debug(f"保存延迟历史失败: {e}")
+
+    def _remove_latency_history(self, name: str) -> None:
+        """删除代理的延迟历史，失败时只记录日志"""
+        try:
+            self.latency_history.remove(name)
+        except Exception as e:
+            self.logger.debug(f"删除延迟历史失败: {e}")
+
+    def get_latency_summaries(
+        self, names: Optional[Iterable[str]] = None, max_age: Optional[float] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """获取代理的历史延迟统计
+
+        Args:
+            names: 代理名称列表，为None时统计全部代理
+            max_age: 只统计最近 max_age 秒内的检查记录
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 代理名称到 LatencyHistory.summary 统计结果的映射
+        """
+        if names is None:
+            names = self.config.proxies.keys()
+        return {name: self.latency_history.summary(name, max_age) for name in names}
+
+    @property
+    def usage_store(self) -> "UsageStore":
+        """本地转发的用量统计存储（首次访问时创建）"""
+        if self._usage_store is None:
+            from .metering import UsageStore
+
+            self._usage_store = UsageStore()
+        return self._usage_store
+
+    def get_usage_stats(
+        self, since: Optional[float] = None, by: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """获取本地转发的用量统计
+
+        Args:
+            since: 统计起点（Unix 时间），为None时统计全部记录
+            by: 分组方式（proxy、model），为None时按代理分组
+
+        Returns:
+            List[Dict[str, Any]]: UsageStore.query 的统计结果
+
+        Raises:
+            ValidationError: 分组方式无效
+            ConfigError: 读取用量统计失败
+        """
+        from .metering import STATS_BY_PROXY, STATS_GROUPS
+
+        by = STATS_BY_PROXY if by is None else by
+        if by not in STATS_GROUPS:
+            raise ValidationError(f"不支持的分组方式: {by}", field="by", value=by)
+        try:
+            return self.usage_store.query(since, by)
+        except Exception as e:
+            self.logger.error(f"读取用量统计失败: {e}")
+            raise ConfigError(f"读取用量统计失败: {e}") from None
+
+    def switch_to_best(
+        self,
+        tag: Optional[str] = None,
+        attempts: int = 3,
+        concurrency: Optional[int] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        max_age: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """检查所有启用的候选代理，切换到错误率最低、延迟最小的代理
+
+        候选代理的每次检查并发进行；切换只保存一次配置并应用一次 Claude Code 配置。
+        指定 max_age 时，最近 max_age 秒内已有检查记录的代理直接使用历史记录排名，不再重新检查。
+
+        Args:
+            tag: 只在包含该标签的代理中选择
+            attempts: 每个候选代理的检查次数
+            concurrency: 最大并发检查数，为None时使用 DEFAULT_CHECK_CONCURRENCY
+            timeouts: 各阶段超时时间（dns、connect、tls、http）
+            progress: 每次检查完成时调用，参数为该次检查结果
+            max_age: 复用延迟历史中最近 max_age 秒内的检查记录，为None时全部重新检查
+
+        Returns:
+            Dict[str, Any]: {"proxy": 切换后的代理, "ranking": rank_results 的排序结果}
+
+        Raises:
+            OperationError: 没有符合条件的启用代理
+            NetworkError: 所有候选代理的检查都失败
+        """
+        from .checker import DEFAULT_CHECK_CONCURRENCY, ConnectivityChecker, rank_results
+
+        candidates = self.config.get_active_proxies()
+        if tag is not None:
+            tagged = self.get_proxies_by_tag(tag)
+            candidates = {name: proxy for name, proxy in candidates.items() if name in tagged}
+        if not candidates:
+            scope = f"包含标签 '{tag}' 的" if tag else ""
+            raise OperationError(
+                f"没有{scope}启用代理可供选择", operation="switch_to_best", target=tag
+            )
+
+        samples: List[Dict[str, Any]] = []
+        if max_age is not None:
+            for name in list(candidates):
+                recent = self.latency_history.samples(name, max_age)
+                if recent:
+                    samples.extend(recent)
+                    del candidates[name]
+
+        # 轮流排列各代理的多次检查，避免同一代理的检查集中在同一时刻
+        probes = [proxy for _ in range(max(1, attempts)) for proxy in candidates.values()]
+        if probes:
+            checker = ConnectivityChecker(
+                concurrency=DEFAULT_CHECK_CONCURRENCY if concurrency is None else concurrency,
+                timeouts=timeouts,
+            )
+            results = checker.run(probes, progress)
+            self._record_latency(results)
+            samples.extend(results)
+        ranking = rank_results(samples)
+
+        best = ranking[0]
+        if best["successes"] == 0:
+            raise NetworkError(f"所有候选代理均不可用，最后的错误: {best['last_error']}")
+
+        self.logger.info(
+            f"延迟最低的代理: {best['proxy_name']}（{best['latency'] * 1000:.0f}ms，"
+            f"错误率 {best['error_rate']:.0%}）"
+        )
+        return {"proxy": self.switch_proxy(best["proxy_name"]), "ranking": ranking}
 
     def search_proxies(
         self, query: str, search_fields: Optional[List[str]] = None
@@ -717,17 +1422,6 @@ class ProxyManager:
             setting_file = claude_config_dir / "settings.json"
             backup_file = claude_config_dir / "settings.json.claudewarp.bak"
 
-            # 读取现有配置或创建新配置
-            existing_config = {}
-            if setting_file.exists():
-                try:
-                    with open(setting_file, "r", encoding="utf-8") as f:
-                        existing_config = json.load(f)
-                    self.logger.debug(f"已读取现有配置文件: {setting_file}")
-                except (json.JSONDecodeError, Exception) as e:
-                    self.logger.warning(f"读取现有配置文件失败，将创建新配置: {e}")
-                    existing_config = {}
-
             # 备份现有配置（仅首次）
             if setting_file.exists() and not backup_file.exists():
                 from .utils import safe_copy_file
@@ -735,18 +1429,15 @@ class ProxyManager:
                 safe_copy_file(setting_file, backup_file, backup=False)
                 self.logger.info(f"已备份现有 Claude Code 配置到: {backup_file}")
 
-            # 合并配置
-            merged_config = self._merge_claude_code_config(existing_config, proxy)
-
-            from .utils import atomic_write
-
-            config_json = json.dumps(merged_config, indent=2, ensure_ascii=False)
-
-            if atomic_write(setting_file, config_json):
+            # 只修改 env 中归 claudewarp 管理的键，文件其余内容保持不变
+            updates, remove = self._claude_code_env(proxy)
+            if self._claude_settings_file(setting_file).update_env(
+                updates, remove, defaults={"permissions": {"allow": [], "deny": []}}
+            ):
                 self.logger.info(f"已应用代理 '{proxy.name}' 到 Claude Code: {setting_file}")
-                return True
             else:
-                raise ConfigError("写入 Claude Code 配置文件失败")
+                self.logger.debug(f"Claude Code 配置已是代理 '{proxy.name}'，无需写入")
+            return True
 
         except Exception as e:
             self.logger.error(f"应用 Claude Code 配置失败: {e}")
@@ -767,61 +1458,53 @@ class ProxyManager:
         # Linux/macOS: ~/.claude
         return home_dir / ".claude"
 
-    def _merge_claude_code_config(
-        self, existing_config: Dict[str, Any], proxy: ProxyServer
-    ) -> Dict[str, Any]:
-        """合并现有配置和代理配置
+    def _claude_settings_file(self, setting_file: Path) -> ClaudeSettingsFile:
+        """获取 settings.json 文件对象（复用解析缓存）"""
+        if self._claude_settings is None or self._claude_settings.path != setting_file:
+            self._claude_settings = ClaudeSettingsFile(
+                setting_file, durability=self.claude_code_durability
+            )
+        return self._claude_settings
+
+    def _claude_code_env(self, proxy: ProxyServer) -> Tuple[Dict[str, Any], List[str]]:
+        """生成代理对应的 Claude Code 环境变量
 
         Args:
-            existing_config: 现有的配置字典
             proxy: 代理服务器对象
 
         Returns:
-            Dict[str, Any]: 合并后的配置字典
+            Tuple[Dict[str, Any], List[str]]: (需要设置的环境变量, 需要删除的环境变量)
         """
-        # 深拷贝现有配置作为基础
-        import copy
-
-        merged_config = copy.deepcopy(existing_config)
-
-        # 确保 env 字段存在
-        if "env" not in merged_config:
-            merged_config["env"] = {}
-
-        # 根据认证方式选择要设置的环境变量
-        auth_method = proxy.get_auth_method()
-
-        # 清除可能存在的认证环境变量，确保互斥性
-        merged_config["env"].pop("ANTHROPIC_API_KEY", None)
-        merged_config["env"].pop("ANTHROPIC_AUTH_TOKEN", None)
-
-        # 设置对应的认证环境变量
-        if auth_method == "auth_token":
-            merged_config["env"]["ANTHROPIC_AUTH_TOKEN"] = proxy.auth_token
+        # 根据认证方式设置对应的认证环境变量并清除另一种，确保互斥性
+        if proxy.get_auth_method() == "auth_token":
+            updates: Dict[str, Any] = {"ANTHROPIC_AUTH_TOKEN": proxy.auth_token}
+            remove = ["ANTHROPIC_API_KEY"]
         else:
-            merged_config["env"]["ANTHROPIC_API_KEY"] = proxy.api_key
+            updates = {"ANTHROPIC_API_KEY": proxy.api_key}
+            remove = ["ANTHROPIC_AUTH_TOKEN"]
 
-        # 设置基础URL
-        merged_config["env"]["ANTHROPIC_BASE_URL"] = proxy.base_url
-        merged_config["env"]["CLAUDE_CODE_DISABLE_NONESSENTIAL_TRAFFIC"] = 1
+        updates["ANTHROPIC_BASE_URL"] = proxy.base_url
+        updates["CLAUDE_CODE_DISABLE_NONESSENTIAL_TRAFFIC"] = 1
 
-        # 如果配置了大模型，添加 ANTHROPIC_MODEL 环境变量
+        # 启用本地转发时指向本地转发代理，使用本地令牌，切换代理不再改变地址和凭据
+        local_proxy = self.get_local_proxy_settings()
+        if local_proxy is not None:
+            updates.pop("ANTHROPIC_API_KEY", None)
+            updates["ANTHROPIC_AUTH_TOKEN"] = local_proxy["token"]
+            updates["ANTHROPIC_BASE_URL"] = local_proxy_url(local_proxy)
+            remove = ["ANTHROPIC_API_KEY"]
+
+        # 配置了大模型/小模型时设置对应的环境变量，否则删除
         if proxy.bigmodel:
-            merged_config["env"]["ANTHROPIC_MODEL"] = proxy.bigmodel
+            updates["ANTHROPIC_MODEL"] = proxy.bigmodel
         else:
-            merged_config["env"].pop("ANTHROPIC_MODEL", None)
-
-        # 如果配置了小模型，添加 ANTHROPIC_SMALL_FAST_MODEL 环境变量
+            remove.append("ANTHROPIC_MODEL")
         if proxy.smallmodel:
-            merged_config["env"]["ANTHROPIC_SMALL_FAST_MODEL"] = proxy.smallmodel
+            updates["ANTHROPIC_SMALL_FAST_MODEL"] = proxy.smallmodel
         else:
-            merged_config["env"].pop("ANTHROPIC_SMALL_FAST_MODEL", None)
-
-        # 如果原配置中没有 permissions 字段，添加默认值
-        if "permissions" not in merged_config:
-            merged_config["permissions"] = {"allow": [], "deny": []}
+            remove.append("ANTHROPIC_SMALL_FAST_MODEL")
 
-        return merged_config
+        return updates, remove
 
     def _clear_claude_code_config(self) -> bool:
         """清空Claude Code的代理配置，恢复默认设置
@@ -840,91 +1523,503 @@ class ProxyManager:
                 self.logger.info("Claude Code 配置文件不存在，无需清空")
                 return True
 
-            # 读取现有配置
-            existing_config = {}
-            try:
-                with open(setting_file, "r", encoding="utf-8") as f:
-                    existing_config = json.load(f)
-            except (json.JSONDecodeError, Exception) as e:
-                self.logger.warning(f"读取现有配置文件失败: {e}")
-                existing_config = {}
-
-            # 清空代理相关的环境变量
-            if "env" in existing_config:
-                # 清除所有 Anthropic 相关的环境变量
-                anthropic_keys = [
-                    "ANTHROPIC_API_KEY",
-                    "ANTHROPIC_AUTH_TOKEN", 
-                    "ANTHROPIC_BASE_URL",
-                    "ANTHROPIC_MODEL",
-                    "ANTHROPIC_SMALL_FAST_MODEL",
-                    "CLAUDE_CODE_DISABLE_NONESSENTIAL_TRAFFIC"
-                ]
-                
-                for key in anthropic_keys:
-                    existing_config["env"].pop(key, None)
-                
-                # 如果env为空，则删除整个env字段
-                if not existing_config["env"]:
-                    existing_config.pop("env", None)
-
-            from .utils import atomic_write
-            
-            # 如果配置完全为空，删除文件
-            if not existing_config:
-                setting_file.unlink()
-                self.logger.info("已删除空的 Claude Code 配置文件")
-            else:
-                # 保存清理后的配置
-                config_json = json.dumps(existing_config, indent=2, ensure_ascii=False)
-                if atomic_write(setting_file, config_json):
-                    self.logger.info("已清空 Claude Code 代理配置")
-                else:
-                    raise ConfigError("写入 Claude Code 配置文件失败")
-
+            # 只删除代理相关的环境变量，env 为空时删除该字段，文件为空时删除文件
+            if self._claude_settings_file(setting_file).update_env(
+                {}, MANAGED_ENV_KEYS, prune_empty=True
+            ):
+                self.logger.info("已清空 Claude Code 代理配置")
             return True
 
         except Exception as e:
             self.logger.error(f"清空 Claude Code 配置失败: {e}")
             raise ConfigError(f"清空 Claude Code 配置失败: {e}") from None
 
-    def _generate_claude_code_config(self, proxy: ProxyServer) -> Dict[str, Any]:
-        """生成 Claude Code 配置
+    def get_claude_code_targets(self) -> List[Path]:
+        """获取登记的 Claude Code 配置同步目标
+
+        Returns:
+            List[Path]: 目标配置文件路径列表
+        """
+        from .targets import TARGETS_SETTING_KEY
+
+        return [Path(path) for path in self.config.settings.get(TARGETS_SETTING_KEY, [])]
+
+    @_locked_mutation
+    def add_claude_code_targets(self, paths: Iterable[Union[str, Path]]) -> List[Path]:
+        """登记 Claude Code 配置同步目标
 
         Args:
-            proxy: 代理服务器对象
+            paths: 配置文件路径（以 .json 结尾）或 Claude Code 配置目录
 
         Returns:
-            Dict[str, Any]: Claude Code 配置字典
+            List[Path]: 新登记的目标（已登记的目标会被忽略）
+
+        Raises:
+            ConfigError: 配置保存失败
         """
-        # 根据认证方式选择要设置的环境变量
-        auth_method = proxy.get_auth_method()
+        from .targets import TARGETS_SETTING_KEY, resolve_target_path
 
-        if auth_method == "auth_token":
-            env_config = {
-                "ANTHROPIC_AUTH_TOKEN": proxy.auth_token,
-                "ANTHROPIC_BASE_URL": proxy.base_url,
-                "CLAUDE_CODE_DISABLE_NONESSENTIAL_TRAFFIC": 1,
+        existing = [str(path) for path in self.get_claude_code_targets()]
+        added = [
+            str(path)
+            for path in dict.fromkeys(resolve_target_path(path) for path in paths)
+            if str(path) not in existing
+        ]
+        if not added:
+            return []
+
+        try:
+            self.config.settings = {**self.config.settings, TARGETS_SETTING_KEY: existing + added}
+            self._save_config(changed=[])
+            self.logger.info(f"已登记 {len(added)} 个 Claude Code 配置同步目标")
+            return [Path(path) for path in added]
+        except ConfigConflictError:
+            raise
+        except Exception as e:
+            self.logger.error(f"登记同步目标失败: {e}")
+            raise ConfigError(f"登记同步目标失败: {e}") from None
+
+    @_locked_mutation
+    def remove_claude_code_targets(self, paths: Iterable[Union[str, Path]]) -> List[Path]:
+        """取消登记 Claude Code 配置同步目标（不修改目标文件）
+
+        Args:
+            paths: 配置文件路径或 Claude Code 配置目录
+
+        Returns:
+            List[Path]: 被移除的目标
+
+        Raises:
+            ConfigError: 配置保存失败
+        """
+        from .targets import TARGETS_SETTING_KEY, resolve_target_path
+
+        targets = {str(resolve_target_path(path)) for path in paths}
+        existing = [str(path) for path in self.get_claude_code_targets()]
+        removed = [path for path in existing if path in targets]
+        if not removed:
+            return []
+
+        try:
+            self.config.settings = {
+                **self.config.settings,
+                TARGETS_SETTING_KEY: [path for path in existing if path not in targets],
             }
+            self._save_config(changed=[])
+            self.logger.info(f"已移除 {len(removed)} 个 Claude Code 配置同步目标")
+            return [Path(path) for path in removed]
+        except ConfigConflictError:
+            raise
+        except Exception as e:
+            self.logger.error(f"移除同步目标失败: {e}")
+            raise ConfigError(f"移除同步目标失败: {e}") from None
+
+    def sync_claude_code_targets(
+        self,
+        proxy_name: Optional[str] = None,
+        targets: Optional[Iterable[Union[str, Path]]] = None,
+        max_workers: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """将代理配置并发同步到登记的 Claude Code 配置目标
+
+        只修改各目标 env 中由 claudewarp 管理的环境变量；文件未变化且内容已是最新的目标直接跳过。
+        单个目标失败不影响其他目标，失败信息记录在返回结果中。
+        事务中只检查代理是否存在并记录最后一次同步请求，提交后再按已提交的配置写入，
+        此时返回空列表，同步结果记录在日志中。
+
+        Args:
+            proxy_name: 代理名称，为None时使用当前代理；"no" 或没有当前代理时清空代理配置
+            targets: 目标路径，为None时使用登记的全部目标
+            max_workers: 并发写入的线程数，为None时使用 DEFAULT_SYNC_WORKERS
+
+        Returns:
+            List[Dict[str, Any]]: 每个目标的同步结果
+            （path、status: updated/unchanged/skipped/failed、elapsed 秒数、error）
+
+        Raises:
+            ProxyNotFoundError: 指定的代理服务器不存在
+        """
+        from .targets import DEFAULT_SYNC_WORKERS, ClaudeCodeTargetSync, resolve_target_path
+
+        if proxy_name is None:
+            proxy = self.get_current_proxy()
+        elif proxy_name in BUILTIN_PROXY_NAMES:
+            proxy = None
         else:
-            env_config = {
-                "ANTHROPIC_API_KEY": proxy.api_key,
-                "ANTHROPIC_BASE_URL": proxy.base_url,
-                "CLAUDE_CODE_DISABLE_NONESSENTIAL_TRAFFIC": 1,
-            }
+            proxy = self.get_proxy(proxy_name)
 
-        # 如果配置了大模型，添加 ANTHROPIC_MODEL 环境变量
-        if proxy.bigmodel:
-            env_config["ANTHROPIC_MODEL"] = proxy.bigmodel
+        if self._transaction is not None:
+            pending_targets = None if targets is None else list(targets)
+            self._transaction["targets"] = (proxy_name, pending_targets, max_workers)
+            return []
 
-        # 如果配置了小模型，添加 ANTHROPIC_SMALL_FAST_MODEL 环境变量
-        if proxy.smallmodel:
-            env_config["ANTHROPIC_SMALL_FAST_MODEL"] = proxy.smallmodel
+        paths = (
+            self.get_claude_code_targets()
+            if targets is None
+            else [resolve_target_path(path) for path in targets]
+        )
+        syncer = ClaudeCodeTargetSync(
+            durability=self.claude_code_durability,
+            max_workers=DEFAULT_SYNC_WORKERS if max_workers is None else max_workers,
+        )
+        if proxy is None:
+            return syncer.sync(paths, {}, MANAGED_ENV_KEYS, prune_empty=True)
 
-        return {
-            "env": env_config,
-            "permissions": {"allow": [], "deny": []},
+        updates, remove = self._claude_code_env(proxy)
+        return syncer.sync(paths, updates, remove)
+
+    def _sync_targets_after_commit(
+        self,
+        proxy_name: Optional[str],
+        targets: Optional[List[Union[str, Path]]],
+        max_workers: Optional[int],
+    ) -> None:
+        """事务提交后执行记录的目标同步，结果只记录日志
+
+        Args:
+            proxy_name: 代理名称，为None时使用提交后的当前代理
+            targets: 目标路径，为None时使用登记的全部目标
+            max_workers: 并发写入的线程数
+        """
+        try:
+            results = self.sync_claude_code_targets(proxy_name, targets, max_workers)
+        except Exception as e:
+            self.logger.warning(f"同步 Claude Code 配置目标失败: {e}")
+            return
+
+        for result in results:
+            if result["status"] == "failed":
+                self.logger.warning(f"同步配置目标失败: {result['path']}: {result['error']}")
+        self.logger.info(f"已同步 {len(results)} 个 Claude Code 配置目标")
+
+    def get_local_proxy_settings(self) -> Optional[Dict[str, Any]]:
+        """获取本地转发设置
+
+        Returns:
+            Optional[Dict[str, Any]]: host、port 和 token，未启用本地转发时返回None
+        """
+        settings = self.config.settings.get(LOCAL_PROXY_SETTING_KEY)
+        if not isinstance(settings, dict) or not settings.get("token"):
+            return None
+        return dict(settings)
+
+    @_locked_mutation
+    def enable_local_proxy(
+        self, host: str = DEFAULT_SERVE_HOST, port: int = DEFAULT_SERVE_PORT
+    ) -> Dict[str, Any]:
+        """启用本地转发
+
+        Claude Code 配置改为指向本地转发代理（使用本地令牌），之后切换代理只改变转发目标，
+        不再改写 settings.json。已启用时沿用原来的本地令牌。
+
+        Args:
+            host: 本地转发代理的监听地址
+            port: 本地转发代理的监听端口
+
+        Returns:
+            Dict[str, Any]: 本地转发设置（host、port、token）
+
+        Raises:
+            ConfigError: 配置保存失败
+        """
+        existing = self.get_local_proxy_settings() or {}
+        settings = {
+            "host": host,
+            "port": port,
+            "token": existing.get("token") or generate_local_token(),
         }
+        try:
+            self.config.settings = {**self.config.settings, LOCAL_PROXY_SETTING_KEY: settings}
+            self._save_config(changed=[])
+            self.logger.info(f"已启用本地转发: {local_proxy_url(settings)}")
+        except ConfigConflictError:
+            raise
+        except Exception as e:
+            self.logger.error(f"启用本地转发失败: {e}")
+            raise ConfigError(f"启用本地转发失败: {e}") from None
+
+        current = self.get_current_proxy()
+        if current is not None:
+            self._sync_claude_code(current.name)
+        return settings
+
+    @_locked_mutation
+    def disable_local_proxy(self) -> bool:
+        """停用本地转发，Claude Code 配置恢复为直接连接当前代理
+
+        Returns:
+            bool: 之前是否启用了本地转发
+
+        Raises:
+            ConfigError: 配置保存失败
+        """
+        if LOCAL_PROXY_SETTING_KEY not in self.config.settings:
+            return False
+        try:
+            self.config.settings = {
+                key: value
+                for key, value in self.config.settings.items()
+                if key != LOCAL_PROXY_SETTING_KEY
+            }
+            self._save_config(changed=[])
+            self.logger.info("已停用本地转发")
+        except ConfigConflictError:
+            raise
+        except Exception as e:
+            self.logger.error(f"停用本地转发失败: {e}")
+            raise ConfigError(f"停用本地转发失败: {e}") from None
+
+        current = self.get_current_proxy()
+        self._sync_claude_code(current.name if current is not None else "no")
+        return True
+
+    def create_local_proxy_server(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+        pool_tag: Optional[str] = None,
+        strategy: str = STRATEGY_ROUND_ROBIN,
+        failover: bool = False,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        rate_limit: bool = False,
+        max_queue_wait: Optional[float] = None,
+        metering: bool = False,
+    ) -> "LocalProxyServer":
+        """创建本地转发代理（未启动）
+
+        Args:
+            host: 监听地址，为None时使用本地转发设置中的地址
+            port: 监听端口，为None时使用本地转发设置中的端口
+            timeouts: 上游超时时间（connect、read）
+            pool_tag: 代理池标签，指定时请求分摊到带有该标签的所有启用代理
+            strategy: 代理池的负载均衡策略（round-robin、weighted、least-outstanding）
+            failover: 是否启用故障转移，上游故障时在备用代理上重试
+            max_attempts: 故障转移模式下每个请求最多尝试的次数（包括第一次）
+            rate_limit: 是否启用速率限制调度，按上游报告的速率限制排队或改用其他代理
+            max_queue_wait: 请求在本地排队的最长时间（秒），为None时使用 DEFAULT_MAX_QUEUE_WAIT
+            metering: 是否按代理和模型统计请求和 token 用量（见 'cw stats'）
+
+        Returns:
+            LocalProxyServer: 本地转发代理，启用本地转发时要求客户端携带本地令牌
+
+        Raises:
+            ValidationError: 负载均衡策略无效
+        """
+        if strategy not in BALANCE_STRATEGIES:
+            raise ValidationError(
+                f"不支持的负载均衡策略: {strategy}", field="strategy", value=strategy
+            )
+        from .forwarder import LocalProxyServer
+        from .ratelimit import DEFAULT_MAX_QUEUE_WAIT
+
+        settings = self.get_local_proxy_settings() or {}
+        return LocalProxyServer(
+            self,
+            host=host or settings.get("host") or DEFAULT_SERVE_HOST,
+            port=port if port is not None else settings.get("port") or DEFAULT_SERVE_PORT,
+            token=settings.get("token"),
+            timeouts=timeouts,
+            pool_tag=pool_tag,
+            strategy=strategy,
+            failover=failover,
+            max_attempts=max_attempts,
+            rate_limit=rate_limit,
+            max_queue_wait=DEFAULT_MAX_QUEUE_WAIT if max_queue_wait is None else max_queue_wait,
+            metering=metering,
+        )
+
+    def get_pool_members(self, tag: str) -> List[ProxyServer]:
+        """获取代理池成员
+
+        Args:
+            tag: 代理池标签
+
+        Returns:
+            List[ProxyServer]: 带有该标签的所有启用代理
+        """
+        return [proxy for proxy in self.get_proxies_by_tag(tag).values() if proxy.is_active]
+
+    def get_pool_weights(self) -> Dict[str, int]:
+        """获取代理池的代理权重
+
+        Returns:
+            Dict[str, int]: 代理名称到权重的映射，未设置的代理权重为 1
+        """
+        weights = self.config.settings.get(POOL_WEIGHTS_SETTING_KEY)
+        return dict(weights) if isinstance(weights, dict) else {}
+
+    @_locked_mutation
+    def set_pool_weights(self, weights: Dict[str, int]) -> Dict[str, int]:
+        """设置代理池的代理权重
+
+        Args:
+            weights: 代理名称到权重（正整数）的映射，与已有设置合并
+
+        Returns:
+            Dict[str, int]: 合并后的全部权重
+
+        Raises:
+            ProxyNotFoundError: 代理服务器不存在
+            ValidationError: 权重不是正整数
+            ConfigError: 配置保存失败
+        """
+        for name, weight in weights.items():
+            if name not in self.config.proxies:
+                raise ProxyNotFoundError(name)
+            if not isinstance(weight, int) or weight < 1:
+                raise ValidationError(
+                    f"权重必须是正整数: {name}={weight}", field="weight", value=weight
+                )
+
+        merged = {**self.get_pool_weights(), **weights}
+        try:
+            self.config.settings = {**self.config.settings, POOL_WEIGHTS_SETTING_KEY: merged}
+            self._save_config(changed=[])
+            self.logger.info(f"已设置代理权重: {weights}")
+            return merged
+        except ConfigConflictError:
+            raise
+        except Exception as e:
+            self.logger.error(f"设置代理权重失败: {e}")
+            raise ConfigError(f"设置代理权重失败: {e}") from None
+
+    def get_all_fallbacks(self) -> Dict[str, List[str]]:
+        """获取全部代理的备用代理列表
+
+        Returns:
+            Dict[str, List[str]]: 代理名称到备用代理名称列表的映射
+        """
+        fallbacks = self.config.settings.get(FALLBACKS_SETTING_KEY)
+        return dict(fallbacks) if isinstance(fallbacks, dict) else {}
+
+    def get_fallbacks(self, name: str) -> List[str]:
+        """获取代理的备用代理列表
+
+        Args:
+            name: 代理名称
+
+        Returns:
+            List[str]: 备用代理名称（按尝试顺序）
+        """
+        return list(self.get_all_fallbacks().get(name, []))
+
+    @_locked_mutation
+    def set_fallbacks(self, name: str, fallbacks: List[str]) -> List[str]:
+        """设置代理的备用代理列表，本地转发代理启用故障转移时按顺序在备用代理上重试
+
+        Args:
+            name: 代理名称
+            fallbacks: 备用代理名称（按尝试顺序），为空时清除
+
+        Returns:
+            List[str]: 设置后的备用代理列表
+
+        Raises:
+            ProxyNotFoundError: 代理服务器不存在
+            ValidationError: 备用代理包含代理自身
+            ConfigError: 配置保存失败
+        """
+        for proxy_name in [name, *fallbacks]:
+            if proxy_name not in self.config.proxies:
+                raise ProxyNotFoundError(proxy_name)
+        if name in fallbacks:
+            raise ValidationError("备用代理不能包含代理自身", field="fallbacks", value=name)
+
+        fallbacks = list(dict.fromkeys(fallbacks))
+        existing = self.get_all_fallbacks()
+        if fallbacks:
+            existing[name] = fallbacks
+        else:
+            existing.pop(name, None)
+        try:
+            self.config.settings = {**self.config.settings, FALLBACKS_SETTING_KEY: existing}
+            self._save_config(changed=[])
+            self.logger.info(f"已设置代理 {name} 的备用代理: {fallbacks}")
+            return fallbacks
+        except ConfigConflictError:
+            raise
+        except Exception as e:
+            self.logger.error(f"设置备用代理失败: {e}")
+            raise ConfigError(f"设置备用代理失败: {e}") from None
+
+    def get_model_routes(self) -> Dict[str, str]:
+        """获取模型路由规则
+
+        Returns:
+            Dict[str, str]: 规则（模型名称、通配符或 small/big）到代理名称的映射，按添加顺序
+        """
+        routes = self.config.settings.get(MODEL_ROUTES_SETTING_KEY)
+        return dict(routes) if isinstance(routes, dict) else {}
+
+    @_locked_mutation
+    def set_model_route(self, rule: str, proxy_name: str) -> Dict[str, str]:
+        """添加或修改模型路由规则，本地转发代理按请求的模型把请求转发到指定代理
+
+        Args:
+            rule: 模型名称、通配符（如 claude-opus-*），或模型类别 small/big
+            proxy_name: 目标代理名称
+
+        Returns:
+            Dict[str, str]: 修改后的全部规则
+
+        Raises:
+            ProxyNotFoundError: 代理服务器不存在
+            ValidationError: 规则为空
+            ConfigError: 配置保存失败
+        """
+        rule = rule.strip()
+        if not rule:
+            raise ValidationError("路由规则不能为空", field="rule", value=rule)
+        if proxy_name not in self.config.proxies:
+            raise ProxyNotFoundError(proxy_name)
+
+        routes = {**self.get_model_routes(), rule: proxy_name}
+        try:
+            self.config.settings = {**self.config.settings, MODEL_ROUTES_SETTING_KEY: routes}
+            self._save_config(changed=[])
+            kind = "模型类别" if rule in MODEL_CLASSES else "模型"
+            self.logger.info(f"已设置模型路由: {kind} {rule} -> {proxy_name}")
+            return routes
+        except ConfigConflictError:
+            raise
+        except Exception as e:
+            self.logger.error(f"设置模型路由失败: {e}")
+            raise ConfigError(f"设置模型路由失败: {e}") from None
+
+    @_locked_mutation
+    def remove_model_routes(self, rules: Iterable[str]) -> List[str]:
+        """删除模型路由规则
+
+        Args:
+            rules: 要删除的规则
+
+        Returns:
+            List[str]: 被删除的规则
+
+        Raises:
+            ConfigError: 配置保存失败
+        """
+        existing = self.get_model_routes()
+        removed = [rule for rule in dict.fromkeys(rules) if rule in existing]
+        if not removed:
+            return []
+
+        try:
+            self.config.settings = {
+                **self.config.settings,
+                MODEL_ROUTES_SETTING_KEY: {
+                    rule: target for rule, target in existing.items() if rule not in removed
+                },
+            }
+            self._save_config(changed=[])
+            self.logger.info(f"已删除 {len(removed)} 条模型路由")
+            return removed
+        except ConfigConflictError:
+            raise
+        except Exception as e:
+            self.logger.error(f"删除模型路由失败: {e}")
+            raise ConfigError(f"删除模型路由失败: {e}") from None
 
     def reload_config(self) -> None:
         """重新加载配置文件
@@ -935,6 +2030,55 @@ class ProxyManager:
         self.logger.info("重新加载配置文件")
         self._load_config()
 
+    def refresh_from_disk(self) -> Optional[Dict[str, Any]]:
+        """配置文件被外部修改时增量重新加载
+
+        只验证发生变化的代理，未变化的代理对象保持不变；配置文件未变化或正在事务中时不做任何事。
+
+        Returns:
+            Optional[Dict[str, Any]]: 变更摘要（见 ConfigManager.load_config_incremental），
+            没有重新加载时返回None
+
+        Raises:
+            ConfigError: 配置加载失败
+        """
+        if self._transaction is not None or self._config is None:
+            return None
+        if not self.config_manager.has_external_changes():
+            return None
+
+        config, changes = self.config_manager.load_config_incremental(self._config)
+        self._config = config
+        return changes
+
+    def watch(
+        self,
+        callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        interval: Optional[float] = None,
+    ) -> "ConfigWatcher":
+        """启动后台监视，配置文件或 Claude Code 配置被外部修改时自动增量重新加载
+
+        Example:
+            watcher = manager.watch(lambda event: print(event["source"]))
+            ...
+            watcher.stop()
+
+        Args:
+            callback: 变更回调，在监视线程中调用
+            interval: 无法使用inotify时的轮询间隔（秒），为None时使用 DEFAULT_WATCH_INTERVAL
+
+        Returns:
+            ConfigWatcher: 已启动的监视器
+        """
+        from .watcher import DEFAULT_WATCH_INTERVAL, ConfigWatcher
+
+        watcher = ConfigWatcher(
+            self, interval=DEFAULT_WATCH_INTERVAL if interval is None else interval
+        )
+        if callback is not None:
+            watcher.add_callback(callback)
+        return watcher.start()
+
 
 # 导出管理器类
 __all__ = ["ProxyManager"]
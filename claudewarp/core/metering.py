@@ -0,0 +1,531 @@
+"""
+用量统计
+
+本地转发代理按代理和模型统计请求数、错误数、耗时和响应中的 usage（输入/输出/缓存 token），
+在内存中按分钟聚合，定期追加到缓存目录下的 usage/ 中：
+
+- minutes-YYYYMM.bin：每分钟、每个代理和模型一条定长记录（108 字节），只追加；
+- hours-YYYYMM.bin：按小时汇总的记录，文件头记录已经汇总到第几条分钟记录，
+  每次统计时只汇总新增的分钟记录，统计几个月的数据也只需要读取小时记录；
+- names.json：记录中代理和模型使用的编号与名称的对应关系。
+
+时间均按 UTC 计算。耗时按对数分桶计数，百分位为所在分桶的上界（不超过最大耗时）。
+"""
+
+import gzip
+import json
+import logging
+import math
+import re
+import struct
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .locking import ConfigLock
+from .utils import DURABILITY_RELAXED, atomic_write, ensure_directory, get_cache_directory
+
+# 响应 usage 中统计的字段
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+# 耗时分桶的上界（秒），最后一个分桶为超过 256 秒
+LATENCY_BOUNDS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+STATS_BY_PROXY = "proxy"
+STATS_BY_MODEL = "model"
+STATS_GROUPS = (STATS_BY_PROXY, STATS_BY_MODEL)
+
+# 解析非流式响应 usage 时最多缓存的响应体大小
+MAX_USAGE_BODY = 4 * 1024 * 1024
+
+USAGE_MAGIC = b"CWUH"
+USAGE_FORMAT_VERSION = 1
+
+# 记录：起始分钟（Unix 时间 / 60）、代理编号、模型编号、请求数、错误数、耗时合计、最大耗时、
+# 耗时分桶计数、输入/输出/缓存写入/缓存读取 token 数
+_RECORD = struct.Struct(f"<IHHIIdf{len(LATENCY_BOUNDS) + 1}I{len(USAGE_FIELDS)}Q")
+
+# 小时汇总文件头：魔数、版本、记录大小、已汇总的分钟记录数
+_ROLLUP_HEADER = struct.Struct("<4sHHQ16x")
+
+# 只在最近这段时间内按分钟统计起点，更早的起点对齐到整点
+_MINUTE_PRECISION_WINDOW = 48 * 3600
+
+# 从分钟记录文件末尾向前查找时，允许的记录时间乱序（分钟）
+_ORDER_SLACK = 10
+
+_DURATION = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*$", re.IGNORECASE)
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_since(value: str, now: Optional[float] = None) -> float:
+    """解析统计起点
+
+    Args:
+        value: 时长（如 30m、12h、7d、2w，表示最近这段时间）或 ISO 格式的日期/时间，
+            不带时区时按 UTC 解释
+        now: 当前时间（Unix 时间），为None时使用系统时间
+
+    Returns:
+        float: 起点的 Unix 时间
+
+    Raises:
+        ValueError: 格式无效
+    """
+    now = time.time() if now is None else now
+    match = _DURATION.match(value)
+    if match:
+        return now - float(match.group(1)) * _DURATION_UNITS[match.group(2).lower()]
+    parsed = datetime.fromisoformat(value.strip())
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class _Bucket:
+    """一段时间内某个代理和模型的统计"""
+
+    __slots__ = ("requests", "errors", "latency_sum", "latency_max", "histogram", "usage")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.histogram = [0] * (len(LATENCY_BOUNDS) + 1)
+        self.usage = [0] * len(USAGE_FIELDS)
+
+    def add_request(self, latency: float, error: bool, usage: Dict[str, int]) -> None:
+        self.requests += 1
+        self.errors += int(error)
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        index = next(
+            (i for i, bound in enumerate(LATENCY_BOUNDS) if latency <= bound), len(LATENCY_BOUNDS)
+        )
+        self.histogram[index] += 1
+        for i, field in enumerate(USAGE_FIELDS):
+            self.usage[i] += int(usage.get(field) or 0)
+
+    def merge(self, other: "_Bucket") -> None:
+        self.requests += other.requests
+        self.errors += other.errors
+        self.latency_sum += other.latency_sum
+        self.latency_max = max(self.latency_max, other.latency_max)
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+        self.usage = [a + b for a, b in zip(self.usage, other.usage)]
+
+    def pack(self, minute: int, proxy_id: int, model_id: int) -> bytes:
+        return _RECORD.pack(
+            minute,
+            proxy_id,
+            model_id,
+            self.requests,
+            self.errors,
+            self.latency_sum,
+            self.latency_max,
+            *self.histogram,
+            *self.usage,
+        )
+
+    @classmethod
+    def unpack(cls, values: Tuple[Any, ...]) -> Tuple[int, int, int, "_Bucket"]:
+        """从记录字段还原，返回（起始分钟、代理编号、模型编号、统计）"""
+        bucket = cls()
+        minute, proxy_id, model_id, bucket.requests, bucket.errors = values[:5]
+        bucket.latency_sum, bucket.latency_max = values[5], values[6]
+        histogram_end = 7 + len(LATENCY_BOUNDS) + 1
+        bucket.histogram = list(values[7:histogram_end])
+        bucket.usage = list(values[histogram_end:])
+        return minute, proxy_id, model_id, bucket
+
+    def percentile(self, q: float) -> Optional[float]:
+        """耗时百分位（所在分桶的上界，不超过最大耗时）"""
+        if not self.requests:
+            return None
+        target = self.requests * q / 100
+        count = 0
+        for index, value in enumerate(self.histogram):
+            count += value
+            if count >= target and value:
+                bound = LATENCY_BOUNDS[index] if index < len(LATENCY_BOUNDS) else math.inf
+                return min(bound, self.latency_max)
+        return self.latency_max
+
+
+class UsageParser:
+    """从转发的响应体中提取模型名称、usage 和流中的错误
+
+    SSE 响应逐块解析 message_start、message_delta 和 error 事件，只保留未完成的事件；
+    JSON 响应缓存完整响应体（最多 MAX_USAGE_BODY 字节），结束时解析 usage。
+    """
+
+    def __init__(self, content_type: Optional[str], content_encoding: Optional[str] = None):
+        media_type = (content_type or "").split(";", 1)[0].strip().lower()
+        self.stream = media_type == "text/event-stream"
+        self.json = media_type == "application/json"
+        self.encoding = (content_encoding or "identity").strip().lower()
+        self.model: Optional[str] = None
+        self.usage: Dict[str, int] = {}
+        self.error = False
+        self._buffer = b""
+        self._size = 0
+
+    def feed(self, chunk: bytes) -> None:
+        if self.stream:
+            self._buffer += chunk
+            while True:
+                end = self._buffer.find(b"\n\n")
+                if end < 0:
+                    break
+                event, self._buffer = self._buffer[:end], self._buffer[end + 2 :]
+                self._parse_event(event)
+        elif self.json:
+            self._size += len(chunk)
+            if self._size <= MAX_USAGE_BODY:
+                self._buffer += chunk
+            else:
+                self._buffer = b""
+
+    def _parse_event(self, event: bytes) -> None:
+        if (
+            b"message_start" not in event
+            and b"message_delta" not in event
+            and b"error" not in event
+        ):
+            return
+        name = ""
+        data = []
+        for line in event.replace(b"\r", b"").split(b"\n"):
+            if line.startswith(b"event:"):
+                name = line[6:].strip().decode("utf-8", "replace")
+            elif line.startswith(b"data:"):
+                data.append(line[5:].strip())
+        try:
+            payload = json.loads(b"\n".join(data) or b"{}")
+        except ValueError:
+            return
+        if not isinstance(payload, dict):
+            return
+        name = name or str(payload.get("type", ""))
+        if name == "message_start":
+            message = payload.get("message") or {}
+            self.model = message.get("model") or self.model
+            self._update_usage(message.get("usage"))
+        elif name == "message_delta":
+            self._update_usage(payload.get("usage"))
+        elif name == "error":
+            self.error = True
+
+    def _update_usage(self, usage: Any) -> None:
+        """usage 中的字段为累计值，后出现的值覆盖之前的值"""
+        if isinstance(usage, dict):
+            for field in USAGE_FIELDS:
+                if isinstance(usage.get(field), int):
+                    self.usage[field] = usage[field]
+
+    def finish(self) -> None:
+        """响应体结束，解析缓存的 JSON 响应"""
+        if not self.json or not self._buffer:
+            return
+        body, self._buffer = self._buffer, b""
+        try:
+            if self.encoding == "gzip":
+                body = gzip.decompress(body)
+            elif self.encoding == "deflate":
+                body = zlib.decompress(body)
+            elif self.encoding != "identity":
+                return
+            payload = json.loads(body)
+        except (OSError, EOFError, zlib.error, ValueError):
+            return
+        if isinstance(payload, dict):
+            if isinstance(payload.get("model"), str):
+                self.model = payload["model"]
+            self._update_usage(payload.get("usage"))
+
+
+class UsageMeter:
+    """在内存中按分钟聚合转发记录，由 take() 取出后写入 UsageStore"""
+
+    def __init__(self) -> None:
+        self._buckets: Dict[Tuple[int, str, str], _Bucket] = {}
+
+    def record(
+        self,
+        proxy: str,
+        model: Optional[str],
+        latency: float,
+        error: bool,
+        usage: Optional[Dict[str, int]] = None,
+        when: Optional[float] = None,
+    ) -> None:
+        """记录一个转发的请求
+
+        Args:
+            proxy: 代理名称
+            model: 模型名称，未知时为None
+            latency: 耗时（秒）
+            error: 是否失败（上游错误状态码、转发失败或流中的错误事件）
+            usage: 响应中的 usage 字段
+            when: 请求时间（Unix 时间），为None时使用当前时间
+        """
+        minute = int((time.time() if when is None else when) // 60)
+        key = (minute, proxy, model or "")
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket()
+        bucket.add_request(latency, error, usage or {})
+
+    def take(self) -> Dict[Tuple[int, str, str], _Bucket]:
+        """取出尚未写入的统计"""
+        buckets, self._buckets = self._buckets, {}
+        return buckets
+
+
+def _month(minute: int) -> str:
+    return time.strftime("%Y%m", time.gmtime(minute * 60))
+
+
+class UsageStore:
+    """用量统计的磁盘存储"""
+
+    def __init__(self, directory: Optional[Path] = None):
+        """初始化存储
+
+        Args:
+            directory: 存储目录，为None时使用缓存目录下的 usage 目录
+        """
+        self.directory = directory or (get_cache_directory("claudewarp") / "usage")
+        self.lock = ConfigLock(self.directory / "usage", timeout=5.0)
+        self.logger = logging.getLogger(__name__)
+
+    def _minutes_path(self, month: str) -> Path:
+        return self.directory / f"minutes-{month}.bin"
+
+    def _hours_path(self, month: str) -> Path:
+        return self.directory / f"hours-{month}.bin"
+
+    def _load_names(self) -> Dict[str, List[str]]:
+        try:
+            names = json.loads((self.directory / "names.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            names = {}
+        return {
+            "proxies": list(names.get("proxies", [])),
+            "models": list(names.get("models", [])),
+        }
+
+    def append(self, buckets: Dict[Tuple[int, str, str], _Bucket]) -> None:
+        """追加 UsageMeter.take() 取出的统计"""
+        if not buckets:
+            return
+        ensure_directory(self.directory, mode=0o700)
+        with self.lock.hold():
+            names = self._load_names()
+            ids = {
+                kind: {name: i for i, name in enumerate(values)} for kind, values in names.items()
+            }
+
+            def intern(kind: str, name: str) -> int:
+                if name not in ids[kind]:
+                    # 记录中的编号是 16 位无符号整数，在打包之前检查
+                    if len(names[kind]) > 0xFFFF:
+                        raise ValueError("用量统计中的代理或模型数量过多")
+                    ids[kind][name] = len(names[kind])
+                    names[kind].append(name)
+                return ids[kind][name]
+
+            grouped: Dict[str, List[bytes]] = {}
+            for (minute, proxy, model), bucket in sorted(buckets.items()):
+                record = bucket.pack(minute, intern("proxies", proxy), intern("models", model))
+                grouped.setdefault(_month(minute), []).append(record)
+            if not atomic_write(
+                self.directory / "names.json", json.dumps(names, ensure_ascii=False)
+            ):
+                raise OSError("写入用量统计名称表失败")
+
+            for month, records in grouped.items():
+                path = self._minutes_path(month)
+                with open(path, "ab") as f:
+                    # 丢弃上次写入中断留下的不完整记录，保证记录对齐
+                    size = f.tell()
+                    if size % _RECORD.size:
+                        f.truncate(size - size % _RECORD.size)
+                    f.write(b"".join(records))
+
+    def _fold(self, month: str) -> None:
+        """把新增的分钟记录汇总到小时记录（调用方需持有锁）
+
+        文件头和汇总后的记录一起写入临时文件后整体替换，中途崩溃时保留的是替换前后之一的完整文件，
+        不会出现记录已追加而已汇总条数未更新、下次重复汇总的情况。
+        """
+        minutes_path = self._minutes_path(month)
+        hours_path = self._hours_path(month)
+        total = minutes_path.stat().st_size // _RECORD.size
+
+        try:
+            data = hours_path.read_bytes()
+        except FileNotFoundError:
+            data = b""
+        folded = -1
+        if len(data) >= _ROLLUP_HEADER.size:
+            magic, version, record_size, folded = _ROLLUP_HEADER.unpack_from(data)
+            if (
+                magic != USAGE_MAGIC
+                or version != USAGE_FORMAT_VERSION
+                or record_size != _RECORD.size
+                or folded > total
+            ):
+                folded = -1
+        if folded < 0:
+            # 新文件或无法识别的文件：重新汇总全部分钟记录
+            folded, body = 0, b""
+        elif folded == total:
+            return
+        else:
+            body = data[_ROLLUP_HEADER.size :]
+            body = body[: len(body) - len(body) % _RECORD.size]
+
+        with open(minutes_path, "rb") as minutes:
+            minutes.seek(folded * _RECORD.size)
+            records = minutes.read((total - folded) * _RECORD.size)
+        hours: Dict[Tuple[int, int, int], _Bucket] = {}
+        for values in _RECORD.iter_unpack(records):
+            minute, proxy_id, model_id, bucket = _Bucket.unpack(values)
+            key = (minute - minute % 60, proxy_id, model_id)
+            if key in hours:
+                hours[key].merge(bucket)
+            else:
+                hours[key] = bucket
+
+        content = b"".join(
+            [
+                _ROLLUP_HEADER.pack(USAGE_MAGIC, USAGE_FORMAT_VERSION, _RECORD.size, total),
+                body,
+                *(bucket.pack(*key) for key, bucket in sorted(hours.items())),
+            ]
+        )
+        # 小时记录可以随时从分钟记录重新汇总，不需要 fsync；断电后文件为空或不完整时按无法识别处理
+        if not atomic_write(hours_path, content, durability=DURABILITY_RELAXED):
+            raise OSError("写入用量统计小时记录失败")
+
+    def _months(self) -> List[str]:
+        return sorted(path.stem.split("-", 1)[1] for path in self.directory.glob("minutes-*.bin"))
+
+    def _read_hours(self, month: str) -> Iterable[Tuple[Any, ...]]:
+        try:
+            data = self._hours_path(month).read_bytes()
+        except OSError:
+            return []
+        body = data[_ROLLUP_HEADER.size :]
+        return _RECORD.iter_unpack(body[: len(body) - len(body) % _RECORD.size])
+
+    def _read_recent_minutes(self, start: int, end: int) -> List[Tuple[Any, ...]]:
+        """从分钟记录文件末尾向前读取 [start, end) 分钟内的记录"""
+        path = self._minutes_path(_month(start))
+        records: List[Tuple[Any, ...]] = []
+        try:
+            with open(path, "rb") as f:
+                count = f.seek(0, 2) // _RECORD.size
+                block = 4096
+                while count > 0:
+                    first = max(0, count - block)
+                    f.seek(first * _RECORD.size)
+                    chunk = list(_RECORD.iter_unpack(f.read((count - first) * _RECORD.size)))
+                    records.extend(values for values in chunk if start <= values[0] < end)
+                    if max(values[0] for values in chunk) < start - _ORDER_SLACK:
+                        break
+                    count = first
+        except OSError:
+            return []
+        return records
+
+    def query(
+        self, since: Optional[float] = None, by: str = STATS_BY_PROXY
+    ) -> List[Dict[str, Any]]:
+        """统计用量
+
+        Args:
+            since: 起点（Unix 时间），为None时统计全部记录；早于 48 小时前的起点对齐到整点
+            by: 分组方式（proxy、model）
+
+        Returns:
+            List[Dict[str, Any]]: 按请求数从多到少排列，每项包含 name、requests、errors、error_rate、
+            avg_latency、p50、p95、max_latency（秒）和 USAGE_FIELDS 中的各 token 数
+        """
+        if by not in STATS_GROUPS:
+            raise ValueError(f"不支持的分组方式: {by}")
+        if not self.directory.is_dir():
+            return []
+
+        with self.lock.hold():
+            months = self._months()
+            for month in months:
+                self._fold(month)
+
+        records: List[Tuple[Any, ...]] = []
+        start_hour = 0
+        if since is not None:
+            start = int(since // 60)
+            start_hour = start - start % 60
+            if start != start_hour and since > time.time() - _MINUTE_PRECISION_WINDOW:
+                # 起点所在的小时按分钟统计，之后按小时统计
+                records.extend(self._read_recent_minutes(start, start_hour + 60))
+                start_hour += 60
+            months = [month for month in months if month >= _month(start)]
+        for month in months:
+            records.extend(values for values in self._read_hours(month) if values[0] >= start_hour)
+
+        names = self._load_names()
+        kind = "proxies" if by == STATS_BY_PROXY else "models"
+        index = 1 if by == STATS_BY_PROXY else 2
+        groups: Dict[str, _Bucket] = {}
+        for values in records:
+            _, _, _, bucket = _Bucket.unpack(values)
+            key_id = values[index]
+            name = names[kind][key_id] if key_id < len(names[kind]) else f"#{key_id}"
+            if name in groups:
+                groups[name].merge(bucket)
+            else:
+                groups[name] = bucket
+
+        stats = []
+        for name, bucket in groups.items():
+            stats.append(
+                {
+                    "name": name,
+                    "requests": bucket.requests,
+                    "errors": bucket.errors,
+                    "error_rate": bucket.errors / bucket.requests if bucket.requests else None,
+                    "avg_latency": (
+                        bucket.latency_sum / bucket.requests if bucket.requests else None
+                    ),
+                    "p50": bucket.percentile(50),
+                    "p95": bucket.percentile(95),
+                    "max_latency": bucket.latency_max if bucket.requests else None,
+                    **dict(zip(USAGE_FIELDS, bucket.usage)),
+                }
+            )
+        stats.sort(key=lambda item: (-item["requests"], item["name"]))
+        return stats
+
+
+__all__ = [
+    "LATENCY_BOUNDS",
+    "STATS_BY_MODEL",
+    "STATS_BY_PROXY",
+    "STATS_GROUPS",
+    "USAGE_FIELDS",
+    "UsageMeter",
+    "UsageParser",
+    "UsageStore",
+    "parse_since",
+]
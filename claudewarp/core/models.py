@@ -4,11 +4,13 @@
 定义代理服务器和配置相关的数据模型，使用Pydantic进行数据验证。
 """
 
+import hashlib
+import json
 import re
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Self
 
-from pydantic import BaseModel, Field, field_validator, model_validator
+from pydantic import BaseModel, Field, PrivateAttr, field_validator, model_validator
 from pydantic_core.core_schema import ValidationInfo
 
 class ProxyServer(BaseModel):
@@ -86,14 +88,9 @@ class ProxyServer(BaseModel):
 
     @field_validator("tags")
     def validate_tags(cls, v: List[str]) -> List[str]:
-        """验证标签列表"""
-        return list(set(i.strip() for i in v))
-
-    @field_validator("updated_at")
-    def update_timestamp(cls, v: str, values: dict) -> str:
-        """自动更新时间戳"""
-        return datetime.now().isoformat()
-    
+        """验证标签列表（去重并保持原有顺序，保证序列化结果稳定）"""
+        return list(dict.fromkeys(i.strip() for i in v))
+
     @model_validator(mode="after")
     def api_key_or_auth_token(cls, values: Self) -> Self:
         """确保api_key或auth_token至少有一个"""
@@ -113,6 +110,14 @@ class ProxyServer(BaseModel):
         
         return values
 
+    def content_dict(self) -> Dict[str, Any]:
+        """获取不含更新时间的字段内容，用于判断代理是否发生实质变化"""
+        return self.model_dump(exclude={"updated_at"})
+
+    def same_content(self, other: "ProxyServer") -> bool:
+        """判断与另一个代理的配置内容是否相同（忽略更新时间）"""
+        return self.content_dict() == other.content_dict()
+
     def get_auth_method(self) -> str:
         """获取当前使用的认证方法"""
         if self.auth_token and self.auth_token.strip():
@@ -181,6 +186,11 @@ class ProxyConfig(BaseModel):
     updated_at: str = Field(
         default_factory=lambda: datetime.now().isoformat(), description="配置最后更新时间"
     )
+    revision: int = Field(default=0, ge=0, description="配置修订号，每次保存时递增，用于检测并发修改")
+
+    # 最近一次加载或保存时的全局字段摘要和代理对象，用于判断配置是否有未保存的变更
+    _saved_digest: Optional[str] = PrivateAttr(default=None)
+    _saved_proxies: Dict[str, ProxyServer] = PrivateAttr(default_factory=dict)
 
     @field_validator("current_proxy")
     def validate_current_proxy(cls, v: Optional[str], values: ValidationInfo) -> Optional[str]:
@@ -201,10 +211,55 @@ class ProxyConfig(BaseModel):
                 )
         return v
 
-    @field_validator("updated_at")
-    def update_timestamp(cls, v: str, values: dict) -> str:
-        """自动更新时间戳"""
-        return datetime.now().isoformat()
+    def content_digest(self) -> str:
+        """计算配置内容摘要
+
+        忽略修订号以及配置和代理的更新时间，键顺序固定，内容实质相同的配置得到相同摘要。
+
+        Returns:
+            str: 十六进制SHA-256摘要
+        """
+        data = self.model_dump(
+            exclude={"updated_at": True, "revision": True, "proxies": {"__all__": {"updated_at"}}}
+        )
+        canonical = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _global_digest(self) -> str:
+        """计算代理以外的全局字段摘要（忽略修订号和更新时间）"""
+        data = self.model_dump(include={"version", "current_proxy", "settings", "created_at"})
+        canonical = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def mark_saved(self) -> None:
+        """记录当前内容已与存储一致
+
+        只计算全局字段的摘要，代理只保存对象引用，不序列化整个配置。
+        """
+        self._saved_digest = self._global_digest()
+        self._saved_proxies = dict(self.proxies)
+
+    def is_dirty(self) -> bool:
+        """判断配置是否有未保存的变更
+
+        从未加载或保存过的配置总是视为有变更。代理只比较与保存时不是同一对象的条目，
+        因此修改代理时应整体替换对象（如 model_copy(update=...)），而不是原地修改字段。
+        """
+        if self._saved_digest is None or self._saved_digest != self._global_digest():
+            return True
+
+        saved = self._saved_proxies
+        if len(saved) != len(self.proxies):
+            return True
+        for name, proxy in self.proxies.items():
+            old = saved.get(name)
+            if old is None or (old is not proxy and not proxy.same_content(old)):
+                return True
+        return False
+
+    def touch(self) -> None:
+        """将配置的更新时间设为当前时间"""
+        self.updated_at = datetime.now().isoformat()
 
     def get_current_proxy(self) -> Optional[ProxyServer]:
         """获取当前活跃的代理服务器"""
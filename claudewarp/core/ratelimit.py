@@ -0,0 +1,295 @@
+"""
+速率限制调度
+
+Anthropic 兼容的中转站在响应中返回 anthropic-ratelimit-* 和 retry-after 响应头。
+本地转发代理启用速率限制调度时，按上游代理记录这些响应头，用令牌桶估计剩余容量：
+
+- anthropic-ratelimit-requests-limit/remaining/reset：请求数令牌桶；
+- anthropic-ratelimit-tokens-*（没有时使用 input-tokens-*）：token 令牌桶，请求消耗的 token 按请求体大小估计
+  （提示缓存命中的 token 不计入限制，估计值偏大，因此只在估计剩余量耗尽时等待）；
+- retry-after（429/503/529 响应）：在指定时间之前不再向该上游发送请求。
+
+令牌桶按 reset 时间（RFC 3339，桶恢复满的时间）推算补充速度，没有 reset 时按每分钟恢复 limit 计算。
+估计容量不足时请求在本地排队，而不是发出后收到 429；代理池模式下优先选择有剩余容量的代理。
+排队的请求按客户端会话轮流放行，一个会话的大量请求不会让其他会话一直等待。
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .transport import Headers, header_value
+
+RATE_LIMIT_HEADER_PREFIX = "anthropic-ratelimit-"
+
+# 客户端会话标识请求头，没有时以客户端连接区分会话
+SESSION_HEADERS = ("x-claude-code-session-id", "x-claudewarp-session")
+
+# 请求在本地排队的最长时间（秒），超过后返回 429
+DEFAULT_MAX_QUEUE_WAIT = 60.0
+
+# 收到 429 但没有 retry-after 时暂停发送的时间（秒）
+DEFAULT_RETRY_AFTER = 1.0
+
+# 没有 reset 时间时，令牌桶每 REFILL_WINDOW 秒恢复 limit 个令牌
+REFILL_WINDOW = 60.0
+
+# 按请求体大小估计输入 token 数时，每个 token 对应的字节数
+BYTES_PER_TOKEN = 4
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """解析 retry-after 响应头（秒数或 HTTP 日期），返回需要等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, when.timestamp() - (time.time() if now is None else now))
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """解析 RFC 3339 格式的 reset 时间，返回距现在的秒数"""
+    if not value:
+        return None
+    try:
+        when = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when.timestamp() - time.time()
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """根据上游响应头估计的令牌桶"""
+
+    def __init__(self) -> None:
+        self.limit: Optional[int] = None
+        self.tokens = 0.0
+        self.rate = 0.0
+        self.updated = 0.0
+
+    def update(self, limit: int, remaining: int, reset_in: Optional[float], now: float) -> None:
+        """以上游报告的剩余量校准令牌桶"""
+        self.limit = max(1, limit)
+        self.tokens = float(min(remaining, self.limit))
+        self.updated = now
+        if reset_in is not None and reset_in > 0 and self.limit > remaining:
+            self.rate = (self.limit - remaining) / reset_in
+        else:
+            self.rate = self.limit / REFILL_WINDOW
+
+    def level(self, now: float) -> float:
+        """当前估计的剩余令牌数"""
+        if self.limit is None:
+            return float("inf")
+        return min(float(self.limit), self.tokens + self.rate * (now - self.updated))
+
+    def delay(self, cost: float, now: float) -> float:
+        """取出 cost 个令牌需要等待的时间（秒），上游没有报告限制时为 0"""
+        if self.limit is None:
+            return 0.0
+        cost = min(cost, self.limit)
+        missing = cost - self.level(now)
+        if missing <= 0:
+            return 0.0
+        return missing / self.rate if self.rate > 0 else REFILL_WINDOW
+
+    def consume(self, cost: float, now: float) -> None:
+        if self.limit is None:
+            return
+        self.tokens = self.level(now) - min(cost, self.limit)
+        self.updated = now
+
+
+class UpstreamRateLimit:
+    """单个上游的速率限制估计"""
+
+    def __init__(self) -> None:
+        self.requests = TokenBucket()
+        self.tokens = TokenBucket()
+        self.blocked_until = 0.0
+        self.throttled = 0
+
+    def update(self, status: int, headers: Headers) -> None:
+        """根据上游响应的状态码和响应头更新估计"""
+        now = time.monotonic()
+        for bucket, names in (
+            (self.requests, ("requests",)),
+            (self.tokens, ("tokens", "input-tokens")),
+        ):
+            for name in names:
+                prefix = f"{RATE_LIMIT_HEADER_PREFIX}{name}-"
+                limit = _parse_int(header_value(headers, prefix + "limit"))
+                remaining = _parse_int(header_value(headers, prefix + "remaining"))
+                if limit is not None and remaining is not None:
+                    reset_in = _parse_reset(header_value(headers, prefix + "reset"))
+                    bucket.update(limit, remaining, reset_in, now)
+                    break
+
+        retry_after = parse_retry_after(header_value(headers, "retry-after"))
+        if status == 429:
+            self.throttled += 1
+            if retry_after is None:
+                retry_after = DEFAULT_RETRY_AFTER
+        if retry_after is not None and status in (429, 503, 529):
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def delay(self) -> float:
+        """发送下一个请求需要等待的时间（秒）"""
+        now = time.monotonic()
+        return max(
+            self.blocked_until - now,
+            self.requests.delay(1, now),
+            self.tokens.delay(1, now),
+            0.0,
+        )
+
+    def consume(self, cost: float) -> None:
+        now = time.monotonic()
+        self.requests.consume(1, now)
+        self.tokens.consume(cost, now)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """估计的剩余请求数、剩余 token 数、需要等待的时间和收到的 429 次数"""
+        now = time.monotonic()
+        return {
+            "requests_remaining": None
+            if self.requests.limit is None
+            else int(self.requests.level(now)),
+            "tokens_remaining": None if self.tokens.limit is None else int(self.tokens.level(now)),
+            "blocked_for": max(0.0, self.blocked_until - now),
+            "throttled": self.throttled,
+        }
+
+
+class _FairQueue:
+    """等待同一上游容量的请求，按会话轮流放行"""
+
+    def __init__(self, limits: UpstreamRateLimit):
+        self.limits = limits
+        self._waiting: "OrderedDict[str, Deque[Tuple[asyncio.Future, float]]]" = OrderedDict()
+        self._dispatcher: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._waiting.values())
+
+    async def acquire(self, session: str, cost: float) -> None:
+        if not self._waiting and self.limits.delay() <= 0:
+            self.limits.consume(cost)
+            return
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(session, deque()).append((future, cost))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        await future
+
+    async def _dispatch(self) -> None:
+        while self._waiting:
+            session, queue = next(iter(self._waiting.items()))
+            future, cost = queue[0]
+            if future.done():
+                # 等待超时或客户端断开
+                self._pop(session)
+                continue
+            delay = self.limits.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            self._pop(session)
+            self.limits.consume(cost)
+            future.set_result(None)
+
+    def _pop(self, session: str) -> None:
+        """取出会话的第一个请求，会话还有请求时移到队尾"""
+        queue = self._waiting.pop(session)
+        queue.popleft()
+        if queue:
+            self._waiting[session] = queue
+
+
+class RateLimiter:
+    """按上游代理记录速率限制并调度请求"""
+
+    def __init__(self, max_wait: float = DEFAULT_MAX_QUEUE_WAIT):
+        """初始化调度器
+
+        Args:
+            max_wait: 请求在本地排队的最长时间（秒）
+        """
+        self.max_wait = max_wait
+        self._queues: Dict[str, _FairQueue] = {}
+
+    def _queue(self, name: str) -> _FairQueue:
+        queue = self._queues.get(name)
+        if queue is None:
+            queue = self._queues[name] = _FairQueue(UpstreamRateLimit())
+        return queue
+
+    def update(self, name: str, status: int, headers: Headers) -> None:
+        """记录上游响应中的速率限制信息"""
+        self._queue(name).limits.update(status, headers)
+
+    def delay(self, name: str) -> float:
+        """向上游发送请求需要等待的估计时间（秒，不包括排在前面的请求）"""
+        queue = self._queues.get(name)
+        return 0.0 if queue is None else queue.limits.delay()
+
+    def available(self, name: str) -> bool:
+        """上游是否有剩余容量且没有排队的请求"""
+        queue = self._queues.get(name)
+        return queue is None or (not queue.queued and queue.limits.delay() <= 0)
+
+    async def acquire(self, name: str, session: str, cost: float) -> float:
+        """等待上游有足够容量，返回等待的时间（秒）
+
+        Raises:
+            asyncio.TimeoutError: 排队时间超过 max_wait
+        """
+        started = time.monotonic()
+        await asyncio.wait_for(self._queue(name).acquire(session, cost), self.max_wait)
+        return time.monotonic() - started
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """各上游的速率限制估计和排队请求数"""
+        return {
+            name: {**queue.limits.snapshot(), "queued": queue.queued}
+            for name, queue in self._queues.items()
+        }
+
+
+def estimate_tokens(body: bytes) -> float:
+    """按请求体大小估计请求的输入 token 数"""
+    return len(body) / BYTES_PER_TOKEN
+
+
+__all__ = [
+    "DEFAULT_MAX_QUEUE_WAIT",
+    "RATE_LIMIT_HEADER_PREFIX",
+    "RateLimiter",
+    "SESSION_HEADERS",
+    "TokenBucket",
+    "UpstreamRateLimit",
+    "estimate_tokens",
+    "parse_retry_after",
+]
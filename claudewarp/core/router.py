@@ -0,0 +1,151 @@
+"""
+按模型路由
+
+本地转发代理从请求体中读取 model 字段，按配置项 settings.model_routes 把请求转发到不同的代理，
+例如小模型（延迟敏感、调用频繁）走最近的中转，大模型走吞吐最高的中转。
+
+路由规则是规则到代理名称的映射，按以下顺序匹配：
+
+1. 模型名称或通配符（fnmatch 语法，如 claude-opus-*），按添加顺序；
+2. small / big：请求模型的类别。模型是某个代理配置的 smallmodel，或名称中含 haiku 时为 small，否则为 big。
+
+读取 model 时只扫描请求体开头的有限范围，不解析、不复制整个请求体。扫描跳过字符串内容并记录
+对象嵌套深度，只接受顶层对象的 model 键，消息内容和 tool_use 输入中的同名字段不会误匹配；
+范围内没有找到顶层 model 时不路由。
+请求的模型是某个代理配置的 bigmodel/smallmodel 时，转发前替换为目标代理同类别的模型名称，
+不同中转对同一模型使用不同名称时也能正确路由。
+"""
+
+import fnmatch
+import re
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from .models import ProxyServer
+
+# 配置项中保存模型路由规则的键
+MODEL_ROUTES_SETTING_KEY = "model_routes"
+
+# 模型类别规则
+ROUTE_SMALL = "small"
+ROUTE_BIG = "big"
+MODEL_CLASSES = (ROUTE_SMALL, ROUTE_BIG)
+
+# 查找 model 字段的范围（字节）
+MODEL_PEEK_LIMIT = 64 * 1024
+
+# 扫描的记号：完整的字符串、括号，以及在范围内未结束的字符串（只剩开头的引号）
+_JSON_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]]|"')
+# 键与值之间的冒号，以及顶层 model 键之后的值
+_KEY_SEPARATOR = re.compile(rb"\s*:")
+_MODEL_VALUE = re.compile(rb'\s*:\s*"([^"\\]{1,256})"')
+
+
+class PeekedModel(NamedTuple):
+    """从请求体中读取的模型名称及其在请求体中的位置"""
+
+    model: str
+    start: int
+    end: int
+
+
+def peek_model(body: bytes, limit: int = MODEL_PEEK_LIMIT) -> Optional[PeekedModel]:
+    """读取请求体顶层对象的 model 字段
+
+    Args:
+        body: 请求体
+        limit: 只扫描前 limit 个字节
+
+    Returns:
+        Optional[PeekedModel]: 模型名称和位置，范围内没有顶层 model 字段或值无法识别时为None
+    """
+    depth = 0
+    for token in _JSON_TOKEN.finditer(body, 0, limit):
+        text = token.group()
+        if depth == 0 and text != b"{":
+            # 请求体不是 JSON 对象
+            return None
+        if text in (b"{", b"["):
+            depth += 1
+        elif text in (b"}", b"]"):
+            depth -= 1
+            if depth == 0:
+                return None
+        elif text == b'"':
+            return None
+        elif depth == 1 and text == b'"model"' and _KEY_SEPARATOR.match(body, token.end(), limit):
+            match = _MODEL_VALUE.match(body, token.end(), limit)
+            break
+    else:
+        return None
+    if match is None:
+        return None
+    try:
+        model = match.group(1).decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    return PeekedModel(model, match.start(1), match.end(1))
+
+
+def replace_model(body: bytes, peeked: PeekedModel, model: str) -> bytes:
+    """把请求体中的 model 字段替换为 model"""
+    return body[: peeked.start] + model.encode("utf-8") + body[peeked.end :]
+
+
+def model_class(model: str, proxies: Iterable[ProxyServer]) -> str:
+    """模型类别：某个代理的 smallmodel 或名称含 haiku 时为 small，否则为 big"""
+    if "haiku" in model.lower() or any(proxy.smallmodel == model for proxy in proxies):
+        return ROUTE_SMALL
+    return ROUTE_BIG
+
+
+def configured_class(model: str, proxies: Iterable[ProxyServer]) -> Optional[str]:
+    """模型在代理配置中的类别（是某个代理的 smallmodel/bigmodel），都不是时为None"""
+    big = False
+    for proxy in proxies:
+        if proxy.smallmodel == model:
+            return ROUTE_SMALL
+        big = big or proxy.bigmodel == model
+    return ROUTE_BIG if big else None
+
+
+def class_model(proxy: ProxyServer, model_class_name: str) -> Optional[str]:
+    """代理配置的某个类别的模型名称"""
+    return proxy.smallmodel if model_class_name == ROUTE_SMALL else proxy.bigmodel
+
+
+def match_route(
+    routes: Dict[str, str], model: str, proxies: Iterable[ProxyServer]
+) -> Optional[Tuple[str, str]]:
+    """查找模型匹配的路由规则
+
+    Args:
+        routes: 路由规则（规则到代理名称）
+        model: 请求的模型
+        proxies: 全部代理，用于判断模型类别
+
+    Returns:
+        Optional[Tuple[str, str]]: 匹配的规则和目标代理名称，没有匹配时为None
+    """
+    for rule, target in routes.items():
+        if rule not in MODEL_CLASSES and fnmatch.fnmatchcase(model, rule):
+            return rule, target
+    rule = model_class(model, proxies)
+    if rule in routes:
+        return rule, routes[rule]
+    return None
+
+
+__all__ = [
+    "MODEL_CLASSES",
+    "MODEL_PEEK_LIMIT",
+    "MODEL_ROUTES_SETTING_KEY",
+    "PeekedModel",
+    "ROUTE_BIG",
+    "ROUTE_SMALL",
+    "class_model",
+    "configured_class",
+    "match_route",
+    "model_class",
+    "peek_model",
+    "replace_model",
+]
@@ -0,0 +1,466 @@
+"""
+配置存储后端
+
+定义ConfigManager使用的存储后端接口，并提供TOML（默认）、JSON和SQLite三种实现。
+文档型后端（TOML/JSON）负责整份配置的序列化，写入、备份等由ConfigManager统一处理；
+SQLite后端每个代理一行，增删改只执行单行语句，无需重写整个文件。
+"""
+
+import hashlib
+import json
+import re
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Type, Union
+
+import toml
+
+from .exceptions import ConfigError, ConfigFileCorruptedError
+from .utils import DURABILITY_RELAXED, DURABILITY_STANDARD, DURABILITY_STRICT
+
+# 每次保存都会变化的字段（以及文件头注释），计算内容指纹时忽略
+_VOLATILE_LINE = re.compile(
+    rb'^[ \t]*(?:#.*|"?(?:updated_at|revision)"?[ \t]*[=:].*)(?:\r?\n|$)', re.MULTILINE
+)
+
+
+class StorageBackend(ABC):
+    """存储后端基类
+
+    所有后端都以统一的字典结构交换配置数据：
+    ``{"version", "current_proxy", "created_at", "updated_at", "settings", "proxies"}``，
+    其中 ``proxies`` 为 ``{名称: 代理字段字典}``。
+    具体后端继承 DocumentStorageBackend（整份文档序列化）或 DatabaseStorageBackend（直接读写存储）。
+    """
+
+    #: 后端名称
+    name: str = ""
+    #: 默认文件扩展名
+    suffix: str = ""
+    #: 是否为整份文档序列化的后端（由ConfigManager负责原子写入和备份）
+    is_document: bool = True
+    #: 是否支持按代理增量写入
+    supports_incremental: bool = False
+
+    def fingerprint(self, path: Path, raw: bytes) -> str:
+        """计算配置内容的规范化指纹
+
+        忽略注释和更新时间等每次保存都会变化的内容，内容实质相同的文件得到相同指纹，
+        用于备份去重。文档型后端逐行过滤，无需解析整个文件。
+
+        Args:
+            path: 存储路径
+            raw: 文件原始内容
+
+        Returns:
+            str: 十六进制SHA-256指纹
+        """
+        return hashlib.sha256(_VOLATILE_LINE.sub(b"", raw)).hexdigest()
+
+
+class DocumentStorageBackend(StorageBackend):
+    """文档型存储后端基类：只负责整份配置的解析和序列化"""
+
+    is_document = True
+
+    @abstractmethod
+    def loads(self, path: Path, raw: bytes) -> Dict[str, Any]:
+        """从文件原始内容解析配置数据
+
+        Args:
+            path: 配置文件路径，用于错误信息
+            raw: 文件原始内容
+
+        Returns:
+            Dict[str, Any]: 配置数据
+
+        Raises:
+            ConfigFileCorruptedError: 内容格式错误
+        """
+
+    @abstractmethod
+    def dumps(self, data: Dict[str, Any]) -> str:
+        """将配置数据序列化为文件内容
+
+        Args:
+            data: 配置数据
+
+        Returns:
+            str: 文件内容
+        """
+
+
+class DatabaseStorageBackend(StorageBackend):
+    """非文档型存储后端基类：直接读写存储，写入的原子性由后端自己保证"""
+
+    is_document = False
+
+    @abstractmethod
+    def read(self, path: Path) -> Dict[str, Any]:
+        """直接从存储读取配置数据
+
+        Args:
+            path: 存储路径
+
+        Returns:
+            Dict[str, Any]: 配置数据
+        """
+
+    def read_revision(self, path: Path) -> int:
+        """读取配置修订号
+
+        Args:
+            path: 存储路径
+
+        Returns:
+            int: 修订号，尚未记录时为0
+        """
+        return int(self.read(path).get("revision") or 0)
+
+    @abstractmethod
+    def write(self, path: Path, data: Dict[str, Any]) -> bool:
+        """将完整配置数据写入存储
+
+        Args:
+            path: 存储路径
+            data: 配置数据
+
+        Returns:
+            bool: 是否成功写入
+        """
+
+    def write_changes(
+        self,
+        path: Path,
+        data: Dict[str, Any],
+        changed: Iterable[str] = (),
+        removed: Iterable[str] = (),
+    ) -> bool:
+        """增量写入配置变更
+
+        全局字段（当前代理、设置等）总是随变更一起写入。
+        不支持增量写入（supports_incremental 为False）的后端写入完整配置。
+
+        Args:
+            path: 存储路径
+            data: 完整配置数据
+            changed: 新增或修改的代理名称
+            removed: 删除的代理名称
+
+        Returns:
+            bool: 是否成功写入
+        """
+        return self.write(path, data)
+
+
+class TomlStorageBackend(DocumentStorageBackend):
+    """TOML文件存储后端（默认）"""
+
+    name = "toml"
+    suffix = ".toml"
+
+    def loads(self, path: Path, raw: bytes) -> Dict[str, Any]:
+        try:
+            return toml.loads(raw.decode("utf-8"))
+        except (toml.TomlDecodeError, UnicodeDecodeError) as e:
+            raise ConfigFileCorruptedError(str(path), str(e)) from None
+
+    def dumps(self, data: Dict[str, Any]) -> str:
+        try:
+            toml_content = toml.dumps(data)
+        except Exception as e:
+            raise ConfigError(f"序列化配置失败: {e}") from None
+
+        # 添加文件头注释
+        header = f"""# Claude中转站管理工具配置文件
+# 配置文件版本: {data.get("version")}
+# 最后更新: {data.get("updated_at")}
+# 警告: 请勿手动编辑此文件，除非您了解其格式
+
+"""
+
+        return header + toml_content
+
+
+class JsonStorageBackend(DocumentStorageBackend):
+    """JSON文件存储后端"""
+
+    name = "json"
+    suffix = ".json"
+
+    def loads(self, path: Path, raw: bytes) -> Dict[str, Any]:
+        try:
+            data = json.loads(raw.decode("utf-8"))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ConfigFileCorruptedError(str(path), str(e)) from None
+
+        if not isinstance(data, dict):
+            raise ConfigFileCorruptedError(str(path), "顶层结构必须是对象")
+        return data
+
+    def dumps(self, data: Dict[str, Any]) -> str:
+        try:
+            return json.dumps(data, indent=2, ensure_ascii=False) + "\n"
+        except (TypeError, ValueError) as e:
+            raise ConfigError(f"序列化配置失败: {e}") from None
+
+
+class SQLiteStorageBackend(DatabaseStorageBackend):
+    """SQLite数据库存储后端
+
+    每个代理占一行，标签单独建表并建立索引；全局字段以JSON编码存放在meta表中。
+    代理的先后顺序由rowid保持。
+    """
+
+    name = "sqlite"
+    suffix = ".db"
+    supports_incremental = True
+
+    # 代理表的列，与ProxyServer字段对应（tags单独存放）
+    PROXY_COLUMNS = (
+        "name",
+        "base_url",
+        "api_key",
+        "auth_token",
+        "description",
+        "is_active",
+        "bigmodel",
+        "smallmodel",
+        "created_at",
+        "updated_at",
+    )
+
+    # 存放在meta表中的全局字段
+    META_KEYS = ("version", "revision", "current_proxy", "created_at", "updated_at", "settings")
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS proxies (
+        name TEXT PRIMARY KEY,
+        base_url TEXT NOT NULL,
+        api_key TEXT,
+        auth_token TEXT,
+        description TEXT NOT NULL DEFAULT '',
+        is_active INTEGER NOT NULL DEFAULT 1,
+        bigmodel TEXT,
+        smallmodel TEXT,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS proxy_tags (
+        proxy_name TEXT NOT NULL REFERENCES proxies(name) ON DELETE CASCADE,
+        tag TEXT NOT NULL,
+        PRIMARY KEY (proxy_name, tag)
+    );
+    CREATE INDEX IF NOT EXISTS idx_proxy_tags_tag ON proxy_tags(tag);
+    """
+
+    # 持久化级别对应的 PRAGMA synchronous 取值
+    SYNCHRONOUS = {
+        DURABILITY_STRICT: "EXTRA",
+        DURABILITY_RELAXED: "OFF",
+    }
+
+    def __init__(self, timeout: float = 10.0, durability: str = DURABILITY_STANDARD):
+        """初始化SQLite后端
+
+        Args:
+            timeout: 等待数据库锁的超时时间（秒）
+            durability: 持久化级别，决定 PRAGMA synchronous 的取值
+        """
+        self.timeout = timeout
+        self.durability = durability
+
+    def _connect(self, path: Path):
+        """打开数据库连接并确保表结构存在"""
+        import sqlite3
+
+        try:
+            conn = sqlite3.connect(str(path), timeout=self.timeout)
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.execute(f"PRAGMA synchronous = {self.SYNCHRONOUS.get(self.durability, 'FULL')}")
+            conn.executescript(self.SCHEMA)
+        except sqlite3.DatabaseError as e:
+            raise ConfigFileCorruptedError(str(path), str(e)) from None
+        return conn
+
+    def read(self, path: Path) -> Dict[str, Any]:
+        import sqlite3
+
+        conn = self._connect(path)
+        try:
+            data: Dict[str, Any] = {}
+            for key, value in conn.execute("SELECT key, value FROM meta"):
+                data[key] = json.loads(value)
+
+            tags: Dict[str, List[str]] = {}
+            for proxy_name, tag in conn.execute(
+                "SELECT proxy_name, tag FROM proxy_tags ORDER BY rowid"
+            ):
+                tags.setdefault(proxy_name, []).append(tag)
+
+            columns = ", ".join(self.PROXY_COLUMNS)
+            proxies: Dict[str, Dict[str, Any]] = {}
+            for row in conn.execute(f"SELECT {columns} FROM proxies ORDER BY rowid"):
+                proxy = dict(zip(self.PROXY_COLUMNS, row))
+                proxy["is_active"] = bool(proxy["is_active"])
+                proxy["tags"] = tags.get(proxy["name"], [])
+                proxies[proxy["name"]] = proxy
+
+            data["proxies"] = proxies
+            return data
+
+        except (sqlite3.DatabaseError, ValueError) as e:
+            raise ConfigFileCorruptedError(str(path), str(e)) from None
+        finally:
+            conn.close()
+
+    def read_revision(self, path: Path) -> int:
+        import sqlite3
+
+        conn = self._connect(path)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+            return int(json.loads(row[0]) or 0) if row else 0
+        except (sqlite3.DatabaseError, ValueError) as e:
+            raise ConfigFileCorruptedError(str(path), str(e)) from None
+        finally:
+            conn.close()
+
+    def write(self, path: Path, data: Dict[str, Any]) -> bool:
+        proxies = data.get("proxies", {})
+        conn = self._connect(path)
+        try:
+            with conn:
+                self._write_meta(conn, data)
+                existing = {row[0] for row in conn.execute("SELECT name FROM proxies")}
+                for name in existing - set(proxies):
+                    conn.execute("DELETE FROM proxies WHERE name = ?", (name,))
+                for proxy in proxies.values():
+                    self._upsert_proxy(conn, proxy)
+            return True
+        finally:
+            conn.close()
+
+    def write_changes(
+        self,
+        path: Path,
+        data: Dict[str, Any],
+        changed: Iterable[str] = (),
+        removed: Iterable[str] = (),
+    ) -> bool:
+        proxies = data.get("proxies", {})
+        conn = self._connect(path)
+        try:
+            with conn:
+                self._write_meta(conn, data)
+                for name in removed:
+                    conn.execute("DELETE FROM proxies WHERE name = ?", (name,))
+                for name in changed:
+                    if name in proxies:
+                        self._upsert_proxy(conn, proxies[name])
+            return True
+        finally:
+            conn.close()
+
+    def fingerprint(self, path: Path, raw: bytes) -> str:
+        # 数据库文件的字节内容与数据无一一对应关系，按读出的数据计算
+        data = self.read(path)
+        data.pop("updated_at", None)
+        data.pop("revision", None)
+        for proxy in data.get("proxies", {}).values():
+            proxy.pop("updated_at", None)
+        canonical = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _write_meta(self, conn, data: Dict[str, Any]) -> None:
+        """写入全局字段"""
+        conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            [(key, json.dumps(data.get(key), ensure_ascii=False)) for key in self.META_KEYS],
+        )
+
+    def _upsert_proxy(self, conn, proxy: Dict[str, Any]) -> None:
+        """插入或更新单个代理及其标签"""
+        columns = ", ".join(self.PROXY_COLUMNS)
+        placeholders = ", ".join("?" for _ in self.PROXY_COLUMNS)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in self.PROXY_COLUMNS if c != "name")
+        values = [proxy.get(c) for c in self.PROXY_COLUMNS]
+        values[self.PROXY_COLUMNS.index("is_active")] = int(bool(proxy.get("is_active", True)))
+        if values[self.PROXY_COLUMNS.index("description")] is None:
+            values[self.PROXY_COLUMNS.index("description")] = ""
+
+        # 使用UPSERT而非REPLACE，保持rowid（即代理顺序）不变
+        conn.execute(
+            f"INSERT INTO proxies ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT(name) DO UPDATE SET {updates}",
+            values,
+        )
+        conn.execute("DELETE FROM proxy_tags WHERE proxy_name = ?", (proxy["name"],))
+        conn.executemany(
+            "INSERT OR IGNORE INTO proxy_tags (proxy_name, tag) VALUES (?, ?)",
+            [(proxy["name"], tag) for tag in proxy.get("tags") or []],
+        )
+
+
+# 已注册的存储后端
+STORAGE_BACKENDS: Dict[str, Type[StorageBackend]] = {
+    TomlStorageBackend.name: TomlStorageBackend,
+    JsonStorageBackend.name: JsonStorageBackend,
+    SQLiteStorageBackend.name: SQLiteStorageBackend,
+}
+
+# 文件扩展名到后端名称的映射
+_SUFFIX_BACKENDS = {
+    ".toml": "toml",
+    ".json": "json",
+    ".db": "sqlite",
+    ".sqlite": "sqlite",
+    ".sqlite3": "sqlite",
+}
+
+
+def get_storage_backend(
+    storage: Optional[Union[str, StorageBackend]] = None, path: Optional[Path] = None
+) -> StorageBackend:
+    """获取存储后端实例
+
+    Args:
+        storage: 后端名称或后端实例，为None时根据文件扩展名推断
+        path: 配置文件路径
+
+    Returns:
+        StorageBackend: 存储后端实例
+
+    Raises:
+        ConfigError: 不支持的存储后端
+    """
+    if isinstance(storage, StorageBackend):
+        return storage
+
+    if storage is None:
+        suffix = path.suffix.lower() if path is not None else ""
+        storage = _SUFFIX_BACKENDS.get(suffix, TomlStorageBackend.name)
+
+    backend_class = STORAGE_BACKENDS.get(storage.lower())
+    if backend_class is None:
+        raise ConfigError(
+            f"不支持的存储后端: {storage}。支持的后端: {', '.join(STORAGE_BACKENDS)}"
+        )
+    return backend_class()
+
+
+__all__ = [
+    "StorageBackend",
+    "DocumentStorageBackend",
+    "DatabaseStorageBackend",
+    "TomlStorageBackend",
+    "JsonStorageBackend",
+    "SQLiteStorageBackend",
+    "STORAGE_BACKENDS",
+    "get_storage_backend",
+]
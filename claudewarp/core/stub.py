@@ -0,0 +1,338 @@
+"""
+本地模拟服务器
+
+模拟 Anthropic Messages API 的最小 HTTP 服务器，用于离线测试性能测试和转发代理：
+
+- POST .../v1/messages：按 stream 参数返回 SSE 流或 JSON，先等待 ttft 秒，
+  之后每个 token 间隔 token_delay 秒，token 数为 tokens 与请求 max_tokens 中较小的一个；
+- GET .../v1/models：返回模型列表；
+- 按 error_rate 随机返回 529 overloaded_error；
+- 设置 rate_limit（每分钟请求数）时返回 anthropic-ratelimit-requests-* 响应头，超过限制时返回 429 和 retry-after；
+- 没有携带凭据（或与 api_key 不符）时返回 401。
+"""
+
+import asyncio
+import contextlib
+import itertools
+import json
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .transport import (
+    Headers,
+    HTTPProtocolError,
+    encode_chunk,
+    encode_head,
+    header_value,
+    iter_body,
+    read_head,
+    wants_close,
+)
+
+DEFAULT_STUB_PORT = 8765
+
+
+def _sse(event: str, data: Dict[str, Any]) -> bytes:
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n".encode("utf-8")
+
+
+class StubServer:
+    """模拟 Anthropic Messages API 的本地服务器"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_STUB_PORT,
+        ttft: float = 0.05,
+        token_delay: float = 0.01,
+        tokens: int = 64,
+        error_rate: float = 0.0,
+        api_key: Optional[str] = None,
+        rate_limit: Optional[int] = None,
+    ):
+        """初始化模拟服务器
+
+        Args:
+            host: 监听地址
+            port: 监听端口，为0时自动分配
+            ttft: 返回第一个 token 前的等待时间（秒）
+            token_delay: 相邻 token 的间隔（秒）
+            tokens: 每个响应最多生成的 token 数
+            error_rate: 随机返回 529 的比例（0-1）
+            api_key: 要求的凭据，为None时接受任意凭据
+            rate_limit: 每分钟请求数上限（令牌桶，持续恢复），为None时不限制
+        """
+        self.host = host
+        self.port = port
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.tokens = max(1, tokens)
+        self.error_rate = error_rate
+        self.api_key = api_key
+        self.rate_limit = rate_limit
+        self.requests = 0
+        self.throttled = 0
+        self._bucket = float(rate_limit or 0)
+        self._bucket_updated = time.monotonic()
+        self.logger = logging.getLogger(__name__)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+        self._ids = itertools.count(1)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/"
+
+    async def start(self) -> int:
+        """开始监听，返回实际端口"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.logger.info(f"模拟服务器已启动: {self.url}")
+        return self.port
+
+    async def close(self) -> None:
+        """停止监听并关闭所有连接"""
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._connections):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        await self._server.serve_forever()
+
+    def run(self) -> None:
+        """在新的事件循环中运行，直到被中断"""
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(self.serve_forever())
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    start_line, headers = await read_head(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                method, target, version = (start_line.split(" ") + ["", ""])[:3]
+                body = b"".join([chunk async for chunk in iter_body(reader, headers, False)])
+                self.requests += 1
+                close = wants_close(version, headers)
+                await self._respond(writer, method, target, headers, body, close)
+                if close:
+                    return
+        except (HTTPProtocolError, ConnectionError, asyncio.IncompleteReadError) as e:
+            self.logger.debug(f"模拟服务器连接中断: {e}")
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    def _take_rate_limit(self) -> Tuple[bool, List[Tuple[str, str]]]:
+        """从令牌桶取出一个请求，返回是否允许和速率限制响应头"""
+        if not self.rate_limit:
+            return True, []
+        now = time.monotonic()
+        rate = self.rate_limit / 60.0
+        self._bucket = min(
+            float(self.rate_limit), self._bucket + (now - self._bucket_updated) * rate
+        )
+        self._bucket_updated = now
+        allowed = self._bucket >= 1
+        if allowed:
+            self._bucket -= 1
+        reset = datetime.now(timezone.utc) + timedelta(
+            seconds=(self.rate_limit - self._bucket) / rate
+        )
+        headers = [
+            ("anthropic-ratelimit-requests-limit", str(self.rate_limit)),
+            ("anthropic-ratelimit-requests-remaining", str(int(self._bucket))),
+            ("anthropic-ratelimit-requests-reset", reset.isoformat(timespec="seconds")),
+        ]
+        if not allowed:
+            headers.append(("retry-after", str(max(1, int((1 - self._bucket) / rate + 0.999)))))
+        return allowed, headers
+
+    def _authorized(self, headers: Headers) -> bool:
+        credential = header_value(headers, "x-api-key")
+        authorization = header_value(headers, "authorization") or ""
+        if credential is None and authorization.lower().startswith("bearer "):
+            credential = authorization[7:].strip()
+        if not credential:
+            return False
+        return self.api_key is None or credential == self.api_key
+
+    async def _send_json(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        data: Dict[str, Any],
+        close: bool,
+        extra_headers: Optional[Headers] = None,
+    ) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        reasons = {
+            200: "OK",
+            400: "Bad Request",
+            401: "Unauthorized",
+            404: "Not Found",
+            429: "Too Many Requests",
+            529: "Overloaded",
+        }
+        headers = [
+            ("Content-Type", "application/json"),
+            ("Content-Length", str(len(body))),
+            ("request-id", f"req_stub_{next(self._ids)}"),
+            *(extra_headers or []),
+        ]
+        if close:
+            headers.append(("Connection", "close"))
+        start_line = f"HTTP/1.1 {status} {reasons.get(status, 'Error')}"
+        writer.write(encode_head(start_line, headers) + body)
+        await writer.drain()
+
+    def _error(self, error_type: str, message: str) -> Dict[str, Any]:
+        return {"type": "error", "error": {"type": error_type, "message": message}}
+
+    async def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        method: str,
+        target: str,
+        headers: Headers,
+        body: bytes,
+        close: bool,
+    ) -> None:
+        path = target.split("?", 1)[0].rstrip("/")
+        if not self._authorized(headers):
+            await self._send_json(
+                writer, 401, self._error("authentication_error", "invalid x-api-key"), close
+            )
+            return
+        if method == "GET" and path.endswith("/v1/models"):
+            models = [{"type": "model", "id": "stub-model", "display_name": "Stub Model"}]
+            await self._send_json(writer, 200, {"data": models, "has_more": False}, close)
+            return
+        if method != "POST" or not path.endswith("/v1/messages"):
+            await self._send_json(writer, 404, self._error("not_found_error", "Not Found"), close)
+            return
+
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            await self._send_json(
+                writer, 400, self._error("invalid_request_error", "invalid JSON body"), close
+            )
+            return
+        allowed, rate_headers = self._take_rate_limit()
+        if not allowed:
+            self.throttled += 1
+            await self._send_json(
+                writer,
+                429,
+                self._error("rate_limit_error", "Number of requests has exceeded your rate limit"),
+                close,
+                rate_headers,
+            )
+            return
+        if self.error_rate and random.random() < self.error_rate:
+            await self._send_json(writer, 529, self._error("overloaded_error", "Overloaded"), close)
+            return
+
+        model = request.get("model") or "stub-model"
+        count = min(self.tokens, int(request.get("max_tokens") or self.tokens))
+        stop_reason = "max_tokens" if count < self.tokens else "end_turn"
+        usage = {"input_tokens": max(1, len(body) // 4), "output_tokens": count}
+        message_id = f"msg_stub_{next(self._ids)}"
+
+        if not request.get("stream"):
+            await asyncio.sleep(self.ttft + self.token_delay * (count - 1))
+            message = {
+                "id": message_id,
+                "type": "message",
+                "role": "assistant",
+                "model": model,
+                "content": [{"type": "text", "text": "tok " * count}],
+                "stop_reason": stop_reason,
+                "stop_sequence": None,
+                "usage": usage,
+            }
+            await self._send_json(writer, 200, message, close, rate_headers)
+            return
+
+        response_headers = [
+            ("Content-Type", "text/event-stream"),
+            ("Cache-Control", "no-cache"),
+            ("Transfer-Encoding", "chunked"),
+            ("request-id", f"req_stub_{next(self._ids)}"),
+            *rate_headers,
+        ]
+        if close:
+            response_headers.append(("Connection", "close"))
+        writer.write(encode_head("HTTP/1.1 200 OK", response_headers))
+        start = {
+            "type": "message_start",
+            "message": {
+                "id": message_id,
+                "type": "message",
+                "role": "assistant",
+                "model": model,
+                "content": [],
+                "stop_reason": None,
+                "stop_sequence": None,
+                "usage": {"input_tokens": usage["input_tokens"], "output_tokens": 1},
+            },
+        }
+        writer.write(
+            encode_chunk(
+                _sse("message_start", start)
+                + _sse(
+                    "content_block_start",
+                    {
+                        "type": "content_block_start",
+                        "index": 0,
+                        "content_block": {"type": "text", "text": ""},
+                    },
+                )
+            )
+        )
+        await writer.drain()
+
+        await asyncio.sleep(self.ttft)
+        for index in range(count):
+            if index:
+                await asyncio.sleep(self.token_delay)
+            delta = {
+                "type": "content_block_delta",
+                "index": 0,
+                "delta": {"type": "text_delta", "text": "tok "},
+            }
+            writer.write(encode_chunk(_sse("content_block_delta", delta)))
+            await writer.drain()
+
+        writer.write(
+            encode_chunk(
+                _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+                + _sse(
+                    "message_delta",
+                    {
+                        "type": "message_delta",
+                        "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                        "usage": {"output_tokens": count},
+                    },
+                )
+                + _sse("message_stop", {"type": "message_stop"})
+            )
+            + b"0\r\n\r\n"
+        )
+        await writer.drain()
+
+
+__all__ = ["DEFAULT_STUB_PORT", "StubServer"]
@@ -0,0 +1,213 @@
+"""
+Claude Code 配置同步目标
+
+除了 ~/.claude/settings.json，还可以把当前代理同步到登记的其他 Claude Code 配置文件，
+例如各项目的 .claude/settings.local.json、容器挂载或其他用户的配置目录。
+目标列表保存在配置项 settings.claude_code_targets 中。
+
+同步时使用线程池并发写入各个目标。每个目标记录上次成功同步后的文件状态和期望内容的摘要，
+文件未被修改且期望内容相同时直接跳过，不读取文件。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from .claude_settings import ClaudeSettingsFile
+from .utils import (
+    DURABILITY_RELAXED,
+    atomic_write,
+    ensure_directory,
+    file_signature,
+    get_cache_directory,
+)
+
+# 配置项中保存同步目标列表的键
+TARGETS_SETTING_KEY = "claude_code_targets"
+
+# 默认的并发写入线程数
+DEFAULT_SYNC_WORKERS = 16
+
+# 同步结果状态
+TARGET_UPDATED = "updated"
+TARGET_UNCHANGED = "unchanged"
+TARGET_SKIPPED = "skipped"
+TARGET_FAILED = "failed"
+
+
+def resolve_target_path(path: Union[str, Path]) -> Path:
+    """规范化同步目标路径
+
+    以 .json 结尾的路径视为配置文件本身，其他路径视为 Claude Code 配置目录，
+    对应其中的 settings.json。
+
+    Args:
+        path: 配置文件或配置目录路径
+
+    Returns:
+        Path: 配置文件的绝对路径
+    """
+    target = Path(os.path.abspath(os.path.expanduser(str(path))))
+    if target.suffix.lower() != ".json":
+        target = target / "settings.json"
+    return target
+
+
+def _desired_digest(updates: Dict[str, Any], remove: Iterable[str], prune_empty: bool) -> str:
+    """计算期望修改内容的摘要"""
+    canonical = json.dumps(
+        [updates, sorted(remove), prune_empty], sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ClaudeCodeTargetSync:
+    """将环境变量并发同步到多个 Claude Code 配置文件"""
+
+    def __init__(
+        self,
+        durability: Optional[str] = None,
+        max_workers: int = DEFAULT_SYNC_WORKERS,
+        state_path: Optional[Path] = None,
+    ):
+        """初始化同步器
+
+        Args:
+            durability: 写入目标文件的持久化级别
+            max_workers: 并发写入的线程数
+            state_path: 同步状态缓存文件路径，为None时使用缓存目录下的默认路径
+        """
+        self.durability = durability
+        self.max_workers = max(1, max_workers)
+        self.state_path = state_path or (
+            get_cache_directory("claudewarp") / "claude_code_targets.json"
+        )
+        self.logger = logging.getLogger(__name__)
+
+    def _load_state(self) -> Dict[str, Any]:
+        """读取同步状态缓存，缓存损坏时视为空"""
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            return state if isinstance(state, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict[str, Any]) -> None:
+        """保存同步状态缓存，失败时只记录日志"""
+        try:
+            ensure_directory(self.state_path.parent, mode=0o700)
+            atomic_write(
+                self.state_path,
+                json.dumps(state, ensure_ascii=False, sort_keys=True),
+                skip_unchanged=True,
+                durability=DURABILITY_RELAXED,
+            )
+        except OSError as e:
+            self.logger.debug(f"保存同步状态缓存失败: {e}")
+
+    def _sync_one(
+        self,
+        path: Path,
+        updates: Dict[str, Any],
+        remove: List[str],
+        prune_empty: bool,
+        digest: str,
+        cached: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """同步单个目标，返回同步结果"""
+        started = time.perf_counter()
+        result: Dict[str, Any] = {"path": str(path), "status": TARGET_FAILED, "error": None}
+
+        try:
+            signature = file_signature(path)
+            if (
+                cached is not None
+                and cached.get("digest") == digest
+                and cached.get("signature") == (list(signature) if signature else None)
+            ):
+                result["status"] = TARGET_SKIPPED
+            elif not path.parent.is_dir():
+                # 不自动创建目录，避免为已删除的项目重新生成配置
+                result["error"] = f"目录不存在: {path.parent}"
+            else:
+                settings_file = ClaudeSettingsFile(path, durability=self.durability)
+                written = settings_file.update_env(updates, remove, prune_empty=prune_empty)
+                result["status"] = TARGET_UPDATED if written else TARGET_UNCHANGED
+        except Exception as e:
+            result["error"] = str(e)
+
+        result["elapsed"] = time.perf_counter() - started
+        return result
+
+    def sync(
+        self,
+        targets: Iterable[Path],
+        updates: Dict[str, Any],
+        remove: Iterable[str] = (),
+        prune_empty: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """并发修改所有目标的环境变量
+
+        Args:
+            targets: 目标配置文件路径
+            updates: 需要设置的环境变量
+            remove: 需要删除的环境变量
+            prune_empty: env 变为空时删除该字段，文件变为空时删除文件
+
+        Returns:
+            List[Dict[str, Any]]: 与 targets 顺序一致的同步结果，每项包含
+            path、status（updated、unchanged、skipped、failed）、elapsed（秒）和 error
+        """
+        targets = [Path(target) for target in targets]
+        if not targets:
+            return []
+
+        remove = [key for key in remove if key not in updates]
+        digest = _desired_digest(updates, remove, prune_empty)
+        state = self._load_state()
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        workers = min(self.max_workers, len(targets))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="claudewarp-sync") as pool:
+            results = list(
+                pool.map(
+                    lambda path: self._sync_one(
+                        path, updates, remove, prune_empty, digest, state.get(str(path))
+                    ),
+                    targets,
+                )
+            )
+
+        # 记录同步成功的目标当前的文件状态，下次内容相同且文件未变化时跳过
+        for result in results:
+            if result["status"] == TARGET_FAILED:
+                state.pop(result["path"], None)
+            elif result["status"] != TARGET_SKIPPED:
+                signature = file_signature(Path(result["path"]))
+                state[result["path"]] = {
+                    "digest": digest,
+                    "signature": list(signature) if signature else None,
+                }
+        self._save_state(state)
+
+        failed = sum(1 for result in results if result["status"] == TARGET_FAILED)
+        self.logger.info(f"已同步 {len(results)} 个 Claude Code 配置目标，失败 {failed} 个")
+        return results
+
+
+__all__ = [
+    "ClaudeCodeTargetSync",
+    "DEFAULT_SYNC_WORKERS",
+    "TARGETS_SETTING_KEY",
+    "TARGET_FAILED",
+    "TARGET_SKIPPED",
+    "TARGET_UNCHANGED",
+    "TARGET_UPDATED",
+    "resolve_target_path",
+]
@@ -0,0 +1,505 @@
+"""
+HTTP/1.1 传输
+
+基于 asyncio 流的最小 HTTP/1.1 客户端与服务端解析，只使用标准库。
+支持 Content-Length 和 chunked 两种消息体、长连接复用以及 Server-Sent Events 解析，
+供性能测试、本地模拟服务器和本地转发代理使用。
+"""
+
+import asyncio
+import contextlib
+import ssl
+from typing import AsyncIterator, List, Optional, Set, Tuple
+from urllib.parse import SplitResult, urlsplit
+
+# 读取消息体时每次读取的最大字节数
+READ_CHUNK_SIZE = 64 * 1024
+
+# 请求行/状态行和头部的最大长度
+MAX_HEAD_SIZE = 64 * 1024
+
+Headers = List[Tuple[str, str]]
+
+
+class HTTPProtocolError(Exception):
+    """对端发送了无法解析的 HTTP 消息"""
+
+
+class HTTPBodyTooLargeError(HTTPProtocolError):
+    """消息体超过允许的大小"""
+
+
+class StaleConnectionError(ConnectionError):
+    """复用的空闲连接在收到响应前断开（已被对端关闭），对端没有处理这个请求"""
+
+
+def header_value(headers: Headers, name: str) -> Optional[str]:
+    """获取头部字段的值（不区分大小写，多个同名字段时返回第一个）"""
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _parse_headers(lines: List[bytes]) -> Headers:
+    headers: Headers = []
+    for line in lines:
+        if not line:
+            continue
+        key, sep, value = line.partition(b":")
+        if not sep or not key.strip():
+            raise HTTPProtocolError(f"无效的头部字段: {line[:60]!r}")
+        headers.append((key.strip().decode("latin-1"), value.strip().decode("latin-1")))
+    return headers
+
+
+async def read_head(reader: asyncio.StreamReader) -> Tuple[str, Headers]:
+    """读取起始行和头部
+
+    Returns:
+        Tuple[str, Headers]: 起始行和头部字段列表
+
+    Raises:
+        asyncio.IncompleteReadError: 连接在读完头部前关闭
+        HTTPProtocolError: 头部过长或格式无效
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError:
+        raise HTTPProtocolError("头部过长") from None
+    if len(head) > MAX_HEAD_SIZE:
+        raise HTTPProtocolError("头部过长")
+    lines = head[:-4].split(b"\r\n")
+    return lines[0].decode("latin-1"), _parse_headers(lines[1:])
+
+
+def encode_head(start_line: str, headers: Headers) -> bytes:
+    """编码起始行和头部"""
+    lines = [start_line] + [f"{key}: {value}" for key, value in headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def encode_chunk(data: bytes) -> bytes:
+    """编码一个 chunked 消息体的数据块"""
+    return f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n"
+
+
+def hop_by_hop(headers: Headers) -> Set[str]:
+    """逐跳头部字段名（小写），包括 Connection 头中列出的字段，转发时不应传递"""
+    names = {
+        "connection",
+        "keep-alive",
+        "proxy-authenticate",
+        "proxy-authorization",
+        "proxy-connection",
+        "te",
+        "trailer",
+        "transfer-encoding",
+        "upgrade",
+    }
+    for key, value in headers:
+        if key.lower() == "connection":
+            names.update(token.strip().lower() for token in value.split(",") if token.strip())
+    return names
+
+
+def is_chunked(headers: Headers) -> bool:
+    value = header_value(headers, "transfer-encoding")
+    return value is not None and "chunked" in value.lower()
+
+
+def wants_close(version: str, headers: Headers) -> bool:
+    """根据协议版本和 Connection 头判断消息后是否关闭连接"""
+    connection = (header_value(headers, "connection") or "").lower()
+    if version == "HTTP/1.0":
+        return "keep-alive" not in connection
+    return "close" in connection
+
+
+async def iter_body(
+    reader: asyncio.StreamReader,
+    headers: Headers,
+    until_eof: bool = True,
+    max_size: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """按块读取消息体
+
+    Args:
+        reader: 输入流
+        headers: 消息头部
+        until_eof: 既没有 Content-Length 也不是 chunked 时是否读到连接关闭
+            （响应为True，请求为False，即没有消息体）
+        max_size: 消息体的最大字节数，为None时不限制
+
+    Raises:
+        HTTPBodyTooLargeError: 消息体超过 max_size，超出的部分不会被读取
+    """
+    if is_chunked(headers):
+        received = 0
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            try:
+                size = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise HTTPProtocolError(f"无效的 chunk 大小: {line[:20]!r}") from None
+            if size == 0:
+                # 跳过 trailer
+                while await reader.readuntil(b"\r\n") != b"\r\n":
+                    pass
+                return
+            received += size
+            if max_size is not None and received > max_size:
+                raise HTTPBodyTooLargeError(f"消息体超过 {max_size} 字节")
+            yield await reader.readexactly(size)
+            await reader.readexactly(2)
+
+    length = header_value(headers, "content-length")
+    if length is not None:
+        try:
+            remaining = int(length)
+        except ValueError:
+            raise HTTPProtocolError(f"无效的 Content-Length: {length}") from None
+        if max_size is not None and remaining > max_size:
+            raise HTTPBodyTooLargeError(f"消息体超过 {max_size} 字节")
+        while remaining > 0:
+            data = await reader.read(min(remaining, READ_CHUNK_SIZE))
+            if not data:
+                raise asyncio.IncompleteReadError(b"", remaining)
+            remaining -= len(data)
+            yield data
+        return
+
+    if until_eof:
+        while True:
+            data = await reader.read(READ_CHUNK_SIZE)
+            if not data:
+                return
+            yield data
+
+
+async def iter_sse(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[str, str]]:
+    """解析 Server-Sent Events
+
+    Yields:
+        Tuple[str, str]: 事件名（未指定时为 message）和数据（多行 data 以换行连接）
+    """
+    buffer = b""
+    event, data = "message", []
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            index = buffer.find(b"\n")
+            if index < 0:
+                break
+            line, buffer = buffer[:index].rstrip(b"\r").decode("utf-8"), buffer[index + 1 :]
+            if not line:
+                if data:
+                    yield event, "\n".join(data)
+                event, data = "message", []
+            elif line.startswith(":"):
+                continue
+            else:
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "event":
+                    event = value
+                elif field == "data":
+                    data.append(value)
+    if data:
+        yield event, "\n".join(data)
+
+
+class HTTPResponse:
+    """HTTP 响应，消息体按需读取"""
+
+    def __init__(
+        self,
+        connection: "HTTPConnection",
+        status: int,
+        reason: str,
+        version: str,
+        headers: Headers,
+        method: str = "GET",
+    ):
+        self.connection = connection
+        self.status = status
+        self.reason = reason
+        self.version = version
+        self.headers = headers
+        self.method = method
+        self._consumed = False
+
+    @property
+    def has_body(self) -> bool:
+        """响应是否带有消息体（HEAD 请求和 1xx/204/304 响应没有）"""
+        return not (
+            self.method == "HEAD" or self.status in (204, 304) or 100 <= self.status < 200
+        )
+
+    def header(self, name: str) -> Optional[str]:
+        return header_value(self.headers, name)
+
+    async def iter_bytes(self) -> AsyncIterator[bytes]:
+        """按块读取消息体，读完后连接可以复用"""
+        if self._consumed:
+            return
+        self._consumed = True
+        reader = self.connection.reader
+        assert reader is not None
+        if not self.has_body:
+            self.connection.finish(self)
+            return
+        async for chunk in iter_body(reader, self.headers):
+            yield chunk
+        self.connection.finish(self)
+
+    async def read(self) -> bytes:
+        """读取完整的消息体"""
+        return b"".join([chunk async for chunk in self.iter_bytes()])
+
+    def iter_sse(self) -> AsyncIterator[Tuple[str, str]]:
+        """按事件读取 SSE 消息体"""
+        return iter_sse(self.iter_bytes())
+
+
+class HTTPConnection:
+    """到一个源站的 HTTP/1.1 连接，上一个响应读完后可以复用"""
+
+    def __init__(
+        self,
+        url: str,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        connect_timeout: Optional[float] = None,
+    ):
+        """初始化连接（不立即建立连接）
+
+        Args:
+            url: 源站地址，只使用其中的协议、主机和端口
+            ssl_context: HTTPS 使用的 TLS 上下文，为None时使用系统默认的证书验证
+            connect_timeout: 建立连接（含 TLS 握手）的超时时间（秒），为None时不限制
+        """
+        parts: SplitResult = urlsplit(url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname or ""
+        self.port = parts.port or (443 if self.https else 80)
+        if ssl_context is None and self.https:
+            ssl_context = ssl.create_default_context()
+        self.ssl_context = ssl_context
+        self.connect_timeout = connect_timeout
+        host = f"[{self.host}]" if ":" in self.host else self.host
+        default_port = 443 if self.https else 80
+        self.host_header = host if self.port == default_port else f"{host}:{self.port}"
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.requests = 0
+        self.reusable = False
+        self._close_after = True
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+    async def connect(self) -> None:
+        """建立 TCP 连接（HTTPS 时完成 TLS 握手）
+
+        Raises:
+            asyncio.TimeoutError: 超过 connect_timeout 仍未建立连接
+        """
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                self.host,
+                self.port,
+                ssl=self.ssl_context if self.https else None,
+                server_hostname=self.host if self.https else None,
+            ),
+            self.connect_timeout,
+        )
+        self.requests = 0
+        self.reusable = False
+
+    async def request(
+        self, method: str, target: str, headers: Headers, body: bytes = b""
+    ) -> HTTPResponse:
+        """发送请求并读取响应头
+
+        Args:
+            method: 请求方法
+            target: 请求路径（含查询参数）
+            headers: 请求头，自动补充 Host 和 Content-Length
+            body: 请求体
+
+        Returns:
+            HTTPResponse: 响应，消息体需要调用方读取
+        """
+        if not self.connected:
+            await self.connect()
+        assert self.reader is not None and self.writer is not None
+
+        self.reusable = False
+        names = {key.lower() for key, _ in headers}
+        extra: Headers = []
+        if "host" not in names:
+            extra.append(("Host", self.host_header))
+        if body or method in ("POST", "PUT", "PATCH"):
+            if "content-length" not in names and "transfer-encoding" not in names:
+                extra.append(("Content-Length", str(len(body))))
+        self.writer.write(encode_head(f"{method} {target} HTTP/1.1", extra + headers) + body)
+        await self.writer.drain()
+        self.requests += 1
+
+        while True:
+            start_line, response_headers = await read_head(self.reader)
+            parts = start_line.split(" ", 2)
+            if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+                raise HTTPProtocolError(f"无效的HTTP响应: {start_line[:60]}")
+            status = int(parts[1])
+            # 跳过 100 Continue 等中间响应
+            if status >= 200 or status == 101:
+                break
+        reason = parts[2] if len(parts) > 2 else ""
+        response = HTTPResponse(self, status, reason, parts[0], response_headers, method)
+        self._close_after = wants_close(parts[0], response_headers) or (
+            response.has_body
+            and not is_chunked(response_headers)
+            and header_value(response_headers, "content-length") is None
+        )
+        return response
+
+    def finish(self, response: HTTPResponse) -> None:
+        """响应读完后调用，决定连接能否复用"""
+        self.reusable = not self._close_after and self.connected
+        if not self.reusable:
+            self.close()
+
+    def close(self) -> None:
+        self.reusable = False
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def aclose(self) -> None:
+        """关闭连接并等待关闭完成"""
+        writer = self.writer
+        self.close()
+        if writer is not None:
+            with contextlib.suppress(Exception):
+                await asyncio.wait_for(writer.wait_closed(), 5)
+
+
+class ConnectionPool:
+    """同一源站的空闲连接池"""
+
+    def __init__(
+        self,
+        url: str,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        max_idle: int = 64,
+        connect_timeout: Optional[float] = None,
+    ):
+        self.url = url
+        self.connect_timeout = connect_timeout
+        # 同一连接池的连接共用一个 TLS 上下文，避免每个连接重复加载证书
+        if ssl_context is None and urlsplit(url).scheme == "https":
+            ssl_context = ssl.create_default_context()
+        self.ssl_context = ssl_context
+        self.max_idle = max_idle
+        self._idle: List[HTTPConnection] = []
+        self.created = 0
+
+    def acquire(self) -> HTTPConnection:
+        """取一个空闲连接，没有时创建新连接（未连接，首次请求时建立）"""
+        while self._idle:
+            connection = self._idle.pop()
+            if connection.connected:
+                return connection
+        self.created += 1
+        return HTTPConnection(self.url, self.ssl_context, self.connect_timeout)
+
+    async def connect(self) -> HTTPConnection:
+        """取一个连接并确保连接已建立（请求发出之前的阶段）
+
+        Raises:
+            OSError: 建立连接或 TLS 握手失败
+            asyncio.TimeoutError: 超过 connect_timeout 仍未建立连接
+        """
+        connection = self.acquire()
+        if not connection.connected:
+            try:
+                await connection.connect()
+            except BaseException:
+                connection.close()
+                raise
+        return connection
+
+    async def send(
+        self,
+        connection: HTTPConnection,
+        method: str,
+        target: str,
+        headers: Headers,
+        body: bytes = b"",
+    ) -> HTTPResponse:
+        """在 connect() 取得的连接上发送请求并读取响应头
+
+        Raises:
+            StaleConnectionError: 复用的连接在收到响应前断开，可以换一个连接重新发送
+        """
+        reused = connection.requests > 0
+        try:
+            return await connection.request(method, target, headers, body)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            connection.close()
+            if reused:
+                message = f"复用的连接已被对端关闭: {e or type(e).__name__}"
+                raise StaleConnectionError(message) from e
+            raise
+        except BaseException:
+            connection.close()
+            raise
+
+    async def request(
+        self, method: str, target: str, headers: Headers, body: bytes = b""
+    ) -> HTTPResponse:
+        """用池中的连接发送请求并读取响应头
+
+        复用的空闲连接可能已被对端关闭，这种情况下（收到响应前连接断开）换一个连接重试；
+        新建的连接失败时直接抛出异常。响应读完后调用 release(response.connection) 归还连接。
+        """
+        while True:
+            connection = await self.connect()
+            try:
+                return await self.send(connection, method, target, headers, body)
+            except StaleConnectionError:
+                continue
+
+    def release(self, connection: HTTPConnection) -> None:
+        """归还连接，不可复用或池已满时关闭"""
+        if connection.reusable and connection.connected and len(self._idle) < self.max_idle:
+            self._idle.append(connection)
+        else:
+            connection.close()
+
+    async def aclose(self) -> None:
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(connection.aclose() for connection in idle))
+
+
+__all__ = [
+    "ConnectionPool",
+    "HTTPBodyTooLargeError",
+    "HTTPConnection",
+    "HTTPProtocolError",
+    "HTTPResponse",
+    "Headers",
+    "StaleConnectionError",
+    "encode_chunk",
+    "encode_head",
+    "header_value",
+    "hop_by_hop",
+    "is_chunked",
+    "iter_body",
+    "iter_sse",
+    "read_head",
+    "wants_close",
+]
@@ -10,13 +10,32 @@ import shutil
 import subprocess
 import sys
 import tempfile
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
 
 from .exceptions import DiskSpaceError
 from .exceptions import PermissionError as ClaudeWarpPermissionError
-from .exceptions import SystemError
+from .exceptions import SystemError, ValidationError
+
+# 文件写入的持久化级别
+# strict:   fsync文件，替换后再fsync所在目录，断电后写入一定可见
+# standard: 只fsync文件（默认），断电后可能仍是旧文件，但不会出现半写的内容
+# relaxed:  不fsync，适用于CI、tmpfs等不关心断电的场景
+# group:    fsync文件，目录fsync推迟到 fsync_group() 结束时按目录合并执行；不在组内时等同strict
+DURABILITY_STRICT = "strict"
+DURABILITY_STANDARD = "standard"
+DURABILITY_RELAXED = "relaxed"
+DURABILITY_GROUP = "group"
+DURABILITY_LEVELS = (DURABILITY_STRICT, DURABILITY_STANDARD, DURABILITY_RELAXED, DURABILITY_GROUP)
+
+# 覆盖默认持久化级别的环境变量
+DURABILITY_ENV = "CLAUDEWARP_DURABILITY"
+
+# 当前线程中进行中的fsync组，记录待fsync的目录
+_fsync_group_state = threading.local()
 
 
 class LevelAlignFilter:
@@ -374,8 +393,126 @@ def cleanup_old_backups(backup_dir: Path, original_name: str, max_backups: int)
         pass  # 忽略清理错误
 
 
-def atomic_write(
+def file_content_equals(
     file_path: Union[str, Path], content: Union[str, bytes], encoding: str = "utf-8"
+) -> bool:
+    """判断文件内容是否与给定内容完全相同
+
+    先比较文件大小，大小一致时才读取文件内容。
+
+    Args:
+        file_path: 文件路径
+        content: 待比较的内容
+        encoding: 编码格式（文本内容）
+
+    Returns:
+        bool: 文件存在且内容完全相同时返回True
+    """
+    data = content.encode(encoding) if isinstance(content, str) else content
+    path = Path(file_path)
+
+    try:
+        if path.stat().st_size != len(data):
+            return False
+        return path.read_bytes() == data
+    except OSError:
+        return False
+
+
+def file_signature(file_path: Union[str, Path]) -> Optional[Tuple[int, int, int]]:
+    """获取文件状态标识 (inode, 大小, 修改时间纳秒)，用于廉价地判断文件是否被修改
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        Optional[Tuple[int, int, int]]: 文件状态标识，文件不存在时返回None
+    """
+    try:
+        stat = Path(file_path).stat()
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def resolve_durability(durability: Optional[str] = None) -> str:
+    """确定实际使用的持久化级别
+
+    Args:
+        durability: 指定的持久化级别，为None时读取环境变量 CLAUDEWARP_DURABILITY，默认为standard
+
+    Returns:
+        str: 持久化级别
+
+    Raises:
+        ValidationError: 持久化级别无效
+    """
+    if durability is None:
+        durability = os.environ.get(DURABILITY_ENV) or DURABILITY_STANDARD
+
+    durability = durability.strip().lower()
+    if durability not in DURABILITY_LEVELS:
+        raise ValidationError(
+            f"不支持的持久化级别: {durability}。支持的级别: {', '.join(DURABILITY_LEVELS)}",
+            field="durability",
+            value=durability,
+        )
+    return durability
+
+
+def fsync_directory(dir_path: Union[str, Path]) -> None:
+    """fsync目录，使目录项的变更（创建、重命名）持久化
+
+    Windows不支持打开目录进行fsync，直接跳过。
+
+    Args:
+        dir_path: 目录路径
+    """
+    if is_windows():
+        return
+
+    fd = os.open(str(dir_path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def fsync_group() -> Iterator[None]:
+    """合并一批写入的目录fsync
+
+    组内以group级别写入的文件仍会在替换前fsync，目录fsync推迟到组结束时执行，
+    同一目录只执行一次。组可以嵌套，只有最外层结束时才执行。
+
+    Example:
+        with fsync_group():
+            atomic_write(path_a, content_a, durability="group")
+            atomic_write(path_b, content_b, durability="group")
+    """
+    pending: Optional[Set[str]] = getattr(_fsync_group_state, "pending", None)
+    if pending is not None:
+        yield
+        return
+
+    _fsync_group_state.pending = pending = set()
+    try:
+        yield
+    finally:
+        _fsync_group_state.pending = None
+        for dir_path in sorted(pending):
+            try:
+                fsync_directory(dir_path)
+            except OSError:
+                pass  # 目录已被删除等情况，文件本身已经fsync
+
+
+def atomic_write(
+    file_path: Union[str, Path],
+    content: Union[str, bytes],
+    encoding: str = "utf-8",
+    skip_unchanged: bool = False,
+    durability: Optional[str] = None,
 ) -> bool:
     """原子性写入文件
 
@@ -383,16 +520,23 @@ def atomic_write(
         file_path: 文件路径
         content: 文件内容
         encoding: 编码格式（文本模式）
+        skip_unchanged: 文件内容已完全相同时跳过写入
+        durability: 持久化级别（strict、standard、relaxed、group），为None时使用默认级别
 
     Returns:
-        bool: 是否成功写入
+        bool: 是否成功写入（跳过写入时同样返回True）
     """
     path = Path(file_path)
     temp_path = None
+    durability = resolve_durability(durability)
+
+    if skip_unchanged and file_content_equals(path, content, encoding):
+        return True
 
     try:
-        # 确保目录存在
-        ensure_directory(path.parent)
+        # 确保目录存在；已有目录保持原权限（配置和备份目录为 0700）
+        if not path.parent.exists():
+            ensure_directory(path.parent)
 
         # 创建临时文件
         with tempfile.NamedTemporaryFile(
@@ -404,7 +548,8 @@ def atomic_write(
             temp_path = Path(temp_file.name)
             temp_file.write(content)
             temp_file.flush()
-            os.fsync(temp_file.fileno())
+            if durability != DURABILITY_RELAXED:
+                os.fsync(temp_file.fileno())
 
         # 原子性移动
         if is_windows():
@@ -413,6 +558,16 @@ def atomic_write(
                 path.unlink()
 
         temp_path.replace(path)
+
+        if durability == DURABILITY_GROUP:
+            pending = getattr(_fsync_group_state, "pending", None)
+            if pending is not None:
+                pending.add(str(path.parent))
+            else:
+                fsync_directory(path.parent)
+        elif durability == DURABILITY_STRICT:
+            fsync_directory(path.parent)
+
         return True
 
     except OSError:
@@ -496,6 +651,22 @@ def format_file_size(size_bytes: Union[int, float]) -> str:
     return f"{size_bytes:.1f} {sizes[i]}"
 
 
+def mask_secret(secret: str, show_chars: int = 4) -> str:
+    """遮蔽密钥等敏感信息，只保留首尾若干字符
+
+    Args:
+        secret: 原始内容
+        show_chars: 首尾各保留的字符数
+
+    Returns:
+        str: 遮蔽后的内容
+    """
+    if len(secret) <= show_chars * 2:
+        return "*" * len(secret)
+
+    return f"{secret[:show_chars]}{'*' * (len(secret) - show_chars * 2)}{secret[-show_chars:]}"
+
+
 def validate_url(url: str) -> bool:
     """验证URL格式
 
@@ -597,7 +768,19 @@ __all__ = [
     "safe_copy_file",
     "create_backup",
     "cleanup_old_backups",
+    "file_content_equals",
+    "file_signature",
     "atomic_write",
+    # 持久化级别
+    "DURABILITY_STRICT",
+    "DURABILITY_STANDARD",
+    "DURABILITY_RELAXED",
+    "DURABILITY_GROUP",
+    "DURABILITY_LEVELS",
+    "DURABILITY_ENV",
+    "resolve_durability",
+    "fsync_directory",
+    "fsync_group",
     # 磁盘空间
     "get_disk_usage",
     "check_disk_space",
@@ -605,6 +788,7 @@ __all__ = [
     "run_command",
     # 工具函数
     "format_file_size",
+    "mask_secret",
     "validate_url",
     "sanitize_filename",
     # 环境信息
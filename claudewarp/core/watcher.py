@@ -0,0 +1,337 @@
+"""
+配置文件监视
+
+为长期运行、内嵌 ProxyManager 的程序（GUI、后台服务）监视配置文件和
+Claude Code 的 settings.json，被外部修改时自动增量重新加载并通知回调。
+
+Linux 上使用 inotify 监视所在目录（配置文件通过原子替换写入，需要监视目录项变化），
+其他平台或 inotify 不可用时退回到定时检查文件状态（stat）。
+两种方式都以文件的 inode、大小和修改时间判断文件是否真的发生了变化。
+"""
+
+import json
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from .utils import file_signature
+
+if TYPE_CHECKING:
+    from .manager import ProxyManager
+
+# 无法使用inotify时的默认轮询间隔（秒）
+DEFAULT_WATCH_INTERVAL = 1.0
+
+# 使用inotify时的兜底检查间隔（秒），防止漏掉事件
+INOTIFY_FALLBACK_INTERVAL = 30.0
+
+# 收到事件后等待后续事件的时间（秒），合并同一次写入产生的多个事件
+DEBOUNCE_DELAY = 0.05
+
+# inotify 事件掩码
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_WATCH_MASK = (
+    _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+)
+_IN_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Inotify:
+    """基于ctypes的最小inotify封装，只用于唤醒监视线程"""
+
+    def __init__(self, directories: List[Path]):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+
+        try:
+            for directory in directories:
+                wd = libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), _IN_WATCH_MASK)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), f"无法监视目录: {directory}")
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def drain(self) -> List[str]:
+        """读取所有待处理事件，返回涉及的文件名"""
+        names = []
+        while True:
+            try:
+                buffer = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset + _IN_EVENT_HEADER.size <= len(buffer):
+                _, _, _, length = _IN_EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _IN_EVENT_HEADER.size
+                names.append(os.fsdecode(buffer[offset : offset + length].rstrip(b"\0")))
+                offset += length
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class ConfigWatcher:
+    """配置文件监视器
+
+    监视 ProxyManager 的配置文件（及其变更日志）和 Claude Code 的 settings.json：
+
+    - 配置文件变化时调用 ProxyManager.refresh_from_disk() 增量重新加载，
+      回调收到 {"source": "config", "path": ..., "added": [...], "changed": [...], ...}；
+      本进程自己写入的变化不会触发回调；
+    - settings.json 变化时回调收到 {"source": "claude_code", "path": ..., "changed_keys": [...],
+      "env": {...}, "proxy": 与 ANTHROPIC_BASE_URL 对应的代理名称或None}。
+
+    重新加载失败（例如文件正在被手动编辑）时保留原配置，回调收到带 "error" 字段的事件。
+    回调在监视线程中执行。
+    """
+
+    def __init__(
+        self,
+        manager: "ProxyManager",
+        interval: float = DEFAULT_WATCH_INTERVAL,
+        use_inotify: bool = True,
+    ):
+        """初始化监视器
+
+        Args:
+            manager: 被监视的代理管理器
+            interval: 轮询间隔（秒），使用inotify时只作为兜底检查间隔的下限
+            use_inotify: 是否在Linux上使用inotify
+        """
+        self.manager = manager
+        self.interval = interval
+        self.use_inotify = use_inotify and sys.platform.startswith("linux")
+        self.logger = logging.getLogger(__name__)
+
+        config_path = manager.config_manager.config_path
+        self.config_paths = [config_path, manager.config_manager.journal.path]
+        self.settings_path = manager._get_claude_code_config_dir() / "settings.json"
+
+        self._callbacks: List[Callable[[Dict[str, Any]], None]] = []
+        self._signatures: Dict[Path, Optional[Tuple[int, int, int]]] = {}
+        self._settings_env: Dict[str, Any] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._wake_pipe: Optional[Tuple[int, int]] = None
+        self._inotify: Optional[_Inotify] = None
+
+    @property
+    def backend(self) -> str:
+        """当前使用的监视方式：inotify 或 polling"""
+        return "inotify" if self._inotify is not None else "polling"
+
+    @property
+    def is_running(self) -> bool:
+        """监视线程是否在运行"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_callback(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """注册变更回调"""
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """移除变更回调"""
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+    def start(self) -> "ConfigWatcher":
+        """启动后台监视线程
+
+        Returns:
+            ConfigWatcher: 监视器本身
+        """
+        if self.is_running:
+            return self
+
+        for path in self.config_paths + [self.settings_path]:
+            self._signatures[path] = file_signature(path)
+        self._settings_env = self._read_settings_env()
+
+        if self.use_inotify:
+            directories = {path.parent for path in self.config_paths + [self.settings_path]}
+            try:
+                self._inotify = _Inotify(sorted(d for d in directories if d.is_dir()))
+                self._wake_pipe = os.pipe()
+            except (OSError, AttributeError) as e:
+                self.logger.debug(f"inotify 不可用，改为轮询: {e}")
+                self._inotify = None
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="claudewarp-watcher", daemon=True)
+        self._thread.start()
+        self.logger.info(f"已开始监视配置文件（{self.backend}）")
+        return self
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """停止监视并等待监视线程退出"""
+        self._stop_event.set()
+        if self._wake_pipe is not None:
+            os.write(self._wake_pipe[1], b"\0")
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        if self._wake_pipe is not None:
+            for fd in self._wake_pipe:
+                os.close(fd)
+            self._wake_pipe = None
+        self.logger.info("已停止监视配置文件")
+
+    def __enter__(self) -> "ConfigWatcher":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        """监视线程主循环"""
+        while not self._stop_event.is_set():
+            if self._inotify is not None and self._wake_pipe is not None:
+                timeout = max(self.interval, INOTIFY_FALLBACK_INTERVAL)
+                fds = [self._inotify.fd, self._wake_pipe[0]]
+                readable, _, _ = select.select(fds, [], [], timeout)
+                if self._stop_event.is_set():
+                    break
+                if self._inotify.fd in readable:
+                    # 等待同一次写入的后续事件（写临时文件、重命名）到齐后再检查
+                    self._stop_event.wait(DEBOUNCE_DELAY)
+                    self._inotify.drain()
+            elif self._stop_event.wait(self.interval):
+                break
+
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.warning(f"检查配置文件变化失败: {e}")
+
+    def check(self) -> List[Dict[str, Any]]:
+        """检查一次文件变化并处理
+
+        监视线程会自动调用；未启动监视线程时也可以手动调用。
+
+        Returns:
+            List[Dict[str, Any]]: 本次产生的变更事件
+        """
+        events = []
+
+        config_changed = False
+        for path in self.config_paths:
+            signature = file_signature(path)
+            if path == self.config_paths[0] and signature is not None and signature[1] == 0:
+                # 非原子写入（如编辑器直接覆盖）的中间状态，等待写入完成
+                continue
+            if signature != self._signatures.get(path):
+                self._signatures[path] = signature
+                config_changed = True
+        if config_changed:
+            event = self._reload_config()
+            if event is not None:
+                events.append(event)
+
+        signature = file_signature(self.settings_path)
+        if signature != self._signatures.get(self.settings_path):
+            self._signatures[self.settings_path] = signature
+            event = self._diff_settings()
+            if event is not None:
+                events.append(event)
+
+        for event in events:
+            self._notify(event)
+        return events
+
+    def _reload_config(self) -> Optional[Dict[str, Any]]:
+        """增量重新加载配置，返回变更事件"""
+        event: Dict[str, Any] = {
+            "source": "config",
+            "path": str(self.manager.config_manager.config_path),
+        }
+        try:
+            # 与本进程内的修改操作互斥，避免替换正在修改的配置对象
+            with self.manager.config_manager.lock.hold():
+                changes = self.manager.refresh_from_disk()
+        except Exception as e:
+            self.logger.warning(f"重新加载配置失败，保留当前配置: {e}")
+            event["error"] = str(e)
+            return event
+
+        if changes is None:
+            return None
+        event.update(changes)
+        return event
+
+    def _read_settings_env(self) -> Dict[str, Any]:
+        """读取 settings.json 中的环境变量配置"""
+        try:
+            with open(self.settings_path, "r", encoding="utf-8") as f:
+                settings = json.load(f)
+        except FileNotFoundError:
+            return {}
+        env = settings.get("env", {}) if isinstance(settings, dict) else {}
+        return env if isinstance(env, dict) else {}
+
+    def _diff_settings(self) -> Optional[Dict[str, Any]]:
+        """比较 settings.json 中的环境变量，返回变更事件"""
+        try:
+            env = self._read_settings_env()
+        except (OSError, ValueError) as e:
+            # 文件可能正在被写入，等待下一次变化
+            self.logger.debug(f"读取 Claude Code 配置失败: {e}")
+            return None
+
+        old_env = self._settings_env
+        changed_keys = sorted(
+            key for key in set(old_env) | set(env) if old_env.get(key) != env.get(key)
+        )
+        self._settings_env = env
+        if not changed_keys:
+            return None
+
+        base_url = env.get("ANTHROPIC_BASE_URL")
+        proxy = next(
+            (
+                name
+                for name, server in self.manager.config.proxies.items()
+                if base_url and server.base_url == base_url
+            ),
+            None,
+        )
+        return {
+            "source": "claude_code",
+            "path": str(self.settings_path),
+            "changed_keys": changed_keys,
+            "env": env,
+            "proxy": proxy,
+        }
+
+    def _notify(self, event: Dict[str, Any]) -> None:
+        """调用所有回调，单个回调出错不影响其他回调"""
+        for callback in list(self._callbacks):
+            try:
+                callback(event)
+            except Exception as e:
+                self.logger.warning(f"配置变更回调执行失败: {e}")
+
+
+__all__ = [
+    "ConfigWatcher",
+    "DEFAULT_WATCH_INTERVAL",
+]
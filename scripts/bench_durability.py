@@ -0,0 +1,89 @@
+"""
+atomic_write 持久化级别基准测试
+
+比较 strict、standard、relaxed 和 group 四种持久化级别下原子写入配置文件的耗时。
+group 级别模拟批处理：每个批次在一个 fsync_group() 中写入配置文件和 settings.json。
+
+用法::
+
+    python scripts/bench_durability.py
+    python scripts/bench_durability.py --dir ~/.config/claudewarp --count 200 --batch 2
+
+建议在实际使用的配置目录所在的文件系统上运行（例如网络挂载的家目录），
+临时目录可能位于 tmpfs 上，fsync 几乎没有开销。
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from claudewarp.core.utils import (  # noqa: E402
+    DURABILITY_GROUP,
+    DURABILITY_LEVELS,
+    atomic_write,
+    format_file_size,
+    fsync_group,
+)
+
+
+def make_content(size: int, seq: int) -> str:
+    """生成指定大小、每次内容不同的配置文件内容"""
+    header = f'version = "1.0"\ncurrent_proxy = "proxy-{seq}"\n'
+    return header + "#" * max(size - len(header) - 1, 0) + "\n"
+
+
+def run_level(target_dir: Path, durability: str, count: int, batch: int, size: int) -> list:
+    """以指定持久化级别写入，返回每个批次的耗时（毫秒）"""
+    files = [target_dir / f"bench-{durability}-{i}.toml" for i in range(batch)]
+    timings = []
+
+    for seq in range(count):
+        start = time.perf_counter()
+        if durability == DURABILITY_GROUP:
+            with fsync_group():
+                for path in files:
+                    atomic_write(path, make_content(size, seq), durability=durability)
+        else:
+            for path in files:
+                atomic_write(path, make_content(size, seq), durability=durability)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    for path in files:
+        path.unlink()
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="比较 atomic_write 各持久化级别的耗时")
+    parser.add_argument("--dir", type=Path, default=None, help="写入的目录（默认使用临时目录）")
+    parser.add_argument("--count", type=int, default=100, help="每个级别的批次数")
+    parser.add_argument("--batch", type=int, default=2, help="每个批次写入的文件数")
+    parser.add_argument("--size", type=int, default=4096, help="每个文件的大小（字节）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        target_dir = Path(tmp)
+        print(
+            f"目录: {target_dir}  批次: {args.count}  每批文件数: {args.batch}  "
+            f"文件大小: {format_file_size(args.size)}"
+        )
+        print(f"{'级别':<10}{'平均(ms)':>12}{'中位数(ms)':>14}{'p95(ms)':>12}{'总计(s)':>12}")
+
+        for durability in DURABILITY_LEVELS:
+            timings = run_level(target_dir, durability, args.count, args.batch, args.size)
+            p95 = sorted(timings)[max(int(len(timings) * 0.95) - 1, 0)]
+            print(
+                f"{durability:<10}{statistics.mean(timings):>12.3f}"
+                f"{statistics.median(timings):>14.3f}{p95:>12.3f}{sum(timings) / 1000:>12.3f}"
+            )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+配置并发修改压力测试
+
+启动多个进程同时修改同一个配置文件，验证跨进程锁和修订号检查不会丢失更新：
+
+- 每个进程添加若干个名称唯一的代理，最终所有代理都应存在；
+- 每个进程在事务中对同一个代理的计数器（description 字段）做若干次“读取-加一-写回”，
+  最终计数应等于所有进程的递增次数之和；
+- 配置修订号应等于成功保存的次数。
+
+用法::
+
+    python scripts/stress_config_lock.py
+    python scripts/stress_config_lock.py --workers 32 --ops 20 --storage sqlite
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from claudewarp.core.manager import ProxyManager  # noqa: E402
+
+COUNTER_PROXY = "counter"
+
+
+def worker(config_path: str, worker_id: int, ops: int, start_event) -> None:
+    """并发修改配置：交替添加代理和递增计数器"""
+    manager = ProxyManager(config_path=Path(config_path), auto_backup=False)
+    start_event.wait()
+
+    for op in range(ops):
+        manager.add_proxy(
+            f"w{worker_id}-p{op}", "https://stress.example.com/", "sk-stress-test"
+        )
+        with manager.transaction():
+            current = int(manager.get_proxy(COUNTER_PROXY).description)
+            manager.update_proxy(COUNTER_PROXY, description=str(current + 1))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="多进程并发修改配置文件的压力测试")
+    parser.add_argument("--workers", type=int, default=16, help="并发进程数")
+    parser.add_argument("--ops", type=int, default=10, help="每个进程的操作轮数")
+    parser.add_argument(
+        "--storage", choices=("toml", "json", "sqlite"), default="toml", help="存储后端"
+    )
+    args = parser.parse_args()
+
+    suffix = {"toml": ".toml", "json": ".json", "sqlite": ".db"}[args.storage]
+    with tempfile.TemporaryDirectory() as tmp:
+        # Claude Code 配置和缓存也放在临时目录中，避免影响真实环境
+        os.environ["HOME"] = tmp
+        os.environ["XDG_CACHE_HOME"] = str(Path(tmp) / "cache")
+        config_path = Path(tmp) / f"config{suffix}"
+
+        manager = ProxyManager(config_path=config_path, auto_backup=False)
+        manager.add_proxy(
+            COUNTER_PROXY, "https://stress.example.com/", "sk-stress-test", description="0"
+        )
+        initial_revision = manager.config.revision
+
+        start_event = multiprocessing.Event()
+        processes = [
+            multiprocessing.Process(
+                target=worker, args=(str(config_path), worker_id, args.ops, start_event)
+            )
+            for worker_id in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+
+        started = time.perf_counter()
+        start_event.set()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        failed = [p.pid for p in processes if p.exitcode != 0]
+        config = ProxyManager(config_path=config_path, auto_backup=False).config
+
+        expected_proxies = args.workers * args.ops + 1
+        expected_counter = args.workers * args.ops
+        expected_revision = initial_revision + 2 * args.workers * args.ops
+        counter = int(config.proxies[COUNTER_PROXY].description)
+
+        print(f"进程数: {args.workers}  每进程轮数: {args.ops}  存储: {args.storage}")
+        print(f"耗时: {elapsed:.2f}s  ({2 * args.workers * args.ops / elapsed:.1f} 次写入/秒)")
+        print(f"代理数量: {len(config.proxies)} / {expected_proxies}")
+        print(f"计数器: {counter} / {expected_counter}")
+        print(f"修订号: {config.revision} / {expected_revision}")
+
+        ok = (
+            not failed
+            and len(config.proxies) == expected_proxies
+            and counter == expected_counter
+            and config.revision == expected_revision
+        )
+        if failed:
+            print(f"失败的进程: {failed}")
+        print("结果: 通过" if ok else "结果: 存在丢失的更新")
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
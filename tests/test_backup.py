@@ -0,0 +1,23 @@
+"""
+配置备份
+
+备份含有 API 密钥，backups 和 objects 目录只允许所有者访问。
+"""
+
+import os
+import stat
+import sys
+
+import pytest
+
+from claudewarp.core.backup import BackupStore
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix 权限")
+def test_backup_directories_are_private(tmp_path):
+    config_path = tmp_path / "config.toml"
+    store = BackupStore(config_path)
+    assert store.create(b'api_key = "sk-test-key"\n', "f" * 64, 5) is not None
+
+    for directory in (store.backup_dir, store.objects_dir):
+        assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
@@ -0,0 +1,60 @@
+"""
+上游负载均衡
+
+加权轮询按权重比例分配，权重不超过总权重一半的代理不会被连续选中；
+least-outstanding 按正在进行的请求数（按权重折算）选择。
+"""
+
+import pytest
+
+from claudewarp.core.balancer import STRATEGY_LEAST_OUTSTANDING, STRATEGY_WEIGHTED, LoadBalancer
+from claudewarp.core.models import ProxyServer
+
+
+def make_proxies(*names):
+    return [
+        ProxyServer(name=name, base_url="https://balancer.example.com/", api_key="sk-test-key")
+        for name in names
+    ]
+
+
+@pytest.mark.parametrize("weights", [{}, {"a": 2}, {"a": 3, "b": 2}, {"a": 2, "b": 2}])
+def test_weighted_follows_weights_without_repeats(weights):
+    balancer = LoadBalancer(STRATEGY_WEIGHTED, weights)
+    proxies = make_proxies("a", "b", "c")
+    total = sum(balancer.weight(proxy.name) for proxy in proxies)
+    picks = [balancer.select(proxies).name for _ in range(total * 10)]
+
+    assert {name: picks.count(name) for name in "abc"} == {
+        name: balancer.weight(name) * 10 for name in "abc"
+    }
+    assert all(previous != current for previous, current in zip(picks, picks[1:]))
+
+
+def test_dominant_weight_keeps_its_share():
+    # 权重超过其他代理之和时只能连续选中，仍按比例分配
+    balancer = LoadBalancer(STRATEGY_WEIGHTED, {"a": 5})
+    picks = [balancer.select(make_proxies("a", "b", "c")).name for _ in range(70)]
+    assert (picks.count("a"), picks.count("b"), picks.count("c")) == (50, 10, 10)
+
+
+def test_least_outstanding_tracks_acquire_and_release():
+    balancer = LoadBalancer(STRATEGY_LEAST_OUTSTANDING, {"b": 2})
+    proxies = make_proxies("a", "b", "c")
+
+    for name in ("a", "a", "b", "c"):
+        balancer.acquire(name)
+    # 正在进行的请求数按权重折算：a 为 2，b 为 0.5，c 为 1
+    assert {balancer.select(proxies).name for _ in range(3)} == {"b"}
+
+    balancer.acquire("b")
+    balancer.acquire("b")
+    balancer.release("a")
+    balancer.release("a")
+    assert {balancer.select(proxies).name for _ in range(3)} == {"a"}
+
+    # 负载相同时轮流
+    for name in ("b", "b", "b", "c"):
+        balancer.release(name)
+    assert sorted(balancer.select(proxies).name for _ in range(3)) == ["a", "b", "c"]
+    assert balancer.stats()["b"] == {"outstanding": 0, "requests": 3, "weight": 2}
@@ -0,0 +1,61 @@
+"""
+批量执行命令
+
+无法解析的命令行（例如引号不成对）报告行号，批处理中的命令都不执行；
+同步配置目标推迟到批处理提交之后，回滚时不写入。
+"""
+
+import json
+
+import pytest
+from typer.testing import CliRunner
+
+from claudewarp.cli.commands import app
+from claudewarp.core.manager import ProxyManager
+
+
+def test_unparsable_line_aborts_batch(tmp_path, monkeypatch, caplog):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    config_path = tmp_path / "config.toml"
+    monkeypatch.setenv("CLAUDEWARP_CONFIG", str(config_path))
+
+    commands = "\n".join(
+        [
+            "# 第 1 行是注释",
+            "add -n p0 -u https://batch.example.com/ -k sk-test-key --no-interactive",
+            'edit p0 --desc "unterminated',
+        ]
+    )
+    result = CliRunner().invoke(app, ["batch", "-"], input=commands)
+
+    assert result.exit_code == 1
+    assert "第 3 行" in caplog.text
+    assert "p0" not in ProxyManager(config_path=config_path, auto_backup=False).config.proxies
+
+
+@pytest.mark.parametrize("fails", [False, True])
+def test_target_sync_waits_for_batch_commit(tmp_path, monkeypatch, fails):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("CLAUDEWARP_CONFIG", str(tmp_path / "config.toml"))
+    target = tmp_path / "target"
+    target.mkdir()
+
+    commands = [
+        f"targets add {target}",
+        "add -n p0 -u https://batch.example.com/ -k sk-test-key --no-interactive",
+        "use p0 --targets",
+    ]
+    if fails:
+        commands.append("remove missing --force")
+    result = CliRunner().invoke(app, ["batch", "-"], input="\n".join(commands))
+
+    settings_path = target / "settings.json"
+    if fails:
+        assert result.exit_code == 1
+        assert not settings_path.exists()
+    else:
+        assert result.exit_code == 0
+        env = json.loads(settings_path.read_text())["env"]
+        assert env["ANTHROPIC_BASE_URL"] == "https://batch.example.com/"
@@ -0,0 +1,88 @@
+"""
+性能测试
+
+对本地模拟服务器（stub 模块）运行 BenchmarkRunner，检查流式和非流式请求的报告字段。
+"""
+
+import asyncio
+
+import pytest
+
+from claudewarp.core.bench import BENCH_MIXED, BENCH_NONSTREAM, BENCH_STREAM, BenchmarkRunner
+from claudewarp.core.models import ProxyServer
+from claudewarp.core.stub import StubServer
+
+API_KEY = "sk-test-key"
+TOKENS = 8
+
+
+def bench(mode: str, requests: int = 6, api_key: str = API_KEY, **stub_options):
+    async def main():
+        stub = StubServer(
+            port=0, ttft=0.02, token_delay=0.002, tokens=TOKENS, api_key=API_KEY, **stub_options
+        )
+        await stub.start()
+        try:
+            proxy = ProxyServer(name="stub", base_url=stub.url, api_key=api_key)
+            runner = BenchmarkRunner(
+                proxy, "stub-model", requests=requests, concurrency=3, mode=mode, timeout=10
+            )
+            return await runner.run_async()
+        finally:
+            await stub.close()
+
+    return asyncio.run(main())
+
+
+def assert_throughput(summary, requests: int) -> None:
+    assert summary["requests"] == requests
+    assert summary["successes"] == requests
+    assert summary["errors"] == {}
+    assert summary["error_rate"] == 0
+    assert summary["requests_per_second"] > 0
+    assert summary["output_tokens"] == requests * TOKENS
+    assert summary["tokens_per_second"] > 0
+    assert summary["latency"]["p50"] > 0
+
+
+def test_stream():
+    report = bench(BENCH_STREAM)
+    summary = report["summary"]
+    assert_throughput(summary, 6)
+    assert 0 < summary["ttft"]["p50"] <= summary["latency"]["p50"]
+    assert summary["itl"]["p50"] > 0
+    assert summary["stream_tokens_per_second"] > 0
+    # 同一次测试中的请求复用长连接
+    assert report["connections"] <= 3
+
+
+def test_nonstream():
+    summary = bench(BENCH_NONSTREAM)["summary"]
+    assert_throughput(summary, 6)
+    # 非流式响应一次返回全部内容，没有首 token 时间和 token 间隔
+    assert summary["ttft"]["p50"] is None
+    assert summary["itl"]["p50"] is None
+
+
+def test_mixed_reports_each_mode():
+    report = bench(BENCH_MIXED)
+    assert_throughput(report["summary"], 6)
+    stream, nonstream = report["by_mode"][BENCH_STREAM], report["by_mode"][BENCH_NONSTREAM]
+    assert_throughput(stream, 3)
+    assert_throughput(nonstream, 3)
+    assert stream["ttft"]["p50"] > 0 and stream["itl"]["p50"] > 0
+    assert nonstream["ttft"]["p50"] is None
+
+
+@pytest.mark.parametrize("mode", [BENCH_STREAM, BENCH_NONSTREAM])
+@pytest.mark.parametrize(
+    ("options", "error"),
+    [({"error_rate": 1.0}, "HTTP 529"), ({"api_key": "sk-wrong-key"}, "HTTP 401")],
+)
+def test_errors_are_counted(mode, options, error):
+    summary = bench(mode, requests=4, **options)["summary"]
+    assert summary["successes"] == 0
+    assert summary["error_rate"] == 1
+    assert summary["errors"] == {error: 4}
+    assert summary["requests_per_second"] == 0
+    assert summary["latency"]["p50"] is None
@@ -0,0 +1,142 @@
+"""
+连通性检查
+
+在本地 asyncio 服务器上检查各类失败能否区分：DNS、连接被拒绝、TLS、HTTP 5xx 和认证失败，
+以及同时进行的检查数不超过 concurrency。
+"""
+
+import asyncio
+import socket
+
+import pytest
+
+from claudewarp.core.checker import (
+    CHECK_AUTH_ERROR,
+    CHECK_CONNECT_ERROR,
+    CHECK_DNS_ERROR,
+    CHECK_HTTP_ERROR,
+    CHECK_OK,
+    CHECK_TLS_ERROR,
+    ConnectivityChecker,
+)
+from claudewarp.core.exceptions import ErrorCodes
+from claudewarp.core.models import ProxyServer
+
+TIMEOUTS = {"dns": 3.0, "connect": 3.0, "tls": 3.0, "http": 3.0}
+
+
+class StatusServer:
+    """按请求路径返回状态码的本地服务器
+
+    base_url 的路径决定响应：/s<状态码>/ 返回该状态码，/slow/ 等待 delay 秒后返回 200；
+    请求行无效（例如收到 TLS 握手）时返回 400 并关闭连接。同时记录最大并发连接数。
+    """
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.port = 0
+        self._server = None
+
+    async def __aenter__(self) -> "StatusServer":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    def url(self, path: str = "", scheme: str = "http") -> str:
+        return f"{scheme}://127.0.0.1:{self.port}/{path}"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            request_line = await reader.readline()
+            parts = request_line.decode("latin-1").split(" ")
+            if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+                writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+                return
+            await reader.readuntil(b"\r\n\r\n")
+            status = 200
+            segment = parts[1].strip("/").split("/", 1)[0]
+            if segment.startswith("s") and segment[1:].isdigit():
+                status = int(segment[1:])
+            elif segment == "slow":
+                await asyncio.sleep(self.delay)
+            writer.write(f"HTTP/1.1 {status} Test\r\nContent-Length: 0\r\n\r\n".encode())
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.active -= 1
+            writer.close()
+
+
+def make_proxy(name: str, base_url: str) -> ProxyServer:
+    return ProxyServer(name=name, base_url=base_url, api_key="sk-test-key")
+
+
+def closed_port() -> int:
+    """一个当前没有监听的本地端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def check(proxies, concurrency: int = 8):
+    async def main():
+        async with StatusServer() as server:
+            checker = ConnectivityChecker(concurrency=concurrency, timeouts=TIMEOUTS)
+            results = await checker.check_all([make_proxy(n, u(server)) for n, u in proxies])
+            return server, results
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize(
+    ("base_url", "status", "http_status"),
+    [
+        (lambda server: server.url(), CHECK_OK, 200),
+        (lambda server: server.url("s404/"), CHECK_OK, 404),
+        (lambda server: server.url("s429/"), CHECK_OK, 429),
+        (lambda server: server.url("s503/"), CHECK_HTTP_ERROR, 503),
+        (lambda server: server.url("s500/"), CHECK_HTTP_ERROR, 500),
+        (lambda server: server.url("s401/"), CHECK_AUTH_ERROR, 401),
+        (lambda server: server.url("s403/"), CHECK_AUTH_ERROR, 403),
+        (lambda server: server.url(scheme="https"), CHECK_TLS_ERROR, None),
+        (lambda server: f"http://127.0.0.1:{closed_port()}/", CHECK_CONNECT_ERROR, None),
+        (lambda server: "http://claudewarp-check.test/", CHECK_DNS_ERROR, None),
+    ],
+)
+def test_failure_classes(base_url, status, http_status):
+    _, (result,) = check([("p", base_url)])
+    assert result["status"] == status, result["message"]
+    assert result["http_status"] == http_status
+    if status == CHECK_OK:
+        assert result["error"] is None
+        assert result["latency"] > 0
+        assert {"dns", "connect", "ttfb", "http"} <= set(result["timings"])
+    else:
+        assert result["message"]
+        auth = status == CHECK_AUTH_ERROR
+        expected = ErrorCodes.API_KEY_ERROR if auth else ErrorCodes.PROXY_CONNECTION_ERROR
+        assert result["error"]["error_code"] == expected
+
+
+def test_concurrency_is_bounded():
+    proxies = [(f"p{i}", lambda server: server.url("slow/")) for i in range(12)]
+    server, results = check(proxies, concurrency=3)
+    assert [result["status"] for result in results] == [CHECK_OK] * 12
+    assert [result["proxy_name"] for result in results] == [f"p{i}" for i in range(12)]
+    assert 1 < server.max_active <= 3
+
+
+def test_dns_lookup_is_shared():
+    proxies = [(f"p{i}", lambda server: server.url(f"s20{i}/")) for i in range(3)]
+    _, results = check(proxies)
+    assert [result["status"] for result in results] == [CHECK_OK] * 3
+    assert sorted(result["dns_reused"] for result in results) == [False, True, True]
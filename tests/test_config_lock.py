@@ -0,0 +1,59 @@
+"""
+配置并发修改
+
+多个进程同时修改同一个配置文件，检查跨进程锁和修订号检查不会丢失更新
+（scripts/stress_config_lock.py 的缩小版本，脚本可用于更多进程和轮数的压力测试）。
+"""
+
+import multiprocessing
+from pathlib import Path
+
+import pytest
+
+from claudewarp.core.manager import ProxyManager
+
+WORKERS = 4
+OPS = 3
+COUNTER_PROXY = "counter"
+
+
+def worker(config_path: str, worker_id: int, start_event) -> None:
+    """交替添加名称唯一的代理，并在事务中对同一个计数器做“读取-加一-写回”"""
+    manager = ProxyManager(config_path=Path(config_path), auto_backup=False)
+    start_event.wait()
+    for op in range(OPS):
+        manager.add_proxy(f"w{worker_id}-p{op}", "https://stress.example.com/", "sk-stress-test")
+        with manager.transaction():
+            current = int(manager.get_proxy(COUNTER_PROXY).description)
+            manager.update_proxy(COUNTER_PROXY, description=str(current + 1))
+
+
+@pytest.mark.parametrize("suffix", [".toml", ".json", ".db"])
+def test_concurrent_mutations_are_not_lost(tmp_path, monkeypatch, suffix):
+    # Claude Code 配置和缓存放在临时目录中，子进程继承这些环境变量
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    config_path = tmp_path / f"config{suffix}"
+
+    manager = ProxyManager(config_path=config_path, auto_backup=False)
+    manager.add_proxy(
+        COUNTER_PROXY, "https://stress.example.com/", "sk-stress-test", description="0"
+    )
+    initial_revision = manager.config.revision
+
+    start_event = multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(target=worker, args=(str(config_path), worker_id, start_event))
+        for worker_id in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    start_event.set()
+    for process in processes:
+        process.join(timeout=120)
+
+    assert [process.exitcode for process in processes] == [0] * WORKERS
+    config = ProxyManager(config_path=config_path, auto_backup=False).config
+    assert len(config.proxies) == WORKERS * OPS + 1
+    assert int(config.proxies[COUNTER_PROXY].description) == WORKERS * OPS
+    assert config.revision == initial_revision + 2 * WORKERS * OPS
@@ -0,0 +1,54 @@
+"""
+导出代理
+
+导出到文件时经由同目录下权限为0600的唯一临时文件写入，中途失败（包括中断）不留下临时文件。
+"""
+
+import json
+import stat
+
+import pytest
+from typer.testing import CliRunner
+
+from claudewarp.cli.commands import app
+from claudewarp.core.manager import ProxyManager
+
+
+@pytest.fixture
+def config_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    config_path = tmp_path / "config.toml"
+    monkeypatch.setenv("CLAUDEWARP_CONFIG", str(config_path))
+    manager = ProxyManager(config_path=config_path, auto_backup=False)
+    for name in ("p0", "p1"):
+        manager.add_proxy(name, "https://dump.example.com/", "sk-test-key")
+    return config_path
+
+
+def test_dump_writes_private_file_without_leftovers(tmp_path, config_path):
+    output = tmp_path / "out" / "proxies.ndjson"
+    output.parent.mkdir()
+    result = CliRunner().invoke(app, ["dump", "-o", str(output)])
+
+    assert result.exit_code == 0
+    assert [json.loads(line)["api_key"] for line in output.read_text().splitlines()] == [
+        "sk-test-key",
+        "sk-test-key",
+    ]
+    assert stat.S_IMODE(output.stat().st_mode) == 0o600
+    assert list(output.parent.iterdir()) == [output]
+
+
+def test_interrupted_dump_removes_temp_file(tmp_path, config_path, monkeypatch):
+    def interrupted(self, **kwargs):
+        yield {"name": "p0", "api_key": "sk-test-key"}
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(ProxyManager, "iter_proxies", interrupted)
+    output = tmp_path / "out" / "proxies.ndjson"
+    output.parent.mkdir()
+    result = CliRunner().invoke(app, ["dump", "-o", str(output)])
+
+    assert result.exit_code != 0
+    assert list(output.parent.iterdir()) == []
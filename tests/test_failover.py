@@ -0,0 +1,231 @@
+"""
+故障转移
+
+POST 请求写入上游之后连接中断时不在备用代理上重复发送，写入之前的失败按备用代理顺序重试；
+熔断器在连续失败后断开，冷却后放行一个试探请求，成功则恢复。
+"""
+
+import asyncio
+import json
+import socket
+
+import pytest
+
+from claudewarp.core import failover
+from claudewarp.core.failover import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    CircuitBreaker,
+)
+from claudewarp.core.forwarder import LocalProxyServer
+from claudewarp.core.manager import ProxyManager
+from claudewarp.core.stub import StubServer
+from claudewarp.core.transport import ConnectionPool, StaleConnectionError, read_head
+
+
+class DroppingServer:
+    """读完整个请求，返回 200 响应头和一部分响应体后断开连接"""
+
+    def __init__(self):
+        self.requests = 0
+        self.port = 0
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            _, headers = await read_head(reader)
+            length = dict((key.lower(), value) for key, value in headers).get("content-length")
+            await reader.readexactly(int(length or 0))
+            self.requests += 1
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                b'Content-Length: 100\r\n\r\n{"id": "msg_partial"'
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+def closed_url() -> str:
+    """一个当前没有监听的本地地址"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}/"
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    # 重试前不等待退避时间
+    monkeypatch.setattr("claudewarp.core.forwarder.backoff_delay", lambda attempt: 0)
+    return ProxyManager(config_path=tmp_path / "config.toml", auto_backup=False)
+
+
+async def forward(manager, primary: str, fallbacks, method: str = "POST") -> bytes:
+    """以故障转移模式转发一个请求，返回客户端收到的响应"""
+    manager.switch_proxy(primary)
+    manager.set_fallbacks(primary, fallbacks)
+    server = LocalProxyServer(manager, port=0, watch=False, failover=True)
+    await server.start()
+    try:
+        if method == "POST":
+            messages = [{"role": "user", "content": "hi"}]
+            body = json.dumps({"model": "stub-model", "max_tokens": 4, "messages": messages})
+            body, target = body.encode(), "/v1/messages"
+        else:
+            body, target = b"", "/v1/models"
+        head = (
+            f"{method} {target} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n"
+        )
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(head.encode() + body)
+        response = await asyncio.wait_for(reader.read(), 10)
+        writer.close()
+        return response
+    finally:
+        await server.close()
+
+
+def run_with_servers(test) -> None:
+    """启动一个中途断开的上游和两个正常的上游，执行 test(dropping, second, third)"""
+
+    async def main():
+        dropping = DroppingServer()
+        stubs = [StubServer(port=0, ttft=0, token_delay=0, tokens=2) for _ in range(2)]
+        await dropping.start()
+        for stub in stubs:
+            await stub.start()
+        try:
+            await test(dropping, *stubs)
+        finally:
+            await dropping.close()
+            for stub in stubs:
+                await stub.close()
+
+    asyncio.run(main())
+
+
+def test_post_is_not_resent_after_upstream_drops(manager):
+    async def test(dropping, second, third):
+        manager.add_proxy("dropping", dropping.url, "sk-test-key")
+        manager.add_proxy("second", second.url, "sk-test-key")
+        response = await forward(manager, "dropping", ["second"])
+        assert response.startswith(b"HTTP/1.1 502 ")
+        assert (dropping.requests, second.requests) == (1, 0)
+
+    run_with_servers(test)
+
+
+def test_idempotent_request_is_retried_after_upstream_drops(manager):
+    async def test(dropping, second, third):
+        manager.add_proxy("dropping", dropping.url, "sk-test-key")
+        manager.add_proxy("second", second.url, "sk-test-key")
+        response = await forward(manager, "dropping", ["second"], method="GET")
+        assert response.startswith(b"HTTP/1.1 200 ")
+        assert (dropping.requests, second.requests) == (1, 1)
+
+    run_with_servers(test)
+
+
+def test_unsent_post_follows_fallback_order(manager):
+    async def test(dropping, second, third):
+        manager.add_proxy("primary", closed_url(), "sk-test-key")
+        manager.add_proxy("refused", closed_url(), "sk-test-key")
+        manager.add_proxy("disabled", third.url, "sk-test-key", is_active=False)
+        manager.add_proxy("second", second.url, "sk-test-key")
+        manager.add_proxy("third", third.url, "sk-test-key")
+        # 连接失败时请求尚未发出，POST 也在备用代理上重试；禁用的备用代理被跳过
+        fallbacks = ["refused", "disabled", "second", "third"]
+        response = await forward(manager, "primary", fallbacks)
+        assert response.startswith(b"HTTP/1.1 200 ")
+        assert (second.requests, third.requests) == (1, 0)
+
+    run_with_servers(test)
+
+
+def test_stale_reused_connection_is_reported_as_not_sent():
+    async def handle(reader, writer):
+        # 响应没有 Connection: close，但之后立即关闭连接，客户端池中的空闲连接随之失效
+        await read_head(reader)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+        await writer.drain()
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        pool = ConnectionPool(f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/")
+        try:
+            response = await pool.request("GET", "/", [])
+            assert await response.read() == b"ok"
+            pool.release(response.connection)
+            await asyncio.sleep(0.05)
+
+            connection = await pool.connect()
+            with pytest.raises(StaleConnectionError):
+                await pool.send(connection, "POST", "/", [], b"{}")
+            # request() 换一个新连接重新发送
+            response = await pool.request("POST", "/", [], b"{}")
+            assert response.status == 200
+            pool.release(response.connection)
+        finally:
+            await pool.aclose()
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(main())
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_half_opens_and_closes(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(failover.time, "monotonic", clock)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert not breaker.available() and not breaker.allow()
+
+    # 冷却后半开：只放行一个试探请求，试探失败重新断开
+    clock.now += 10
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+
+    # 再次冷却后试探成功，恢复闭合并清零失败次数
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.snapshot() == {"state": CIRCUIT_CLOSED, "failures": 0}
+
+    # 试探请求既不成功也不失败时归还名额
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow() and not breaker.available()
+    breaker.release()
+    assert breaker.available()
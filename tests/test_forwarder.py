@@ -0,0 +1,109 @@
+"""
+本地转发代理
+
+令牌在读取请求体之前检查，请求体（包括 chunked 请求体）超过 MAX_REQUEST_BODY 时返回 413；
+故障转移时每次失败的尝试分别计入用量统计。
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from claudewarp.core import forwarder
+from claudewarp.core.forwarder import LocalProxyServer
+from claudewarp.core.manager import ProxyManager
+from claudewarp.core.stub import StubServer
+
+TOKEN = "cw-local-test-token"
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return ProxyManager(config_path=tmp_path / "config.toml", auto_backup=False)
+
+
+def exchange(manager, head: str, body: bytes = b"") -> bytes:
+    """发送请求头和请求体，返回服务器关闭连接前的全部响应"""
+
+    async def main():
+        server = LocalProxyServer(manager, port=0, token=TOKEN, watch=False)
+        await server.start()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(head.replace("\n", "\r\n").encode() + b"\r\n" + body)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return response
+        finally:
+            await server.close()
+
+    return asyncio.run(main())
+
+
+def test_token_is_checked_before_body(manager):
+    # 只发送请求头：服务器不等待请求体，直接返回 401 并关闭连接
+    head = "POST /v1/messages HTTP/1.1\nHost: localhost\nContent-Length: 1000\n"
+    response = exchange(manager, head)
+    assert response.startswith(b"HTTP/1.1 401 ")
+    assert b"authentication_error" in response
+
+
+@pytest.mark.parametrize("chunked", [True, False])
+def test_request_body_is_capped(manager, monkeypatch, chunked):
+    monkeypatch.setattr(forwarder, "MAX_REQUEST_BODY", 100)
+    head = f"POST /v1/messages HTTP/1.1\nHost: localhost\nx-api-key: {TOKEN}\n"
+    if chunked:
+        head += "Transfer-Encoding: chunked\n"
+        body = b"40\r\n" + b"x" * 64 + b"\r\n" + b"40\r\n" + b"x" * 64 + b"\r\n0\r\n\r\n"
+    else:
+        head += "Content-Length: 128\n"
+        body = b"x" * 128
+    response = exchange(manager, head, body)
+    assert response.startswith(b"HTTP/1.1 413 ")
+    assert b"request_too_large" in response
+
+
+def test_failed_failover_attempts_are_metered(manager):
+    async def main():
+        broken = StubServer(port=0, ttft=0, token_delay=0, tokens=4, error_rate=1.0)
+        healthy = StubServer(port=0, ttft=0, token_delay=0, tokens=4)
+        await broken.start()
+        await healthy.start()
+        manager.add_proxy("broken", broken.url, "sk-test-key")
+        manager.add_proxy("healthy", healthy.url, "sk-test-key")
+        manager.switch_proxy("broken")
+        manager.set_fallbacks("broken", ["healthy"])
+        server = LocalProxyServer(
+            manager, port=0, token=TOKEN, watch=False, failover=True, metering=True
+        )
+        await server.start()
+        try:
+            messages = [{"role": "user", "content": "hi"}]
+            body = json.dumps({"model": "stub-model", "max_tokens": 4, "messages": messages})
+            body = body.encode()
+            head = (
+                "POST /v1/messages HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                f"x-api-key: {TOKEN}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            )
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(head.encode() + body)
+            response = await asyncio.wait_for(reader.read(), 10)
+            writer.close()
+            return response, server.meter.take()
+        finally:
+            await server.close()
+            await broken.close()
+            await healthy.close()
+
+    response, buckets = asyncio.run(main())
+    assert response.startswith(b"HTTP/1.1 200 ")
+    by_proxy = {proxy: bucket for (_, proxy, model), bucket in buckets.items()}
+    assert sorted(by_proxy) == ["broken", "healthy"]
+    assert (by_proxy["broken"].requests, by_proxy["broken"].errors) == (1, 1)
+    assert (by_proxy["healthy"].requests, by_proxy["healthy"].errors) == (1, 0)
+    assert {model for _, _, model in buckets} == {"stub-model"}
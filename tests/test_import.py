@@ -0,0 +1,60 @@
+"""
+批量导入
+
+记录只读取一次；提交时遇到其他进程的修改只重试提交步骤，不会重新消费已读完的记录。
+"""
+
+import pytest
+
+from claudewarp.core.exceptions import ConfigConflictError
+from claudewarp.core.exceptions import ImportError as ProxyImportError
+from claudewarp.core.manager import ProxyManager
+
+
+@pytest.fixture
+def config_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "config.toml"
+
+
+def one_shot_records(names):
+    for position, name in enumerate(names, 1):
+        yield position, {"name": name, "base_url": "https://import.example.com/", "api_key": "sk-k"}
+
+
+def test_conflicting_commit_is_retried_without_rereading_records(config_path):
+    manager = ProxyManager(config_path=config_path, auto_backup=False)
+    manager.add_proxy("existing", "https://import.example.com/", "sk-test-key")
+    save_config = manager.config_manager.save_config
+    calls = []
+
+    def conflict_once(config, *args, **kwargs):
+        # 第一次提交时模拟其他进程已修改配置（修订号不一致）
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConfigConflictError(str(config_path), config.revision, config.revision + 1)
+        return save_config(config, *args, **kwargs)
+
+    manager.config_manager.save_config = conflict_once
+    result = manager.import_proxies(one_shot_records(["p0", "p1"]))
+
+    assert result["added"] == ["p0", "p1"]
+    assert len(calls) == 2
+    reloaded = ProxyManager(config_path=config_path, auto_backup=False)
+    assert sorted(reloaded.config.proxies) == ["existing", "p0", "p1"]
+
+
+def test_name_conflicts_are_reported_with_invalid_records(config_path):
+    manager = ProxyManager(config_path=config_path, auto_backup=False)
+    manager.add_proxy("p1", "https://import.example.com/", "sk-test-key")
+    records = list(one_shot_records(["p0", "p1"])) + [(3, {"name": "p2"})]
+
+    with pytest.raises(ProxyImportError) as excinfo:
+        manager.import_proxies(records)
+    assert [item["position"] for item in excinfo.value.details["errors"]] == [2, 3]
+
+    created_at = manager.get_proxy("p1").created_at
+    result = manager.import_proxies(records[:2], on_conflict="upsert")
+    assert result == {"added": ["p0"], "updated": ["p1"], "skipped": []}
+    assert manager.get_proxy("p1").created_at == created_at
@@ -0,0 +1,131 @@
+"""
+启动导入预算
+
+'cw current' 等命令每天被 shell 提示符和 CI 调用成千上万次，启动时间主要花在导入上。
+这里在子进程中以 -X importtime 导入 CLI，检查不该在启动时加载的模块没有被导入，
+并且导入耗时（importtime 报告的累计时间，取多次运行的最小值）不超过预算。
+'cw current' 另外按端到端的子进程耗时（扣除空解释器的启动耗时）检查，并确认走了快速路径。
+
+预算可以用环境变量 CLAUDEWARP_IMPORT_BUDGET_SCALE 按机器速度整体放大。
+"""
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+RUNS = 3
+
+# 端到端计时受进程调度影响更大，多运行几次取最小值
+WALL_RUNS = 7
+
+BUDGET_SCALE = float(os.environ.get("CLAUDEWARP_IMPORT_BUDGET_SCALE", "1"))
+
+# 导入 CLI 命令模块时不应加载的模块：数据模型、语法高亮和网络/异步相关的模块
+CLI_FORBIDDEN = ("pydantic", "rich.syntax", "pygments", "asyncio", "ssl", "concurrent.futures")
+
+# 读取配置（cw current、cw use）需要 pydantic，但不应加载网络/异步相关的模块
+MANAGER_FORBIDDEN = ("asyncio", "ssl", "concurrent.futures", "gzip", "claudewarp.core.checker")
+
+# 'cw current' 的快速路径只读取配置文件和渲染输出，不应加载命令框架、日志配置和数据模型
+CURRENT_FORBIDDEN = ("typer", "colorlog", "pydantic", "claudewarp.core.config")
+
+# 累计导入耗时预算（毫秒）
+BUDGETS_MS = {
+    "claudewarp": 25,
+    "claudewarp.cli.commands": 250,
+}
+
+# 'cw current' 端到端耗时预算（毫秒），不含空解释器的启动耗时
+CURRENT_BUDGET_MS = 250
+
+
+def import_times(statement: str) -> Dict[str, int]:
+    """在新的解释器中执行 statement，返回各模块的累计导入耗时（微秒）"""
+    return run_with_importtime(["-c", statement])[0]
+
+
+def run_with_importtime(args: List[str], env=None) -> Tuple[Dict[str, int], str]:
+    """以 -X importtime 运行解释器，返回各模块的累计导入耗时（微秒）和标准输出"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times, result.stdout
+
+
+def loaded_modules(times: Dict[str, int], forbidden: Tuple[str, ...]) -> List[str]:
+    """返回已加载的禁止模块（包括其子模块）"""
+    return sorted(
+        name for name in times if any(name == f or name.startswith(f + ".") for f in forbidden)
+    )
+
+
+@pytest.mark.parametrize(
+    ("statement", "forbidden"),
+    [
+        ("import claudewarp.cli.commands", CLI_FORBIDDEN),
+        ("import claudewarp.cli.commands, claudewarp.core.manager", MANAGER_FORBIDDEN),
+    ],
+)
+def test_startup_does_not_import_heavy_modules(statement, forbidden):
+    loaded = loaded_modules(import_times(statement), forbidden)
+    assert not loaded, f"'{statement}' 导入了启动时不需要的模块: {', '.join(loaded)}"
+
+
+@pytest.mark.parametrize("module", sorted(BUDGETS_MS))
+def test_import_time_budget(module):
+    best = min(import_times(f"import {module}")[module] for _ in range(RUNS)) / 1000
+    budget = BUDGETS_MS[module] * BUDGET_SCALE
+    assert best <= budget, f"导入 {module} 耗时 {best:.1f} ms，超过预算 {budget:.0f} ms"
+
+
+def best_wall_time(args: List[str], env=None) -> float:
+    """多次运行子进程，返回最短耗时（毫秒）"""
+    best = float("inf")
+    for _ in range(WALL_RUNS):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=ROOT, env=env, capture_output=True, check=True)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def test_current_end_to_end_budget(tmp_path):
+    from claudewarp.core.manager import ProxyManager
+
+    config_path = tmp_path / "config.toml"
+    manager = ProxyManager(config_path=config_path, auto_backup=False)
+    manager.add_proxy("budget", "https://budget.example.com/", "sk-test-key-123456")
+    env = {
+        **os.environ,
+        "HOME": str(tmp_path),
+        "XDG_CACHE_HOME": str(tmp_path / "cache"),
+        "CLAUDEWARP_CONFIG": str(config_path),
+    }
+    command = ["-m", "claudewarp.cli.main", "current"]
+
+    times, output = run_with_importtime(command, env)
+    assert "budget" in output and "sk-t**********3456" in output
+    loaded = loaded_modules(times, CURRENT_FORBIDDEN)
+    assert not loaded, f"'cw current' 没有走快速路径，导入了: {', '.join(loaded)}"
+
+    elapsed = best_wall_time(command, env) - best_wall_time(["-c", "pass"], env)
+    budget = CURRENT_BUDGET_MS * BUDGET_SCALE
+    assert elapsed <= budget, f"'cw current' 耗时 {elapsed:.1f} ms，超过预算 {budget:.0f} ms"
@@ -0,0 +1,64 @@
+"""
+变更日志
+
+配置文件在变更日志之后被整体替换时，不加锁的读取只能忽略日志，持有配置锁的写入才能将其移走；
+追加记录不重新生成快照，加载时在快照上重放快照之后的记录。
+"""
+
+from claudewarp.core.config import ConfigManager
+from claudewarp.core.models import ProxyConfig, ProxyServer
+
+
+def make_proxy(name: str) -> ProxyServer:
+    return ProxyServer(name=name, base_url="https://journal.example.com/", api_key="sk-test-key")
+
+
+def test_mismatched_journal_is_only_set_aside_under_lock(tmp_path):
+    config_path = tmp_path / "config.toml"
+    manager = ConfigManager(config_path=config_path, auto_backup=False, use_journal=True)
+    config = ProxyConfig(proxies={"p0": make_proxy("p0")})
+    manager.save_config(config, force=True)
+    config.proxies["p1"] = make_proxy("p1")
+    manager.save_config(config, changed_proxies=["p1"])
+    assert manager.journal.exists()
+
+    # 外部编辑替换了配置文件，日志中记录的基础内容哈希不再匹配
+    config_path.write_bytes(config_path.read_bytes() + b"\n# edited\n")
+
+    reader = ConfigManager(config_path=config_path, auto_backup=False, use_journal=True)
+    loaded = reader.load_config()
+    assert list(loaded.proxies) == ["p0"]
+    assert reader.journal.exists()
+    assert not list(tmp_path.glob("*.orphaned.*"))
+
+    loaded.proxies["p2"] = make_proxy("p2")
+    reader.save_config(loaded, changed_proxies=["p2"])
+    assert len(list(tmp_path.glob("config.toml.journal.orphaned.*"))) == 1
+
+    # 新记录写入以当前配置文件为基础的新日志，重新加载时可以重放
+    fresh = ConfigManager(config_path=config_path, auto_backup=False, use_journal=True)
+    assert sorted(fresh.load_config().proxies) == ["p0", "p2"]
+
+
+def test_append_keeps_snapshot_and_load_replays_tail(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    config_path = tmp_path / "config.toml"
+    manager = ConfigManager(config_path=config_path, auto_backup=False, use_journal=True)
+    config = ProxyConfig(proxies={name: make_proxy(name) for name in ("p0", "p1")})
+    manager.save_config(config, force=True)
+    snapshot = manager._get_snapshot_path().read_bytes()
+
+    config.proxies["p2"] = make_proxy("p2")
+    manager.save_config(config, changed_proxies=["p2"])
+    del config.proxies["p0"]
+    config.current_proxy = "p2"
+    manager.save_config(config, removed_proxies=["p0"])
+    assert manager.journal.exists()
+    assert manager._get_snapshot_path().read_bytes() == snapshot
+
+    loaded = ConfigManager(config_path=config_path, auto_backup=False).load_config()
+    parsed = ConfigManager(config_path=config_path, use_snapshot=False).load_config()
+    assert sorted(loaded.proxies) == sorted(parsed.proxies) == ["p1", "p2"]
+    assert loaded.current_proxy == parsed.current_proxy == "p2"
+    assert loaded.revision == parsed.revision == config.revision
+    assert not loaded.is_dirty()
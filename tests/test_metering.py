@@ -0,0 +1,60 @@
+"""
+用量统计
+
+代理或模型的编号超出记录中 16 位字段的范围时，在写入任何记录之前报错；
+小时汇总整体替换，写入失败时不会重复汇总；不带时区的统计起点按 UTC 解释。
+"""
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from claudewarp.core import metering
+from claudewarp.core.metering import UsageMeter, UsageStore, parse_since
+
+
+def test_name_ids_are_bounded_before_packing(tmp_path):
+    store = UsageStore(tmp_path)
+    names = {"proxies": [f"p{i}" for i in range(0x10000)], "models": ["m"]}
+    (tmp_path / "names.json").write_text(json.dumps(names), encoding="utf-8")
+
+    # 编号 0xFFFF 仍可使用
+    meter = UsageMeter()
+    meter.record("p65535", "m", 0.1, False)
+    store.append(meter.take())
+    assert len(list(tmp_path.glob("minutes-*.bin"))) == 1
+
+    meter.record("overflow", "m", 0.1, False)
+    with pytest.raises(ValueError):
+        store.append(meter.take())
+    assert json.loads((tmp_path / "names.json").read_text(encoding="utf-8")) == names
+
+
+def test_failed_fold_does_not_double_count(tmp_path, monkeypatch):
+    store = UsageStore(tmp_path)
+    meter = UsageMeter()
+    meter.record("p0", "m", 0.1, False)
+    store.append(meter.take())
+    assert store.query()[0]["requests"] == 1
+
+    meter.record("p0", "m", 0.1, False)
+    store.append(meter.take())
+    hours_path = next(tmp_path.glob("hours-*.bin"))
+    before = hours_path.read_bytes()
+
+    # 替换小时记录失败时原文件保持不变，下次统计重新汇总同一批分钟记录
+    monkeypatch.setattr(metering, "atomic_write", lambda *args, **kwargs: False)
+    with pytest.raises(OSError):
+        store.query()
+    assert hours_path.read_bytes() == before
+    monkeypatch.undo()
+
+    assert store.query()[0]["requests"] == 2
+    assert store.query()[0]["requests"] == 2
+
+
+def test_naive_since_is_utc():
+    expected = datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp()
+    assert parse_since("2026-01-01") == expected
+    assert parse_since("2026-01-01T08:00:00+08:00") == expected
@@ -0,0 +1,62 @@
+"""
+配置变更跟踪
+
+保存后只比较被替换的代理对象和全局字段，内容实质相同的替换不视为变更。
+"""
+
+import pickle
+
+from claudewarp.core.models import ProxyConfig, ProxyServer
+
+
+def make_config() -> ProxyConfig:
+    proxies = {
+        name: ProxyServer(name=name, base_url="https://models.example.com/", api_key="sk-test-key")
+        for name in ("p0", "p1")
+    }
+    config = ProxyConfig(proxies=proxies, current_proxy="p0")
+    config.mark_saved()
+    return config
+
+
+def test_fresh_config_is_dirty_until_saved():
+    config = ProxyConfig()
+    assert config.is_dirty()
+    config.mark_saved()
+    assert not config.is_dirty()
+
+
+def test_replaced_proxy_is_compared_by_content():
+    config = make_config()
+    proxy = config.proxies["p1"]
+    config.proxies["p1"] = proxy.model_copy(update={"updated_at": "2000-01-01T00:00:00"})
+    assert not config.is_dirty()
+
+    config.proxies["p1"] = proxy.model_copy(update={"description": "changed"})
+    assert config.is_dirty()
+    config.mark_saved()
+    assert not config.is_dirty()
+
+
+def test_added_removed_and_global_changes_are_dirty():
+    config = make_config()
+    del config.proxies["p1"]
+    assert config.is_dirty()
+
+    config = make_config()
+    config.proxies["p2"] = config.proxies.pop("p1").model_copy(update={"name": "p2"})
+    assert config.is_dirty()
+
+    config = make_config()
+    config.current_proxy = "p1"
+    assert config.is_dirty()
+
+    config = make_config()
+    config.settings = {**config.settings, "journal": True}
+    assert config.is_dirty()
+
+
+def test_saved_state_survives_pickling():
+    config = pickle.loads(pickle.dumps(make_config()))
+    assert not config.is_dirty()
+    assert config._saved_proxies["p0"] is config.proxies["p0"]
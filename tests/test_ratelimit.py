@@ -0,0 +1,188 @@
+"""
+速率限制调度
+
+令牌桶按 reset 时间推算补充速度；429 响应在 retry-after（没有时为默认时间）之前暂停发送；
+排队的请求按会话轮流放行，排队超时返回 429；代理池模式下优先分配给有剩余容量的代理。
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from claudewarp.core import ratelimit
+from claudewarp.core.forwarder import LocalProxyServer
+from claudewarp.core.manager import ProxyManager
+from claudewarp.core.ratelimit import (
+    DEFAULT_RETRY_AFTER,
+    RateLimiter,
+    TokenBucket,
+    UpstreamRateLimit,
+    _FairQueue,
+)
+from claudewarp.core.stub import StubServer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Gate:
+    """由测试控制剩余容量的速率限制估计"""
+
+    def __init__(self):
+        self.capacity = 0
+
+    def delay(self) -> float:
+        return 0.0 if self.capacity > 0 else 0.01
+
+    def consume(self, cost: float) -> None:
+        self.capacity -= 1
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return ProxyManager(config_path=tmp_path / "config.toml", auto_backup=False)
+
+
+def test_bucket_refills_until_reset():
+    bucket = TokenBucket()
+    assert bucket.delay(10, 0) == 0.0
+
+    # 还剩 4 个令牌，3 秒后恢复到 10 个：每秒补充 2 个
+    bucket.update(10, 4, 3.0, now=0)
+    assert bucket.level(1) == 6
+    assert bucket.level(100) == 10
+    assert bucket.delay(8, 1) == 1.0
+    assert bucket.delay(6, 1) == 0.0
+
+    bucket.consume(6, 1)
+    assert bucket.level(1) == 0
+    assert bucket.delay(1, 1) == 0.5
+
+    # 没有 reset 时间时每 REFILL_WINDOW 秒恢复 limit 个令牌
+    bucket.update(60, 0, None, now=0)
+    assert bucket.rate == 60 / ratelimit.REFILL_WINDOW
+
+
+def test_throttled_upstream_waits_for_retry_after(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock)
+    limits = UpstreamRateLimit()
+
+    limits.update(429, [("Retry-After", "5")])
+    assert limits.delay() == 5.0
+    clock.now += 5
+    assert limits.delay() == 0.0
+
+    limits.update(429, [])
+    assert limits.delay() == DEFAULT_RETRY_AFTER
+    assert limits.snapshot()["throttled"] == 2
+
+    # 其他状态码没有 retry-after 时不暂停
+    clock.now += DEFAULT_RETRY_AFTER
+    limits.update(503, [])
+    assert limits.delay() == 0.0
+
+    headers = [
+        ("anthropic-ratelimit-requests-limit", "50"),
+        ("anthropic-ratelimit-requests-remaining", "0"),
+    ]
+    limits.update(200, headers)
+    assert limits.delay() == pytest.approx(ratelimit.REFILL_WINDOW / 50)
+    assert limits.snapshot()["requests_remaining"] == 0
+
+
+def test_sessions_take_turns():
+    async def main():
+        gate = Gate()
+        queue = _FairQueue(gate)
+        order = []
+
+        async def request(session):
+            await queue.acquire(session, 1)
+            order.append(session)
+
+        tasks = [asyncio.ensure_future(request(session)) for session in "aaab"]
+        tasks.append(asyncio.ensure_future(request("b")))
+        await asyncio.sleep(0)
+        assert queue.queued == 5 and order == []
+
+        gate.capacity = 5
+        await asyncio.wait_for(asyncio.gather(*tasks), 5)
+        return order
+
+    assert asyncio.run(main()) == ["a", "b", "a", "b", "a"]
+
+
+def test_queue_wait_times_out():
+    async def main():
+        limiter = RateLimiter(max_wait=0.05)
+        limiter.update("p0", 429, [("retry-after", "60")])
+        assert not limiter.available("p0")
+        with pytest.raises(asyncio.TimeoutError):
+            await limiter.acquire("p0", "session", 1)
+
+    asyncio.run(main())
+
+
+async def post(server: LocalProxyServer) -> bytes:
+    messages = [{"role": "user", "content": "hi"}]
+    body = json.dumps({"model": "stub-model", "max_tokens": 4, "messages": messages}).encode()
+    head = (
+        "POST /v1/messages HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+    )
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    writer.write(head.encode() + body)
+    response = await asyncio.wait_for(reader.read(), 10)
+    writer.close()
+    return response
+
+
+def run_with_stubs(manager, test, **options) -> None:
+    """启动两个上游并添加为代理池 pool 的成员 p0、p1，执行 test(server, stubs)"""
+
+    async def main():
+        stubs = [StubServer(port=0, ttft=0, token_delay=0, tokens=2) for _ in range(2)]
+        for i, stub in enumerate(stubs):
+            await stub.start()
+            manager.add_proxy(f"p{i}", stub.url, "sk-test-key", tags=["pool"])
+        server = LocalProxyServer(manager, port=0, watch=False, rate_limit=True, **options)
+        await server.start()
+        try:
+            await test(server, stubs)
+        finally:
+            await server.close()
+            for stub in stubs:
+                await stub.close()
+
+    asyncio.run(main())
+
+
+def test_pool_prefers_members_with_capacity(manager):
+    async def test(server, stubs):
+        server.limiter.update("p0", 429, [("retry-after", "60")])
+        for _ in range(4):
+            assert (await post(server)).startswith(b"HTTP/1.1 200 ")
+        assert [stub.requests for stub in stubs] == [0, 4]
+
+    run_with_stubs(manager, test, pool_tag="pool")
+
+
+def test_queue_timeout_returns_429(manager):
+    async def test(server, stubs):
+        manager.switch_proxy("p0")
+        server.limiter.update("p0", 429, [("retry-after", "60")])
+        response = await post(server)
+        assert response.startswith(b"HTTP/1.1 429 ")
+        assert b"rate_limit_error" in response
+        assert stubs[0].requests == 0
+
+    run_with_stubs(manager, test, max_queue_wait=0.05)
@@ -0,0 +1,63 @@
+"""
+按模型路由
+
+peek_model 只接受请求体顶层对象的 model 键，替换后的请求体仍是原来的 JSON。
+"""
+
+import json
+
+import pytest
+
+from claudewarp.core.router import peek_model, replace_model
+
+
+def test_top_level_model_after_nested_model():
+    body = json.dumps(
+        {
+            "messages": [
+                {
+                    "role": "assistant",
+                    "content": [
+                        {"type": "tool_use", "name": "pick", "input": {"model": "gpt-4o"}},
+                    ],
+                },
+                {"role": "user", "content": 'say "model": "fake"'},
+            ],
+            "tools": [{"name": "pick", "input_schema": {"properties": {"model": {}}}}],
+            "model": "claude-opus-4-1",
+            "stream": True,
+        }
+    ).encode()
+    peeked = peek_model(body)
+    assert peeked.model == "claude-opus-4-1"
+
+    replaced = json.loads(replace_model(body, peeked, "claude-sonnet-4-5"))
+    assert replaced["model"] == "claude-sonnet-4-5"
+    assert replaced["messages"][0]["content"][0]["input"] == {"model": "gpt-4o"}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        # 只有嵌套对象中有 model
+        b'{"metadata": {"model": "claude-haiku"}, "max_tokens": 16}',
+        # model 作为值而不是键
+        b'{"name": "model", "tags": ["model"]}',
+        # 顶层 model 不是字符串
+        b'{"model": null, "max_tokens": 16}',
+        # 不是 JSON 对象
+        b'[{"model": "claude-haiku"}]',
+        b"",
+    ],
+)
+def test_no_top_level_model(body):
+    assert peek_model(body) is None
+
+
+def test_model_beyond_limit_is_not_routed():
+    padding = json.dumps({"text": "x" * 200, "inner": {"model": "nested"}})
+    body = f'{{"system": {padding}, "model": "claude-opus-4-1"}}'.encode()
+    assert peek_model(body).model == "claude-opus-4-1"
+    # 范围在字符串中间截断：不会把字符串内容当作结构
+    assert peek_model(body, limit=40) is None
+    assert peek_model(body, limit=body.index(b'"model": "claude')) is None
@@ -0,0 +1,45 @@
+"""
+配置文件监视
+
+其他进程修改配置文件后，检查时增量重新加载并通知回调增删改的代理；本进程自己的写入不产生事件。
+"""
+
+import pytest
+
+from claudewarp.core.manager import ProxyManager
+from claudewarp.core.watcher import ConfigWatcher
+
+
+@pytest.fixture
+def config_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "config.toml"
+
+
+def test_polling_check_reports_external_changes(config_path):
+    manager = ProxyManager(config_path=config_path, auto_backup=False)
+    for name in ("p0", "p1"):
+        manager.add_proxy(name, "https://watch.example.com/", "sk-test-key")
+    watcher = ConfigWatcher(manager, use_inotify=False)
+    events = []
+    watcher.add_callback(events.append)
+    assert watcher.check() == [] and watcher.backend == "polling"
+
+    # 本进程的修改
+    manager.update_proxy("p0", description="local")
+    assert watcher.check() == []
+
+    other = ProxyManager(config_path=config_path, auto_backup=False)
+    other.add_proxy("p2", "https://watch.example.com/", "sk-test-key")
+    other.update_proxy("p1", description="external")
+    other.remove_proxy("p0")
+
+    assert watcher.check() == events
+    assert len(events) == 1
+    event = events[0]
+    assert (event["source"], event["path"]) == ("config", str(config_path))
+    assert (event["added"], event["changed"], event["removed"]) == (["p2"], ["p1"], ["p0"])
+    assert manager.get_proxy("p1").description == "external"
+    assert sorted(manager.config.proxies) == ["p1", "p2"]
+    assert watcher.check() == []